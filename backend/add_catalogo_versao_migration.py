@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import settings
+from app.models import CatalogoVersao
+
+def add_catalogo_versao():
+    """Add catalog version columns to produtos and create the per-event version counter"""
+    engine = create_engine(settings.database_url)
+    
+    CatalogoVersao.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Table catalogo_versoes ready")
+    
+    with engine.connect() as conn:
+        for coluna in ("versao INTEGER DEFAULT 0", "estoque_versionado INTEGER"):
+            try:
+                conn.execute(text(f"ALTER TABLE produtos ADD COLUMN {coluna}"))
+                print(f"✅ Added column produtos.{coluna.split()[0]}")
+            except Exception as e:
+                print(f"ℹ️ Column produtos.{coluna.split()[0]} already exists or error: {e}")
+        
+        try:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_produtos_versao ON produtos (versao)"))
+            print("✅ Index ix_produtos_versao created")
+        except Exception as e:
+            print(f"❌ Error creating index: {e}")
+        
+        try:
+            conn.execute(text("UPDATE produtos SET versao = 1, estoque_versionado = estoque_atual WHERE versao IS NULL OR versao = 0"))
+            conn.execute(text("""
+                INSERT INTO catalogo_versoes (evento_id, versao)
+                SELECT DISTINCT p.evento_id, 1 FROM produtos p
+                WHERE NOT EXISTS (SELECT 1 FROM catalogo_versoes c WHERE c.evento_id = p.evento_id)
+            """))
+            print("✅ Existing products published as version 1")
+        except Exception as e:
+            print(f"❌ Error seeding catalog versions: {e}")
+        
+        conn.commit()
+        print("✅ Catalog version migration completed successfully!")
+
+if __name__ == "__main__":
+    add_catalogo_versao()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import settings
+from app.models import ArquivoComprovante
+
+def add_comprovantes():
+    """Add content-addressed receipt storage and link financial movements to it"""
+    engine = create_engine(settings.database_url)
+    
+    ArquivoComprovante.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Table arquivos_comprovante ready")
+    
+    with engine.connect() as conn:
+        try:
+            conn.execute(text(
+                "ALTER TABLE movimentacoes_financeiras ADD COLUMN comprovante_hash VARCHAR(64) "
+                "REFERENCES arquivos_comprovante(hash)"
+            ))
+            print("✅ Added column movimentacoes_financeiras.comprovante_hash")
+        except Exception as e:
+            print(f"ℹ️ Column movimentacoes_financeiras.comprovante_hash already exists or error: {e}")
+        
+        try:
+            conn.execute(text("ALTER TABLE arquivos_comprovante ADD COLUMN liberado_em TIMESTAMP"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_arquivos_comprovante_liberado_em ON arquivos_comprovante (liberado_em)"
+            ))
+            # Órfãos já existentes: o prazo da limpeza começa agora
+            conn.execute(text(
+                "UPDATE arquivos_comprovante SET liberado_em = CURRENT_TIMESTAMP "
+                "WHERE referencias <= 0 AND liberado_em IS NULL"
+            ))
+            print("✅ Added column arquivos_comprovante.liberado_em")
+        except Exception as e:
+            print(f"ℹ️ Column arquivos_comprovante.liberado_em already exists or error: {e}")
+        
+        try:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_movimentacoes_financeiras_comprovante_hash "
+                "ON movimentacoes_financeiras (comprovante_hash)"
+            ))
+            print("✅ Index ix_movimentacoes_financeiras_comprovante_hash created")
+        except Exception as e:
+            print(f"❌ Error creating index: {e}")
+        
+        conn.commit()
+        print("ℹ️ Receipts uploaded before this migration keep their comprovante_url path")
+        print("✅ Receipt storage migration completed successfully!")
+
+if __name__ == "__main__":
+    add_comprovantes()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import settings
+
+COLUNAS = [
+    ("desconto_valor", "NUMERIC(10,2)"),
+    ("data_inicio_desconto", "TIMESTAMP"),
+    ("data_fim_desconto", "TIMESTAMP"),
+    ("limite_uso_cupom", "INTEGER"),
+    ("usos_cupom", "INTEGER DEFAULT 0"),
+]
+
+def add_cupom_fields():
+    """Add coupon fields and the codigo_cupom index to listas table"""
+    engine = create_engine(settings.database_url)
+    
+    with engine.connect() as conn:
+        for coluna, tipo in COLUNAS:
+            try:
+                conn.execute(text(f"ALTER TABLE listas ADD COLUMN {coluna} {tipo}"))
+                print(f"✅ Added {coluna} column to listas table")
+            except Exception as e:
+                if "duplicate column name" in str(e).lower() or "already exists" in str(e).lower():
+                    print(f"ℹ️ {coluna} column already exists")
+                else:
+                    print(f"❌ Error adding {coluna} column: {e}")
+        
+        try:
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_listas_codigo_cupom ON listas (codigo_cupom)"))
+            print("✅ Index ix_listas_codigo_cupom ready")
+        except Exception as e:
+            print(f"❌ Error creating index ix_listas_codigo_cupom (check for duplicated coupon codes): {e}")
+        
+        conn.commit()
+        print("✅ Cupom fields migration completed successfully!")
+
+if __name__ == "__main__":
+    add_cupom_fields()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import settings, SessionLocal
+from app.models import SnapshotEstoque, ResumoMovimentoEstoque, MovimentoEstoqueArquivo
+from app.services.estoque_service import estoque_service
+
+def add_estoque_snapshots():
+    """Add stock snapshot, hourly rollup and archive tables, plus the (produto_id, criado_em) index"""
+    engine = create_engine(settings.database_url)
+
+    for tabela in (SnapshotEstoque, ResumoMovimentoEstoque, MovimentoEstoqueArquivo):
+        tabela.__table__.create(bind=engine, checkfirst=True)
+        print(f"✅ Table {tabela.__tablename__} ready")
+
+    with engine.connect() as conn:
+        try:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_movimentos_estoque_produto_criado_em "
+                "ON movimentos_estoque (produto_id, criado_em)"
+            ))
+            print("✅ Index ix_movimentos_estoque_produto_criado_em created")
+        except Exception as e:
+            print(f"❌ Error creating index: {e}")
+
+        conn.commit()
+
+    db = SessionLocal()
+    try:
+        # Baseline snapshot and rollups for the history already recorded
+        snapshots = estoque_service.tirar_snapshots(db)
+        resumos = estoque_service.consolidar(db)
+        db.commit()
+        print(f"✅ Initial snapshots: {snapshots}, hourly rollups: {resumos}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error creating initial snapshots: {e}")
+    finally:
+        db.close()
+
+    print("✅ Stock snapshots migration completed successfully!")
+
+if __name__ == "__main__":
+    add_estoque_snapshots()
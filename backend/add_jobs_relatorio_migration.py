@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from app.database import settings
+from app.models import JobRelatorio
+
+def add_jobs_relatorio():
+    """Add the report jobs table and the on-disk result cache directory"""
+    engine = create_engine(settings.database_url)
+
+    JobRelatorio.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Table jobs_relatorio ready")
+
+    try:
+        os.makedirs(settings.relatorios_cache_dir, exist_ok=True)
+        print(f"✅ Report cache directory ready: {settings.relatorios_cache_dir}")
+    except Exception as e:
+        print(f"❌ Error creating report cache directory: {e}")
+
+    print("✅ Report jobs migration completed successfully!")
+
+if __name__ == "__main__":
+    add_jobs_relatorio()
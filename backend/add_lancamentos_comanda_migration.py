@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import settings
+from app.models import LancamentoComanda
+
+def add_lancamentos_comanda():
+    """Create the comanda ledger table and seed opening balances for existing comandas"""
+    engine = create_engine(settings.database_url)
+    
+    LancamentoComanda.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Table lancamentos_comanda ready")
+    
+    with engine.connect() as conn:
+        try:
+            resultado = conn.execute(text("""
+                INSERT INTO lancamentos_comanda (comanda_id, tipo, valor, saldo_apos)
+                SELECT c.id, 'ajuste', c.saldo_atual, c.saldo_atual
+                FROM comandas c
+                WHERE COALESCE(c.saldo_atual, 0) <> 0
+                  AND NOT EXISTS (SELECT 1 FROM lancamentos_comanda l WHERE l.comanda_id = c.id)
+            """))
+            print(f"✅ Opening balance entries created: {resultado.rowcount}")
+        except Exception as e:
+            print(f"❌ Error seeding opening balances: {e}")
+        
+        conn.commit()
+        print("✅ Comanda ledger migration completed successfully!")
+
+if __name__ == "__main__":
+    add_lancamentos_comanda()
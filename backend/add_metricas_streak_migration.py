@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import settings
+
+def add_metricas_streak():
+    """Add streak_vendas and empresa_id columns and their indexes to metricas_promoters"""
+    engine = create_engine(settings.database_url)
+    
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE metricas_promoters ADD COLUMN streak_vendas INTEGER DEFAULT 0"))
+            print("✅ Added streak_vendas column to metricas_promoters table")
+        except Exception as e:
+            if "duplicate column name" in str(e).lower() or "already exists" in str(e).lower():
+                print("ℹ️ streak_vendas column already exists")
+            else:
+                print(f"❌ Error adding streak_vendas column: {e}")
+        
+        try:
+            conn.execute(text("ALTER TABLE metricas_promoters ADD COLUMN empresa_id INTEGER REFERENCES empresas(id)"))
+            print("✅ Added empresa_id column to metricas_promoters table")
+        except Exception as e:
+            if "duplicate column name" in str(e).lower() or "already exists" in str(e).lower():
+                print("ℹ️ empresa_id column already exists")
+            else:
+                print(f"❌ Error adding empresa_id column: {e}")
+        
+        try:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_metricas_promoters_empresa_id ON metricas_promoters (empresa_id)"))
+            print("✅ Index ix_metricas_promoters_empresa_id ready")
+        except Exception as e:
+            print(f"❌ Error creating index ix_metricas_promoters_empresa_id: {e}")
+        
+        try:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_metricas_promoters_periodo_fim ON metricas_promoters (periodo_fim)"))
+            print("✅ Index ix_metricas_promoters_periodo_fim ready")
+        except Exception as e:
+            print(f"❌ Error creating index ix_metricas_promoters_periodo_fim: {e}")
+        
+        conn.commit()
+        print("✅ Metricas migration completed successfully!")
+
+if __name__ == "__main__":
+    add_metricas_streak()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import settings
+
+INDICES = [
+    ("ix_transacoes_evento_criado_em_id", "transacoes", "evento_id, criado_em, id"),
+    ("ix_checkins_evento_checkin_em_id", "checkins", "evento_id, checkin_em, id"),
+    ("ix_comandas_evento_criado_em_id", "comandas", "evento_id, criado_em, id"),
+    ("ix_vendas_pdv_evento_criado_em_id", "vendas_pdv", "evento_id, criado_em, id"),
+    ("ix_movimentacoes_financeiras_evento_criado_em_id", "movimentacoes_financeiras", "evento_id, criado_em, id"),
+]
+
+def add_paginacao_indexes():
+    """Create composite indexes used by cursor pagination on (criado_em, id)"""
+    engine = create_engine(settings.database_url)
+    
+    with engine.connect() as conn:
+        for nome, tabela, colunas in INDICES:
+            try:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({colunas})"))
+                print(f"✅ Index {nome} ready")
+            except Exception as e:
+                print(f"❌ Error creating index {nome}: {e}")
+        
+        conn.commit()
+        print("✅ Pagination indexes migration completed successfully!")
+
+if __name__ == "__main__":
+    add_paginacao_indexes()
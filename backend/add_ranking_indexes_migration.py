@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import settings
+
+INDICES = [
+    ("ix_listas_promoter_id", "listas", "promoter_id"),
+    ("ix_transacoes_evento_id", "transacoes", "evento_id"),
+    ("ix_transacoes_lista_id", "transacoes", "lista_id"),
+    ("ix_promoter_conquistas_promoter_id", "promoter_conquistas", "promoter_id"),
+]
+
+def add_ranking_indexes():
+    """Create indexes used by the promoter ranking query"""
+    engine = create_engine(settings.database_url)
+    
+    with engine.connect() as conn:
+        for nome, tabela, coluna in INDICES:
+            try:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({coluna})"))
+                print(f"✅ Index {nome} ready")
+            except Exception as e:
+                print(f"❌ Error creating index {nome}: {e}")
+        
+        conn.commit()
+        print("✅ Ranking indexes migration completed successfully!")
+
+if __name__ == "__main__":
+    add_ranking_indexes()
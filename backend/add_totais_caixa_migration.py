@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import settings
+from app.models import TotalCaixaPDV
+
+def add_totais_caixa():
+    """Add running totals to caixa_pdv, link sales to their register and backfill both"""
+    engine = create_engine(settings.database_url)
+    
+    TotalCaixaPDV.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Table totais_caixa_pdv ready")
+    
+    with engine.connect() as conn:
+        alteracoes = [
+            ("caixa_pdv", "quantidade_vendas INTEGER DEFAULT 0"),
+            ("vendas_pdv", "caixa_id INTEGER REFERENCES caixa_pdv(id)"),
+        ]
+        for tabela, coluna in alteracoes:
+            try:
+                conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {coluna}"))
+                print(f"✅ Added column {tabela}.{coluna.split()[0]}")
+            except Exception as e:
+                print(f"ℹ️ Column {tabela}.{coluna.split()[0]} already exists or error: {e}")
+        
+        try:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_vendas_pdv_caixa_id ON vendas_pdv (caixa_id)"))
+            print("✅ Index ix_vendas_pdv_caixa_id created")
+        except Exception as e:
+            print(f"❌ Error creating index: {e}")
+        
+        try:
+            # Same window the X report used: operator's approved sales since the register opened
+            resultado = conn.execute(text("""
+                UPDATE vendas_pdv SET caixa_id = (
+                    SELECT c.id FROM caixa_pdv c
+                    WHERE c.evento_id = vendas_pdv.evento_id
+                      AND c.usuario_operador_id = vendas_pdv.usuario_vendedor_id
+                      AND c.data_abertura <= vendas_pdv.criado_em
+                      AND (c.data_fechamento IS NULL OR c.data_fechamento >= vendas_pdv.criado_em)
+                    ORDER BY c.data_abertura DESC LIMIT 1
+                )
+                WHERE caixa_id IS NULL
+            """))
+            print(f"✅ Sales linked to registers: {resultado.rowcount}")
+            
+            conn.execute(text("""
+                UPDATE caixa_pdv SET
+                    quantidade_vendas = (SELECT COUNT(*) FROM vendas_pdv v WHERE v.caixa_id = caixa_pdv.id AND v.status = 'APROVADA'),
+                    valor_vendas = (SELECT COALESCE(SUM(v.valor_final), 0) FROM vendas_pdv v WHERE v.caixa_id = caixa_pdv.id AND v.status = 'APROVADA')
+            """))
+            conn.execute(text("""
+                INSERT INTO totais_caixa_pdv (caixa_id, tipo_pagamento, quantidade, valor)
+                SELECT v.caixa_id, p.tipo_pagamento, COUNT(*), SUM(p.valor)
+                FROM pagamentos_pdv p JOIN vendas_pdv v ON v.id = p.venda_id
+                WHERE v.caixa_id IS NOT NULL AND v.status = 'APROVADA'
+                  AND NOT EXISTS (SELECT 1 FROM totais_caixa_pdv t WHERE t.caixa_id = v.caixa_id)
+                GROUP BY v.caixa_id, p.tipo_pagamento
+            """))
+            print("✅ Register totals backfilled")
+        except Exception as e:
+            print(f"❌ Error backfilling register totals: {e}")
+        
+        conn.commit()
+        print("✅ Register totals migration completed successfully!")
+
+if __name__ == "__main__":
+    add_totais_caixa()
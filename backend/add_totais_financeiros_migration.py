@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from app.database import settings, SessionLocal
+from app.models import TotalFinanceiroEvento, CaixaEvento, Evento
+from app.services.financeiro_service import financeiro_service
+
+def add_totais_financeiros():
+    """Add running financial totals per event and bring open cash boxes up to date"""
+    engine = create_engine(settings.database_url)
+
+    TotalFinanceiroEvento.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Table totais_financeiros_evento ready")
+
+    db = SessionLocal()
+    try:
+        evento_ids = [evento_id for (evento_id,) in db.query(Evento.id).all()]
+        for evento_id in evento_ids:
+            financeiro_service.criar_totais(db, evento_id, financeiro_service.apurar(db, evento_id))
+        db.commit()
+        print(f"✅ Totals backfilled for {len(evento_ids)} events")
+
+        caixas = db.query(CaixaEvento).filter(CaixaEvento.status == "aberto").all()
+        for caixa in caixas:
+            totais = financeiro_service.totais(db, caixa.evento_id)
+            for chave, valor in totais.items():
+                setattr(caixa, chave, valor)
+            caixa.saldo_final = financeiro_service.saldo(totais, caixa.saldo_inicial)
+        db.commit()
+        print(f"✅ Open cash boxes updated: {len(caixas)}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error backfilling financial totals: {e}")
+    finally:
+        db.close()
+
+    print("✅ Financial totals migration completed successfully!")
+
+if __name__ == "__main__":
+    add_totais_financeiros()
@@ -9,6 +9,26 @@ class Settings(BaseSettings):
     secret_key: str = "sua-chave-secreta-super-segura-aqui"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    scheduler_enabled: bool = True
+    quota_tamanho_bloco: int = 0
+    idempotencia_pdv_ttl_horas: float = 24
+    alerta_ruptura_minutos: float = 30
+    estoque_retencao_dias: int = 30
+    comprovantes_dir: str = "uploads/comprovantes"
+    comprovante_tamanho_maximo_mb: int = 20
+    relatorios_cache_dir: str = "cache/relatorios"
+    relatorios_workers: int = 2
+    relatorios_cache_max_mb: int = 500
+    relatorios_espera_segundos: float = 300  # espera máxima das exportações síncronas; depois, 504
+    pdf_workers: int = 0  # 0 = um por núcleo
+    pdf_max_fila: int = 0  # 0 = 4 por worker
+    pdf_timeout_segundos: float = 30
+    pdf_fontes_dir: str = ""
+    impressoras: str = ""  # "padrao=tcp://10.0.0.20:9100;bar1=/dev/usb/lp0"
+    impressao_colunas: int = 48
+    impressao_arquivo_pdf_dir: str = ""  # vazio = não arquivar PDF dos comprovantes
+    snapshots_analiticos_dir: str = "exports/analitico"
+    snapshot_lote_linhas: int = 50000
     
     class Config:
         env_file = ".env"
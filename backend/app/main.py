@@ -1,25 +1,42 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import asyncio
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 import psycopg
 
-from .database import engine, get_db
-from .models import Base
+from .database import engine, get_db, settings
+from .models import Base, Usuario
 from .routers import auth, eventos, usuarios, empresas, listas, transacoes, checkins, dashboard, relatorios, whatsapp, cupons, n8n, pdv, financeiro, gamificacao
 from .middleware import LoggingMiddleware
 from .auth import verificar_permissao_admin
-from .scheduler import start_scheduler
+from .scheduler import start_scheduler, stop_scheduler, scheduler
 from .websocket import manager
+from .services.quota_service import quota_service
+from .services.pdf_service import pdf_service
+from .services.impressao_service import impressao_service
 
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.scheduler_enabled:
+        await start_scheduler()
+    yield
+    if settings.scheduler_enabled:
+        await stop_scheduler()
+    await asyncio.to_thread(quota_service.liberar_blocos)
+    pdf_service.encerrar()
+    impressao_service.encerrar()
+
 app = FastAPI(
     title="Sistema de Gestão de Eventos",
     description="API completa para gestão de eventos com foco em segurança e automação via CPF",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Disable CORS. Do not remove this for full-stack development.
@@ -29,12 +46,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 app.add_middleware(LoggingMiddleware)
 
-start_scheduler()
-
 app.include_router(auth.router, prefix="/api/auth", tags=["Autenticação"])
 app.include_router(empresas.router, prefix="/api/empresas", tags=["Empresas"])
 app.include_router(usuarios.router, prefix="/api/usuarios", tags=["Usuários"])
@@ -75,6 +91,10 @@ async def checkin_websocket_endpoint(websocket: WebSocket, evento_id: int):
 async def healthz():
     return {"status": "ok", "mensagem": "Sistema de Gestão de Eventos funcionando"}
 
+@app.get("/api/scheduler/status")
+async def scheduler_status(usuario_atual: Usuario = Depends(verificar_permissao_admin)):
+    return scheduler.status()
+
 @app.get("/")
 async def root():
     return {
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Numeric, Enum, Date
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Numeric, Enum, Date, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -100,10 +100,15 @@ class Lista(Base):
     vendas_realizadas = Column(Integer, default=0)
     ativa = Column(Boolean, default=True)
     evento_id = Column(Integer, ForeignKey("eventos.id"), nullable=False)
-    promoter_id = Column(Integer, ForeignKey("usuarios.id"))
+    promoter_id = Column(Integer, ForeignKey("usuarios.id"), index=True)
     descricao = Column(Text)
-    codigo_cupom = Column(String(50))
+    codigo_cupom = Column(String(50), unique=True, index=True)
     desconto_percentual = Column(Numeric(5, 2), default=0)
+    desconto_valor = Column(Numeric(10, 2))
+    data_inicio_desconto = Column(DateTime(timezone=True))
+    data_fim_desconto = Column(DateTime(timezone=True))
+    limite_uso_cupom = Column(Integer)
+    usos_cupom = Column(Integer, default=0)
     
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -128,6 +133,7 @@ class PromoterEvento(Base):
 
 class Transacao(Base):
     __tablename__ = "transacoes"
+    __table_args__ = (Index("ix_transacoes_evento_criado_em_id", "evento_id", "criado_em", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     cpf_comprador = Column(String(14), nullable=False, index=True)
@@ -139,8 +145,8 @@ class Transacao(Base):
     metodo_pagamento = Column(String(50))
     codigo_transacao = Column(String(100), unique=True)
     qr_code_ticket = Column(String(100), unique=True)
-    evento_id = Column(Integer, ForeignKey("eventos.id"), nullable=False)
-    lista_id = Column(Integer, ForeignKey("listas.id"), nullable=False)
+    evento_id = Column(Integer, ForeignKey("eventos.id"), nullable=False, index=True)
+    lista_id = Column(Integer, ForeignKey("listas.id"), nullable=False, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"))
     ip_origem = Column(String(45))
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
@@ -152,6 +158,7 @@ class Transacao(Base):
 
 class Checkin(Base):
     __tablename__ = "checkins"
+    __table_args__ = (Index("ix_checkins_evento_checkin_em_id", "evento_id", "checkin_em", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     cpf = Column(String(14), nullable=False, index=True)
@@ -226,6 +233,8 @@ class Produto(Base):
     imagem_url = Column(String(500))
     evento_id = Column(Integer, ForeignKey("eventos.id"), nullable=False)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
+    versao = Column(Integer, default=0, index=True)  # versão do catálogo do evento na última alteração
+    estoque_versionado = Column(Integer)  # estoque publicado na última versão
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
     atualizado_em = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -236,6 +245,7 @@ class Produto(Base):
 
 class Comanda(Base):
     __tablename__ = "comandas"
+    __table_args__ = (Index("ix_comandas_evento_criado_em_id", "evento_id", "criado_em", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     numero_comanda = Column(String(20), unique=True, nullable=False)
@@ -256,9 +266,11 @@ class Comanda(Base):
     empresa = relationship("Empresa")
     vendas = relationship("VendaPDV", back_populates="comanda")
     recargas = relationship("RecargaComanda", back_populates="comanda")
+    lancamentos = relationship("LancamentoComanda")
 
 class VendaPDV(Base):
     __tablename__ = "vendas_pdv"
+    __table_args__ = (Index("ix_vendas_pdv_evento_criado_em_id", "evento_id", "criado_em", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     numero_venda = Column(String(20), unique=True, nullable=False)
@@ -274,6 +286,7 @@ class VendaPDV(Base):
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
     usuario_vendedor_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
     promoter_id = Column(Integer, ForeignKey("usuarios.id"))
+    caixa_id = Column(Integer, ForeignKey("caixa_pdv.id"), index=True)
     cupom_codigo = Column(String(50))
     observacoes = Column(Text)
     ip_origem = Column(String(45))
@@ -337,8 +350,22 @@ class RecargaComanda(Base):
     comanda = relationship("Comanda", back_populates="recargas")
     usuario = relationship("Usuario")
 
+class LancamentoComanda(Base):
+    __tablename__ = "lancamentos_comanda"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    comanda_id = Column(Integer, ForeignKey("comandas.id"), nullable=False, index=True)
+    tipo = Column(String(20), nullable=False)  # recarga, debito, estorno, ajuste
+    valor = Column(Numeric(10, 2), nullable=False)  # positivo credita, negativo debita
+    saldo_apos = Column(Numeric(10, 2), nullable=False)
+    venda_id = Column(Integer, ForeignKey("vendas_pdv.id"))
+    recarga_id = Column(Integer, ForeignKey("recargas_comanda.id"))
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"))
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+
 class MovimentoEstoque(Base):
     __tablename__ = "movimentos_estoque"
+    __table_args__ = (Index("ix_movimentos_estoque_produto_criado_em", "produto_id", "criado_em"),)
     
     id = Column(Integer, primary_key=True, index=True)
     produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
@@ -355,6 +382,47 @@ class MovimentoEstoque(Base):
     venda = relationship("VendaPDV")
     usuario = relationship("Usuario")
 
+class SnapshotEstoque(Base):
+    __tablename__ = "snapshots_estoque"
+    __table_args__ = (Index("ix_snapshots_estoque_produto_tirado_em", "produto_id", "tirado_em"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
+    evento_id = Column(Integer, ForeignKey("eventos.id"), nullable=False, index=True)
+    estoque = Column(Integer, nullable=False)
+    ultimo_movimento_id = Column(Integer, nullable=False, default=0)  # movimentos até este id já estão no estoque
+    tirado_em = Column(DateTime(timezone=True), server_default=func.now())
+
+class ResumoMovimentoEstoque(Base):
+    __tablename__ = "resumos_movimento_estoque"
+    __table_args__ = (
+        UniqueConstraint("produto_id", "hora", name="uq_resumos_movimento_estoque_produto_hora"),
+        Index("ix_resumos_movimento_estoque_evento_hora", "evento_id", "hora"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
+    evento_id = Column(Integer, ForeignKey("eventos.id"), nullable=False)
+    hora = Column(DateTime(timezone=True), nullable=False)
+    entradas = Column(Integer, nullable=False, default=0)
+    saidas = Column(Integer, nullable=False, default=0)
+    variacao = Column(Integer, nullable=False, default=0)  # soma de estoque_atual - estoque_anterior
+    movimentos = Column(Integer, nullable=False, default=0)
+
+class MovimentoEstoqueArquivo(Base):
+    __tablename__ = "movimentos_estoque_arquivo"
+    __table_args__ = (Index("ix_movimentos_estoque_arquivo_produto_inicio", "produto_id", "inicio"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
+    inicio = Column(DateTime(timezone=True), nullable=False)
+    fim = Column(DateTime(timezone=True), nullable=False)
+    primeiro_movimento_id = Column(Integer, nullable=False)
+    ultimo_movimento_id = Column(Integer, nullable=False)
+    movimentos = Column(Integer, nullable=False)
+    dados = Column(LargeBinary, nullable=False)  # JSON comprimido (zlib) das linhas de movimentos_estoque
+    arquivado_em = Column(DateTime(timezone=True), server_default=func.now())
+
 class CaixaPDV(Base):
     __tablename__ = "caixa_pdv"
     
@@ -364,6 +432,7 @@ class CaixaPDV(Base):
     usuario_operador_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
     valor_abertura = Column(Numeric(10, 2), default=0)
     valor_vendas = Column(Numeric(10, 2), default=0)
+    quantidade_vendas = Column(Integer, default=0)
     valor_sangrias = Column(Numeric(10, 2), default=0)
     valor_fechamento = Column(Numeric(10, 2), default=0)
     status = Column(String(20), default="aberto")  # aberto, fechado
@@ -373,6 +442,19 @@ class CaixaPDV(Base):
     
     evento = relationship("Evento")
     operador = relationship("Usuario")
+    totais = relationship("TotalCaixaPDV", back_populates="caixa")
+
+class TotalCaixaPDV(Base):
+    __tablename__ = "totais_caixa_pdv"
+    __table_args__ = (UniqueConstraint("caixa_id", "tipo_pagamento", name="uq_totais_caixa_pdv_caixa_tipo"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    caixa_id = Column(Integer, ForeignKey("caixa_pdv.id"), nullable=False)
+    tipo_pagamento = Column(Enum(TipoPagamentoPDV), nullable=False)
+    quantidade = Column(Integer, nullable=False, default=0)
+    valor = Column(Numeric(10, 2), nullable=False, default=0)
+    
+    caixa = relationship("CaixaPDV", back_populates="totais")
 
 class LogAuditoria(Base):
     __tablename__ = "logs_auditoria"
@@ -411,8 +493,21 @@ class StatusMovimentacaoFinanceira(enum.Enum):
     CANCELADA = "cancelada"
 
 
+class ArquivoComprovante(Base):
+    __tablename__ = "arquivos_comprovante"
+    
+    hash = Column(String(64), primary_key=True)  # sha256 do conteúdo
+    tamanho = Column(Integer, nullable=False)
+    content_type = Column(String(100), nullable=False)
+    extensao = Column(String(10), nullable=False)
+    miniatura_status = Column(String(20), default="pendente")  # pendente, pronta, indisponivel, erro
+    referencias = Column(Integer, nullable=False, default=0)
+    liberado_em = Column(DateTime(timezone=True), index=True)  # quando as referências chegaram a zero
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+
 class MovimentacaoFinanceira(Base):
     __tablename__ = "movimentacoes_financeiras"
+    __table_args__ = (Index("ix_movimentacoes_financeiras_evento_criado_em_id", "evento_id", "criado_em", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     evento_id = Column(Integer, ForeignKey("eventos.id"), nullable=False)
@@ -426,6 +521,7 @@ class MovimentacaoFinanceira(Base):
     promoter_id = Column(Integer, ForeignKey("usuarios.id"))
     
     comprovante_url = Column(String(500))
+    comprovante_hash = Column(String(64), ForeignKey("arquivos_comprovante.hash"), index=True)
     numero_documento = Column(String(100))
     
     observacoes = Column(Text)
@@ -467,6 +563,30 @@ class CaixaEvento(Base):
     usuario_abertura = relationship("Usuario", foreign_keys=[usuario_abertura_id])
     usuario_fechamento = relationship("Usuario", foreign_keys=[usuario_fechamento_id])
 
+class TotalFinanceiroEvento(Base):
+    __tablename__ = "totais_financeiros_evento"
+    
+    evento_id = Column(Integer, ForeignKey("eventos.id"), primary_key=True)
+    total_entradas = Column(Numeric(12, 2), nullable=False, default=0)
+    total_saidas = Column(Numeric(12, 2), nullable=False, default=0)
+    total_vendas_pdv = Column(Numeric(12, 2), nullable=False, default=0)
+    total_vendas_listas = Column(Numeric(12, 2), nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class JobRelatorio(Base):
+    __tablename__ = "jobs_relatorio"
+    
+    id = Column(String(36), primary_key=True)
+    relatorio = Column(String(50), nullable=False)
+    parametros = Column(Text, nullable=False)  # JSON
+    chave_cache = Column(String(64), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="pendente")  # pendente, processando, concluido, erro
+    cache_hit = Column(Boolean, default=False)
+    erro = Column(Text)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+    concluido_em = Column(DateTime(timezone=True))
+
 class TipoConquista(enum.Enum):
     VENDAS = "vendas"
     PRESENCA = "presenca"
@@ -499,7 +619,7 @@ class PromoterConquista(Base):
     __tablename__ = "promoter_conquistas"
     
     id = Column(Integer, primary_key=True, index=True)
-    promoter_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    promoter_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
     conquista_id = Column(Integer, ForeignKey("conquistas.id"), nullable=False)
     evento_id = Column(Integer, ForeignKey("eventos.id"))
     valor_alcancado = Column(Integer, nullable=False)
@@ -516,8 +636,9 @@ class MetricaPromoter(Base):
     id = Column(Integer, primary_key=True, index=True)
     promoter_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
     evento_id = Column(Integer, ForeignKey("eventos.id"))
+    empresa_id = Column(Integer, ForeignKey("empresas.id"), index=True)  # empresa do evento; NULL na linha geral
     periodo_inicio = Column(Date, nullable=False)
-    periodo_fim = Column(Date, nullable=False)
+    periodo_fim = Column(Date, nullable=False, index=True)
     
     total_vendas = Column(Integer, default=0)
     receita_gerada = Column(Numeric(10, 2), default=0)
@@ -526,6 +647,7 @@ class MetricaPromoter(Base):
     taxa_presenca = Column(Numeric(5, 2), default=0)
     taxa_conversao = Column(Numeric(5, 2), default=0)
     crescimento_vendas = Column(Numeric(5, 2), default=0)
+    streak_vendas = Column(Integer, default=0)
     
     posicao_vendas = Column(Integer)
     posicao_presenca = Column(Integer)
@@ -536,3 +658,51 @@ class MetricaPromoter(Base):
     
     promoter = relationship("Usuario")
     evento = relationship("Evento")
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+    
+    nome = Column(String(50), primary_key=True)
+    holder = Column(String(100), nullable=False)
+    expira_em = Column(DateTime(timezone=True), nullable=False)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ExecucaoJob(Base):
+    __tablename__ = "execucoes_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job = Column(String(50), nullable=False, index=True)
+    worker = Column(String(100), nullable=False)
+    status = Column(String(20), nullable=False)  # sucesso, erro, timeout
+    iniciado_em = Column(DateTime(timezone=True), nullable=False)
+    duracao_ms = Column(Integer, nullable=False)
+    erro = Column(Text)
+
+class EstadoAlerta(Base):
+    __tablename__ = "estados_alertas"
+    __table_args__ = (UniqueConstraint("regra", "chave", name="uq_estados_alertas_regra_chave"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    regra = Column(String(50), nullable=False)
+    chave = Column(String(100), nullable=False)
+    nivel = Column(Integer, nullable=False, default=1)  # último limiar notificado
+    disparado_em = Column(DateTime(timezone=True), server_default=func.now())
+
+class RequisicaoIdempotente(Base):
+    __tablename__ = "requisicoes_idempotentes"
+    __table_args__ = (UniqueConstraint("escopo", "chave", name="uq_requisicoes_idempotentes_escopo_chave"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    escopo = Column(String(100), nullable=False)  # operação + terminal/usuário
+    chave = Column(String(255), nullable=False)
+    hash_payload = Column(String(64), nullable=False)
+    resposta = Column(Text)  # JSON da resposta original
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+    expira_em = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class CatalogoVersao(Base):
+    __tablename__ = "catalogo_versoes"
+    
+    evento_id = Column(Integer, ForeignKey("eventos.id"), primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,145 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Type
+from fastapi import HTTPException, Response, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import and_, or_, func, text
+from sqlalchemy.orm import Query
+import logging
+
+logger = logging.getLogger(__name__)
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+@dataclass
+class Pagina:
+    itens: List[Any]
+    proximo_cursor: Optional[str] = None
+    total_estimado: Optional[int] = None
+    projetada: bool = False
+
+def codificar_cursor(ordem: datetime, id: int) -> str:
+    """Cursor opaco com a posição (ordem, id) do último item da página"""
+    bruto = json.dumps([ordem.isoformat() if ordem else None, id]).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ordem, id = json.loads(bruto)
+        return (datetime.fromisoformat(ordem) if ordem else None), int(id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+
+def _expressao_ordem(query: Query, coluna):
+    """No SQLite as datas ficam como texto em formatos mistos; normaliza para ordenar e comparar"""
+    if query.session.get_bind().dialect.name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:%M:%f", coluna)
+    return coluna
+
+def _valor_ordem(query: Query, valor: datetime):
+    if query.session.get_bind().dialect.name == "sqlite":
+        return valor.strftime("%Y-%m-%d %H:%M:%S.") + f"{valor.microsecond // 1000:03d}"
+    return valor
+
+def estimar_total(query: Query) -> int:
+    """Total de linhas; no PostgreSQL usa a estimativa do planejador em vez de COUNT(*)"""
+    bind = query.session.get_bind()
+    if bind.dialect.name == "postgresql":
+        try:
+            sql = query.order_by(None).statement.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+            plano = query.session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+            return int(plano[0]["Plan"]["Plan Rows"])
+        except Exception as e:
+            logger.warning(f"Estimativa de total indisponível, usando COUNT: {e}")
+    return query.order_by(None).count()
+
+@lru_cache(maxsize=None)
+def _esquema_parcial(esquema: Type[BaseModel], nomes: Tuple[str, ...]) -> Type[BaseModel]:
+    """Recorte do schema de resposta só com os campos pedidos (mesmos tipos e serialização)"""
+    return create_model(
+        f"{esquema.__name__}Parcial",
+        __config__=ConfigDict(from_attributes=True),
+        **{nome: (esquema.model_fields[nome].annotation, esquema.model_fields[nome]) for nome in nomes}
+    )
+
+def paginar(
+    query: Query,
+    modelo,
+    cursor: Optional[str] = None,
+    limit: int = LIMITE_PADRAO,
+    campos: Optional[str] = None,
+    coluna_ordem=None,
+    contar: bool = True,
+    esquema: Optional[Type[BaseModel]] = None
+) -> Pagina:
+    """
+    Paginação por cursor em (criado_em, id) decrescente, com projeção opcional de colunas.
+    Só podem ser projetados os campos do schema de resposta (`esquema`), e é por ele que saem.
+    """
+    coluna_ordem = coluna_ordem if coluna_ordem is not None else modelo.criado_em
+    limit = max(1, min(limit, LIMITE_MAXIMO))
+    ordem = _expressao_ordem(query, coluna_ordem)
+
+    total_estimado = estimar_total(query) if cursor is None and contar else None
+
+    if cursor:
+        valor, ultimo_id = decodificar_cursor(cursor)
+        if valor is None:
+            query = query.filter(coluna_ordem.is_(None), modelo.id < ultimo_id)
+        else:
+            valor = _valor_ordem(query, valor)
+            query = query.filter(or_(
+                ordem < valor,
+                and_(ordem == valor, modelo.id < ultimo_id)
+            ))
+
+    projetada = bool(campos)
+    if projetada:
+        if esquema is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Projeção de campos não suportada")
+        colunas = modelo.__table__.columns
+        permitidos = [nome for nome in esquema.model_fields if nome in colunas]
+        nomes = [nome.strip() for nome in campos.split(",") if nome.strip()]
+        invalidos = [nome for nome in nomes if nome not in permitidos]
+        if invalidos:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Campos inválidos: {', '.join(invalidos)}"
+            )
+        selecionados = list(dict.fromkeys(["id", coluna_ordem.key] + nomes))
+        query = query.with_entities(*[getattr(modelo, nome) for nome in selecionados])
+
+    linhas = query.order_by(ordem.desc(), modelo.id.desc()).limit(limit + 1).all()
+
+    proximo_cursor = None
+    if len(linhas) > limit:
+        linhas = linhas[:limit]
+        ultimo = linhas[-1]
+        proximo_cursor = codificar_cursor(getattr(ultimo, coluna_ordem.key), ultimo.id)
+
+    if projetada:
+        parcial = _esquema_parcial(esquema, tuple(nome for nome in selecionados if nome in permitidos))
+        itens = [parcial.model_validate(linha._asdict()).model_dump(mode="json") for linha in linhas]
+    else:
+        itens = linhas
+    return Pagina(itens=itens, proximo_cursor=proximo_cursor, total_estimado=total_estimado, projetada=projetada)
+
+def responder(pagina: Pagina, response: Response):
+    """Lista de itens no corpo; cursor e total estimado em cabeçalhos para manter o formato das respostas"""
+    headers = {}
+    if pagina.proximo_cursor:
+        headers["X-Next-Cursor"] = pagina.proximo_cursor
+    if pagina.total_estimado is not None:
+        headers["X-Total-Count"] = str(pagina.total_estimado)
+
+    if pagina.projetada:
+        return JSONResponse(content=pagina.itens, headers=headers)
+
+    response.headers.update(headers)
+    return pagina.itens
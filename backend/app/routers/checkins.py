@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -6,6 +6,7 @@ from ..database import get_db
 from ..models import Checkin, Transacao, Evento, Usuario, Comanda
 from ..schemas import Checkin as CheckinSchema, CheckinCreate
 from ..auth import obter_usuario_atual, validar_cpf_basico
+from ..pagination import paginar, responder, LIMITE_PADRAO
 from ..websocket import manager
 from ..services.whatsapp_service import whatsapp_service
 
@@ -84,6 +85,10 @@ async def realizar_checkin(
 @router.get("/evento/{evento_id}", response_model=List[CheckinSchema])
 async def listar_checkins_evento(
     evento_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = LIMITE_PADRAO,
+    campos: Optional[str] = None,
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(obter_usuario_atual)
 ):
@@ -103,8 +108,9 @@ async def listar_checkins_evento(
             detail="Acesso negado"
         )
     
-    checkins = db.query(Checkin).filter(Checkin.evento_id == evento_id).all()
-    return checkins
+    query = db.query(Checkin).filter(Checkin.evento_id == evento_id)
+    pagina = paginar(query, Checkin, cursor=cursor, limit=limit, campos=campos, coluna_ordem=Checkin.checkin_em, esquema=CheckinSchema)
+    return responder(pagina, response)
 
 @router.get("/cpf/{cpf}")
 async def verificar_checkin_cpf(
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime
 from ..database import get_db
 from ..models import Lista, Evento
 from ..schemas import CupomCreate, CupomResponse
 from ..auth import verificar_permissao_promoter
+from ..services.cupom_service import cupom_service, CupomInvalido
 
 router = APIRouter(prefix="/cupons", tags=["Cupons"])
 
@@ -42,6 +42,7 @@ async def criar_cupom(
     
     db.commit()
     db.refresh(lista)
+    cupom_service.invalidar()
     
     return CupomResponse(
         id=lista.id,
@@ -61,28 +62,21 @@ async def validar_cupom(
     Validar cupom de desconto e retornar informações de desconto.
     
     **Uso público:** Endpoint pode ser usado sem autenticação para validação de cupons.
+    Respondido pela tabela de cupons em memória, sem consulta ao banco.
     """
     
-    lista = db.query(Lista).filter(Lista.codigo_cupom == codigo).first()
-    if not lista:
-        raise HTTPException(status_code=404, detail="Cupom não encontrado")
-    
-    agora = datetime.now()
-    if lista.data_inicio_desconto and agora < lista.data_inicio_desconto:
-        raise HTTPException(status_code=400, detail="Cupom ainda não está ativo")
-    
-    if lista.data_fim_desconto and agora > lista.data_fim_desconto:
-        raise HTTPException(status_code=400, detail="Cupom expirado")
-    
-    if lista.limite_uso_cupom and lista.usos_cupom >= lista.limite_uso_cupom:
-        raise HTTPException(status_code=400, detail="Limite de uso do cupom atingido")
+    try:
+        cupom = cupom_service.validar(db, codigo)
+    except CupomInvalido as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
     return {
         "valido": True,
-        "desconto_percentual": float(lista.desconto_percentual or 0),
-        "desconto_valor": float(lista.desconto_valor or 0),
-        "lista_nome": lista.nome,
-        "preco_original": float(lista.preco)
+        "desconto_percentual": float(cupom.desconto_percentual),
+        "desconto_valor": float(cupom.desconto_valor),
+        "lista_nome": cupom.lista_nome,
+        "preco_original": float(cupom.preco),
+        "usos_restantes": cupom.usos_restantes
     }
 
 @router.post("/usar/{codigo}", summary="Usar cupom de desconto")
@@ -96,19 +90,20 @@ async def usar_cupom(
     **Uso:** Chamar após confirmação de compra com cupom.
     """
     
-    lista = db.query(Lista).filter(Lista.codigo_cupom == codigo).first()
-    if not lista:
-        raise HTTPException(status_code=404, detail="Cupom não encontrado")
+    try:
+        cupom = cupom_service.validar(db, codigo)
+    except CupomInvalido as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
-    if lista.limite_uso_cupom and lista.usos_cupom >= lista.limite_uso_cupom:
+    if not cupom_service.resgatar(db, codigo):
+        db.rollback()
         raise HTTPException(status_code=400, detail="Limite de uso do cupom atingido")
     
-    lista.usos_cupom = (lista.usos_cupom or 0) + 1
     db.commit()
     
     return {
         "message": "Cupom usado com sucesso",
-        "usos_restantes": (lista.limite_uso_cupom - lista.usos_cupom) if lista.limite_uso_cupom else None
+        "usos_restantes": cupom.usos_restantes
     }
 
 @router.get("/evento/{evento_id}", response_model=List[CupomResponse], summary="Listar cupons do evento")
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import get_db
 from ..models import Empresa, Usuario
 from ..schemas import Empresa as EmpresaSchema, EmpresaCreate
 from ..auth import obter_usuario_atual, verificar_permissao_admin
+from ..pagination import paginar, responder, LIMITE_PADRAO
 
 router = APIRouter()
 
@@ -32,14 +33,16 @@ async def criar_empresa(
 
 @router.get("/", response_model=List[EmpresaSchema])
 async def listar_empresas(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = LIMITE_PADRAO,
+    campos: Optional[str] = None,
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(verificar_permissao_admin)
 ):
     """Listar todas as empresas (apenas admins)"""
-    empresas = db.query(Empresa).offset(skip).limit(limit).all()
-    return empresas
+    pagina = paginar(db.query(Empresa), Empresa, cursor=cursor, limit=limit, campos=campos, esquema=EmpresaSchema)
+    return responder(pagina, response)
 
 @router.get("/{empresa_id}", response_model=EmpresaSchema)
 async def obter_empresa(
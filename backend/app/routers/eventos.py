@@ -7,9 +7,6 @@ from datetime import datetime
 from decimal import Decimal
 import csv
 import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import inch
 from ..database import get_db
 from ..models import Evento, Usuario, PromoterEvento, Transacao, Checkin, Lista, TipoUsuario
 from ..schemas import (
@@ -21,6 +18,9 @@ from ..schemas import (
     PromoterEventoResponse
 )
 from ..auth import obter_usuario_atual, verificar_permissao_admin
+from ..services.relatorio_job_service import relatorio_job_service, ArquivoRelatorio
+from ..services.pdf_service import pdf_service
+from ..services.financeiro_service import financeiro_service
 
 router = APIRouter()
 
@@ -55,6 +55,8 @@ async def criar_evento(
     
     db_evento = Evento(**evento_data)
     db.add(db_evento)
+    db.flush()
+    financeiro_service.criar_totais(db, db_evento.id)
     db.commit()
     db.refresh(db_evento)
     
@@ -523,13 +525,48 @@ async def exportar_evento_csv(
         headers={"Content-Disposition": f"attachment; filename=evento_{evento_id}_vendas.csv"}
     )
 
+def _gerar_evento_pdf(db: Session, parametros: dict, usuario: Usuario) -> ArquivoRelatorio:
+    evento_id = parametros["evento_id"]
+    evento = db.query(Evento).filter(Evento.id == evento_id).first()
+    
+    total_vendas = db.query(func.count(Transacao.id)).filter(
+        Transacao.evento_id == evento_id,
+        Transacao.status == "aprovada"
+    ).scalar() or 0
+    
+    receita_total = db.query(func.sum(Transacao.valor)).filter(
+        Transacao.evento_id == evento_id,
+        Transacao.status == "aprovada"
+    ).scalar() or Decimal('0.00')
+    
+    conteudo = pdf_service.gerar("evento", {
+        "nome": evento.nome,
+        "data_evento": evento.data_evento.strftime('%d/%m/%Y %H:%M'),
+        "local": evento.local,
+        "endereco": evento.endereco,
+        "limite_idade": evento.limite_idade,
+        "capacidade_maxima": evento.capacidade_maxima,
+        "status": evento.status.value,
+        "total_vendas": total_vendas,
+        "receita_total": float(receita_total)
+    })
+    
+    return ArquivoRelatorio(
+        conteudo=conteudo,
+        media_type="application/pdf",
+        nome_arquivo=f"evento_{evento_id}_relatorio.pdf"
+    )
+
+relatorio_job_service.registrar("evento_pdf", _gerar_evento_pdf, fontes=("eventos", "transacoes"))
+
 @router.get("/{evento_id}/export/pdf")
 async def exportar_evento_pdf(
     evento_id: int,
+    assincrono: bool = False,
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(obter_usuario_atual)
 ):
-    """Exportar dados do evento em PDF"""
+    """Exportar dados do evento em PDF (com `assincrono`, retorna o id do job)"""
     
     evento = db.query(Evento).filter(Evento.id == evento_id).first()
     if not evento:
@@ -545,56 +582,5 @@ async def exportar_evento_pdf(
             detail="Acesso negado"
         )
     
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, height - 50, f"Relatório do Evento: {evento.nome}")
-    
-    p.setFont("Helvetica", 12)
-    y_position = height - 100
-    
-    info_evento = [
-        f"Data: {evento.data_evento.strftime('%d/%m/%Y %H:%M')}",
-        f"Local: {evento.local}",
-        f"Endereço: {evento.endereco or 'N/A'}",
-        f"Limite de Idade: {evento.limite_idade}+",
-        f"Capacidade: {evento.capacidade_maxima}",
-        f"Status: {evento.status.value}"
-    ]
-    
-    for info in info_evento:
-        p.drawString(50, y_position, info)
-        y_position -= 20
-    
-    total_vendas = db.query(func.count(Transacao.id)).filter(
-        Transacao.evento_id == evento_id,
-        Transacao.status == "aprovada"
-    ).scalar() or 0
-    
-    receita_total = db.query(func.sum(Transacao.valor)).filter(
-        Transacao.evento_id == evento_id,
-        Transacao.status == "aprovada"
-    ).scalar() or Decimal('0.00')
-    
-    y_position -= 30
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(50, y_position, "Resumo Financeiro")
-    
-    y_position -= 30
-    p.setFont("Helvetica", 12)
-    p.drawString(50, y_position, f"Total de Vendas: {total_vendas}")
-    y_position -= 20
-    p.drawString(50, y_position, f"Receita Total: R$ {float(receita_total):.2f}")
-    
-    p.showPage()
-    p.save()
-    
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=evento_{evento_id}_relatorio.pdf"}
-    )
+    job = relatorio_job_service.solicitar(db, "evento_pdf", {"evento_id": evento_id}, usuario_atual)
+    return await relatorio_job_service.responder(db, job, assincrono)
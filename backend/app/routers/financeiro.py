@@ -1,23 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Response
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Response, Header
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from typing import List, Optional
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-import uuid
 import os
 import io
 import csv
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
 
 from ..database import get_db
 from ..models import (
     MovimentacaoFinanceira, CaixaEvento, Evento, Usuario, 
     TipoMovimentacaoFinanceira, StatusMovimentacaoFinanceira,
-    Transacao, VendaPDV, LogAuditoria
+    ArquivoComprovante, LogAuditoria
 )
 from ..schemas import (
     MovimentacaoFinanceiraCreate, MovimentacaoFinanceiraUpdate, 
@@ -26,6 +24,11 @@ from ..schemas import (
     DashboardFinanceiro
 )
 from ..auth import obter_usuario_atual, verificar_permissao_admin, verificar_permissao_promoter
+from ..pagination import paginar, responder, LIMITE_PADRAO
+from ..services.financeiro_service import financeiro_service
+from ..services.comprovante_service import comprovante_service, ComprovanteInvalido
+from ..services.relatorio_job_service import relatorio_job_service, ArquivoRelatorio
+from ..services.pdf_service import pdf_service
 
 router = APIRouter(prefix="/financeiro", tags=["Financeiro"])
 
@@ -51,6 +54,11 @@ async def criar_movimentacao(
     )
     
     db.add(db_movimentacao)
+    db.flush()
+    financeiro_service.registrar_movimentacao(
+        db, db_movimentacao.evento_id, None,
+        financeiro_service.contribuicao_movimentacao(db_movimentacao.tipo, db_movimentacao.status, db_movimentacao.valor)
+    )
     db.commit()
     db.refresh(db_movimentacao)
     
@@ -71,6 +79,10 @@ async def criar_movimentacao(
 @router.get("/movimentacoes/{evento_id}", response_model=List[MovimentacaoFinanceiraSchema])
 async def listar_movimentacoes(
     evento_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = LIMITE_PADRAO,
+    campos: Optional[str] = None,
     tipo: Optional[str] = "",
     categoria: Optional[str] = "",
     data_inicio: Optional[str] = "",
@@ -112,9 +124,8 @@ async def listar_movimentacoes(
     if status and status.strip():
         query = query.filter(MovimentacaoFinanceira.status == status)
     
-    movimentacoes = query.order_by(MovimentacaoFinanceira.criado_em.desc()).all()
-    
-    return movimentacoes
+    pagina = paginar(query, MovimentacaoFinanceira, cursor=cursor, limit=limit, campos=campos, esquema=MovimentacaoFinanceiraSchema)
+    return responder(pagina, response)
 
 @router.put("/movimentacoes/{movimentacao_id}", response_model=MovimentacaoFinanceiraSchema)
 async def atualizar_movimentacao(
@@ -144,9 +155,17 @@ async def atualizar_movimentacao(
         "status": movimentacao.status.value
     }
     
+    contribuicao_anterior = financeiro_service.contribuicao_movimentacao(
+        movimentacao.tipo, movimentacao.status, movimentacao.valor
+    )
+    
     for field, value in movimentacao_update.dict(exclude_unset=True).items():
         setattr(movimentacao, field, value)
     
+    financeiro_service.registrar_movimentacao(
+        db, movimentacao.evento_id, contribuicao_anterior,
+        financeiro_service.contribuicao_movimentacao(movimentacao.tipo, movimentacao.status, movimentacao.valor)
+    )
     db.commit()
     db.refresh(movimentacao)
     
@@ -186,28 +205,88 @@ async def upload_comprovante(
         usuario_atual.empresa_id != evento.empresa_id):
         raise HTTPException(status_code=403, detail="Acesso negado")
     
-    allowed_types = ["image/jpeg", "image/png", "application/pdf"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=400, 
-            detail="Tipo de arquivo não permitido. Use JPEG, PNG ou PDF."
-        )
+    try:
+        recebido = await comprovante_service.receber(file)
+    except ComprovanteInvalido as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
-    upload_dir = "uploads/comprovantes"
-    os.makedirs(upload_dir, exist_ok=True)
+    duplicado = comprovante_service.armazenar(db, recebido)
+    comprovante_service.liberar(db, movimentacao.comprovante_hash)
     
-    file_extension = file.filename.split(".")[-1]
-    filename = f"comprovante_{movimentacao_id}_{uuid.uuid4().hex}.{file_extension}"
-    file_path = os.path.join(upload_dir, filename)
+    url = f"/api/financeiro/comprovantes/{recebido.hash}"
+    movimentacao.comprovante_hash = recebido.hash
+    movimentacao.comprovante_url = url
+    db.commit()
     
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    if not duplicado and recebido.content_type.startswith("image/"):
+        comprovante_service.agendar_miniatura(recebido.hash)
     
-    movimentacao.comprovante_url = file_path
-    db.commit()
+    return {
+        "message": "Comprovante enviado com sucesso",
+        "url": url,
+        "hash": recebido.hash,
+        "tamanho": recebido.tamanho,
+        "duplicado": duplicado
+    }
+
+@router.get("/comprovantes/uso/{evento_id}")
+async def obter_uso_comprovantes(
+    evento_id: int,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Espaço ocupado pelos comprovantes do evento"""
+    
+    evento = db.query(Evento).filter(Evento.id == evento_id).first()
+    if not evento:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
     
-    return {"message": "Comprovante enviado com sucesso", "url": file_path}
+    if (usuario_atual.tipo.value != "admin" and 
+        usuario_atual.empresa_id != evento.empresa_id):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    return comprovante_service.uso_por_evento(db, evento_id)
+
+@router.get("/comprovantes/{hash}")
+async def baixar_comprovante(
+    hash: str,
+    miniatura: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Servir um comprovante (ou sua miniatura) com suporte a Range e cache"""
+    
+    arquivo = db.query(ArquivoComprovante).filter(ArquivoComprovante.hash == hash).first()
+    if not arquivo:
+        raise HTTPException(status_code=404, detail="Comprovante não encontrado")
+    
+    if usuario_atual.tipo.value != "admin":
+        permitido = db.query(MovimentacaoFinanceira.id).join(
+            Evento, Evento.id == MovimentacaoFinanceira.evento_id
+        ).filter(
+            MovimentacaoFinanceira.comprovante_hash == hash,
+            Evento.empresa_id == usuario_atual.empresa_id
+        ).first()
+        if not permitido:
+            raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    if miniatura:
+        if arquivo.miniatura_status != "pronta":
+            raise HTTPException(status_code=404, detail=f"Miniatura {arquivo.miniatura_status}")
+        caminho, media_type, etag = comprovante_service.caminho_miniatura(hash), "image/jpeg", f'"{hash}-miniatura"'
+    else:
+        caminho, media_type, etag = comprovante_service.caminho(hash, arquivo.extensao), arquivo.content_type, f'"{hash}"'
+    
+    # Conteúdo endereçado pelo hash nunca muda
+    cabecalhos = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=cabecalhos)
+    
+    if not os.path.exists(caminho):
+        raise HTTPException(status_code=404, detail="Arquivo do comprovante não encontrado")
+    
+    return FileResponse(caminho, media_type=media_type, headers=cabecalhos)
 
 @router.get("/dashboard/{evento_id}", response_model=DashboardFinanceiro)
 async def obter_dashboard_financeiro(
@@ -225,33 +304,12 @@ async def obter_dashboard_financeiro(
         usuario_atual.empresa_id != evento.empresa_id):
         raise HTTPException(status_code=403, detail="Acesso negado")
     
-    total_entradas = db.query(func.sum(MovimentacaoFinanceira.valor)).filter(
-        MovimentacaoFinanceira.evento_id == evento_id,
-        MovimentacaoFinanceira.tipo == "entrada",
-        MovimentacaoFinanceira.status == "aprovada"
-    ).scalar() or Decimal('0.00')
-    
-    total_saidas = db.query(func.sum(MovimentacaoFinanceira.valor)).filter(
-        MovimentacaoFinanceira.evento_id == evento_id,
-        MovimentacaoFinanceira.tipo == "saida",
-        MovimentacaoFinanceira.status == "aprovada"
-    ).scalar() or Decimal('0.00')
-    
-    total_vendas_listas = db.query(func.sum(Transacao.valor)).filter(
-        Transacao.evento_id == evento_id,
-        Transacao.status == "aprovada"
-    ).scalar() or Decimal('0.00')
-    
-    total_vendas_pdv = db.query(func.sum(VendaPDV.valor_final)).filter(
-        VendaPDV.evento_id == evento_id,
-        VendaPDV.status == "aprovada"
-    ).scalar() or Decimal('0.00')
-    
-    total_vendas = total_vendas_listas + total_vendas_pdv
-    saldo_atual = total_entradas + total_vendas - total_saidas
+    totais = financeiro_service.totais(db, evento_id)
+    total_vendas = totais["total_vendas_listas"] + totais["total_vendas_pdv"]
+    saldo_atual = financeiro_service.saldo(totais)
     lucro_prejuizo = saldo_atual
     
-    caixa = db.query(CaixaEvento).filter(
+    caixa = db.query(CaixaEvento.id).filter(
         CaixaEvento.evento_id == evento_id,
         CaixaEvento.status == "aberto"
     ).first()
@@ -262,31 +320,37 @@ async def obter_dashboard_financeiro(
         MovimentacaoFinanceira.evento_id == evento_id
     ).order_by(MovimentacaoFinanceira.criado_em.desc()).limit(5).all()
     
-    categorias_despesas = db.query(
+    # Despesas por categoria e repasses por promoter na mesma consulta agrupada
+    agrupados = db.query(
+        MovimentacaoFinanceira.tipo,
         MovimentacaoFinanceira.categoria,
-        func.sum(MovimentacaoFinanceira.valor).label('total')
-    ).filter(
-        MovimentacaoFinanceira.evento_id == evento_id,
-        MovimentacaoFinanceira.tipo == "saida",
-        MovimentacaoFinanceira.status == "aprovada"
-    ).group_by(MovimentacaoFinanceira.categoria).all()
-    
-    repasses_promoters = db.query(
+        MovimentacaoFinanceira.promoter_id,
         Usuario.nome,
-        func.sum(MovimentacaoFinanceira.valor).label('total')
-    ).join(
-        MovimentacaoFinanceira, MovimentacaoFinanceira.promoter_id == Usuario.id
+        func.sum(MovimentacaoFinanceira.valor)
+    ).outerjoin(
+        Usuario, Usuario.id == MovimentacaoFinanceira.promoter_id
     ).filter(
         MovimentacaoFinanceira.evento_id == evento_id,
-        MovimentacaoFinanceira.tipo == "repasse_promoter",
-        MovimentacaoFinanceira.status == "aprovada"
-    ).group_by(Usuario.id, Usuario.nome).all()
+        MovimentacaoFinanceira.tipo.in_([TipoMovimentacaoFinanceira.SAIDA, TipoMovimentacaoFinanceira.REPASSE_PROMOTER]),
+        MovimentacaoFinanceira.status == StatusMovimentacaoFinanceira.APROVADA
+    ).group_by(
+        MovimentacaoFinanceira.tipo, MovimentacaoFinanceira.categoria, MovimentacaoFinanceira.promoter_id, Usuario.nome
+    ).all()
+    
+    categorias_despesas = {}
+    repasses_promoters = {}
+    for tipo, categoria, promoter_id, promoter_nome, total in agrupados:
+        if tipo == TipoMovimentacaoFinanceira.SAIDA:
+            categorias_despesas[categoria] = categorias_despesas.get(categoria, Decimal('0.00')) + total
+        elif promoter_id is not None:
+            nome, acumulado = repasses_promoters.get(promoter_id, (promoter_nome, Decimal('0.00')))
+            repasses_promoters[promoter_id] = (nome, acumulado + total)
     
     return DashboardFinanceiro(
         evento_id=evento_id,
         saldo_atual=saldo_atual,
-        total_entradas=total_entradas,
-        total_saidas=total_saidas,
+        total_entradas=totais["total_entradas"],
+        total_saidas=totais["total_saidas"],
         total_vendas=total_vendas,
         lucro_prejuizo=lucro_prejuizo,
         movimentacoes_recentes=[
@@ -300,49 +364,34 @@ async def obter_dashboard_financeiro(
             for mov in movimentacoes_recentes
         ],
         categorias_despesas=[
-            {"categoria": cat.categoria, "total": float(cat.total)}
-            for cat in categorias_despesas
+            {"categoria": categoria, "total": float(total)}
+            for categoria, total in categorias_despesas.items()
         ],
         repasses_promoters=[
-            {"promoter": rep.nome, "total": float(rep.total)}
-            for rep in repasses_promoters
+            {"promoter": nome, "total": float(total)}
+            for nome, total in repasses_promoters.values()
         ],
         status_caixa=status_caixa
     )
 
-@router.get("/relatorio/{evento_id}/export/{formato}")
-async def exportar_relatorio_financeiro(
-    evento_id: int,
-    formato: str,
-    data_inicio: Optional[str] = "",
-    data_fim: Optional[str] = "",
-    db: Session = Depends(get_db),
-    usuario_atual: Usuario = Depends(obter_usuario_atual)
-):
-    """Exportar relatório financeiro em PDF, Excel ou CSV"""
-    
-    if formato not in ["pdf", "excel", "csv"]:
-        raise HTTPException(status_code=400, detail="Formato não suportado")
-    
+def _gerar_relatorio_financeiro(db: Session, parametros: dict, usuario: Usuario) -> ArquivoRelatorio:
+    evento_id = parametros["evento_id"]
+    formato = parametros["formato"]
+    data_inicio = parametros.get("data_inicio")
+    data_fim = parametros.get("data_fim")
     evento = db.query(Evento).filter(Evento.id == evento_id).first()
-    if not evento:
-        raise HTTPException(status_code=404, detail="Evento não encontrado")
-    
-    if (usuario_atual.tipo.value != "admin" and 
-        usuario_atual.empresa_id != evento.empresa_id):
-        raise HTTPException(status_code=403, detail="Acesso negado")
     
     query = db.query(MovimentacaoFinanceira).filter(
         MovimentacaoFinanceira.evento_id == evento_id
     )
     
-    if data_inicio and data_inicio.strip():
+    if data_inicio:
         try:
             data_inicio_parsed = datetime.strptime(data_inicio, "%Y-%m-%d").date()
             query = query.filter(MovimentacaoFinanceira.criado_em >= data_inicio_parsed)
         except ValueError:
             pass
-    if data_fim and data_fim.strip():
+    if data_fim:
         try:
             data_fim_parsed = datetime.strptime(data_fim, "%Y-%m-%d").date()
             query = query.filter(MovimentacaoFinanceira.criado_em <= data_fim_parsed + timedelta(days=1))
@@ -374,12 +423,11 @@ async def exportar_relatorio_financeiro(
         
         buffer = io.BytesIO()
         wb.save(buffer)
-        buffer.seek(0)
         
-        return Response(
-            content=buffer.getvalue(),
+        return ArquivoRelatorio(
+            conteudo=buffer.getvalue(),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=financeiro_evento_{evento_id}.xlsx"}
+            nome_arquivo=f"financeiro_evento_{evento_id}.xlsx"
         )
     
     elif formato == "csv":
@@ -399,59 +447,67 @@ async def exportar_relatorio_financeiro(
                 mov.usuario_responsavel.nome
             ])
         
-        return Response(
-            content=output.getvalue(),
+        return ArquivoRelatorio(
+            conteudo=output.getvalue().encode("utf-8"),
             media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=financeiro_evento_{evento_id}.csv"}
+            nome_arquivo=f"financeiro_evento_{evento_id}.csv"
         )
     
     elif formato == "pdf":
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(50, height - 50, f"Relatório Financeiro - {evento.nome}")
-        
-        p.setFont("Helvetica", 12)
-        y_position = height - 100
-        
-        total_entradas = sum(float(mov.valor) for mov in movimentacoes if mov.tipo.value == "entrada")
-        total_saidas = sum(float(mov.valor) for mov in movimentacoes if mov.tipo.value == "saida")
-        saldo = total_entradas - total_saidas
-        
-        p.drawString(50, y_position, f"Total Entradas: R$ {total_entradas:.2f}")
-        y_position -= 20
-        p.drawString(50, y_position, f"Total Saídas: R$ {total_saidas:.2f}")
-        y_position -= 20
-        p.drawString(50, y_position, f"Saldo: R$ {saldo:.2f}")
-        y_position -= 40
-        
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(50, y_position, "Movimentações:")
-        y_position -= 20
-        
-        p.setFont("Helvetica", 10)
-        for mov in movimentacoes[:20]:
-            if y_position < 50:
-                p.showPage()
-                y_position = height - 50
-            
-            linha = f"{mov.criado_em.strftime('%d/%m/%Y')} - {mov.tipo.value.upper()} - {mov.categoria} - R$ {float(mov.valor):.2f}"
-            p.drawString(50, y_position, linha)
-            y_position -= 15
-        
-        p.showPage()
-        p.save()
-        
-        buffer.seek(0)
+        conteudo = pdf_service.gerar("financeiro", {
+            "evento_nome": evento.nome,
+            "total_entradas": sum(float(mov.valor) for mov in movimentacoes if mov.tipo.value == "entrada"),
+            "total_saidas": sum(float(mov.valor) for mov in movimentacoes if mov.tipo.value == "saida"),
+            "movimentacoes": [{
+                "data": mov.criado_em.strftime('%d/%m/%Y'),
+                "tipo": mov.tipo.value,
+                "categoria": mov.categoria,
+                "valor": float(mov.valor)
+            } for mov in movimentacoes[:20]]
+        })
         
-        return Response(
-            content=buffer.getvalue(),
+        return ArquivoRelatorio(
+            conteudo=conteudo,
             media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=financeiro_evento_{evento_id}.pdf"}
+            nome_arquivo=f"financeiro_evento_{evento_id}.pdf"
         )
 
+relatorio_job_service.registrar(
+    "financeiro", _gerar_relatorio_financeiro, fontes=("eventos", "movimentacoes_financeiras")
+)
+
+@router.get("/relatorio/{evento_id}/export/{formato}")
+async def exportar_relatorio_financeiro(
+    evento_id: int,
+    formato: str,
+    data_inicio: Optional[str] = "",
+    data_fim: Optional[str] = "",
+    assincrono: bool = False,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Exportar relatório financeiro em PDF, Excel ou CSV (com `assincrono`, retorna o id do job)"""
+    
+    if formato not in ["pdf", "excel", "csv"]:
+        raise HTTPException(status_code=400, detail="Formato não suportado")
+    
+    evento = db.query(Evento).filter(Evento.id == evento_id).first()
+    if not evento:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+    
+    if (usuario_atual.tipo.value != "admin" and 
+        usuario_atual.empresa_id != evento.empresa_id):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    parametros = {
+        "evento_id": evento_id,
+        "formato": formato,
+        "data_inicio": (data_inicio or "").strip(),
+        "data_fim": (data_fim or "").strip()
+    }
+    job = relatorio_job_service.solicitar(db, "financeiro", parametros, usuario_atual)
+    return await relatorio_job_service.responder(db, job, assincrono)
+
 @router.post("/caixa/abrir", response_model=CaixaEventoSchema)
 async def abrir_caixa_evento(
     caixa: CaixaEventoCreate,
@@ -476,10 +532,14 @@ async def abrir_caixa_evento(
     if caixa_existente:
         raise HTTPException(status_code=400, detail="Já existe um caixa aberto para este evento")
     
+    # O caixa parte dos totais correntes do evento; daí em diante cada lançamento os atualiza
+    totais = financeiro_service.totais(db, caixa.evento_id)
     db_caixa = CaixaEvento(
         **caixa.dict(),
+        **totais,
         usuario_abertura_id=usuario_atual.id
     )
+    db_caixa.saldo_final = financeiro_service.saldo(totais, db_caixa.saldo_inicial)
     
     db.add(db_caixa)
     db.commit()
@@ -520,33 +580,7 @@ async def fechar_caixa_evento(
     if caixa.status == "fechado":
         raise HTTPException(status_code=400, detail="Caixa já está fechado")
     
-    total_entradas = db.query(func.sum(MovimentacaoFinanceira.valor)).filter(
-        MovimentacaoFinanceira.evento_id == caixa.evento_id,
-        MovimentacaoFinanceira.tipo == "entrada",
-        MovimentacaoFinanceira.status == "aprovada"
-    ).scalar() or Decimal('0.00')
-    
-    total_saidas = db.query(func.sum(MovimentacaoFinanceira.valor)).filter(
-        MovimentacaoFinanceira.evento_id == caixa.evento_id,
-        MovimentacaoFinanceira.tipo == "saida",
-        MovimentacaoFinanceira.status == "aprovada"
-    ).scalar() or Decimal('0.00')
-    
-    total_vendas_listas = db.query(func.sum(Transacao.valor)).filter(
-        Transacao.evento_id == caixa.evento_id,
-        Transacao.status == "aprovada"
-    ).scalar() or Decimal('0.00')
-    
-    total_vendas_pdv = db.query(func.sum(VendaPDV.valor_final)).filter(
-        VendaPDV.evento_id == caixa.evento_id,
-        VendaPDV.status == "aprovada"
-    ).scalar() or Decimal('0.00')
-    
-    caixa.total_entradas = total_entradas
-    caixa.total_saidas = total_saidas
-    caixa.total_vendas_listas = total_vendas_listas
-    caixa.total_vendas_pdv = total_vendas_pdv
-    caixa.saldo_final = caixa.saldo_inicial + total_entradas + total_vendas_listas + total_vendas_pdv - total_saidas
+    # Totais e saldo final já estão correntes
     caixa.status = "fechado"
     caixa.data_fechamento = datetime.now()
     caixa.usuario_fechamento_id = usuario_atual.id
@@ -567,3 +601,21 @@ async def fechar_caixa_evento(
     db.commit()
     
     return {"message": "Caixa fechado com sucesso", "saldo_final": float(caixa.saldo_final)}
+
+@router.post("/totais/{evento_id}/reconciliar")
+async def reconciliar_totais_financeiros(
+    evento_id: int,
+    corrigir: bool = False,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(verificar_permissao_admin)
+):
+    """Auditoria: comparar os totais correntes do evento com os recalculados a partir dos lançamentos"""
+    
+    if not db.query(Evento.id).filter(Evento.id == evento_id).first():
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+    
+    resultado = financeiro_service.reconciliar(db, evento_id, corrigir=corrigir)
+    if corrigir:
+        db.commit()
+    
+    return resultado
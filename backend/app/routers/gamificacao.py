@@ -4,6 +4,7 @@ from sqlalchemy import func, desc, and_, or_
 from typing import List, Optional
 from datetime import date, datetime, timedelta
 from decimal import Decimal
+import asyncio
 import uuid
 import os
 import io
@@ -16,7 +17,7 @@ from ..database import get_db
 from ..models import (
     Usuario, Evento, Lista, Transacao, Checkin, PromoterEvento,
     Conquista, PromoterConquista, MetricaPromoter, TipoConquista, NivelBadge,
-    LogAuditoria
+    LogAuditoria, TipoUsuario
 )
 from ..schemas import (
     ConquistaCreate, Conquista as ConquistaSchema,
@@ -24,7 +25,8 @@ from ..schemas import (
     FiltrosRanking, PromoterConquistaResponse
 )
 from ..auth import obter_usuario_atual, verificar_permissao_admin, verificar_permissao_promoter
-from ..services.whatsapp_service import whatsapp_service
+from ..services.gamificacao_service import gamificacao_service, calcular_badge_principal
+from ..services.relatorio_job_service import relatorio_job_service, ArquivoRelatorio
 
 router = APIRouter(prefix="/gamificacao", tags=["Gamificação"])
 
@@ -41,57 +43,29 @@ async def obter_ranking_gamificado(
 ):
     """Obter ranking gamificado de promoters"""
     
-    if not periodo_inicio:
-        periodo_inicio = date.today() - timedelta(days=30)
-    if not periodo_fim:
-        periodo_fim = date.today()
+    empresa_id = None if usuario_atual.tipo.value == "admin" else usuario_atual.empresa_id
     
-    query = db.query(
-        Usuario.id.label('promoter_id'),
-        Usuario.nome.label('nome_promoter'),
-        func.count(Transacao.id).label('total_vendas'),
-        func.sum(Transacao.valor).label('receita_gerada'),
-        func.count(Checkin.id).label('total_presentes'),
-        func.count(Lista.id).label('total_listas')
-    ).join(
-        Lista, Lista.promoter_id == Usuario.id
-    ).join(
-        Transacao, Transacao.lista_id == Lista.id
-    ).outerjoin(
-        Checkin, and_(
-            Transacao.cpf_comprador == Checkin.cpf,
-            Transacao.evento_id == Checkin.evento_id
+    resultados = None
+    if not periodo_inicio and not periodo_fim:
+        resultados = gamificacao_service.consultar_ranking_snapshot(
+            db, evento_id=evento_id, empresa_id=empresa_id, limit=limit
         )
-    ).filter(
-        Usuario.tipo == "promoter",
-        Transacao.status == "aprovada",
-        func.date(Transacao.criado_em).between(periodo_inicio, periodo_fim)
-    )
     
-    if usuario_atual.tipo.value != "admin":
-        query = query.join(Evento).filter(Evento.empresa_id == usuario_atual.empresa_id)
-    
-    if evento_id:
-        query = query.filter(Transacao.evento_id == evento_id)
-    
-    resultados = query.group_by(
-        Usuario.id, Usuario.nome
-    ).order_by(
-        desc(func.sum(Transacao.valor))
-    ).limit(limit).all()
+    if resultados is None:
+        resultados = gamificacao_service.consultar_ranking(
+            db,
+            periodo_inicio=periodo_inicio or date.today() - timedelta(days=30),
+            periodo_fim=periodo_fim or date.today(),
+            evento_id=evento_id,
+            empresa_id=empresa_id,
+            limit=limit
+        )
     
     ranking = []
     for i, resultado in enumerate(resultados, 1):
         taxa_presenca = (resultado.total_presentes / resultado.total_vendas * 100) if resultado.total_vendas > 0 else 0
-        
-        conquistas_count = db.query(func.count(PromoterConquista.id)).filter(
-            PromoterConquista.promoter_id == resultado.promoter_id
-        ).scalar() or 0
-        
-        conquistas_mes = db.query(func.count(PromoterConquista.id)).filter(
-            PromoterConquista.promoter_id == resultado.promoter_id,
-            func.date(PromoterConquista.data_conquista) >= periodo_inicio
-        ).scalar() or 0
+        taxa_conversao = float(resultado.taxa_conversao) if resultado.taxa_conversao is not None else taxa_presenca
+        conquistas_count = resultado.conquistas_total
         
         badge_principal = calcular_badge_principal(i, resultado.total_vendas, taxa_presenca)
         
@@ -110,14 +84,14 @@ async def obter_ranking_gamificado(
             total_vendas=resultado.total_vendas,
             receita_gerada=resultado.receita_gerada or Decimal('0.00'),
             taxa_presenca=round(taxa_presenca, 2),
-            taxa_conversao=round(taxa_presenca, 2),
-            crescimento_mensal=0.0,
+            taxa_conversao=round(taxa_conversao, 2),
+            crescimento_mensal=float(resultado.crescimento_vendas or 0),
             posicao_atual=i,
-            posicao_anterior=None,
+            posicao_anterior=resultado.posicao_anterior,
             conquistas_total=conquistas_count,
-            conquistas_mes=conquistas_mes,
-            eventos_ativos=resultado.total_listas,
-            streak_vendas=0,
+            conquistas_mes=resultado.conquistas_mes,
+            eventos_ativos=resultado.eventos_ativos,
+            streak_vendas=resultado.streak_vendas or 0,
             pontuacao_total=pontuacao
         ))
     
@@ -183,7 +157,9 @@ async def obter_dashboard_gamificacao(
             "total_promoters": len(ranking_geral),
             "conquistas_semana": len(conquistas_list),
             "badge_ouro": len([r for r in ranking_geral if r.badge_principal == "ouro"]),
-            "crescimento_medio": 15.5
+            "crescimento_medio": round(
+                sum(r.crescimento_mensal for r in ranking_geral) / len(ranking_geral), 2
+            ) if ranking_geral else 0.0
         },
         badges_disponiveis=[
             {"nome": "Bronze", "descricao": "10+ vendas", "icone": "🥉"},
@@ -227,6 +203,27 @@ async def criar_conquista(
     
     return db_conquista
 
+@router.post("/verificar-conquistas")
+async def verificar_conquistas_todos(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(verificar_permissao_admin)
+):
+    """Verificar e atribuir conquistas para todos os promoters ativos"""
+    
+    novas_conquistas = gamificacao_service.avaliar_conquistas(db)
+    
+    if novas_conquistas:
+        background_tasks.add_task(
+            gamificacao_service.run_notificacoes_pendentes,
+            list(novas_conquistas.keys())
+        )
+    
+    return {
+        "message": f"{sum(len(c) for c in novas_conquistas.values())} novas conquistas atribuídas",
+        "promoters_contemplados": len(novas_conquistas)
+    }
+
 @router.post("/verificar-conquistas/{promoter_id}")
 async def verificar_conquistas_promoter(
     promoter_id: int,
@@ -238,100 +235,109 @@ async def verificar_conquistas_promoter(
     
     promoter = db.query(Usuario).filter(
         Usuario.id == promoter_id,
-        Usuario.tipo == "promoter"
+        Usuario.tipo == TipoUsuario.PROMOTER
     ).first()
     
     if not promoter:
         raise HTTPException(status_code=404, detail="Promoter não encontrado")
     
-    conquistas_disponiveis = db.query(Conquista).filter(Conquista.ativa == True).all()
-    
-    novas_conquistas = []
-    
-    for conquista in conquistas_disponiveis:
-        ja_possui = db.query(PromoterConquista).filter(
-            PromoterConquista.promoter_id == promoter_id,
-            PromoterConquista.conquista_id == conquista.id
-        ).first()
-        
-        if ja_possui:
-            continue
-        
-        valor_alcancado = 0
-        
-        if conquista.tipo == TipoConquista.VENDAS:
-            valor_alcancado = db.query(func.count(Transacao.id)).join(Lista).filter(
-                Lista.promoter_id == promoter_id,
-                Transacao.status == "aprovada"
-            ).scalar() or 0
-        
-        elif conquista.tipo == TipoConquista.PRESENCA:
-            total_vendas = db.query(func.count(Transacao.id)).join(Lista).filter(
-                Lista.promoter_id == promoter_id,
-                Transacao.status == "aprovada"
-            ).scalar() or 0
-            
-            total_presentes = db.query(func.count(Checkin.id)).join(
-                Transacao, Transacao.cpf_comprador == Checkin.cpf
-            ).join(Lista).filter(
-                Lista.promoter_id == promoter_id
-            ).scalar() or 0
-            
-            valor_alcancado = int((total_presentes / total_vendas * 100)) if total_vendas > 0 else 0
-        
-        if valor_alcancado >= conquista.criterio_valor:
-            nova_conquista = PromoterConquista(
-                promoter_id=promoter_id,
-                conquista_id=conquista.id,
-                valor_alcancado=valor_alcancado
-            )
-            db.add(nova_conquista)
-            novas_conquistas.append(conquista)
+    novas_conquistas = gamificacao_service.avaliar_conquistas(db, [promoter_id]).get(promoter_id, [])
     
-    if novas_conquistas:
-        db.commit()
-        
-        if promoter.telefone:
-            background_tasks.add_task(
-                enviar_notificacao_conquista,
-                promoter.telefone,
-                promoter.nome,
-                novas_conquistas
-            )
+    if novas_conquistas and promoter.telefone:
+        background_tasks.add_task(
+            gamificacao_service.run_notificacoes_pendentes,
+            [promoter_id]
+        )
     
     return {
         "message": f"{len(novas_conquistas)} novas conquistas atribuídas",
         "conquistas": [c.nome for c in novas_conquistas]
     }
 
-@router.get("/export/ranking/{formato}")
-async def exportar_ranking(
-    formato: str,
+@router.post("/metricas/snapshot")
+async def gerar_snapshot_metricas(
+    data_referencia: Optional[date] = None,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(verificar_permissao_admin)
+):
+    """Gerar snapshot de métricas dos promoters (apenas admin)"""
+    
+    total = gamificacao_service.gerar_snapshot_metricas(db, data_referencia, forcar=True)
+    
+    return {"message": f"Snapshot gerado com {total} métricas"}
+
+@router.get("/metricas/{promoter_id}", response_model=List[MetricaPromoterResponse])
+async def obter_metricas_promoter(
+    promoter_id: int,
     evento_id: Optional[int] = None,
-    periodo_inicio: Optional[date] = None,
-    periodo_fim: Optional[date] = None,
-    badge_nivel: Optional[str] = None,
-    tipo_ranking: Optional[str] = "geral",
-    limit: int = 20,
+    limit: int = 30,
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(obter_usuario_atual)
 ):
-    """Exportar ranking em Excel, PDF ou CSV"""
+    """Histórico de métricas de um promoter a partir dos snapshots"""
     
-    if formato not in ["excel", "pdf", "csv"]:
-        raise HTTPException(status_code=400, detail="Formato não suportado")
+    if usuario_atual.tipo.value == "promoter" and usuario_atual.id != promoter_id:
+        raise HTTPException(status_code=403, detail="Acesso negado")
     
-    ranking = await obter_ranking_gamificado(
-        evento_id=evento_id,
-        periodo_inicio=periodo_inicio,
-        periodo_fim=periodo_fim,
-        badge_nivel=badge_nivel,
-        tipo_ranking=tipo_ranking,
-        limit=limit,
-        db=db,
-        usuario_atual=usuario_atual
+    query = db.query(
+        MetricaPromoter,
+        Usuario.nome.label('promoter_nome'),
+        Evento.nome.label('evento_nome')
+    ).join(
+        Usuario, MetricaPromoter.promoter_id == Usuario.id
+    ).outerjoin(
+        Evento, MetricaPromoter.evento_id == Evento.id
+    ).filter(
+        MetricaPromoter.promoter_id == promoter_id
     )
     
+    if usuario_atual.tipo.value != "admin":
+        query = query.filter(Usuario.empresa_id == usuario_atual.empresa_id)
+    
+    if evento_id:
+        query = query.filter(MetricaPromoter.evento_id == evento_id)
+    else:
+        query = query.filter(MetricaPromoter.evento_id.is_(None))
+    
+    resultados = query.order_by(desc(MetricaPromoter.periodo_fim)).limit(limit).all()
+    
+    return [
+        MetricaPromoterResponse(
+            promoter_id=metrica.promoter_id,
+            promoter_nome=promoter_nome,
+            evento_id=metrica.evento_id,
+            evento_nome=evento_nome,
+            periodo_inicio=metrica.periodo_inicio,
+            periodo_fim=metrica.periodo_fim,
+            total_vendas=metrica.total_vendas,
+            receita_gerada=metrica.receita_gerada,
+            total_convidados=metrica.total_convidados,
+            total_presentes=metrica.total_presentes,
+            taxa_presenca=metrica.taxa_presenca,
+            taxa_conversao=metrica.taxa_conversao,
+            crescimento_vendas=metrica.crescimento_vendas,
+            posicao_vendas=metrica.posicao_vendas,
+            posicao_presenca=metrica.posicao_presenca,
+            posicao_geral=metrica.posicao_geral,
+            badge_atual=metrica.badge_atual.value
+        ) for metrica, promoter_nome, evento_nome in resultados
+    ]
+
+def _gerar_ranking(db: Session, parametros: dict, usuario: Usuario) -> ArquivoRelatorio:
+    formato = parametros["formato"]
+    
+    # Roda numa thread do pool de relatórios, fora do loop da aplicação
+    ranking = asyncio.run(obter_ranking_gamificado(
+        evento_id=parametros.get("evento_id"),
+        periodo_inicio=date.fromisoformat(parametros["periodo_inicio"]) if parametros.get("periodo_inicio") else None,
+        periodo_fim=date.fromisoformat(parametros["periodo_fim"]) if parametros.get("periodo_fim") else None,
+        badge_nivel=parametros.get("badge_nivel"),
+        tipo_ranking=parametros.get("tipo_ranking", "geral"),
+        limit=parametros["limit"],
+        db=db,
+        usuario_atual=usuario
+    ))
+    
     if formato == "excel":
         wb = Workbook()
         ws = wb.active
@@ -373,12 +379,11 @@ async def exportar_ranking(
         
         buffer = io.BytesIO()
         wb.save(buffer)
-        buffer.seek(0)
         
-        return Response(
-            content=buffer.getvalue(),
+        return ArquivoRelatorio(
+            conteudo=buffer.getvalue(),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=ranking_promoters.xlsx"}
+            nome_arquivo="ranking_promoters.xlsx"
         )
     
     elif formato == "csv":
@@ -403,28 +408,50 @@ async def exportar_ranking(
                 promoter.nivel_experiencia
             ])
         
-        return Response(
-            content=output.getvalue(),
+        return ArquivoRelatorio(
+            conteudo=output.getvalue().encode("utf-8"),
             media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=ranking_promoters.csv"}
+            nome_arquivo="ranking_promoters.csv"
         )
-    
-    return {"message": "Formato PDF em desenvolvimento"}
 
-def calcular_badge_principal(posicao: int, vendas: int, taxa_presenca: float) -> str:
-    """Calcular badge principal baseado em métricas"""
-    if vendas >= 1000 and taxa_presenca >= 90:
-        return "lenda"
-    elif vendas >= 500 and taxa_presenca >= 90:
-        return "diamante"
-    elif vendas >= 200 and taxa_presenca >= 80:
-        return "platina"
-    elif vendas >= 100:
-        return "ouro"
-    elif vendas >= 50:
-        return "prata"
-    else:
-        return "bronze"
+relatorio_job_service.registrar(
+    "ranking", _gerar_ranking, fontes=("metricas_promoter", "transacoes", "checkins")
+)
+
+@router.get("/export/ranking/{formato}")
+async def exportar_ranking(
+    formato: str,
+    evento_id: Optional[int] = None,
+    periodo_inicio: Optional[date] = None,
+    periodo_fim: Optional[date] = None,
+    badge_nivel: Optional[str] = None,
+    tipo_ranking: Optional[str] = "geral",
+    limit: int = 20,
+    assincrono: bool = False,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Exportar ranking em Excel, PDF ou CSV (com `assincrono`, retorna o id do job)"""
+    
+    if formato not in ["excel", "pdf", "csv"]:
+        raise HTTPException(status_code=400, detail="Formato não suportado")
+    
+    if formato == "pdf":
+        return {"message": "Formato PDF em desenvolvimento"}
+    
+    parametros = {
+        "formato": formato,
+        "evento_id": evento_id,
+        "periodo_inicio": periodo_inicio.isoformat() if periodo_inicio else None,
+        "periodo_fim": periodo_fim.isoformat() if periodo_fim else None,
+        "badge_nivel": badge_nivel,
+        "tipo_ranking": tipo_ranking,
+        "limit": limit,
+        # Sem período, o ranking usa os últimos 30 dias: o resultado muda de um dia para o outro
+        "referencia": date.today().isoformat() if not (periodo_inicio or periodo_fim) else None
+    }
+    job = relatorio_job_service.solicitar(db, "ranking", parametros, usuario_atual)
+    return await relatorio_job_service.responder(db, job, assincrono)
 
 def calcular_pontuacao_gamificada(vendas: int, receita: float, taxa_presenca: float, conquistas: int) -> int:
     """Calcular pontuação gamificada total"""
@@ -434,18 +461,3 @@ def calcular_pontuacao_gamificada(vendas: int, receita: float, taxa_presenca: fl
     pontos_conquistas = conquistas * 100
     
     return pontos_vendas + pontos_receita + pontos_presenca + pontos_conquistas
-
-async def enviar_notificacao_conquista(telefone: str, nome: str, conquistas: List[Conquista]):
-    """Enviar notificação de conquista via WhatsApp"""
-    conquistas_texto = "\n".join([f"{c.icone} {c.nome}" for c in conquistas])
-    
-    message = f"""
-🎉 *PARABÉNS {nome.upper()}!*
-
-Você conquistou novos badges:
-{conquistas_texto}
-
-Continue assim e alcance novos níveis! 🚀
-    """.strip()
-    
-    await whatsapp_service._send_whatsapp_message(telefone, message)
@@ -9,6 +9,9 @@ from ..schemas import (
     DashboardListas, ConvidadoCreate, ConvidadoImport
 )
 from ..auth import obter_usuario_atual
+from ..services.quota_service import quota_service
+from ..services.financeiro_service import financeiro_service
+from ..services.cupom_service import cupom_service
 import uuid
 import re
 import csv
@@ -118,6 +121,7 @@ async def atualizar_lista(
     
     db.commit()
     db.refresh(lista)
+    cupom_service.invalidar()
     
     return lista
 
@@ -146,6 +150,7 @@ async def desativar_lista(
     
     lista.ativa = False
     db.commit()
+    cupom_service.invalidar()
     
     return {"mensagem": "Lista desativada com sucesso"}
 
@@ -236,6 +241,7 @@ async def importar_convidados(
             )
         
         convidados_criados = 0
+        novos_convidados = []
         erros = []
         
         for index, row in df.iterrows():
@@ -270,14 +276,23 @@ async def importar_convidados(
                     'qr_code_ticket': f"TICKET-{str(uuid.uuid4())[:8].upper()}-{evento.id}"
                 }
                 
-                db_transacao = Transacao(**transacao_data)
-                db.add(db_transacao)
-                convidados_criados += 1
+                novos_convidados.append((index, transacao_data))
                 
             except Exception as e:
                 erros.append(f"Linha {index + 2}: {str(e)}")
         
-        lista.vendas_realizadas += convidados_criados
+        reservados = quota_service.reservar_ate(db, lista_id, len(novos_convidados))
+        
+        for index, transacao_data in novos_convidados[:reservados]:
+            db.add(Transacao(**transacao_data))
+            financeiro_service.registrar_transacao(
+                db, evento.id, transacao_data['valor'], status_atual=transacao_data['status']
+            )
+            convidados_criados += 1
+        
+        for index, _ in novos_convidados[reservados:]:
+            erros.append(f"Linha {index + 2}: Limite de vendas da lista atingido")
+        
         db.commit()
         
         return {
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, WebSocket, WebSocketDisconnect, Response, Header
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, desc, and_, or_
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 import uuid
 import json
-from ..database import get_db
+import asyncio
+from ..database import get_db, settings
 from ..models import (
     Produto, Comanda, VendaPDV, ItemVendaPDV, PagamentoPDV, 
     RecargaComanda, MovimentoEstoque, CaixaPDV, Evento,
@@ -15,13 +16,42 @@ from ..models import (
 from ..schemas import (
     ProdutoCreate, Produto as ProdutoSchema, ComandaCreate, Comanda as ComandaSchema,
     VendaPDVCreate, VendaPDV as VendaPDVSchema, RecargaComandaCreate, RecargaComanda as RecargaComandaSchema,
-    CaixaPDVCreate, CaixaPDV as CaixaPDVSchema, RelatorioVendasPDV, DashboardPDV
+    CaixaPDVCreate, CaixaPDV as CaixaPDVSchema, RelatorioVendasPDV, DashboardPDV, SincronizacaoPDVCreate,
+    VendaRapidaCreate
 )
 from ..auth import obter_usuario_atual, verificar_permissao_admin
-from ..websocket import notify_stock_update, notify_new_sale, notify_cash_register_update
+from ..pagination import paginar, responder, LIMITE_PADRAO
+from ..websocket import notify_stock_update, notify_stock_alert, notify_new_sale, notify_cash_register_update, notify_sync_batch
+from ..services.cupom_service import cupom_service, CupomInvalido
+from ..services.idempotencia_service import idempotencia_service, ConflitoIdempotencia
+from ..services.pdv_sync_service import pdv_sync_service
+from ..services.comanda_service import comanda_service, SaldoComandaInvalido
+from ..services.catalogo_service import catalogo_service
+from ..services.caixa_service import caixa_service
+from ..services.financeiro_service import financeiro_service
+from ..services.painel_pdv_service import painel_pdv_service
+from ..services.alerta_estoque_service import alerta_estoque_service, BaixaEstoque
+from ..services.busca_produto_service import busca_produto_service
+from ..services.estoque_service import estoque_service
+from ..services.venda_rapida_service import venda_rapida_service, VendaRecusada
+from ..services.impressao_service import impressao_service
+from ..services.receipt_service import receipt_service
+from fastapi.encoders import jsonable_encoder
 
 router = APIRouter(prefix="/pdv", tags=["PDV"])
 
+LIMITE_BUSCA_PRODUTOS = 200
+
+def _escopo_terminal(operacao: str, usuario_atual, terminal_id: Optional[str]) -> str:
+    """Chaves de idempotência são únicas por terminal (ou operador, sem X-Terminal-Id)"""
+    return f"{operacao}:{usuario_atual.empresa_id}:{terminal_id or f'usuario-{usuario_atual.id}'}"
+
+def _reservar_idempotencia(db: Session, escopo: str, chave: str, payload):
+    try:
+        return idempotencia_service.reservar(db, escopo, chave, payload, ttl_horas=settings.idempotencia_pdv_ttl_horas)
+    except ConflitoIdempotencia as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
 @router.post("/produtos", response_model=ProdutoSchema)
 async def criar_produto(
     produto: ProdutoCreate,
@@ -48,6 +78,8 @@ async def criar_produto(
     )
     
     db.add(db_produto)
+    db.flush()
+    catalogo_service.registrar_alteracao(db, db_produto.evento_id, [db_produto.id])
     db.commit()
     db.refresh(db_produto)
     
@@ -56,13 +88,15 @@ async def criar_produto(
 @router.get("/produtos", response_model=List[ProdutoSchema])
 async def listar_produtos(
     evento_id: int,
+    response: Response,
     categoria: Optional[str] = None,
     status: Optional[str] = None,
     busca: Optional[str] = None,
+    limite: int = LIMITE_BUSCA_PRODUTOS,
     db: Session = Depends(get_db),
     usuario_atual = Depends(obter_usuario_atual)
 ):
-    """Listar produtos do evento"""
+    """Listar produtos do evento; com `busca`, no máximo `limite` resultados (X-Truncated indica o corte)"""
     
     evento = db.query(Evento).filter(Evento.id == evento_id).first()
     if not evento:
@@ -80,14 +114,46 @@ async def listar_produtos(
     if status:
         query = query.filter(Produto.status == status)
     
-    if busca:
-        query = query.filter(
-            Produto.nome.ilike(f"%{busca}%") |
-            Produto.codigo_barras.ilike(f"%{busca}%") |
-            Produto.codigo_interno.ilike(f"%{busca}%")
-        )
-    
-    return query.order_by(Produto.nome).all()
+    if not busca:
+        return query.order_by(Produto.nome).all()
+
+    # Nome pelo índice de busca; códigos também por trecho (ex.: final do código de barras)
+    limite = max(1, min(limite, LIMITE_BUSCA_PRODUTOS))
+    encontrados = busca_produto_service.buscar(db, evento_id, busca, limite=limite + 1)
+    trecho = f"%{busca.strip()}%"
+    produtos = query.filter(or_(
+        Produto.id.in_([produto.id for produto in encontrados]),
+        Produto.codigo_barras.ilike(trecho),
+        Produto.codigo_interno.ilike(trecho)
+    )).order_by(Produto.nome).limit(limite + 1).all()
+
+    truncado = len(encontrados) > limite or len(produtos) > limite
+    response.headers["X-Truncated"] = "true" if truncado else "false"
+    return produtos[:limite]
+
+@router.get("/produtos/busca")
+async def buscar_produtos(
+    evento_id: int,
+    q: str,
+    limite: int = 20,
+    somente_vendaveis: bool = True,
+    db: Session = Depends(get_db),
+    usuario_atual = Depends(obter_usuario_atual)
+):
+    """Busca do PDV: código de barras/interno exato ou nome por prefixo e similaridade, mais vendidos primeiro"""
+
+    evento = db.query(Evento.empresa_id).filter(Evento.id == evento_id).first()
+    if not evento:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+
+    if usuario_atual.tipo.value != "admin" and usuario_atual.empresa_id != evento.empresa_id:
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    limite = max(1, min(limite, LIMITE_BUSCA_PRODUTOS))
+    return [
+        produto.como_dict()
+        for produto in busca_produto_service.buscar(db, evento_id, q, limite=limite, somente_vendaveis=somente_vendaveis)
+    ]
 
 @router.get("/produtos/{produto_id}", response_model=ProdutoSchema)
 async def obter_produto(
@@ -107,6 +173,27 @@ async def obter_produto(
     
     return produto
 
+@router.get("/catalogo/{evento_id}")
+async def obter_catalogo(
+    evento_id: int,
+    desde_versao: Optional[int] = None,
+    db: Session = Depends(get_db),
+    usuario_atual = Depends(obter_usuario_atual)
+):
+    """Catálogo do evento para os terminais: completo ou só os produtos alterados desde `desde_versao`"""
+
+    evento = db.query(Evento.empresa_id).filter(Evento.id == evento_id).first()
+    if not evento:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+
+    if usuario_atual.tipo.value != "admin" and usuario_atual.empresa_id != evento.empresa_id:
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    return Response(
+        content=catalogo_service.delta(db, evento_id, desde_versao),
+        media_type="application/json"
+    )
+
 @router.put("/produtos/{produto_id}", response_model=ProdutoSchema)
 async def atualizar_produto(
     produto_id: int,
@@ -127,6 +214,8 @@ async def atualizar_produto(
         if hasattr(produto, field):
             setattr(produto, field, value)
     
+    db.flush()
+    catalogo_service.registrar_alteracao(db, produto.evento_id, [produto.id])
     db.commit()
     db.refresh(produto)
     
@@ -148,10 +237,10 @@ async def criar_comanda(
         usuario_atual.empresa_id != evento.empresa_id):
         raise HTTPException(status_code=403, detail="Acesso negado")
     
-    qr_code = str(uuid.uuid4())[:8].upper()
+    qr_code = comanda.qr_code or str(uuid.uuid4())[:8].upper()
     
     db_comanda = Comanda(
-        **comanda.model_dump(),
+        **comanda.model_dump(exclude={"qr_code"}),
         empresa_id=usuario_atual.empresa_id,
         qr_code=qr_code,
         status=StatusComanda.ATIVA
@@ -166,6 +255,10 @@ async def criar_comanda(
 @router.get("/comandas", response_model=List[ComandaSchema])
 async def listar_comandas(
     evento_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = LIMITE_PADRAO,
+    campos: Optional[str] = None,
     status: Optional[str] = None,
     cpf: Optional[str] = None,
     db: Session = Depends(get_db),
@@ -189,16 +282,45 @@ async def listar_comandas(
     if cpf:
         query = query.filter(Comanda.cpf_cliente == cpf)
     
-    return query.order_by(desc(Comanda.criado_em)).all()
+    pagina = paginar(query, Comanda, cursor=cursor, limit=limit, campos=campos, esquema=ComandaSchema)
+    return responder(pagina, response)
+
+@router.get("/comandas/saldo/{codigo}")
+async def consultar_saldo_comanda(
+    codigo: str,
+    db: Session = Depends(get_db),
+    usuario_atual = Depends(obter_usuario_atual)
+):
+    """Consultar saldo da comanda pelo QR code ou código RFID"""
+    
+    comanda = comanda_service.consultar_saldo(db, codigo)
+    if not comanda:
+        raise HTTPException(status_code=404, detail="Comanda não encontrada")
+    
+    if (usuario_atual.tipo.value != "admin" and 
+        usuario_atual.empresa_id != comanda.empresa_id):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    return {
+        "comanda_id": comanda.id,
+        "numero_comanda": comanda.numero_comanda,
+        "nome_cliente": comanda.nome_cliente,
+        "saldo_atual": float(comanda.saldo_atual or 0),
+        "saldo_bloqueado": float(comanda.saldo_bloqueado or 0),
+        "status": comanda.status.value,
+        "evento_id": comanda.evento_id
+    }
 
 @router.post("/comandas/{comanda_id}/recarga", response_model=RecargaComandaSchema)
 async def recarregar_comanda(
     comanda_id: int,
     recarga: RecargaComandaCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    terminal_id: Optional[str] = Header(None, alias="X-Terminal-Id", max_length=50),
     db: Session = Depends(get_db),
     usuario_atual = Depends(obter_usuario_atual)
 ):
-    """Recarregar saldo da comanda"""
+    """Recarregar saldo da comanda (reenvios com o mesmo Idempotency-Key retornam a recarga original)"""
     
     comanda = db.query(Comanda).filter(Comanda.id == comanda_id).first()
     if not comanda:
@@ -208,6 +330,12 @@ async def recarregar_comanda(
         usuario_atual.empresa_id != comanda.empresa_id):
         raise HTTPException(status_code=403, detail="Acesso negado")
     
+    escopo = _escopo_terminal("pdv_recarga", usuario_atual, terminal_id)
+    if idempotency_key:
+        original = _reservar_idempotencia(db, escopo, idempotency_key, {"comanda_id": comanda_id, **recarga.dict()})
+        if original is not None:
+            return original
+    
     if comanda.status != StatusComanda.ATIVA:
         raise HTTPException(status_code=400, detail="Comanda não está ativa")
     
@@ -219,9 +347,16 @@ async def recarregar_comanda(
         codigo_transacao=str(uuid.uuid4())
     )
     
-    comanda.saldo_atual += recarga.valor
-    
     db.add(db_recarga)
+    db.flush()
+    
+    try:
+        comanda_service.creditar(db, comanda_id, recarga.valor, usuario_id=usuario_atual.id, recarga_id=db_recarga.id)
+    except SaldoComandaInvalido as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    if idempotency_key:
+        idempotencia_service.concluir(db, escopo, idempotency_key, RecargaComandaSchema.model_validate(db_recarga))
     db.commit()
     db.refresh(db_recarga)
     
@@ -231,10 +366,17 @@ async def recarregar_comanda(
 async def processar_venda(
     venda: VendaPDVCreate,
     background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    terminal_id: Optional[str] = Header(None, alias="X-Terminal-Id", max_length=50),
     db: Session = Depends(get_db),
     usuario_atual = Depends(obter_usuario_atual)
 ):
-    """Processar venda no PDV"""
+    """
+    Processar venda no PDV.
+    
+    Com `Idempotency-Key` (e `X-Terminal-Id`), reenvios do terminal retornam a venda original
+    sem baixar estoque ou debitar a comanda de novo; um reenvio concorrente aguarda o original.
+    """
     
     evento = db.query(Evento).filter(Evento.id == venda.evento_id).first()
     if not evento:
@@ -244,22 +386,22 @@ async def processar_venda(
         usuario_atual.empresa_id != evento.empresa_id):
         raise HTTPException(status_code=403, detail="Acesso negado")
     
-    for item in venda.itens:
-        produto = db.query(Produto).filter(Produto.id == item.produto_id).first()
-        if not produto:
-            raise HTTPException(status_code=404, detail=f"Produto {item.produto_id} não encontrado")
-        
-        if produto.controla_estoque and produto.estoque_atual < item.quantidade:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Estoque insuficiente para {produto.nome}. Disponível: {produto.estoque_atual}"
-            )
+    escopo = _escopo_terminal("pdv_vendas", usuario_atual, terminal_id)
+    if idempotency_key:
+        original = _reservar_idempotencia(db, escopo, idempotency_key, venda)
+        if original is not None:
+            return original
     
     valor_total = sum(item.quantidade * item.preco_unitario for item in venda.itens)
     valor_desconto = Decimal('0.00')
     
     if venda.cupom_codigo:
-        pass
+        try:
+            cupom = cupom_service.validar(db, venda.cupom_codigo, evento_id=venda.evento_id)
+        except CupomInvalido as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        
+        valor_desconto = cupom_service.calcular_desconto(cupom, valor_total)
     
     valor_final = valor_total - valor_desconto
     
@@ -270,7 +412,36 @@ async def processar_venda(
             detail=f"Valor dos pagamentos ({valor_pagamentos}) não confere com valor final ({valor_final})"
         )
     
-    numero_venda = f"PDV{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    # Débito atômico antes de qualquer outra escrita da venda
+    lancamento_comanda = None
+    if venda.comanda_id:
+        try:
+            lancamento_comanda = comanda_service.debitar(
+                db, venda.comanda_id, valor_final, evento_id=venda.evento_id, usuario_id=usuario_atual.id
+            )
+        except SaldoComandaInvalido as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    if venda.cupom_codigo and not cupom_service.resgatar(db, venda.cupom_codigo):
+        raise HTTPException(status_code=400, detail="Limite de uso do cupom atingido")
+    
+    for item in venda.itens:
+        produto = db.query(Produto).filter(Produto.id == item.produto_id).first()
+        if not produto:
+            raise HTTPException(status_code=404, detail=f"Produto {item.produto_id} não encontrado")
+        
+        if produto.controla_estoque and produto.estoque_atual < item.quantidade:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Estoque insuficiente para {produto.nome}. Disponível: {produto.estoque_atual}"
+            )
+    
+    numero_venda = f"PDV{datetime.now().strftime('%y%m%d%H%M%S')}{uuid.uuid4().hex[:5].upper()}"
+    
+    caixa_id = caixa_service.registrar_venda(
+        db, venda.evento_id, usuario_atual.id, valor_final,
+        [(pagamento.tipo_pagamento, pagamento.valor) for pagamento in venda.pagamentos]
+    )
     
     db_venda = VendaPDV(
         numero_venda=numero_venda,
@@ -285,6 +456,7 @@ async def processar_venda(
         evento_id=venda.evento_id,
         empresa_id=usuario_atual.empresa_id,
         usuario_vendedor_id=usuario_atual.id,
+        caixa_id=caixa_id,
         cupom_codigo=venda.cupom_codigo,
         observacoes=venda.observacoes
     )
@@ -292,6 +464,10 @@ async def processar_venda(
     db.add(db_venda)
     db.flush()  # Para obter o ID da venda
     
+    if lancamento_comanda:
+        lancamento_comanda.venda_id = db_venda.id
+    
+    baixas = []
     for item in venda.itens:
         preco_total = item.quantidade * item.preco_unitario
         
@@ -309,6 +485,13 @@ async def processar_venda(
         if produto.controla_estoque:
             estoque_anterior = produto.estoque_atual
             produto.estoque_atual -= item.quantidade
+            baixas.append(BaixaEstoque(
+                produto_id=produto.id,
+                produto_nome=produto.nome,
+                estoque_atual=produto.estoque_atual,
+                estoque_minimo=produto.estoque_minimo or 0,
+                quantidade=item.quantidade
+            ))
             
             movimento = MovimentoEstoque(
                 produto_id=item.produto_id,
@@ -334,16 +517,19 @@ async def processar_venda(
         )
         db.add(db_pagamento)
     
-    if venda.comanda_id:
-        comanda = db.query(Comanda).filter(Comanda.id == venda.comanda_id).first()
-        if comanda and comanda.saldo_atual >= valor_final:
-            comanda.saldo_atual -= valor_final
-        else:
-            raise HTTPException(status_code=400, detail="Saldo insuficiente na comanda")
+    if idempotency_key:
+        db.flush()
+        idempotencia_service.concluir(db, escopo, idempotency_key, VendaPDVSchema.model_validate(db_venda))
     
+    financeiro_service.somar(db, venda.evento_id, total_vendas_pdv=valor_final)
     db.commit()
     db.refresh(db_venda)
     
+    painel_pdv_service.registrar_venda(
+        venda.evento_id, db_venda.id, db_venda.criado_em, db_venda.valor_final,
+        [(item.produto_id, item.quantidade) for item in venda.itens]
+    )
+    
     await notify_new_sale(venda.evento_id, {
         "numero_venda": db_venda.numero_venda,
         "valor_final": float(db_venda.valor_final),
@@ -361,13 +547,139 @@ async def processar_venda(
                 produto.nome
             )
     
-    background_tasks.add_task(imprimir_comprovante, db_venda.id)
+    if baixas:
+        background_tasks.add_task(alertar_estoque, venda.evento_id, baixas)
+    _agendar_impressao(background_tasks, db, venda.evento_id, terminal_id, lambda: receipt_service.dados_comprovante(db_venda))
     
     return db_venda
 
+@router.post("/vendas/rapida")
+async def processar_venda_rapida(
+    venda: VendaRapidaCreate,
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    terminal_id: Optional[str] = Header(None, alias="X-Terminal-Id", max_length=50),
+    db: Session = Depends(get_db),
+    usuario_atual = Depends(obter_usuario_atual)
+):
+    """
+    Venda por aproximação da comanda (RFID ou QR code) paga com o saldo.
+    
+    Comanda e preços vêm de caches em memória; débito, estoque e registros em uma transação.
+    """
+    
+    escopo = _escopo_terminal("pdv_vendas_rapidas", usuario_atual, terminal_id)
+    if idempotency_key:
+        original = _reservar_idempotencia(db, escopo, idempotency_key, venda)
+        if original is not None:
+            return original
+    
+    try:
+        resultado = venda_rapida_service.registrar(db, venda.codigo, venda.evento_id, venda.itens, usuario_atual)
+    except VendaRecusada as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    if idempotency_key:
+        idempotencia_service.concluir(db, escopo, idempotency_key, resultado)
+    db.commit()
+    
+    painel_pdv_service.registrar_venda(
+        venda.evento_id, resultado["venda_id"], None, resultado["valor_final"],
+        [(item.produto_id, item.quantidade) for item in venda.itens]
+    )
+    
+    background_tasks.add_task(notify_new_sale, venda.evento_id, {
+        "numero_venda": resultado["numero_venda"],
+        "valor_final": float(resultado["valor_final"]),
+        "tipo_pagamento": TipoPagamentoPDV.SALDO_COMANDA.value,
+        "itens_count": len(venda.itens)
+    })
+    for estoque in resultado["estoques"]:
+        background_tasks.add_task(
+            notify_stock_update, estoque["produto_id"], venda.evento_id, estoque["estoque_atual"], estoque["produto_nome"]
+        )
+    if resultado["estoques"]:
+        quantidades = {}
+        for item in venda.itens:
+            quantidades[item.produto_id] = quantidades.get(item.produto_id, 0) + item.quantidade
+        background_tasks.add_task(alertar_estoque, venda.evento_id, [
+            BaixaEstoque(quantidade=quantidades[estoque["produto_id"]], **estoque) for estoque in resultado["estoques"]
+        ])
+    _agendar_impressao(
+        background_tasks, db, venda.evento_id, terminal_id,
+        lambda: receipt_service.dados_venda_rapida(db, venda.evento_id, resultado, venda.itens)
+    )
+    
+    return resultado
+
+@router.post("/sync")
+async def sincronizar_vendas_offline(
+    lote: SincronizacaoPDVCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    usuario_atual = Depends(obter_usuario_atual)
+):
+    """
+    Sincronizar vendas registradas offline pelo terminal.
+    
+    O lote é aplicado em uma transação; cada venda é idempotente pelo `id_local` (por terminal).
+    Estoque ou saldo de comanda que ficarem negativos são reportados em `conflitos`.
+    """
+    
+    evento_ids = {venda.evento_id for venda in lote.vendas}
+    eventos = db.query(Evento.id, Evento.empresa_id).filter(Evento.id.in_(evento_ids)).all()
+    if len(eventos) != len(evento_ids):
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+    
+    if (usuario_atual.tipo.value != "admin" and 
+        any(evento.empresa_id != usuario_atual.empresa_id for evento in eventos)):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    escopo = _escopo_terminal("pdv_vendas", usuario_atual, lote.terminal_id)
+    try:
+        resultado = pdv_sync_service.aplicar_lote(
+            db, lote, escopo, usuario_atual, ttl_horas=settings.idempotencia_pdv_ttl_horas
+        )
+        db.commit()
+    except ConflitoIdempotencia as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    vendas_lote = {venda.id_local: venda for venda in lote.vendas}
+    for aplicada in resultado["aplicadas"]:
+        venda = vendas_lote[aplicada["id_local"]]
+        painel_pdv_service.registrar_venda(
+            venda.evento_id, aplicada["venda_id"], venda.registrada_em, aplicada["valor_final"],
+            [(item.produto_id, item.quantidade) for item in venda.itens]
+        )
+    
+    resumo = resultado.pop("resumo", None)
+    if resumo:
+        for evento_id in evento_ids:
+            await notify_sync_batch(evento_id, {"terminal_id": lote.terminal_id, **jsonable_encoder(resumo)})
+        
+        baixas_por_evento = {}
+        for estoque in resumo["estoques"]:
+            baixas_por_evento.setdefault(estoque["evento_id"], []).append(BaixaEstoque(
+                produto_id=estoque["produto_id"],
+                produto_nome=estoque["produto_nome"],
+                estoque_atual=estoque["estoque_atual"],
+                estoque_minimo=estoque["estoque_minimo"],
+                quantidade=estoque["quantidade"]
+            ))
+        for evento_id, baixas in baixas_por_evento.items():
+            background_tasks.add_task(alertar_estoque, evento_id, baixas)
+    
+    return resultado
+
 @router.get("/vendas", response_model=List[VendaPDVSchema])
 async def listar_vendas(
     evento_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = LIMITE_PADRAO,
+    campos: Optional[str] = None,
     data_inicio: Optional[date] = None,
     data_fim: Optional[date] = None,
     status: Optional[str] = None,
@@ -399,7 +711,11 @@ async def listar_vendas(
     if cpf_cliente:
         query = query.filter(VendaPDV.cpf_cliente == cpf_cliente)
     
-    return query.order_by(desc(VendaPDV.criado_em)).all()
+    if not campos:
+        query = query.options(selectinload(VendaPDV.itens), selectinload(VendaPDV.pagamentos))
+    
+    pagina = paginar(query, VendaPDV, cursor=cursor, limit=limit, campos=campos, esquema=VendaPDVSchema)
+    return responder(pagina, response)
 
 @router.post("/caixa/abrir", response_model=CaixaPDVSchema)
 async def abrir_caixa(
@@ -437,9 +753,14 @@ async def abrir_caixa(
     )
     
     db.add(db_caixa)
+    db.flush()
+    caixa_service.iniciar_totais(db, db_caixa.id)
     db.commit()
     db.refresh(db_caixa)
     
+    # Leituras de QR/RFID no balcão sem ida ao banco a partir daqui
+    comanda_service.indexar_evento(db, caixa.evento_id)
+    
     return db_caixa
 
 @router.post("/caixa/{caixa_id}/fechar", response_model=CaixaPDVSchema)
@@ -462,16 +783,7 @@ async def fechar_caixa(
     if caixa.status != "aberto":
         raise HTTPException(status_code=400, detail="Caixa já está fechado")
     
-    vendas_periodo = db.query(func.sum(VendaPDV.valor_final)).filter(
-        and_(
-            VendaPDV.evento_id == caixa.evento_id,
-            VendaPDV.usuario_vendedor_id == usuario_atual.id,
-            VendaPDV.criado_em >= caixa.data_abertura,
-            VendaPDV.status == StatusVendaPDV.APROVADA
-        )
-    ).scalar() or Decimal('0.00')
-    
-    caixa.valor_vendas = vendas_periodo
+    # valor_vendas já é o total corrente, somado a cada venda
     caixa.valor_fechamento = valor_fechamento
     caixa.data_fechamento = datetime.now()
     caixa.observacoes = observacoes
@@ -498,114 +810,114 @@ async def obter_dashboard_pdv(
         usuario_atual.empresa_id != evento.empresa_id):
         raise HTTPException(status_code=403, detail="Acesso negado")
     
-    hoje = date.today()
-    
-    vendas_hoje = db.query(func.count(VendaPDV.id)).filter(
-        and_(
-            VendaPDV.evento_id == evento_id,
-            func.date(VendaPDV.criado_em) == hoje,
-            VendaPDV.status == StatusVendaPDV.APROVADA
-        )
-    ).scalar() or 0
-    
-    valor_vendas_hoje = db.query(func.sum(VendaPDV.valor_final)).filter(
-        and_(
-            VendaPDV.evento_id == evento_id,
-            func.date(VendaPDV.criado_em) == hoje,
-            VendaPDV.status == StatusVendaPDV.APROVADA
-        )
-    ).scalar() or Decimal('0.00')
-    
-    produtos_em_falta = db.query(func.count(Produto.id)).filter(
-        and_(
-            Produto.evento_id == evento_id,
-            Produto.controla_estoque == True,
-            Produto.estoque_atual <= Produto.estoque_minimo
-        )
-    ).scalar() or 0
-    
-    comandas_ativas = db.query(func.count(Comanda.id)).filter(
-        and_(
-            Comanda.evento_id == evento_id,
-            Comanda.status == StatusComanda.ATIVA
-        )
-    ).scalar() or 0
-    
-    caixas_abertos = db.query(func.count(CaixaPDV.id)).filter(
-        and_(
-            CaixaPDV.evento_id == evento_id,
-            CaixaPDV.status == "aberto"
-        )
-    ).scalar() or 0
-    
-    return DashboardPDV(
-        vendas_hoje=vendas_hoje,
-        valor_vendas_hoje=valor_vendas_hoje,
-        produtos_em_falta=produtos_em_falta,
-        comandas_ativas=comandas_ativas,
-        caixas_abertos=caixas_abertos,
-        vendas_por_hora=[],  # Implementar conforme necessário
-        produtos_mais_vendidos=[],  # Implementar conforme necessário
-        alertas=[]  # Implementar conforme necessário
-    )
+    return DashboardPDV(**painel_pdv_service.obter_painel(db, evento_id))
 
-@router.get("/relatorios/x/{caixa_id}")
-async def relatorio_x(
-    caixa_id: int,
+@router.get("/estoque/movimentacao")
+async def obter_movimentacao_estoque(
+    evento_id: int,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    produto_id: Optional[int] = None,
     db: Session = Depends(get_db),
     usuario_atual = Depends(obter_usuario_atual)
 ):
-    """Relatório X - Vendas do caixa sem fechamento"""
-    
-    caixa = db.query(CaixaPDV).filter(CaixaPDV.id == caixa_id).first()
-    if not caixa:
-        raise HTTPException(status_code=404, detail="Caixa não encontrado")
-    
-    if caixa.usuario_operador_id != usuario_atual.id:
+    """Entradas, saídas e variação de estoque por produto e hora (padrão: últimas 24h)"""
+
+    evento = db.query(Evento.empresa_id).filter(Evento.id == evento_id).first()
+    if not evento:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+
+    if usuario_atual.tipo.value != "admin" and usuario_atual.empresa_id != evento.empresa_id:
         raise HTTPException(status_code=403, detail="Acesso negado")
+
+    fim = fim or datetime.now()
+    inicio = inicio or fim - timedelta(hours=24)
+    if inicio >= fim:
+        raise HTTPException(status_code=400, detail="Início deve ser anterior ao fim")
+
+    return estoque_service.movimentacao_por_hora(db, evento_id, inicio, fim, produto_id)
+
+@router.get("/estoque/{produto_id}/posicao")
+async def obter_posicao_estoque(
+    produto_id: int,
+    momento: datetime,
+    db: Session = Depends(get_db),
+    usuario_atual = Depends(obter_usuario_atual)
+):
+    """Estoque do produto em um momento passado (snapshot mais próximo mais a variação)"""
+
+    produto = db.query(Produto.empresa_id, Produto.controla_estoque).filter(Produto.id == produto_id).first()
+    if not produto:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+
+    if usuario_atual.tipo.value != "admin" and usuario_atual.empresa_id != produto.empresa_id:
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    if momento.tzinfo is not None:
+        momento = momento.astimezone().replace(tzinfo=None)
+
+    return {
+        "produto_id": produto_id,
+        "momento": momento,
+        "controla_estoque": produto.controla_estoque,
+        "estoque": estoque_service.estoque_em(db, produto_id, momento)
+    }
+
+def _relatorio_caixa(db: Session, caixa: CaixaPDV, usuario_atual, cursor: Optional[str], limit: int) -> dict:
+    """Totais correntes do caixa mais uma página das vendas (pagamentos carregados em uma consulta)"""
     
-    vendas = db.query(VendaPDV).filter(
-        and_(
-            VendaPDV.evento_id == caixa.evento_id,
-            VendaPDV.usuario_vendedor_id == usuario_atual.id,
-            VendaPDV.criado_em >= caixa.data_abertura,
-            VendaPDV.status == StatusVendaPDV.APROVADA
-        )
-    ).all()
-    
-    totais_pagamento = {}
-    total_geral = Decimal('0.00')
+    query = db.query(VendaPDV).filter(
+        VendaPDV.caixa_id == caixa.id,
+        VendaPDV.status == StatusVendaPDV.APROVADA
+    ).options(selectinload(VendaPDV.pagamentos))
+    pagina = paginar(query, VendaPDV, cursor=cursor, limit=limit, contar=False)
     
-    for venda in vendas:
-        for pagamento in venda.pagamentos:
-            forma = pagamento.tipo_pagamento.value
-            if forma not in totais_pagamento:
-                totais_pagamento[forma] = Decimal('0.00')
-            totais_pagamento[forma] += pagamento.valor
-            total_geral += pagamento.valor
+    totais_pagamento = caixa_service.totais(db, caixa.id)
     
     return {
         "tipo": "relatorio_x",
-        "caixa_id": caixa_id,
+        "caixa_id": caixa.id,
         "numero_caixa": caixa.numero_caixa,
         "data_abertura": caixa.data_abertura,
         "operador": usuario_atual.nome,
-        "total_vendas": len(vendas),
-        "valor_total": float(total_geral),
-        "totais_por_pagamento": {k: float(v) for k, v in totais_pagamento.items()},
+        "total_vendas": caixa.quantidade_vendas or 0,
+        "valor_total": float(sum((total["valor"] for total in totais_pagamento.values()), Decimal('0.00'))),
+        "totais_por_pagamento": {forma: float(total["valor"]) for forma, total in totais_pagamento.items()},
         "vendas": [
             {
                 "numero_venda": v.numero_venda,
                 "valor": float(v.valor_final),
                 "tipo_pagamento": v.pagamentos[0].tipo_pagamento.value if v.pagamentos else "N/A",
                 "horario": v.criado_em.isoformat()
-            } for v in vendas
-        ]
+            } for v in pagina.itens
+        ],
+        "proximo_cursor": pagina.proximo_cursor
     }
 
+@router.get("/relatorios/x/{caixa_id}")
+async def relatorio_x(
+    caixa_id: int,
+    cursor: Optional[str] = None,
+    limit: int = LIMITE_PADRAO,
+    db: Session = Depends(get_db),
+    usuario_atual = Depends(obter_usuario_atual)
+):
+    """Relatório X - Vendas do caixa sem fechamento"""
+    
+    caixa = db.query(CaixaPDV).filter(CaixaPDV.id == caixa_id).first()
+    if not caixa:
+        raise HTTPException(status_code=404, detail="Caixa não encontrado")
+    
+    if caixa.usuario_operador_id != usuario_atual.id:
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    return _relatorio_caixa(db, caixa, usuario_atual, cursor, limit)
+
 @router.get("/relatorios/z/{caixa_id}")
 async def relatorio_z(
     caixa_id: int,
+    cursor: Optional[str] = None,
+    limit: int = LIMITE_PADRAO,
     db: Session = Depends(get_db),
     usuario_atual = Depends(obter_usuario_atual)
 ):
@@ -621,7 +933,7 @@ async def relatorio_z(
     if caixa.status != "fechado":
         raise HTTPException(status_code=400, detail="Caixa deve estar fechado para relatório Z")
     
-    relatorio_x_data = await relatorio_x(caixa_id, db, usuario_atual)
+    relatorio_x_data = _relatorio_caixa(db, caixa, usuario_atual, cursor, limit)
     
     relatorio_x_data.update({
         "tipo": "relatorio_z",
@@ -634,6 +946,32 @@ async def relatorio_z(
     
     return relatorio_x_data
 
+@router.post("/caixa/{caixa_id}/reconciliar")
+async def reconciliar_caixa(
+    caixa_id: int,
+    corrigir: bool = False,
+    db: Session = Depends(get_db),
+    usuario_atual = Depends(verificar_permissao_admin)
+):
+    """Auditoria: comparar os totais correntes do caixa com os recalculados a partir das vendas"""
+    
+    try:
+        resultado = caixa_service.reconciliar(db, caixa_id, corrigir=corrigir)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    if corrigir:
+        db.commit()
+    
+    return resultado
+
+@router.get("/impressoras")
+async def situacao_impressoras(
+    usuario_atual = Depends(verificar_permissao_admin)
+):
+    """Filas de impressão de comprovantes: pendentes, impressos, lotes enviados e falhas recentes"""
+    return impressao_service.situacao()
+
 @router.websocket("/ws/{evento_id}")
 async def websocket_endpoint(websocket: WebSocket, evento_id: int):
     from ..websocket import manager
@@ -645,6 +983,20 @@ async def websocket_endpoint(websocket: WebSocket, evento_id: int):
     except WebSocketDisconnect:
         manager.disconnect(websocket, evento_id)
 
-async def imprimir_comprovante(venda_id: int):
-    """Função para imprimir comprovante (background task)"""
-    pass
+async def alertar_estoque(evento_id: int, baixas: List[BaixaEstoque]):
+    """Enviar `stock_alert` para os produtos que mudaram de nível (background task)"""
+    if not alerta_estoque_service.carregado(evento_id):
+        await asyncio.to_thread(alerta_estoque_service.carregar_taxas, evento_id)
+    
+    for alerta in alerta_estoque_service.registrar_baixas(baixas):
+        await notify_stock_alert(evento_id, alerta)
+
+def _agendar_impressao(background_tasks: BackgroundTasks, db: Session, evento_id: int, terminal_id: Optional[str], montar_dados):
+    """Montar os dados do comprovante ainda na requisição (sessão aberta) só se houver para onde mandá-lo"""
+    if impressao_service.impressora_para(terminal_id) is None and not impressao_service.arquivo_pdf_dir:
+        return
+    background_tasks.add_task(imprimir_comprovante, terminal_id, impressao_service.cabecalho(db, evento_id), montar_dados())
+
+async def imprimir_comprovante(terminal_id: Optional[str], cabecalho: bytes, dados: dict):
+    """Colocar o comprovante na fila da impressora do terminal (background task)"""
+    impressao_service.enfileirar(terminal_id, cabecalho, dados)
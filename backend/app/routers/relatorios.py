@@ -3,9 +3,12 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, date
 from ..database import get_db
-from ..models import Evento, Transacao, Checkin, Usuario, Lista
-from ..schemas import RelatorioVendas
+from ..models import Evento, Transacao, Checkin, Usuario, Lista, JobRelatorio
+from ..schemas import RelatorioVendas, JobRelatorioCreate
 from ..auth import obter_usuario_atual, verificar_permissao_admin
+from ..services.relatorio_job_service import relatorio_job_service, ArquivoRelatorio, RelatorioInvalido
+from ..services.snapshot_analitico_service import snapshot_analitico_service
+import asyncio
 import csv
 import io
 import json
@@ -276,25 +279,12 @@ async def exportar_logs_auditoria(
             ]
         }
 
-@router.get("/vendas/{evento_id}/excel")
-async def exportar_vendas_excel(
-    evento_id: int,
-    db: Session = Depends(get_db),
-    usuario_atual: Usuario = Depends(obter_usuario_atual)
-):
-    """Exportar relatório de vendas em Excel"""
-    
+def _gerar_vendas_excel(db: Session, parametros: dict, usuario: Usuario) -> ArquivoRelatorio:
     from openpyxl import Workbook
     from openpyxl.styles import Font, PatternFill, Alignment
     from openpyxl.utils import get_column_letter
     
-    evento = db.query(Evento).filter(Evento.id == evento_id).first()
-    if not evento:
-        raise HTTPException(status_code=404, detail="Evento não encontrado")
-    
-    if (usuario_atual.tipo.value != "admin" and 
-        usuario_atual.empresa_id != evento.empresa_id):
-        raise HTTPException(status_code=403, detail="Acesso negado")
+    evento_id = parametros["evento_id"]
     
     wb = Workbook()
     ws = wb.active
@@ -331,35 +321,26 @@ async def exportar_vendas_excel(
     
     buffer = io.BytesIO()
     wb.save(buffer)
-    buffer.seek(0)
     
-    return Response(
-        content=buffer.getvalue(),
+    return ArquivoRelatorio(
+        conteudo=buffer.getvalue(),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=vendas_evento_{evento_id}.xlsx"}
+        nome_arquivo=f"vendas_evento_{evento_id}.xlsx"
     )
 
-@router.get("/dashboard/export/{formato}")
-async def exportar_dashboard(
-    formato: str,
-    evento_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    usuario_atual: Usuario = Depends(obter_usuario_atual)
-):
-    """Exportar dados do dashboard em diferentes formatos"""
-    
+def _gerar_dashboard(db: Session, parametros: dict, usuario: Usuario) -> ArquivoRelatorio:
     from openpyxl import Workbook
     from openpyxl.styles import Font, PatternFill
     
-    if formato not in ["pdf", "csv", "excel"]:
-        raise HTTPException(status_code=400, detail="Formato não suportado")
+    formato = parametros["formato"]
+    evento_id = parametros.get("evento_id")
     
     transacoes_query = db.query(Transacao).filter(Transacao.status == "aprovada")
     checkins_query = db.query(Checkin)
     
-    if usuario_atual.tipo.value != "admin":
-        transacoes_query = transacoes_query.join(Evento).filter(Evento.empresa_id == usuario_atual.empresa_id)
-        checkins_query = checkins_query.join(Evento).filter(Evento.empresa_id == usuario_atual.empresa_id)
+    if usuario.tipo.value != "admin":
+        transacoes_query = transacoes_query.join(Evento).filter(Evento.empresa_id == usuario.empresa_id)
+        checkins_query = checkins_query.join(Evento).filter(Evento.empresa_id == usuario.empresa_id)
     
     if evento_id:
         transacoes_query = transacoes_query.filter(Transacao.evento_id == evento_id)
@@ -403,53 +384,189 @@ async def exportar_dashboard(
         
         buffer = io.BytesIO()
         wb.save(buffer)
-        buffer.seek(0)
         
-        return Response(
-            content=buffer.getvalue(),
+        return ArquivoRelatorio(
+            conteudo=buffer.getvalue(),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=dashboard_{datetime.now().strftime('%Y%m%d')}.xlsx"}
+            nome_arquivo=f"dashboard_{datetime.now().strftime('%Y%m%d')}.xlsx"
         )
     
-    elif formato == "csv":
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        writer.writerow(['=== RELATÓRIO DASHBOARD ==='])
-        writer.writerow(['Data:', datetime.now().strftime('%d/%m/%Y %H:%M')])
-        writer.writerow([])
-        
-        writer.writerow(['=== VENDAS ==='])
-        writer.writerow(['CPF', 'Nome', 'Valor', 'Data', 'Método', 'Status'])
-        
-        transacoes = transacoes_query.all()
-        for transacao in transacoes:
-            writer.writerow([
-                transacao.cpf_comprador,
-                transacao.nome_comprador,
-                str(transacao.valor),
-                transacao.criado_em.strftime('%d/%m/%Y'),
-                transacao.metodo_pagamento,
-                transacao.status
-            ])
-        
-        writer.writerow([])
-        writer.writerow(['=== CHECK-INS ==='])
-        writer.writerow(['CPF', 'Nome', 'Data Check-in', 'Método'])
-        
-        checkins = checkins_query.all()
-        for checkin in checkins:
-            writer.writerow([
-                checkin.cpf,
-                checkin.nome,
-                checkin.checkin_em.strftime('%d/%m/%Y %H:%M'),
-                checkin.metodo_checkin
-            ])
-        
-        return Response(
-            content=output.getvalue(),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=dashboard_{datetime.now().strftime('%Y%m%d')}.csv"}
-        )
+    output = io.StringIO()
+    writer = csv.writer(output)
+    
+    writer.writerow(['=== RELATÓRIO DASHBOARD ==='])
+    writer.writerow(['Data:', datetime.now().strftime('%d/%m/%Y %H:%M')])
+    writer.writerow([])
+    
+    writer.writerow(['=== VENDAS ==='])
+    writer.writerow(['CPF', 'Nome', 'Valor', 'Data', 'Método', 'Status'])
+    
+    transacoes = transacoes_query.all()
+    for transacao in transacoes:
+        writer.writerow([
+            transacao.cpf_comprador,
+            transacao.nome_comprador,
+            str(transacao.valor),
+            transacao.criado_em.strftime('%d/%m/%Y'),
+            transacao.metodo_pagamento,
+            transacao.status
+        ])
+    
+    writer.writerow([])
+    writer.writerow(['=== CHECK-INS ==='])
+    writer.writerow(['CPF', 'Nome', 'Data Check-in', 'Método'])
+    
+    checkins = checkins_query.all()
+    for checkin in checkins:
+        writer.writerow([
+            checkin.cpf,
+            checkin.nome,
+            checkin.checkin_em.strftime('%d/%m/%Y %H:%M'),
+            checkin.metodo_checkin
+        ])
+    
+    return ArquivoRelatorio(
+        conteudo=output.getvalue().encode("utf-8"),
+        media_type="text/csv",
+        nome_arquivo=f"dashboard_{datetime.now().strftime('%Y%m%d')}.csv"
+    )
+
+relatorio_job_service.registrar("vendas_excel", _gerar_vendas_excel, fontes=("transacoes",))
+relatorio_job_service.registrar("dashboard", _gerar_dashboard, fontes=("transacoes", "checkins"))
+
+@router.get("/vendas/{evento_id}/excel")
+async def exportar_vendas_excel(
+    evento_id: int,
+    assincrono: bool = False,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Exportar relatório de vendas em Excel (com `assincrono`, retorna o id do job)"""
+    
+    evento = db.query(Evento).filter(Evento.id == evento_id).first()
+    if not evento:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+    
+    if (usuario_atual.tipo.value != "admin" and 
+        usuario_atual.empresa_id != evento.empresa_id):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    job = relatorio_job_service.solicitar(db, "vendas_excel", {"evento_id": evento_id}, usuario_atual)
+    return await relatorio_job_service.responder(db, job, assincrono)
+
+@router.get("/dashboard/export/{formato}")
+async def exportar_dashboard(
+    formato: str,
+    evento_id: Optional[int] = None,
+    assincrono: bool = False,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Exportar dados do dashboard em diferentes formatos (com `assincrono`, retorna o id do job)"""
+    
+    if formato not in ["pdf", "csv", "excel"]:
+        raise HTTPException(status_code=400, detail="Formato não suportado")
+    
+    if formato == "pdf":
+        return {"message": "Formato PDF em desenvolvimento"}
+    
+    job = relatorio_job_service.solicitar(db, "dashboard", {"formato": formato, "evento_id": evento_id}, usuario_atual)
+    return await relatorio_job_service.responder(db, job, assincrono)
+
+@router.post("/jobs")
+async def criar_job_relatorio(
+    pedido: JobRelatorioCreate,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Enfileirar um relatório pelo nome; responde na hora com o id do job"""
+    
+    evento_id = pedido.parametros.get("evento_id")
+    if evento_id is not None:
+        evento = db.query(Evento).filter(Evento.id == evento_id).first()
+        if not evento:
+            raise HTTPException(status_code=404, detail="Evento não encontrado")
+        if (usuario_atual.tipo.value != "admin" and 
+            usuario_atual.empresa_id != evento.empresa_id):
+            raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    try:
+        job = relatorio_job_service.solicitar(db, pedido.relatorio, pedido.parametros, usuario_atual)
+    except RelatorioInvalido as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    return await relatorio_job_service.responder(db, job, assincrono=True)
+
+@router.get("/jobs/{job_id}")
+async def obter_job_relatorio(
+    job_id: str,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Situação de um job de relatório"""
+    
+    return relatorio_job_service.situacao(_job_do_usuario(db, job_id, usuario_atual))
+
+@router.get("/jobs/{job_id}/download")
+async def baixar_job_relatorio(
+    job_id: str,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Arquivo gerado por um job (202 enquanto não termina)"""
+    
+    job = _job_do_usuario(db, job_id, usuario_atual)
+    if job.status == "concluido" and relatorio_job_service.arquivo(job) is None:
+        raise HTTPException(status_code=410, detail="Arquivo expirou do cache; solicite o relatório novamente")
+    
+    return await relatorio_job_service.responder(db, job, timeout=0)
+
+@router.post("/snapshots/{evento_id}")
+async def exportar_snapshot_analitico(
+    evento_id: int,
+    completo: bool = False,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Snapshot colunar (Parquet) do evento para análises; incremental por padrão (só linhas novas; `completo` traz as alteradas)"""
+    
+    evento = db.query(Evento).filter(Evento.id == evento_id).first()
+    if not evento:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+    
+    if (usuario_atual.tipo.value != "admin" and 
+        usuario_atual.empresa_id != evento.empresa_id):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    return await asyncio.to_thread(snapshot_analitico_service.exportar, db, evento_id, completo)
+
+@router.get("/snapshots/{evento_id}")
+async def obter_snapshot_analitico(
+    evento_id: int,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """Manifesto do último snapshot do evento: arquivos, linhas e até que id cada tabela foi exportada"""
+    
+    evento = db.query(Evento).filter(Evento.id == evento_id).first()
+    if not evento:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+    
+    if (usuario_atual.tipo.value != "admin" and 
+        usuario_atual.empresa_id != evento.empresa_id):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    manifesto = snapshot_analitico_service.manifesto(evento_id)
+    if not manifesto:
+        raise HTTPException(status_code=404, detail="Evento ainda sem snapshot")
+    return manifesto
+
+def _job_do_usuario(db: Session, job_id: str, usuario_atual: Usuario) -> JobRelatorio:
+    job = db.query(JobRelatorio).filter(JobRelatorio.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    
+    if usuario_atual.tipo.value != "admin" and job.usuario_id != usuario_atual.id:
+        raise HTTPException(status_code=403, detail="Acesso negado")
     
-    return {"message": "Formato PDF em desenvolvimento"}
+    return job
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Header
 from sqlalchemy.orm import Session
+from sqlalchemy import insert
 from typing import List, Optional
+from collections import Counter
 from ..database import get_db
 from ..models import Transacao, Lista, Evento, Usuario
-from ..schemas import Transacao as TransacaoSchema, TransacaoCreate
+from ..schemas import Transacao as TransacaoSchema, TransacaoCreate, TransacaoLoteCreate, TransacaoLote
 from ..auth import obter_usuario_atual, validar_cpf_basico
+from ..pagination import paginar, responder, LIMITE_PADRAO
+from ..services.quota_service import quota_service, RESERVA_BLOCO
+from ..services.idempotencia_service import idempotencia_service, ConflitoIdempotencia
+from ..services.financeiro_service import financeiro_service
 import uuid
 
 router = APIRouter()
@@ -44,39 +50,144 @@ async def criar_transacao(
             detail="Acesso negado"
         )
     
-    if lista.limite_vendas and lista.vendas_realizadas >= lista.limite_vendas:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Limite de vendas da lista atingido"
-        )
-    
     transacao_data = transacao.dict()
     transacao_data['codigo_transacao'] = str(uuid.uuid4())
     transacao_data['qr_code_ticket'] = f"TICKET-{str(uuid.uuid4())[:8].upper()}-{evento.id}"
     transacao_data['usuario_id'] = usuario_atual.id
     transacao_data['valor'] = lista.preco
     
+    origem_vaga = quota_service.reservar(db, lista.id)
+    if not origem_vaga:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Limite de vendas da lista atingido"
+        )
+    
     db_transacao = Transacao(**transacao_data)
     db.add(db_transacao)
+    financeiro_service.registrar_transacao(db, evento.id, db_transacao.valor, status_atual=db_transacao.status)
     
-    lista.vendas_realizadas += 1
-    
-    db.commit()
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        if origem_vaga == RESERVA_BLOCO:
+            quota_service.devolver_reserva_local(lista.id)
+        raise
     db.refresh(db_transacao)
     
     return db_transacao
 
+@router.post("/lote", response_model=TransacaoLote)
+async def criar_transacoes_lote(
+    lote: TransacaoLoteCreate,
+    idempotency_key: str = Header(..., alias="Idempotency-Key", max_length=255),
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(obter_usuario_atual)
+):
+    """
+    Emitir ingressos em lote (tudo ou nada).
+    
+    Validação com consultas agrupadas, uma reserva de cota por lista e um único INSERT.
+    Reenvios com o mesmo `Idempotency-Key` retornam o lote original sem emitir novamente.
+    """
+    
+    escopo = f"transacoes_lote:{usuario_atual.id}"
+    try:
+        resposta_original = idempotencia_service.reservar(db, escopo, idempotency_key, lote)
+    except ConflitoIdempotencia as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    if resposta_original is not None:
+        return resposta_original
+    
+    lista_ids = {item.lista_id for item in lote.transacoes}
+    evento_ids = {item.evento_id for item in lote.transacoes}
+    
+    listas = {
+        lista.id: lista for lista in db.query(Lista.id, Lista.evento_id, Lista.preco, Lista.ativa).filter(
+            Lista.id.in_(lista_ids)
+        )
+    }
+    eventos = {
+        evento.id: evento for evento in db.query(Evento.id, Evento.empresa_id).filter(
+            Evento.id.in_(evento_ids)
+        )
+    }
+    
+    erros = []
+    for indice, item in enumerate(lote.transacoes):
+        lista = listas.get(item.lista_id)
+        evento = eventos.get(item.evento_id)
+        if not validar_cpf_basico(item.cpf_comprador):
+            erros.append({"indice": indice, "erro": "CPF do comprador inválido"})
+        elif not lista or not lista.ativa or lista.evento_id != item.evento_id:
+            erros.append({"indice": indice, "erro": "Lista não encontrada ou inativa"})
+        elif not evento:
+            erros.append({"indice": indice, "erro": "Evento não encontrado"})
+        elif usuario_atual.tipo.value != "admin" and usuario_atual.empresa_id != evento.empresa_id:
+            erros.append({"indice": indice, "erro": "Acesso negado"})
+    
+    if erros:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=erros)
+    
+    # Vagas tiradas do bloco local já foram gravadas no banco: o rollback não as devolve
+    reservas = []
+    try:
+        quantidades = Counter(item.lista_id for item in lote.transacoes)
+        for lista_id, quantidade in sorted(quantidades.items()):
+            origem_vaga = quota_service.reservar(db, lista_id, quantidade)
+            if not origem_vaga:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Limite de vendas da lista {lista_id} não comporta {quantidade} ingressos"
+                )
+            reservas.append((lista_id, origem_vaga))
+        
+        linhas = []
+        for item in lote.transacoes:
+            dados = item.dict()
+            dados['codigo_transacao'] = str(uuid.uuid4())
+            dados['qr_code_ticket'] = f"TICKET-{uuid.uuid4().hex[:8].upper()}-{item.evento_id}"
+            dados['usuario_id'] = usuario_atual.id
+            dados['valor'] = listas[item.lista_id].preco
+            linhas.append(dados)
+        
+        transacoes = db.scalars(insert(Transacao).returning(Transacao), linhas).all()
+        for transacao in transacoes:
+            financeiro_service.registrar_transacao(db, transacao.evento_id, transacao.valor, status_atual=transacao.status)
+        
+        resposta = TransacaoLote(
+            chave_idempotencia=idempotency_key,
+            quantidade=len(transacoes),
+            transacoes=transacoes
+        )
+        idempotencia_service.concluir(db, escopo, idempotency_key, resposta)
+        db.commit()
+    except Exception:
+        db.rollback()
+        for lista_id, origem_vaga in reservas:
+            if origem_vaga == RESERVA_BLOCO:
+                quota_service.devolver_reserva_local(lista_id)
+        raise
+    
+    return resposta
+
 @router.get("/", response_model=List[TransacaoSchema])
 async def listar_transacoes(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = LIMITE_PADRAO,
+    campos: Optional[str] = None,
     evento_id: Optional[int] = None,
     cpf_comprador: Optional[str] = None,
     status: Optional[str] = None,
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(obter_usuario_atual)
 ):
-    """Listar transações"""
+    """Listar transações (paginação por cursor; próximo cursor em X-Next-Cursor)"""
     
     query = db.query(Transacao)
     
@@ -92,8 +203,8 @@ async def listar_transacoes(
     if status:
         query = query.filter(Transacao.status == status)
     
-    transacoes = query.offset(skip).limit(limit).all()
-    return transacoes
+    pagina = paginar(query, Transacao, cursor=cursor, limit=limit, campos=campos, esquema=TransacaoSchema)
+    return responder(pagina, response)
 
 @router.get("/{transacao_id}", response_model=TransacaoSchema)
 async def obter_transacao(
@@ -151,6 +262,9 @@ async def atualizar_status_transacao(
             detail=f"Status inválido. Use: {', '.join(status_validos)}"
         )
     
+    financeiro_service.registrar_transacao(
+        db, transacao.evento_id, transacao.valor, status_anterior=transacao.status, status_atual=novo_status
+    )
     transacao.status = novo_status
     db.commit()
     
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from ..database import get_db
 from ..models import Usuario, Empresa
 from ..schemas import Usuario as UsuarioSchema, UsuarioCreate
 from ..auth import obter_usuario_atual, verificar_permissao_admin, gerar_hash_senha, validar_cpf_basico
+from ..pagination import paginar, responder, LIMITE_PADRAO
 
 router = APIRouter()
 
@@ -57,8 +58,10 @@ async def criar_usuario(
 
 @router.get("/", response_model=List[UsuarioSchema])
 async def listar_usuarios(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = LIMITE_PADRAO,
+    campos: Optional[str] = None,
     empresa_id: Optional[int] = None,
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(obter_usuario_atual)
@@ -72,8 +75,8 @@ async def listar_usuarios(
     elif empresa_id:
         query = query.filter(Usuario.empresa_id == empresa_id)
     
-    usuarios = query.offset(skip).limit(limit).all()
-    return usuarios
+    pagina = paginar(query, Usuario, cursor=cursor, limit=limit, campos=campos, esquema=UsuarioSchema)
+    return responder(pagina, response)
 
 @router.get("/{usuario_id}", response_model=UsuarioSchema)
 async def obter_usuario(
@@ -1,31 +1,264 @@
 import asyncio
-import schedule
+import os
+import random
+import socket
 import time
-from threading import Thread
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from .database import SessionLocal
+from .models import SchedulerLease, ExecucaoJob
 from .services.alert_service import alert_service
+from .services.gamificacao_service import gamificacao_service
+from .services.idempotencia_service import idempotencia_service
+from .services.estoque_service import estoque_service
+from .services.catalogo_service import catalogo_service
+from .services.comprovante_service import comprovante_service
+from .services.relatorio_job_service import relatorio_job_service
+from .services.snapshot_analitico_service import snapshot_analitico_service
 import logging
 
 logger = logging.getLogger(__name__)
 
-def run_alert_checks():
-    """Executar verificações de alerta"""
-    try:
-        asyncio.run(alert_service.run_alert_checks())
-        logger.info("Verificações de alerta executadas com sucesso")
-    except Exception as e:
-        logger.error(f"Erro nas verificações de alerta: {e}")
-
-def start_scheduler():
-    """Iniciar scheduler de alertas"""
-    schedule.every(30).minutes.do(run_alert_checks)
-    
-    schedule.every(6).hours.do(run_alert_checks)
-    
-    def run_scheduler():
+@dataclass
+class JobAgendado:
+    nome: str
+    intervalo: float
+    funcao: Callable
+    jitter: float = 0.1
+    timeout: Optional[float] = None
+    proxima_execucao: float = 0.0
+    em_execucao: bool = False
+    ultima_execucao: Optional[dict] = field(default=None)
+
+    def agendar_proxima(self):
+        self.proxima_execucao = time.monotonic() + self.intervalo + random.uniform(0, self.intervalo * self.jitter)
+
+class Scheduler:
+    """Scheduler asyncio no loop principal; apenas o worker líder (lease no banco) executa os jobs"""
+
+    def __init__(self, session_factory=SessionLocal, nome_lease: str = "scheduler",
+                 lease_ttl: float = 90, intervalo_tick: float = 15):
+        self.session_factory = session_factory
+        self.nome_lease = nome_lease
+        self.lease_ttl = lease_ttl
+        self.intervalo_tick = intervalo_tick
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs: Dict[str, JobAgendado] = {}
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._execucoes: set = set()
+
+    def every(self, segundos: float, nome: str, funcao: Callable, jitter: float = 0.1, timeout: Optional[float] = None):
+        """Registrar job periódico; funções síncronas rodam em thread para não bloquear o loop"""
+        job = JobAgendado(nome=nome, intervalo=segundos, funcao=funcao, jitter=jitter, timeout=timeout)
+        job.agendar_proxima()
+        self.jobs[nome] = job
+        return job
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Scheduler iniciado no worker {self.worker_id}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for execucao in list(self._execucoes):
+            execucao.cancel()
+        if self._execucoes:
+            await asyncio.gather(*self._execucoes, return_exceptions=True)
+
+        if self.is_leader:
+            await asyncio.to_thread(self.liberar_lease)
+            self.is_leader = False
+
+    async def _loop(self):
         while True:
-            schedule.run_pending()
-            time.sleep(60)
-    
-    scheduler_thread = Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
-    logger.info("Scheduler de alertas iniciado")
+            eh_lider = await asyncio.to_thread(self.renovar_lease)
+            if eh_lider != self.is_leader:
+                logger.info(f"Worker {self.worker_id} {'assumiu' if eh_lider else 'perdeu'} a liderança do scheduler")
+            self.is_leader = eh_lider
+
+            if self.is_leader:
+                agora = time.monotonic()
+                for job in self.jobs.values():
+                    if not job.em_execucao and agora >= job.proxima_execucao:
+                        self._disparar(job)
+
+            await asyncio.sleep(self.intervalo_tick)
+
+    def _disparar(self, job: JobAgendado):
+        job.em_execucao = True
+        execucao = asyncio.create_task(self.executar_job(job))
+        self._execucoes.add(execucao)
+        execucao.add_done_callback(self._execucoes.discard)
+
+    async def executar_job(self, job: JobAgendado):
+        """Executar um job registrando duração e resultado"""
+        job.em_execucao = True
+        iniciado_em = datetime.now()
+        inicio = time.perf_counter()
+        status, erro = "sucesso", None
+        execucao = None
+
+        try:
+            if asyncio.iscoroutinefunction(job.funcao):
+                execucao = asyncio.ensure_future(job.funcao())
+                await asyncio.wait_for(execucao, timeout=job.timeout)
+            else:
+                # O timeout não interrompe a thread: shield mantém a tarefa viva e o job segue em execução
+                execucao = asyncio.ensure_future(asyncio.to_thread(job.funcao))
+                await asyncio.wait_for(asyncio.shield(execucao), timeout=job.timeout)
+        except asyncio.TimeoutError:
+            status, erro = "timeout", f"Excedeu {job.timeout}s"
+            logger.error(f"Job {job.nome} excedeu o timeout de {job.timeout}s")
+        except asyncio.CancelledError:
+            status, erro = "erro", "Cancelado"
+            raise
+        except Exception as e:
+            status, erro = "erro", str(e)
+            logger.error(f"Erro no job {job.nome}: {e}")
+        finally:
+            duracao_ms = int((time.perf_counter() - inicio) * 1000)
+            job.ultima_execucao = {
+                "status": status,
+                "iniciado_em": iniciado_em.isoformat(),
+                "duracao_ms": duracao_ms,
+                "erro": erro
+            }
+            if execucao is not None and not execucao.done():
+                execucao.add_done_callback(lambda tarefa: self._liberar_job(job, tarefa))
+            else:
+                self._liberar_job(job)
+            await asyncio.to_thread(self._registrar_execucao, job.nome, status, iniciado_em, duracao_ms, erro)
+            logger.info(f"Job {job.nome} finalizado: {status} em {duracao_ms} ms")
+
+    def _liberar_job(self, job: JobAgendado, tarefa: Optional[asyncio.Future] = None):
+        """Liberar o job para o próximo tick; com tarefa, chamado quando a thread que estourou o timeout termina"""
+        if tarefa is not None and not tarefa.cancelled() and tarefa.exception():
+            logger.error(f"Erro no job {job.nome} após o timeout: {tarefa.exception()}")
+        job.em_execucao = False
+        job.agendar_proxima()
+
+    def _registrar_execucao(self, nome: str, status: str, iniciado_em: datetime, duracao_ms: int, erro: Optional[str]):
+        db = self.session_factory()
+        try:
+            db.add(ExecucaoJob(
+                job=nome,
+                worker=self.worker_id,
+                status=status,
+                iniciado_em=iniciado_em,
+                duracao_ms=duracao_ms,
+                erro=erro
+            ))
+            db.commit()
+        except Exception as e:
+            logger.error(f"Erro ao registrar execução do job {nome}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def renovar_lease(self) -> bool:
+        """Adquirir ou renovar o lease de liderança; retorna True se este worker é o líder"""
+        db = self.session_factory()
+        try:
+            agora = datetime.now()
+            expira_em = agora + timedelta(seconds=self.lease_ttl)
+
+            atualizado = db.query(SchedulerLease).filter(
+                SchedulerLease.nome == self.nome_lease,
+                or_(
+                    SchedulerLease.holder == self.worker_id,
+                    SchedulerLease.expira_em < agora
+                )
+            ).update({"holder": self.worker_id, "expira_em": expira_em}, synchronize_session=False)
+
+            if not atualizado:
+                existe = db.query(SchedulerLease.nome).filter(
+                    SchedulerLease.nome == self.nome_lease
+                ).first()
+                if existe:
+                    db.rollback()
+                    return False
+                db.add(SchedulerLease(nome=self.nome_lease, holder=self.worker_id, expira_em=expira_em))
+
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao renovar lease do scheduler: {e}")
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def liberar_lease(self):
+        db = self.session_factory()
+        try:
+            db.query(SchedulerLease).filter(
+                SchedulerLease.nome == self.nome_lease,
+                SchedulerLease.holder == self.worker_id
+            ).update({"expira_em": datetime.now()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Erro ao liberar lease do scheduler: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def status(self) -> dict:
+        return {
+            "worker": self.worker_id,
+            "lider": self.is_leader,
+            "jobs": {
+                nome: {
+                    "intervalo_segundos": job.intervalo,
+                    "em_execucao": job.em_execucao,
+                    "ultima_execucao": job.ultima_execucao
+                } for nome, job in self.jobs.items()
+            }
+        }
+
+scheduler = Scheduler()
+
+scheduler.every(30 * 60, "alertas", alert_service.run_alert_checks, timeout=10 * 60)
+
+scheduler.every(60 * 60, "conquistas", gamificacao_service.run_verificacao_conquistas, timeout=20 * 60)
+
+scheduler.every(15 * 60, "snapshot_metricas", gamificacao_service.run_snapshot_metricas, timeout=10 * 60)
+
+scheduler.every(60 * 60, "limpeza_idempotencia", idempotencia_service.limpar_expiradas, timeout=5 * 60)
+
+scheduler.every(30, "publicacao_estoque_catalogo", catalogo_service.run_publicar_estoque, timeout=5 * 60)
+
+scheduler.every(60 * 60, "snapshot_estoque", estoque_service.run_snapshots, timeout=10 * 60)
+
+scheduler.every(60 * 60, "consolidacao_estoque", estoque_service.run_consolidacao, timeout=20 * 60)
+
+scheduler.every(24 * 60 * 60, "limpeza_comprovantes", comprovante_service.limpar_orfaos, timeout=30 * 60)
+
+scheduler.every(6 * 60 * 60, "limpeza_relatorios", relatorio_job_service.limpar_cache, timeout=10 * 60)
+
+scheduler.every(60 * 60, "snapshot_analitico", snapshot_analitico_service.run_incremental, timeout=30 * 60)
+
+scheduler.every(24 * 60 * 60, "snapshot_analitico_completo", snapshot_analitico_service.run_completo, timeout=2 * 60 * 60)
+
+async def start_scheduler():
+    """Iniciar scheduler de jobs periódicos"""
+    await scheduler.start()
+
+async def stop_scheduler():
+    """Parar scheduler e liberar a liderança"""
+    await scheduler.stop()
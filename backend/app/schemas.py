@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, Field, validator
 from datetime import datetime, date
 from typing import Optional, List
 from decimal import Decimal
@@ -267,6 +267,14 @@ class Transacao(TransacaoBase):
     class Config:
         from_attributes = True
 
+class TransacaoLoteCreate(BaseModel):
+    transacoes: List[TransacaoCreate] = Field(..., min_length=1, max_length=500)
+
+class TransacaoLote(BaseModel):
+    chave_idempotencia: str
+    quantidade: int
+    transacoes: List[Transacao]
+
 class CheckinBase(BaseModel):
     cpf: str
     metodo_checkin: str
@@ -335,6 +343,10 @@ class RelatorioVendas(BaseModel):
     vendas_por_lista: List[dict]
     vendas_por_promoter: List[dict]
 
+class JobRelatorioCreate(BaseModel):
+    relatorio: str
+    parametros: dict = {}
+
 class CupomCreate(BaseModel):
     lista_id: int
     codigo: str
@@ -479,6 +491,23 @@ class VendaPDV(VendaPDVBase):
     class Config:
         from_attributes = True
 
+class VendaPDVOffline(VendaPDVCreate):
+    id_local: str = Field(..., max_length=255)  # chave de idempotência gerada no terminal
+    registrada_em: Optional[datetime] = None
+
+class SincronizacaoPDVCreate(BaseModel):
+    terminal_id: str = Field(..., max_length=50)
+    vendas: List[VendaPDVOffline] = Field(..., min_length=1, max_length=1000)
+
+class ItemVendaRapida(BaseModel):
+    produto_id: int
+    quantidade: int = Field(1, ge=1)
+
+class VendaRapidaCreate(BaseModel):
+    codigo: str = Field(..., max_length=100)  # QR code ou RFID da comanda
+    evento_id: int
+    itens: List[ItemVendaRapida] = Field(..., min_length=1, max_length=50)
+
 class RecargaComandaBase(BaseModel):
     valor: Decimal
     tipo_pagamento: TipoPagamentoPDV
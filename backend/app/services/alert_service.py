@@ -1,17 +1,31 @@
 import asyncio
+import time
+from dataclasses import dataclass
 from datetime import datetime, date, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Dict, Any
+from sqlalchemy import func, and_
+from typing import List, Dict, Any, Iterable
 from ..database import SessionLocal
-from ..models import Evento, Lista, Transacao, Usuario, TipoLista
+from ..models import (
+    Evento, Lista, Transacao, Usuario, TipoLista, TipoUsuario, StatusTransacao,
+    Conquista, PromoterConquista, TipoConquista, EstadoAlerta
+)
 from ..services.whatsapp_service import whatsapp_service
 import logging
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class Alerta:
+    chave: str
+    mensagem: str
+    telefones: List[str]
+    nivel: int = 1
+
 class AlertService:
-    def __init__(self):
+    def __init__(self, timeout_regra: float = 120):
+        self.timeout_regra = timeout_regra
+        self.session_factory = SessionLocal
         self.alert_rules = {
             "limite_lista": self.check_limite_lista,
             "aniversarios_vip": self.check_aniversarios_vip,
@@ -19,210 +33,372 @@ class AlertService:
             "evento_proximo": self.check_evento_proximo,
             "conquistas_pendentes": self.check_conquistas_pendentes
         }
-    
-    async def run_alert_checks(self):
-        """Executar todas as verificações de alerta"""
-        db = SessionLocal()
+        self.ultima_execucao: Dict[str, Dict[str, Any]] = {}
+
+    async def run_alert_checks(self) -> Dict[str, Dict[str, Any]]:
+        """Executar todas as verificações de alerta em paralelo"""
+        resultados = await asyncio.gather(*[
+            self._executar_regra(rule_name, rule_func)
+            for rule_name, rule_func in self.alert_rules.items()
+        ])
+        self.ultima_execucao = dict(zip(self.alert_rules.keys(), resultados))
+        return self.ultima_execucao
+
+    async def _executar_regra(self, rule_name: str, rule_func) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        resultado = {"status": "sucesso", "alertas": 0}
+        try:
+            resultado["alertas"] = await asyncio.wait_for(
+                self._processar_regra(rule_name, rule_func), timeout=self.timeout_regra
+            )
+        except asyncio.TimeoutError:
+            resultado["status"] = "timeout"
+            logger.error(f"Regra {rule_name} excedeu o timeout de {self.timeout_regra}s")
+        except Exception as e:
+            resultado["status"] = "erro"
+            logger.error(f"Erro na regra {rule_name}: {e}")
+
+        resultado["duracao_ms"] = int((time.perf_counter() - inicio) * 1000)
+        logger.info(f"Regra {rule_name}: {resultado['status']}, {resultado['alertas']} alertas em {resultado['duracao_ms']} ms")
+        return resultado
+
+    async def _processar_regra(self, rule_name: str, rule_func) -> int:
+        """Avaliar a regra, enviar apenas alertas novos e persistir o estado"""
+        pendentes = await asyncio.to_thread(self._avaliar_regra, rule_name, rule_func)
+
+        enviados = []
+        for alerta in pendentes:
+            resultados = await asyncio.gather(*[
+                whatsapp_service._send_whatsapp_message(telefone, alerta.mensagem)
+                for telefone in alerta.telefones
+            ], return_exceptions=True)
+            if any(not isinstance(r, Exception) for r in resultados):
+                enviados.append(alerta)
+
+        if enviados:
+            await asyncio.to_thread(self._registrar_disparos, rule_name, enviados)
+
+        return len(enviados)
+
+    def _avaliar_regra(self, rule_name: str, rule_func) -> List[Alerta]:
+        """Filtrar os alertas já disparados no mesmo nível e limpar condições que deixaram de valer"""
+        db = self.session_factory()
+        try:
+            alertas = rule_func(db)
+
+            estados = {
+                estado.chave: estado for estado in db.query(EstadoAlerta).filter(
+                    EstadoAlerta.regra == rule_name
+                ).all()
+            }
+
+            chaves_ativas = {alerta.chave for alerta in alertas}
+            chaves_encerradas = [chave for chave in estados if chave not in chaves_ativas]
+            if chaves_encerradas:
+                db.query(EstadoAlerta).filter(
+                    EstadoAlerta.regra == rule_name,
+                    EstadoAlerta.chave.in_(chaves_encerradas)
+                ).delete(synchronize_session=False)
+                db.commit()
+
+            return [
+                alerta for alerta in alertas
+                if alerta.telefones and (alerta.chave not in estados or estados[alerta.chave].nivel < alerta.nivel)
+            ]
+        finally:
+            db.close()
+
+    def _registrar_disparos(self, rule_name: str, alertas: List[Alerta]):
+        db = self.session_factory()
         try:
-            for rule_name, rule_func in self.alert_rules.items():
-                try:
-                    await rule_func(db)
-                except Exception as e:
-                    logger.error(f"Erro na regra {rule_name}: {e}")
+            estados = {
+                estado.chave: estado for estado in db.query(EstadoAlerta).filter(
+                    EstadoAlerta.regra == rule_name,
+                    EstadoAlerta.chave.in_([a.chave for a in alertas])
+                ).all()
+            }
+            for alerta in alertas:
+                estado = estados.get(alerta.chave)
+                if estado:
+                    estado.nivel = alerta.nivel
+                    estado.disparado_em = datetime.now()
+                else:
+                    db.add(EstadoAlerta(regra=rule_name, chave=alerta.chave, nivel=alerta.nivel))
+            db.commit()
         finally:
             db.close()
-    
-    async def check_limite_lista(self, db: Session):
-        """Verificar listas próximas do limite"""
-        listas_criticas = db.query(Lista).filter(
+
+    def _admins_por_empresa(self, db: Session, empresa_ids: Iterable[int]) -> Dict[int, List[str]]:
+        empresa_ids = list(set(empresa_ids))
+        if not empresa_ids:
+            return {}
+
+        admins: Dict[int, List[str]] = {}
+        for empresa_id, telefone in db.query(Usuario.empresa_id, Usuario.telefone).filter(
+            Usuario.empresa_id.in_(empresa_ids),
+            Usuario.tipo == TipoUsuario.ADMIN,
+            Usuario.telefone.isnot(None)
+        ).all():
+            admins.setdefault(empresa_id, []).append(telefone)
+        return admins
+
+    def _vendas_por_evento(self, db: Session):
+        return db.query(
+            Transacao.evento_id.label('evento_id'),
+            func.count(Transacao.id).label('total_vendas')
+        ).filter(
+            Transacao.status == StatusTransacao.APROVADA
+        ).group_by(Transacao.evento_id).subquery()
+
+    def check_limite_lista(self, db: Session) -> List[Alerta]:
+        """Verificar listas próximas do limite (alerta em 90% e novamente ao atingir 100%)"""
+        listas_criticas = db.query(
+            Lista.id,
+            Lista.nome,
+            Lista.vendas_realizadas,
+            Lista.limite_vendas,
+            Evento.nome.label('evento_nome'),
+            Usuario.telefone
+        ).join(
+            Evento, Lista.evento_id == Evento.id
+        ).join(
+            Usuario, Lista.promoter_id == Usuario.id
+        ).filter(
             Lista.ativa == True,
             Lista.limite_vendas.isnot(None),
+            Lista.limite_vendas > 0,
             Lista.vendas_realizadas >= Lista.limite_vendas * 0.9
         ).all()
-        
+
+        alertas = []
         for lista in listas_criticas:
             percentual = (lista.vendas_realizadas / lista.limite_vendas) * 100
-            
-            if lista.promoter_id:
-                promoter = db.query(Usuario).filter(Usuario.id == lista.promoter_id).first()
-                if promoter and promoter.telefone:
-                    message = f"""
+            message = f"""
 🚨 *ALERTA - LIMITE DE LISTA*
 
 Lista: {lista.nome}
 Vendas: {lista.vendas_realizadas}/{lista.limite_vendas} ({percentual:.1f}%)
-Evento: {lista.evento.nome}
+Evento: {lista.evento_nome}
 
 Ação necessária: Verificar estratégia de vendas
-                    """.strip()
-                    
-                    await whatsapp_service._send_whatsapp_message(
-                        promoter.telefone, message
-                    )
-    
-    async def check_aniversarios_vip(self, db: Session):
+            """.strip()
+
+            alertas.append(Alerta(
+                chave=f"lista:{lista.id}",
+                mensagem=message,
+                telefones=[lista.telefone] if lista.telefone else [],
+                nivel=100 if percentual >= 100 else 90
+            ))
+
+        return alertas
+
+    def check_aniversarios_vip(self, db: Session) -> List[Alerta]:
         """Verificar aniversariantes VIP nos próximos eventos"""
         hoje = date.today()
         proximos_7_dias = hoje + timedelta(days=7)
-        
-        eventos_proximos = db.query(Evento).filter(
-            func.date(Evento.data_evento).between(hoje, proximos_7_dias)
+
+        transacoes_vip = db.query(
+            Evento.id.label('evento_id'),
+            Evento.nome.label('evento_nome'),
+            Evento.data_evento,
+            Evento.empresa_id,
+            Transacao.cpf_comprador,
+            Transacao.nome_comprador
+        ).join(
+            Transacao, Transacao.evento_id == Evento.id
+        ).join(
+            Lista, Transacao.lista_id == Lista.id
+        ).filter(
+            func.date(Evento.data_evento).between(hoje, proximos_7_dias),
+            Lista.tipo == TipoLista.VIP,
+            Transacao.status == StatusTransacao.APROVADA
         ).all()
-        
-        for evento in eventos_proximos:
-            transacoes_vip = db.query(Transacao).join(Lista).filter(
-                Transacao.evento_id == evento.id,
-                Lista.tipo == TipoLista.VIP,
-                Transacao.status == "aprovada"
-            ).all()
-            
-            aniversariantes = []
-            for transacao in transacoes_vip:
-                if self._is_birthday_week(transacao.cpf_comprador):
-                    aniversariantes.append(transacao.nome_comprador)
-            
-            if aniversariantes:
-                admin_users = db.query(Usuario).filter(
-                    Usuario.empresa_id == evento.empresa_id,
-                    Usuario.tipo == "admin"
-                ).all()
-                
-                for admin in admin_users:
-                    if admin.telefone:
-                        message = f"""
+
+        eventos: Dict[int, Dict[str, Any]] = {}
+        for transacao in transacoes_vip:
+            if self._is_birthday_week(transacao.cpf_comprador):
+                evento = eventos.setdefault(transacao.evento_id, {"dados": transacao, "aniversariantes": []})
+                evento["aniversariantes"].append(transacao.nome_comprador)
+
+        admins = self._admins_por_empresa(db, [e["dados"].empresa_id for e in eventos.values()])
+
+        alertas = []
+        for evento_id, evento in eventos.items():
+            dados = evento["dados"]
+            message = f"""
 🎂 *ANIVERSARIANTES VIP*
 
-Evento: {evento.nome}
-Data: {evento.data_evento.strftime('%d/%m/%Y')}
+Evento: {dados.evento_nome}
+Data: {dados.data_evento.strftime('%d/%m/%Y')}
 
 Aniversariantes da semana:
-{chr(10).join(f"• {nome}" for nome in aniversariantes)}
+{chr(10).join(f"• {nome}" for nome in evento["aniversariantes"])}
 
 Considere preparar algo especial! 🎉
-                        """.strip()
-                        
-                        await whatsapp_service._send_whatsapp_message(
-                            admin.telefone, message
-                        )
-    
-    async def check_vendas_baixas(self, db: Session):
-        """Verificar eventos com vendas baixas"""
+            """.strip()
+
+            alertas.append(Alerta(
+                chave=f"evento:{evento_id}",
+                mensagem=message,
+                telefones=admins.get(dados.empresa_id, []),
+                nivel=len(evento["aniversariantes"])
+            ))
+
+        return alertas
+
+    def check_vendas_baixas(self, db: Session) -> List[Alerta]:
+        """Verificar eventos com vendas baixas na última semana antes do evento"""
         hoje = date.today()
-        proximos_30_dias = hoje + timedelta(days=30)
-        
-        eventos_proximos = db.query(Evento).filter(
-            func.date(Evento.data_evento).between(hoje, proximos_30_dias)
-        ).all()
-        
-        for evento in eventos_proximos:
-            total_vendas = db.query(func.count(Transacao.id)).filter(
-                Transacao.evento_id == evento.id,
-                Transacao.status == "aprovada"
-            ).scalar() or 0
-            
-            dias_restantes = (evento.data_evento.date() - hoje).days
-            
-            if dias_restantes <= 7 and total_vendas < 10:
-                promoters = db.query(Usuario).join(
-                    Lista, Lista.promoter_id == Usuario.id
-                ).filter(Lista.evento_id == evento.id).distinct().all()
-                
-                for promoter in promoters:
-                    if promoter.telefone:
-                        message = f"""
+        proximos_7_dias = hoje + timedelta(days=7)
+        vendas_sq = self._vendas_por_evento(db)
+        total_vendas = func.coalesce(vendas_sq.c.total_vendas, 0)
+
+        eventos_promoters = db.query(
+            Evento.id,
+            Evento.nome,
+            Evento.data_evento,
+            total_vendas.label('total_vendas'),
+            Usuario.telefone
+        ).join(
+            Lista, Lista.evento_id == Evento.id
+        ).join(
+            Usuario, Lista.promoter_id == Usuario.id
+        ).outerjoin(
+            vendas_sq, vendas_sq.c.evento_id == Evento.id
+        ).filter(
+            func.date(Evento.data_evento).between(hoje, proximos_7_dias),
+            total_vendas < 10,
+            Usuario.telefone.isnot(None)
+        ).distinct().all()
+
+        eventos: Dict[int, Dict[str, Any]] = {}
+        for row in eventos_promoters:
+            evento = eventos.setdefault(row.id, {"dados": row, "telefones": []})
+            evento["telefones"].append(row.telefone)
+
+        alertas = []
+        for evento_id, evento in eventos.items():
+            dados = evento["dados"]
+            dias_restantes = (dados.data_evento.date() - hoje).days
+            message = f"""
 📉 *ALERTA - VENDAS BAIXAS*
 
-Evento: {evento.nome}
-Data: {evento.data_evento.strftime('%d/%m/%Y')}
-Vendas atuais: {total_vendas}
+Evento: {dados.nome}
+Data: {dados.data_evento.strftime('%d/%m/%Y')}
+Vendas atuais: {dados.total_vendas}
 Dias restantes: {dias_restantes}
 
 Ação sugerida: Intensificar divulgação
-                        """.strip()
-                        
-                        await whatsapp_service._send_whatsapp_message(
-                            promoter.telefone, message
-                        )
-    
-    async def check_evento_proximo(self, db: Session):
+            """.strip()
+
+            alertas.append(Alerta(
+                chave=f"evento:{evento_id}",
+                mensagem=message,
+                telefones=evento["telefones"]
+            ))
+
+        return alertas
+
+    def check_evento_proximo(self, db: Session) -> List[Alerta]:
         """Verificar eventos nas próximas 24h"""
         amanha = date.today() + timedelta(days=1)
-        
-        eventos_amanha = db.query(Evento).filter(
+        vendas_sq = self._vendas_por_evento(db)
+
+        eventos_amanha = db.query(
+            Evento.id,
+            Evento.nome,
+            Evento.data_evento,
+            Evento.local,
+            Evento.empresa_id,
+            func.coalesce(vendas_sq.c.total_vendas, 0).label('total_vendas')
+        ).outerjoin(
+            vendas_sq, vendas_sq.c.evento_id == Evento.id
+        ).filter(
             func.date(Evento.data_evento) == amanha
         ).all()
-        
+
+        admins = self._admins_por_empresa(db, [e.empresa_id for e in eventos_amanha])
+
+        alertas = []
         for evento in eventos_amanha:
-            total_vendas = db.query(func.count(Transacao.id)).filter(
-                Transacao.evento_id == evento.id,
-                Transacao.status == "aprovada"
-            ).scalar() or 0
-            
-            admin_users = db.query(Usuario).filter(
-                Usuario.empresa_id == evento.empresa_id,
-                Usuario.tipo == "admin"
-            ).all()
-            
-            for admin in admin_users:
-                if admin.telefone:
-                    message = f"""
+            message = f"""
 ⏰ *EVENTO AMANHÃ*
 
 {evento.nome}
 📅 {evento.data_evento.strftime('%d/%m/%Y às %H:%M')}
 📍 {evento.local}
-🎫 {total_vendas} vendas confirmadas
+🎫 {evento.total_vendas} vendas confirmadas
 
 Lembrete: Preparar equipe e materiais
-                    """.strip()
-                    
-                    await whatsapp_service._send_whatsapp_message(
-                        admin.telefone, message
-                    )
-    
+            """.strip()
+
+            alertas.append(Alerta(
+                chave=f"evento:{evento.id}",
+                mensagem=message,
+                telefones=admins.get(evento.empresa_id, [])
+            ))
+
+        return alertas
+
     def _is_birthday_week(self, cpf: str) -> bool:
         """Mock para verificação de aniversário (requer API de CPF real)"""
         return cpf.endswith(('01', '15', '30'))
-    
-    async def check_conquistas_pendentes(self, db: Session):
-        """Verificar promoters que podem ter novas conquistas"""
-        from ..models import Conquista, PromoterConquista, TipoConquista
-        
-        promoters_ativos = db.query(Usuario).filter(
-            Usuario.tipo == "promoter",
-            Usuario.ativo == True
-        ).all()
-        
-        for promoter in promoters_ativos:
-            total_vendas = db.query(func.count(Transacao.id)).join(Lista).filter(
-                Lista.promoter_id == promoter.id,
-                Transacao.status == "aprovada"
-            ).scalar() or 0
-            
-            conquistas_vendas = db.query(Conquista).filter(
+
+    def check_conquistas_pendentes(self, db: Session) -> List[Alerta]:
+        """Verificar promoters que podem ter novas conquistas de vendas"""
+        vendas_sq = db.query(
+            Lista.promoter_id.label('promoter_id'),
+            func.count(Transacao.id).label('total_vendas')
+        ).join(
+            Transacao, Transacao.lista_id == Lista.id
+        ).filter(
+            Transacao.status == StatusTransacao.APROVADA
+        ).group_by(Lista.promoter_id).subquery()
+
+        pendentes = db.query(
+            Usuario.id.label('promoter_id'),
+            Usuario.nome,
+            Usuario.telefone,
+            Conquista.id.label('conquista_id'),
+            Conquista.nome.label('conquista_nome'),
+            Conquista.icone
+        ).join(
+            vendas_sq, vendas_sq.c.promoter_id == Usuario.id
+        ).join(
+            Conquista, and_(
                 Conquista.tipo == TipoConquista.VENDAS,
-                Conquista.criterio_valor <= total_vendas,
-                Conquista.ativa == True
-            ).all()
-            
-            for conquista in conquistas_vendas:
-                ja_possui = db.query(PromoterConquista).filter(
-                    PromoterConquista.promoter_id == promoter.id,
-                    PromoterConquista.conquista_id == conquista.id
-                ).first()
-                
-                if not ja_possui and promoter.telefone:
-                    message = f"""
+                Conquista.ativa == True,
+                Conquista.criterio_valor <= vendas_sq.c.total_vendas
+            )
+        ).outerjoin(
+            PromoterConquista, and_(
+                PromoterConquista.promoter_id == Usuario.id,
+                PromoterConquista.conquista_id == Conquista.id
+            )
+        ).filter(
+            Usuario.tipo == TipoUsuario.PROMOTER,
+            Usuario.ativo == True,
+            Usuario.telefone.isnot(None),
+            PromoterConquista.id.is_(None)
+        ).all()
+
+        alertas = []
+        for pendente in pendentes:
+            message = f"""
 🎉 *NOVA CONQUISTA DISPONÍVEL!*
 
-{promoter.nome}, você pode ter desbloqueado:
-{conquista.icone} {conquista.nome}
+{pendente.nome}, você pode ter desbloqueado:
+{pendente.icone} {pendente.conquista_nome}
 
 Acesse o sistema para verificar! 🚀
-                    """.strip()
-                    
-                    await whatsapp_service._send_whatsapp_message(
-                        promoter.telefone, message
-                    )
+            """.strip()
+
+            alertas.append(Alerta(
+                chave=f"promoter:{pendente.promoter_id}:conquista:{pendente.conquista_id}",
+                mensagem=message,
+                telefones=[pendente.telefone]
+            ))
+
+        return alertas
 
 alert_service = AlertService()
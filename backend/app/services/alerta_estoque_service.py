@@ -0,0 +1,150 @@
+import math
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+from ..database import SessionLocal, settings
+from ..models import MovimentoEstoque, Produto
+import logging
+
+logger = logging.getLogger(__name__)
+
+NIVEL_OK = 0
+NIVEL_RUPTURA_PREVISTA = 1
+NIVEL_ESTOQUE_MINIMO = 2
+NIVEL_SEM_ESTOQUE = 3
+
+TIPOS_ALERTA = {
+    NIVEL_RUPTURA_PREVISTA: "ruptura_prevista",
+    NIVEL_ESTOQUE_MINIMO: "estoque_minimo",
+    NIVEL_SEM_ESTOQUE: "sem_estoque"
+}
+
+@dataclass
+class BaixaEstoque:
+    produto_id: int
+    produto_nome: str
+    estoque_atual: int
+    estoque_minimo: int
+    quantidade: int
+
+@dataclass
+class MonitorProduto:
+    taxa: float = 0.0  # unidades por minuto, média com decaimento exponencial
+    ultima_baixa: Optional[datetime] = None
+    nivel_alertado: int = NIVEL_OK
+
+class AlertaEstoqueService:
+    """
+    Vigia de estoque do PDV: a cada baixa atualiza em O(1) e sem consultas a taxa de venda do
+    produto e a previsão de ruptura, e devolve um alerta quando o produto sobe de nível
+    (ruptura prevista em até `minutos_ruptura`, abaixo do estoque mínimo, sem estoque).
+    """
+
+    def __init__(self, minutos_ruptura: float = 30, constante_tempo_minutos: float = 15,
+                 session_factory=SessionLocal):
+        self.minutos_ruptura = minutos_ruptura
+        self.constante_tempo = constante_tempo_minutos
+        self.session_factory = session_factory
+        self._monitores: Dict[int, MonitorProduto] = {}
+        self._eventos_carregados: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def carregado(self, evento_id: int) -> bool:
+        return evento_id in self._eventos_carregados
+
+    def carregar_taxas(self, evento_id: int):
+        """Semear as taxas de venda com as saídas recentes de MovimentoEstoque (uma vez por evento)"""
+        db = self.session_factory()
+        try:
+            desde = datetime.now() - timedelta(minutes=self.constante_tempo * 3)
+            saidas = db.query(
+                MovimentoEstoque.produto_id, MovimentoEstoque.quantidade, MovimentoEstoque.criado_em
+            ).join(Produto, Produto.id == MovimentoEstoque.produto_id).filter(
+                Produto.evento_id == evento_id,
+                MovimentoEstoque.tipo_movimento == "saida",
+                MovimentoEstoque.criado_em >= desde
+            ).order_by(MovimentoEstoque.criado_em).all()
+        except Exception as e:
+            # Sem histórico as taxas partem das próximas vendas
+            logger.error(f"Erro ao carregar taxas de venda do evento {evento_id}: {e}")
+            self._eventos_carregados.add(evento_id)
+            return
+        finally:
+            db.close()
+
+        with self._lock:
+            if evento_id in self._eventos_carregados:
+                return
+            for produto_id, quantidade, criado_em in saidas:
+                if criado_em is not None and criado_em.tzinfo is not None:
+                    criado_em = criado_em.astimezone().replace(tzinfo=None)
+                self._atualizar_taxa(self._monitores.setdefault(produto_id, MonitorProduto()), quantidade, criado_em)
+            self._eventos_carregados.add(evento_id)
+        logger.info(f"Taxas de venda do evento {evento_id} carregadas de {len(saidas)} saídas de estoque")
+
+    def registrar_baixas(self, baixas: Iterable[BaixaEstoque], momento: Optional[datetime] = None) -> List[dict]:
+        """Atualizar os produtos vendidos e devolver os alertas a enviar"""
+        momento = momento or datetime.now()
+        alertas = []
+        with self._lock:
+            for baixa in baixas:
+                monitor = self._monitores.setdefault(baixa.produto_id, MonitorProduto())
+                self._atualizar_taxa(monitor, baixa.quantidade, momento)
+                alerta = self._avaliar(monitor, baixa)
+                if alerta:
+                    alertas.append(alerta)
+        return alertas
+
+    def previsao_ruptura(self, produto_id: int, estoque_atual: int) -> Optional[float]:
+        """Minutos até zerar o estoque no ritmo atual (None sem vendas recentes)"""
+        monitor = self._monitores.get(produto_id)
+        if not monitor or monitor.taxa <= 0:
+            return None
+        return estoque_atual / monitor.taxa
+
+    def _atualizar_taxa(self, monitor: MonitorProduto, quantidade: int, momento: datetime):
+        if monitor.ultima_baixa is not None:
+            decorrido = max(0.0, (momento - monitor.ultima_baixa).total_seconds() / 60)
+            monitor.taxa *= math.exp(-decorrido / self.constante_tempo)
+        monitor.taxa += quantidade / self.constante_tempo
+        monitor.ultima_baixa = momento if monitor.ultima_baixa is None else max(monitor.ultima_baixa, momento)
+
+    def _avaliar(self, monitor: MonitorProduto, baixa: BaixaEstoque) -> Optional[dict]:
+        previsao = baixa.estoque_atual / monitor.taxa if monitor.taxa > 0 else None
+
+        if baixa.estoque_atual <= 0:
+            nivel = NIVEL_SEM_ESTOQUE
+        elif baixa.estoque_atual <= baixa.estoque_minimo:
+            nivel = NIVEL_ESTOQUE_MINIMO
+        elif previsao is not None and previsao <= self.minutos_ruptura:
+            nivel = NIVEL_RUPTURA_PREVISTA
+        elif (monitor.nivel_alertado == NIVEL_RUPTURA_PREVISTA and previsao is not None
+              and previsao <= self.minutos_ruptura * 2):
+            # Histerese: a previsão oscila com o ritmo de vendas
+            nivel = NIVEL_RUPTURA_PREVISTA
+        else:
+            nivel = NIVEL_OK
+
+        if nivel <= monitor.nivel_alertado:
+            # Reposição baixa o nível e permite alertar de novo na próxima queda
+            monitor.nivel_alertado = nivel
+            return None
+
+        monitor.nivel_alertado = nivel
+        return {
+            "tipo": TIPOS_ALERTA[nivel],
+            "produto_id": baixa.produto_id,
+            "produto_nome": baixa.produto_nome,
+            "estoque_atual": baixa.estoque_atual,
+            "estoque_minimo": baixa.estoque_minimo,
+            "vendas_por_minuto": round(monitor.taxa, 2),
+            "minutos_para_ruptura": round(previsao, 1) if previsao is not None else None
+        }
+
+    def invalidar(self):
+        with self._lock:
+            self._monitores.clear()
+            self._eventos_carregados.clear()
+
+alerta_estoque_service = AlertaEstoqueService(minutos_ruptura=settings.alerta_ruptura_minutos)
@@ -0,0 +1,175 @@
+import bisect
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from ..models import ItemVendaPDV, VendaPDV
+from .catalogo_service import catalogo_service, ProdutoCatalogo
+import logging
+
+logger = logging.getLogger(__name__)
+
+def normalizar(texto: str) -> str:
+    """Minúsculas e sem acentos"""
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower().strip()
+
+def trigramas(texto: str) -> Set[str]:
+    """Trigramas por palavra, com o mesmo preenchimento do pg_trgm ("  pal ")"""
+    resultado = set()
+    for palavra in texto.split():
+        palavra = f"  {palavra} "
+        resultado.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return resultado
+
+def assinatura(produtos: Dict[int, ProdutoCatalogo]) -> int:
+    """Muda só quando nomes ou códigos mudam (baixas de estoque não exigem reindexar)"""
+    return hash(tuple(
+        (produto.id, produto.nome, produto.codigo_barras, produto.codigo_interno) for produto in produtos.values()
+    ))
+
+class IndiceProdutos:
+    """Índice de um catálogo: códigos exatos em dicionário, palavras ordenadas para prefixo e trigramas dos nomes"""
+
+    def __init__(self, produtos: Dict[int, ProdutoCatalogo]):
+        self.produtos = produtos
+        self.assinatura = assinatura(produtos)
+        self.codigos: Dict[str, int] = {}
+        palavras = []
+        self.trigramas: Dict[str, Set[int]] = defaultdict(set)
+
+        for produto in produtos.values():
+            for codigo in (produto.codigo_barras, produto.codigo_interno):
+                if codigo:
+                    self.codigos[codigo.strip().lower()] = produto.id
+
+            nome = normalizar(produto.nome)
+            palavras.extend((palavra, produto.id) for palavra in set(nome.split()))
+            for grama in trigramas(nome):
+                self.trigramas[grama].add(produto.id)
+
+        palavras.sort()
+        self.palavras = [palavra for palavra, _ in palavras]
+        self.ids_palavras = [produto_id for _, produto_id in palavras]
+
+    def por_codigo(self, termo: str) -> Optional[int]:
+        return self.codigos.get(termo.strip().lower())
+
+    def por_prefixo(self, prefixo: str) -> Set[int]:
+        """Produtos com alguma palavra do nome começando por `prefixo` (busca binária)"""
+        inicio = bisect.bisect_left(self.palavras, prefixo)
+        fim = bisect.bisect_left(self.palavras, prefixo + "\uffff")
+        return set(self.ids_palavras[inicio:fim])
+
+    def por_similaridade(self, termo: str, limiar: float) -> Dict[int, float]:
+        """
+        Fração dos trigramas do termo presentes no nome (próxima do word_similarity do pg_trgm):
+        o termo digitado costuma ser só uma parte do nome, então não se divide pela união.
+        """
+        gramas = trigramas(termo)
+        if not gramas:
+            return {}
+
+        comuns = defaultdict(int)
+        for grama in gramas:
+            for produto_id in self.trigramas.get(grama, ()):
+                comuns[produto_id] += 1
+
+        return {
+            produto_id: total / len(gramas)
+            for produto_id, total in comuns.items()
+            if total / len(gramas) >= limiar
+        }
+
+class BuscaProdutoService:
+    """Busca de produtos do PDV sobre o catálogo em memória, reconstruída quando a versão do catálogo muda"""
+
+    def __init__(self, limiar_similaridade: float = 0.5, ttl_popularidade: float = 300):
+        self.limiar_similaridade = limiar_similaridade
+        self.ttl_popularidade = ttl_popularidade
+        self._indices: Dict[int, Tuple[int, IndiceProdutos]] = {}
+        self._popularidade: Dict[int, Tuple[float, Dict[int, int]]] = {}
+        self._lock = threading.Lock()
+
+    def obter_indice(self, db: Session, evento_id: int) -> IndiceProdutos:
+        snapshot = catalogo_service.obter_snapshot(db, evento_id)
+        with self._lock:
+            atual = self._indices.get(evento_id)
+        if atual and atual[0] == snapshot.versao and atual[1].produtos is snapshot.produtos:
+            return atual[1]
+
+        if atual and atual[1].assinatura == assinatura(snapshot.produtos):
+            indice = atual[1]
+            indice.produtos = snapshot.produtos
+        else:
+            indice = IndiceProdutos(snapshot.produtos)
+        with self._lock:
+            self._indices[evento_id] = (snapshot.versao, indice)
+        return indice
+
+    def buscar(self, db: Session, evento_id: int, termo: str, limite: int = 20,
+               somente_vendaveis: bool = False) -> List[ProdutoCatalogo]:
+        """
+        Código de barras ou interno exato primeiro; depois nomes por prefixo de palavra e
+        por trigramas, ordenados por prefixo, similaridade e quantidade vendida no evento.
+        """
+        indice = self.obter_indice(db, evento_id)
+        termo = (termo or "").strip()
+        if not termo:
+            return []
+
+        produto_id = indice.por_codigo(termo)
+        if produto_id is not None:
+            produto = indice.produtos[produto_id]
+            return [produto] if produto.vendavel or not somente_vendaveis else []
+
+        normalizado = normalizar(termo)
+        palavras = normalizado.split()
+        prefixados = indice.por_prefixo(palavras[-1]) if palavras else set()
+        for palavra in palavras[:-1]:
+            prefixados &= indice.por_prefixo(palavra)
+
+        similares = indice.por_similaridade(normalizado, self.limiar_similaridade) if len(normalizado) >= 3 else {}
+        popularidade = self.obter_popularidade(db, evento_id)
+
+        candidatos = [
+            indice.produtos[produto_id] for produto_id in prefixados | similares.keys()
+            if indice.produtos[produto_id].vendavel or not somente_vendaveis
+        ]
+        candidatos.sort(key=lambda produto: (
+            produto.id not in prefixados,
+            -similares.get(produto.id, 0),
+            -popularidade.get(produto.id, 0),
+            produto.nome
+        ))
+        return candidatos[:limite]
+
+    def obter_popularidade(self, db: Session, evento_id: int) -> Dict[int, int]:
+        """Quantidade vendida por produto no evento, recalculada a cada `ttl_popularidade` segundos"""
+        with self._lock:
+            carregada = self._popularidade.get(evento_id)
+        if carregada and time.monotonic() - carregada[0] <= self.ttl_popularidade:
+            return carregada[1]
+
+        vendidos = dict(
+            db.query(ItemVendaPDV.produto_id, func.sum(ItemVendaPDV.quantidade)).join(
+                VendaPDV, VendaPDV.id == ItemVendaPDV.venda_id
+            ).filter(VendaPDV.evento_id == evento_id).group_by(ItemVendaPDV.produto_id).all()
+        )
+        with self._lock:
+            self._popularidade[evento_id] = (time.monotonic(), vendidos)
+        return vendidos
+
+    def invalidar(self, evento_id: Optional[int] = None):
+        with self._lock:
+            if evento_id is None:
+                self._indices.clear()
+                self._popularidade.clear()
+            else:
+                self._indices.pop(evento_id, None)
+                self._popularidade.pop(evento_id, None)
+
+busca_produto_service = BuscaProdutoService()
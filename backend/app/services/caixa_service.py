@@ -0,0 +1,135 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import update, insert, func
+from sqlalchemy.exc import IntegrityError
+from ..models import CaixaPDV, TotalCaixaPDV, VendaPDV, PagamentoPDV, StatusVendaPDV, TipoPagamentoPDV
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CaixaService:
+    """Totais correntes do caixa (vendas e por forma de pagamento), somados na transação de cada venda"""
+
+    def iniciar_totais(self, db: Session, caixa_id: int):
+        """Uma linha zerada por forma de pagamento, para que as vendas só façam UPDATE"""
+        db.execute(insert(TotalCaixaPDV), [
+            {"caixa_id": caixa_id, "tipo_pagamento": tipo, "quantidade": 0, "valor": Decimal('0.00')}
+            for tipo in TipoPagamentoPDV
+        ])
+
+    def registrar_venda(self, db: Session, evento_id: int, usuario_id: int, valor_final: Decimal,
+                        pagamentos: Iterable[Tuple[TipoPagamentoPDV, Decimal]]) -> Optional[int]:
+        """Somar uma venda ao caixa aberto do operador; retorna o id do caixa (None sem caixa aberto)"""
+        por_tipo = defaultdict(lambda: [0, Decimal('0.00')])
+        for tipo, valor in pagamentos:
+            por_tipo[tipo][0] += 1
+            por_tipo[tipo][1] += valor
+        return self.registrar_vendas(db, evento_id, usuario_id, 1, valor_final, por_tipo)
+
+    def registrar_vendas(self, db: Session, evento_id: int, usuario_id: int, quantidade: int, valor: Decimal,
+                         por_tipo: Dict[TipoPagamentoPDV, List]) -> Optional[int]:
+        """
+        Somar `quantidade` vendas ao caixa aberto do operador com incrementos atômicos.
+        `por_tipo` mapeia forma de pagamento -> (quantidade, valor). O commit fica a cargo do chamador.
+        """
+        caixa_id = db.execute(
+            update(CaixaPDV).where(
+                CaixaPDV.evento_id == evento_id,
+                CaixaPDV.usuario_operador_id == usuario_id,
+                CaixaPDV.status == "aberto"
+            ).values(
+                valor_vendas=func.coalesce(CaixaPDV.valor_vendas, 0) + valor,
+                quantidade_vendas=func.coalesce(CaixaPDV.quantidade_vendas, 0) + quantidade
+            ).returning(CaixaPDV.id).execution_options(synchronize_session=False)
+        ).scalars().first()
+        if caixa_id is None:
+            return None
+
+        for tipo in sorted(por_tipo, key=lambda tipo: tipo.name):
+            quantidade_tipo, valor_tipo = por_tipo[tipo]
+            self._somar_pagamento(db, caixa_id, tipo, quantidade_tipo, valor_tipo)
+        return caixa_id
+
+    def totais(self, db: Session, caixa_id: int) -> Dict[str, dict]:
+        return {
+            total.tipo_pagamento.value: {"quantidade": total.quantidade, "valor": total.valor}
+            for total in db.query(TotalCaixaPDV).filter(
+                TotalCaixaPDV.caixa_id == caixa_id,
+                TotalCaixaPDV.quantidade > 0
+            ).order_by(TotalCaixaPDV.tipo_pagamento)
+        }
+
+    def apurar(self, db: Session, caixa_id: int) -> dict:
+        """Totais recalculados a partir das vendas do caixa (auditoria)"""
+        quantidade, valor = db.query(
+            func.count(VendaPDV.id), func.coalesce(func.sum(VendaPDV.valor_final), 0)
+        ).filter(
+            VendaPDV.caixa_id == caixa_id,
+            VendaPDV.status == StatusVendaPDV.APROVADA
+        ).one()
+
+        por_tipo = db.query(
+            PagamentoPDV.tipo_pagamento, func.count(PagamentoPDV.id), func.coalesce(func.sum(PagamentoPDV.valor), 0)
+        ).join(VendaPDV, VendaPDV.id == PagamentoPDV.venda_id).filter(
+            VendaPDV.caixa_id == caixa_id,
+            VendaPDV.status == StatusVendaPDV.APROVADA
+        ).group_by(PagamentoPDV.tipo_pagamento).all()
+
+        return {
+            "quantidade_vendas": quantidade,
+            "valor_vendas": Decimal(str(valor)),
+            "totais_por_pagamento": {
+                tipo.value: {"quantidade": total_quantidade, "valor": Decimal(str(total_valor))}
+                for tipo, total_quantidade, total_valor in por_tipo
+            }
+        }
+
+    def reconciliar(self, db: Session, caixa_id: int, corrigir: bool = False) -> dict:
+        """Comparar os totais correntes com os apurados; com `corrigir`, regravar os apurados (sem commit)"""
+        caixa = db.query(CaixaPDV).filter(CaixaPDV.id == caixa_id).first()
+        if not caixa:
+            raise ValueError(f"Caixa {caixa_id} não encontrado")
+
+        registrado = {
+            "quantidade_vendas": caixa.quantidade_vendas or 0,
+            "valor_vendas": Decimal(str(caixa.valor_vendas or 0)),
+            "totais_por_pagamento": self.totais(db, caixa_id)
+        }
+        apurado = self.apurar(db, caixa_id)
+        consistente = registrado == apurado
+
+        if corrigir and not consistente:
+            caixa.quantidade_vendas = apurado["quantidade_vendas"]
+            caixa.valor_vendas = apurado["valor_vendas"]
+            db.query(TotalCaixaPDV).filter(TotalCaixaPDV.caixa_id == caixa_id).update(
+                {"quantidade": 0, "valor": Decimal('0.00')}, synchronize_session=False
+            )
+            for tipo, total in apurado["totais_por_pagamento"].items():
+                self._somar_pagamento(db, caixa_id, TipoPagamentoPDV(tipo), total["quantidade"], total["valor"])
+            logger.warning(f"Totais do caixa {caixa_id} corrigidos: {registrado} -> {apurado}")
+
+        return {"caixa_id": caixa_id, "consistente": consistente, "registrado": registrado, "apurado": apurado}
+
+    def _somar_pagamento(self, db: Session, caixa_id: int, tipo: TipoPagamentoPDV, quantidade: int, valor: Decimal):
+        somados = db.execute(
+            update(TotalCaixaPDV).where(
+                TotalCaixaPDV.caixa_id == caixa_id,
+                TotalCaixaPDV.tipo_pagamento == tipo
+            ).values(
+                quantidade=TotalCaixaPDV.quantidade + quantidade,
+                valor=TotalCaixaPDV.valor + valor
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        if somados:
+            return
+
+        # Caixa aberto antes dos totais por forma de pagamento existirem
+        try:
+            with db.begin_nested():
+                db.execute(insert(TotalCaixaPDV).values(caixa_id=caixa_id, tipo_pagamento=tipo, quantidade=quantidade, valor=valor))
+        except IntegrityError:
+            self._somar_pagamento(db, caixa_id, tipo, quantidade, valor)
+
+caixa_service = CaixaService()
@@ -0,0 +1,224 @@
+import json
+import threading
+import time
+from dataclasses import dataclass, asdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import update, insert, or_
+from sqlalchemy.exc import IntegrityError
+from ..database import SessionLocal
+from ..models import Produto, StatusProduto, CatalogoVersao
+import logging
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ProdutoCatalogo:
+    id: int
+    nome: str
+    preco: Decimal
+    tipo: str
+    categoria: Optional[str]
+    controla_estoque: bool
+    estoque_atual: int
+    estoque_minimo: int
+    status: str
+    codigo_barras: Optional[str]
+    codigo_interno: Optional[str]
+    imagem_url: Optional[str]
+    versao: int
+
+    @property
+    def vendavel(self) -> bool:
+        return self.status == StatusProduto.ATIVO.value
+
+    def como_dict(self) -> dict:
+        return {**asdict(self), "preco": str(self.preco)}
+
+@dataclass
+class SnapshotCatalogo:
+    versao: int
+    produtos: Dict[int, ProdutoCatalogo]
+    serializado: bytes
+    verificado_em: float
+
+class CatalogoService:
+    """
+    Catálogo de produtos por evento: snapshot versionado e pré-serializado em memória.
+    Cada alteração de produto recebe a próxima versão do evento (catalogo_versoes), o que
+    permite aos terminais baixar só o que mudou desde a versão que já têm. A leitura não grava:
+    baixas de estoque são versionadas pelo scheduler (run_publicar_estoque).
+    """
+
+    def __init__(self, intervalo_verificacao: float = 2.0):
+        self.intervalo_verificacao = intervalo_verificacao
+        self._snapshots: Dict[int, SnapshotCatalogo] = {}
+        self._lock = threading.Lock()
+
+    def obter(self, db: Session, evento_id: int) -> Dict[int, ProdutoCatalogo]:
+        """Produtos do evento por id"""
+        return self.obter_snapshot(db, evento_id).produtos
+
+    def obter_snapshot(self, db: Session, evento_id: int) -> SnapshotCatalogo:
+        """
+        Snapshot atual do evento. A versão no banco é conferida no máximo a cada
+        `intervalo_verificacao` segundos; o catálogo só é relido quando ela muda.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(evento_id)
+        agora = time.monotonic()
+        if snapshot and agora - snapshot.verificado_em <= self.intervalo_verificacao:
+            return snapshot
+
+        versao = self.versao_atual(db, evento_id)
+        if snapshot and snapshot.versao == versao:
+            snapshot.verificado_em = agora
+            return snapshot
+        return self.carregar(db, evento_id)
+
+    def carregar(self, db: Session, evento_id: int) -> SnapshotCatalogo:
+        versao = self.versao_atual(db, evento_id)
+        produtos = {
+            produto.id: ProdutoCatalogo(
+                id=produto.id,
+                nome=produto.nome,
+                preco=produto.preco,
+                tipo=produto.tipo.value,
+                categoria=produto.categoria,
+                controla_estoque=bool(produto.controla_estoque),
+                estoque_atual=produto.estoque_atual or 0,
+                estoque_minimo=produto.estoque_minimo or 0,
+                status=produto.status.value if produto.status else StatusProduto.ATIVO.value,
+                codigo_barras=produto.codigo_barras,
+                codigo_interno=produto.codigo_interno,
+                imagem_url=produto.imagem_url,
+                versao=produto.versao or 0
+            ) for produto in db.query(
+                Produto.id, Produto.nome, Produto.preco, Produto.tipo, Produto.categoria,
+                Produto.controla_estoque, Produto.estoque_atual, Produto.estoque_minimo, Produto.status,
+                Produto.codigo_barras, Produto.codigo_interno, Produto.imagem_url, Produto.versao
+            ).filter(Produto.evento_id == evento_id).order_by(Produto.id)
+        }
+
+        snapshot = SnapshotCatalogo(
+            versao=versao,
+            produtos=produtos,
+            serializado=self.serializar(evento_id, versao, produtos.values(), completo=True),
+            verificado_em=time.monotonic()
+        )
+        with self._lock:
+            self._snapshots[evento_id] = snapshot
+
+        logger.info(f"Catálogo do evento {evento_id} carregado: {len(produtos)} produtos (versão {versao})")
+        return snapshot
+
+    def delta(self, db: Session, evento_id: int, desde_versao: Optional[int] = None) -> bytes:
+        """
+        JSON com os produtos alterados depois de `desde_versao`. Sem versão, ou com uma
+        versão que o servidor não conhece, devolve o snapshot completo já serializado.
+        """
+        snapshot = self.obter_snapshot(db, evento_id)
+        if desde_versao is None or desde_versao > snapshot.versao:
+            return snapshot.serializado
+
+        alterados = [produto for produto in snapshot.produtos.values() if produto.versao > desde_versao]
+        return self.serializar(evento_id, snapshot.versao, alterados, completo=False)
+
+    def versao_atual(self, db: Session, evento_id: int) -> int:
+        return db.query(CatalogoVersao.versao).filter(CatalogoVersao.evento_id == evento_id).scalar() or 0
+
+    def registrar_alteracao(self, db: Session, evento_id: int, produto_ids: Iterable[int]) -> int:
+        """
+        Atribuir a próxima versão do evento aos produtos alterados; o commit fica a cargo do chamador.
+        A linha do contador fica bloqueada até o commit, então as versões são publicadas em ordem.
+        """
+        produto_ids = list(produto_ids)
+        versao = self._proxima_versao(db, evento_id)
+        if produto_ids:
+            db.execute(
+                update(Produto).where(Produto.id.in_(produto_ids)).values(
+                    versao=versao,
+                    estoque_versionado=Produto.estoque_atual
+                ).execution_options(synchronize_session=False)
+            )
+        self.invalidar(evento_id)
+        return versao
+
+    def publicar_estoque(self, db: Session, evento_id: int) -> Optional[int]:
+        """
+        Versionar produtos cujo estoque mudou desde a última versão publicada.
+        As vendas só baixam o estoque; a versão é atribuída aqui, periodicamente, para
+        não serializar todas as vendas do evento na linha do contador. Faz commit.
+        """
+        alterados = [
+            produto_id for (produto_id,) in db.query(Produto.id).filter(
+                Produto.evento_id == evento_id,
+                Produto.controla_estoque == True,
+                or_(
+                    Produto.estoque_versionado.is_(None),
+                    Produto.estoque_versionado != Produto.estoque_atual
+                )
+            )
+        ]
+        if not alterados:
+            return None
+
+        try:
+            versao = self.registrar_alteracao(db, evento_id, alterados)
+            db.commit()
+            return versao
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao publicar estoque do catálogo do evento {evento_id}: {e}")
+            return None
+
+    def run_publicar_estoque(self, session_factory=SessionLocal) -> int:
+        """Publicar o estoque dos eventos com baixas pendentes, numa sessão própria (executado pelo scheduler)"""
+        db = session_factory()
+        try:
+            evento_ids = [evento_id for (evento_id,) in db.query(Produto.evento_id).filter(
+                Produto.controla_estoque == True,
+                or_(
+                    Produto.estoque_versionado.is_(None),
+                    Produto.estoque_versionado != Produto.estoque_atual
+                )
+            ).distinct().all()]
+            return sum(1 for evento_id in evento_ids if self.publicar_estoque(db, evento_id) is not None)
+        finally:
+            db.close()
+
+    def serializar(self, evento_id: int, versao: int, produtos: Iterable[ProdutoCatalogo], completo: bool) -> bytes:
+        corpo = {
+            "evento_id": evento_id,
+            "versao": versao,
+            "completo": completo,
+            "produtos": [produto.como_dict() for produto in produtos]
+        }
+        return json.dumps(corpo, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def invalidar(self, evento_id: Optional[int] = None):
+        with self._lock:
+            if evento_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(evento_id, None)
+
+    def _proxima_versao(self, db: Session, evento_id: int) -> int:
+        versao = db.execute(
+            update(CatalogoVersao).where(CatalogoVersao.evento_id == evento_id).values(
+                versao=CatalogoVersao.versao + 1
+            ).returning(CatalogoVersao.versao).execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+        if versao is not None:
+            return versao
+
+        try:
+            with db.begin_nested():
+                db.execute(insert(CatalogoVersao).values(evento_id=evento_id, versao=1))
+            return 1
+        except IntegrityError:
+            # Outra transação criou o contador do evento ao mesmo tempo
+            return self._proxima_versao(db, evento_id)
+
+catalogo_service = CatalogoService()
@@ -0,0 +1,201 @@
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import update, insert, bindparam, func, or_
+from ..models import Comanda, LancamentoComanda, StatusComanda
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SaldoComandaInvalido(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+@dataclass(frozen=True)
+class ComandaIndexada:
+    id: int
+    evento_id: int
+    empresa_id: int
+
+class ComandaService:
+    """Saldo de comandas: livro de lançamentos só de inserção e saldo em cache atualizado por SQL atômico"""
+
+    def __init__(self, limite_indice: int = 200000):
+        self.limite_indice = limite_indice
+        self._indice: Dict[str, ComandaIndexada] = {}
+        self._eventos_indexados: set = set()
+        self._lock = threading.Lock()
+
+    def resolver_codigo(self, db: Session, codigo: str) -> Optional[ComandaIndexada]:
+        """Resolver QR code ou RFID pelo índice em memória; códigos são únicos, então só faltas consultam o banco"""
+        comanda = self._indice.get(codigo)
+        if comanda:
+            return comanda
+
+        linha = db.query(Comanda.id, Comanda.evento_id, Comanda.empresa_id).filter(
+            or_(Comanda.qr_code == codigo, Comanda.codigo_rfid == codigo)
+        ).first()
+        if not linha:
+            return None
+
+        comanda = ComandaIndexada(id=linha.id, evento_id=linha.evento_id, empresa_id=linha.empresa_id)
+        with self._lock:
+            if len(self._indice) >= self.limite_indice:
+                self._indice.clear()
+                self._eventos_indexados.clear()
+            self._indice[codigo] = comanda
+        return comanda
+
+    def indexar_evento(self, db: Session, evento_id: int) -> int:
+        """Pré-carregar os códigos das comandas do evento na abertura do primeiro caixa; comandas criadas depois entram pela primeira falta"""
+        if evento_id in self._eventos_indexados:
+            return 0
+
+        linhas = db.query(
+            Comanda.id, Comanda.evento_id, Comanda.empresa_id, Comanda.qr_code, Comanda.codigo_rfid
+        ).filter(Comanda.evento_id == evento_id).all()
+
+        with self._lock:
+            if len(self._indice) + 2 * len(linhas) > self.limite_indice:
+                self._indice.clear()
+                self._eventos_indexados.clear()
+            for linha in linhas:
+                comanda = ComandaIndexada(id=linha.id, evento_id=linha.evento_id, empresa_id=linha.empresa_id)
+                for codigo in (linha.qr_code, linha.codigo_rfid):
+                    if codigo:
+                        self._indice[codigo] = comanda
+            self._eventos_indexados.add(evento_id)
+        return len(linhas)
+
+    def invalidar_indice(self):
+        """
+        Esvaziar o índice. Código, evento e empresa de uma comanda não mudam pela API (status e saldo não ficam
+        no índice), então só é preciso quando comandas são alteradas ou removidas direto no banco, e nos testes
+        """
+        with self._lock:
+            self._indice.clear()
+            self._eventos_indexados.clear()
+
+    def debitar(self, db: Session, comanda_id: int, valor: Decimal, evento_id: Optional[int] = None,
+                usuario_id: Optional[int] = None, venda_id: Optional[int] = None) -> LancamentoComanda:
+        """Debitar somente se a comanda está ativa e tem saldo; o commit fica a cargo do chamador"""
+        condicoes = [
+            Comanda.id == comanda_id,
+            Comanda.status == StatusComanda.ATIVA,
+            Comanda.saldo_atual >= valor
+        ]
+        if evento_id is not None:
+            condicoes.append(Comanda.evento_id == evento_id)
+
+        saldo = db.execute(
+            update(Comanda).where(*condicoes).values(
+                saldo_atual=Comanda.saldo_atual - valor
+            ).returning(Comanda.saldo_atual).execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+
+        if saldo is None:
+            raise self._motivo_recusa(db, comanda_id, evento_id)
+
+        return self._lancar(db, comanda_id, "debito", -valor, saldo, usuario_id=usuario_id, venda_id=venda_id)
+
+    def creditar(self, db: Session, comanda_id: int, valor: Decimal, tipo: str = "recarga",
+                 usuario_id: Optional[int] = None, recarga_id: Optional[int] = None,
+                 venda_id: Optional[int] = None) -> LancamentoComanda:
+        """Creditar saldo (recarga ou estorno) com incremento atômico"""
+        saldo = db.execute(
+            update(Comanda).where(
+                Comanda.id == comanda_id,
+                Comanda.status == StatusComanda.ATIVA
+            ).values(
+                saldo_atual=Comanda.saldo_atual + valor
+            ).returning(Comanda.saldo_atual).execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+
+        if saldo is None:
+            raise self._motivo_recusa(db, comanda_id)
+
+        return self._lancar(db, comanda_id, tipo, valor, saldo, usuario_id=usuario_id, recarga_id=recarga_id, venda_id=venda_id)
+
+    def debitar_lote(self, db: Session, debitos: List[Tuple[int, Decimal, Optional[int]]],
+                     usuario_id: Optional[int] = None) -> Dict[int, Decimal]:
+        """
+        Debitar vendas já realizadas (sincronização offline) sem checar saldo:
+        um UPDATE relativo por comanda e um INSERT com todos os lançamentos.
+        Retorna o saldo final por comanda (pode ser negativo).
+        """
+        totais = defaultdict(Decimal)
+        for comanda_id, valor, _ in debitos:
+            totais[comanda_id] += valor
+
+        if not totais:
+            return {}
+
+        tabela = Comanda.__table__
+        db.execute(
+            update(tabela).where(tabela.c.id == bindparam("b_id")).values(
+                saldo_atual=tabela.c.saldo_atual - bindparam("b_valor")
+            ),
+            [{"b_id": comanda_id, "b_valor": valor} for comanda_id, valor in totais.items()]
+        )
+
+        saldos = dict(db.query(Comanda.id, Comanda.saldo_atual).filter(Comanda.id.in_(totais)).all())
+
+        # Saldo após cada lançamento, reconstruído a partir do saldo inicial do lote
+        correntes = {comanda_id: saldos[comanda_id] + total for comanda_id, total in totais.items()}
+        lancamentos = []
+        for comanda_id, valor, venda_id in debitos:
+            correntes[comanda_id] -= valor
+            lancamentos.append({
+                "comanda_id": comanda_id,
+                "tipo": "debito",
+                "valor": -valor,
+                "saldo_apos": correntes[comanda_id],
+                "venda_id": venda_id,
+                "usuario_id": usuario_id
+            })
+        db.execute(insert(LancamentoComanda), lancamentos)
+
+        return saldos
+
+    def consultar_saldo(self, db: Session, codigo: str):
+        """Saldo pelo QR code ou código RFID da pulseira (colunas únicas, consulta indexada)"""
+        return db.query(
+            Comanda.id,
+            Comanda.numero_comanda,
+            Comanda.nome_cliente,
+            Comanda.saldo_atual,
+            Comanda.saldo_bloqueado,
+            Comanda.status,
+            Comanda.evento_id,
+            Comanda.empresa_id
+        ).filter(
+            or_(Comanda.qr_code == codigo, Comanda.codigo_rfid == codigo)
+        ).first()
+
+    def conferir_saldo(self, db: Session, comanda_id: int) -> Tuple[Decimal, Decimal]:
+        """(saldo em cache, soma do livro) para conciliação"""
+        saldo = db.query(Comanda.saldo_atual).filter(Comanda.id == comanda_id).scalar()
+        livro = db.query(func.coalesce(func.sum(LancamentoComanda.valor), 0)).filter(
+            LancamentoComanda.comanda_id == comanda_id
+        ).scalar()
+        return Decimal(str(saldo or 0)), Decimal(str(livro))
+
+    def _lancar(self, db: Session, comanda_id: int, tipo: str, valor: Decimal, saldo_apos: Decimal, **kwargs) -> LancamentoComanda:
+        lancamento = LancamentoComanda(comanda_id=comanda_id, tipo=tipo, valor=valor, saldo_apos=saldo_apos, **kwargs)
+        db.add(lancamento)
+        return lancamento
+
+    def _motivo_recusa(self, db: Session, comanda_id: int, evento_id: Optional[int] = None) -> SaldoComandaInvalido:
+        comanda = db.query(Comanda.status, Comanda.evento_id).filter(Comanda.id == comanda_id).first()
+        if not comanda or (evento_id is not None and comanda.evento_id != evento_id):
+            return SaldoComandaInvalido("Comanda não encontrada", status_code=404)
+        if comanda.status != StatusComanda.ATIVA:
+            return SaldoComandaInvalido("Comanda não está ativa")
+        return SaldoComandaInvalido("Saldo insuficiente na comanda")
+
+comanda_service = ComandaService()
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+from PIL import Image, ImageOps
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, update, func, distinct, case
+from sqlalchemy.exc import IntegrityError
+from ..database import SessionLocal, settings
+from ..models import ArquivoComprovante, MovimentacaoFinanceira
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Assinatura no início do arquivo -> (content_type, extensão); o content_type enviado pelo cliente não é confiável
+ASSINATURAS = (
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"%PDF-", "application/pdf", "pdf"),
+)
+
+class ComprovanteInvalido(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+@dataclass
+class ArquivoRecebido:
+    hash: str
+    tamanho: int
+    content_type: str
+    extensao: str
+    caminho_temporario: Optional[str]  # None quando o conteúdo já estava armazenado
+
+class ComprovanteService:
+    """
+    Armazenamento de comprovantes endereçado por conteúdo: o upload é gravado em blocos num arquivo
+    temporário enquanto o sha256 é calculado; conteúdo repetido não ocupa espaço novo.
+    Miniaturas das imagens são geradas fora da requisição, num pool de threads.
+    """
+
+    def __init__(self, diretorio: str = "uploads/comprovantes", tamanho_bloco: int = 1024 * 1024,
+                 tamanho_maximo: int = 20 * 1024 * 1024, lado_miniatura: int = 320, workers: int = 2,
+                 session_factory=SessionLocal):
+        self.diretorio = diretorio
+        self.tamanho_bloco = tamanho_bloco
+        self.tamanho_maximo = tamanho_maximo
+        self.lado_miniatura = lado_miniatura
+        self.workers = workers
+        self.session_factory = session_factory
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def caminho(self, hash: str, extensao: str) -> str:
+        return os.path.join(self.diretorio, hash[:2], hash[2:4], f"{hash}.{extensao}")
+
+    def caminho_miniatura(self, hash: str) -> str:
+        return os.path.join(self.diretorio, "miniaturas", hash[:2], f"{hash}.jpg")
+
+    async def receber(self, arquivo) -> ArquivoRecebido:
+        """Gravar o upload em blocos (sem carregar o arquivo inteiro) calculando o hash"""
+        diretorio_temporario = os.path.join(self.diretorio, "tmp")
+        await asyncio.to_thread(os.makedirs, diretorio_temporario, exist_ok=True)
+        descritor, caminho_temporario = tempfile.mkstemp(dir=diretorio_temporario)
+
+        sha256 = hashlib.sha256()
+        tamanho = 0
+        tipo = None
+        try:
+            with os.fdopen(descritor, "wb") as destino:
+                while True:
+                    bloco = await arquivo.read(self.tamanho_bloco)
+                    if not bloco:
+                        break
+                    if tipo is None:
+                        tipo = self._identificar(bloco)
+                    tamanho += len(bloco)
+                    if tamanho > self.tamanho_maximo:
+                        raise ComprovanteInvalido(
+                            f"Arquivo excede o limite de {self.tamanho_maximo // (1024 * 1024)} MB", status_code=413
+                        )
+                    sha256.update(bloco)
+                    await asyncio.to_thread(destino.write, bloco)
+            if tamanho == 0:
+                raise ComprovanteInvalido("Arquivo vazio")
+        except BaseException:
+            await asyncio.to_thread(self._remover, caminho_temporario)
+            raise
+
+        content_type, extensao = tipo
+        hash = sha256.hexdigest()
+        if await asyncio.to_thread(os.path.exists, self.caminho(hash, extensao)):
+            await asyncio.to_thread(self._remover, caminho_temporario)
+            caminho_temporario = None
+        return ArquivoRecebido(hash, tamanho, content_type, extensao, caminho_temporario)
+
+    def armazenar(self, db: Session, recebido: ArquivoRecebido) -> bool:
+        """
+        Mover o conteúdo para o caminho definitivo e registrar a referência (sem commit).
+        Retorna True quando o conteúdo já existia.
+        """
+        if recebido.caminho_temporario:
+            destino = self.caminho(recebido.hash, recebido.extensao)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(recebido.caminho_temporario, destino)
+
+        existente = db.execute(
+            update(ArquivoComprovante).where(ArquivoComprovante.hash == recebido.hash).values(
+                referencias=ArquivoComprovante.referencias + 1,
+                liberado_em=None
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        if existente:
+            return True
+
+        try:
+            with db.begin_nested():
+                db.execute(insert(ArquivoComprovante).values(
+                    hash=recebido.hash,
+                    tamanho=recebido.tamanho,
+                    content_type=recebido.content_type,
+                    extensao=recebido.extensao,
+                    miniatura_status="pendente" if recebido.content_type.startswith("image/") else "indisponivel",
+                    referencias=1
+                ))
+        except IntegrityError:
+            # Mesmo conteúdo enviado em paralelo
+            return self.armazenar(db, ArquivoRecebido(recebido.hash, recebido.tamanho, recebido.content_type,
+                                                      recebido.extensao, None))
+        return False
+
+    def liberar(self, db: Session, hash: Optional[str]):
+        """Desfazer uma referência (comprovante substituído); sem referências, o arquivo sai na limpeza de órfãos"""
+        if hash:
+            db.execute(
+                update(ArquivoComprovante).where(
+                    ArquivoComprovante.hash == hash,
+                    ArquivoComprovante.referencias > 0
+                ).values(
+                    referencias=ArquivoComprovante.referencias - 1,
+                    liberado_em=case((ArquivoComprovante.referencias == 1, datetime.now()), else_=ArquivoComprovante.liberado_em)
+                ).execution_options(synchronize_session=False)
+            )
+
+    def agendar_miniatura(self, hash: str):
+        """Gerar a miniatura no pool, depois do commit do upload"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="miniaturas")
+        self._executor.submit(self.gerar_miniatura, hash)
+
+    def gerar_miniatura(self, hash: str) -> str:
+        db = self.session_factory()
+        try:
+            arquivo = db.query(ArquivoComprovante).filter(ArquivoComprovante.hash == hash).first()
+            if not arquivo or arquivo.miniatura_status != "pendente":
+                return arquivo.miniatura_status if arquivo else "indisponivel"
+
+            try:
+                destino = self.caminho_miniatura(hash)
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                with Image.open(self.caminho(hash, arquivo.extensao)) as imagem:
+                    imagem.draft("RGB", (self.lado_miniatura, self.lado_miniatura))  # JPEG: decodifica já reduzida
+                    miniatura = ImageOps.exif_transpose(imagem).convert("RGB")
+                    miniatura.thumbnail((self.lado_miniatura, self.lado_miniatura))
+                    miniatura.save(destino, "JPEG", quality=80, optimize=True)
+                arquivo.miniatura_status = "pronta"
+            except Exception as e:
+                logger.error(f"Erro ao gerar miniatura do comprovante {hash}: {e}")
+                arquivo.miniatura_status = "erro"
+
+            db.commit()
+            return arquivo.miniatura_status
+        finally:
+            db.close()
+
+    def uso_por_evento(self, db: Session, evento_id: int) -> dict:
+        """Espaço ocupado pelos comprovantes do evento: enviado (com repetições) e armazenado (sem)"""
+        enviados, bytes_enviados = db.query(
+            func.count(MovimentacaoFinanceira.id), func.coalesce(func.sum(ArquivoComprovante.tamanho), 0)
+        ).join(ArquivoComprovante, ArquivoComprovante.hash == MovimentacaoFinanceira.comprovante_hash).filter(
+            MovimentacaoFinanceira.evento_id == evento_id
+        ).one()
+
+        distintos = db.query(distinct(MovimentacaoFinanceira.comprovante_hash)).filter(
+            MovimentacaoFinanceira.evento_id == evento_id,
+            MovimentacaoFinanceira.comprovante_hash.isnot(None)
+        ).subquery()
+        arquivos, bytes_armazenados = db.query(
+            func.count(ArquivoComprovante.hash), func.coalesce(func.sum(ArquivoComprovante.tamanho), 0)
+        ).filter(ArquivoComprovante.hash.in_(distintos)).one()
+
+        return {
+            "evento_id": evento_id,
+            "comprovantes": enviados,
+            "arquivos": arquivos,
+            "bytes_enviados": int(bytes_enviados),
+            "bytes_armazenados": int(bytes_armazenados),
+            "bytes_economizados": int(bytes_enviados) - int(bytes_armazenados)
+        }
+
+    def limpar_orfaos(self, horas: float = 24) -> int:
+        """Remover arquivos sem referência há mais de `horas` (executado pelo scheduler)"""
+        db = self.session_factory()
+        try:
+            limite = datetime.now() - timedelta(hours=horas)
+            candidatos = db.query(ArquivoComprovante.hash, ArquivoComprovante.extensao).filter(
+                ArquivoComprovante.referencias <= 0,
+                ArquivoComprovante.liberado_em < limite
+            ).all()
+
+            removidos = 0
+            for hash, extensao in candidatos:
+                # Condicional: um upload do mesmo conteúdo pode ter voltado a referenciá-lo
+                if db.query(ArquivoComprovante).filter(
+                    ArquivoComprovante.hash == hash,
+                    ArquivoComprovante.referencias <= 0,
+                    ArquivoComprovante.liberado_em < limite
+                ).delete(synchronize_session=False):
+                    db.commit()
+                    self._remover(self.caminho(hash, extensao))
+                    self._remover(self.caminho_miniatura(hash))
+                    removidos += 1
+
+            if removidos:
+                logger.info(f"Comprovantes órfãos removidos: {removidos}")
+            return removidos
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao limpar comprovantes órfãos: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def _identificar(self, bloco: bytes):
+        for assinatura, content_type, extensao in ASSINATURAS:
+            if bloco.startswith(assinatura):
+                return content_type, extensao
+        raise ComprovanteInvalido("Tipo de arquivo não permitido. Use JPEG, PNG ou PDF.")
+
+    def _remover(self, caminho: str):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+comprovante_service = ComprovanteService(
+    diretorio=settings.comprovantes_dir,
+    tamanho_maximo=settings.comprovante_tamanho_maximo_mb * 1024 * 1024
+)
@@ -0,0 +1,162 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import update, func, or_, event
+from ..models import Lista
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CupomInvalido(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+@dataclass
+class CupomInfo:
+    lista_id: int
+    evento_id: int
+    codigo: str
+    lista_nome: str
+    preco: Decimal
+    desconto_percentual: Decimal
+    desconto_valor: Decimal
+    data_inicio: Optional[datetime]
+    data_fim: Optional[datetime]
+    limite_uso: Optional[int]
+    usos: int
+
+    @property
+    def usos_restantes(self) -> Optional[int]:
+        return max(0, self.limite_uso - self.usos) if self.limite_uso else None
+
+class CupomService:
+    """Tabela de cupons em memória indexada por código, recarregada em mudanças e periodicamente"""
+
+    def __init__(self, ttl_segundos: float = 60):
+        self.ttl_segundos = ttl_segundos
+        self._cupons: Dict[str, CupomInfo] = {}
+        self._carregado_em: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def carregar(self, db: Session):
+        """Carregar todos os cupons em uma única consulta"""
+        cupons = {}
+        for lista in db.query(
+            Lista.id,
+            Lista.evento_id,
+            Lista.codigo_cupom,
+            Lista.nome,
+            Lista.preco,
+            Lista.desconto_percentual,
+            Lista.desconto_valor,
+            Lista.data_inicio_desconto,
+            Lista.data_fim_desconto,
+            Lista.limite_uso_cupom,
+            Lista.usos_cupom
+        ).filter(
+            Lista.codigo_cupom.isnot(None),
+            Lista.ativa == True
+        ).all():
+            cupons[lista.codigo_cupom] = CupomInfo(
+                lista_id=lista.id,
+                evento_id=lista.evento_id,
+                codigo=lista.codigo_cupom,
+                lista_nome=lista.nome,
+                preco=lista.preco or Decimal('0.00'),
+                desconto_percentual=lista.desconto_percentual or Decimal('0.00'),
+                desconto_valor=lista.desconto_valor or Decimal('0.00'),
+                data_inicio=lista.data_inicio_desconto,
+                data_fim=lista.data_fim_desconto,
+                limite_uso=lista.limite_uso_cupom,
+                usos=lista.usos_cupom or 0
+            )
+
+        with self._lock:
+            self._cupons = cupons
+            self._carregado_em = time.monotonic()
+
+        logger.info(f"Tabela de cupons carregada: {len(cupons)} cupons")
+
+    def invalidar(self):
+        """Forçar recarga na próxima consulta (chamado após alterações de cupons)"""
+        with self._lock:
+            self._carregado_em = None
+
+    def obter(self, db: Session, codigo: str) -> Optional[CupomInfo]:
+        with self._lock:
+            expirado = self._carregado_em is None or time.monotonic() - self._carregado_em > self.ttl_segundos
+        if expirado:
+            self.carregar(db)
+        return self._cupons.get(codigo)
+
+    def validar(self, db: Session, codigo: str, evento_id: Optional[int] = None, agora: Optional[datetime] = None) -> CupomInfo:
+        """Validar janela de vigência e usos restantes sem consultar o banco"""
+        cupom = self.obter(db, codigo)
+        if not cupom or (evento_id is not None and cupom.evento_id != evento_id):
+            raise CupomInvalido("Cupom não encontrado", status_code=404)
+
+        agora = agora or datetime.now()
+        if cupom.data_inicio and agora < cupom.data_inicio:
+            raise CupomInvalido("Cupom ainda não está ativo")
+
+        if cupom.data_fim and agora > cupom.data_fim:
+            raise CupomInvalido("Cupom expirado")
+
+        if cupom.limite_uso and cupom.usos >= cupom.limite_uso:
+            raise CupomInvalido("Limite de uso do cupom atingido")
+
+        return cupom
+
+    def calcular_desconto(self, cupom: CupomInfo, valor: Decimal) -> Decimal:
+        """Desconto aplicável ao valor informado, nunca maior que o próprio valor"""
+        desconto = Decimal(str(valor)) * Decimal(str(cupom.desconto_percentual)) / 100 + Decimal(str(cupom.desconto_valor))
+        return min(Decimal(str(valor)), desconto).quantize(Decimal('0.01'))
+
+    def resgatar(self, db: Session, codigo: str, agora: Optional[datetime] = None) -> bool:
+        """Incrementar o uso do cupom com UPDATE condicional; o commit fica a cargo do chamador"""
+        agora = agora or datetime.now()
+        resultado = db.execute(
+            update(Lista).where(
+                Lista.codigo_cupom == codigo,
+                Lista.ativa == True,
+                or_(Lista.data_inicio_desconto.is_(None), Lista.data_inicio_desconto <= agora),
+                or_(Lista.data_fim_desconto.is_(None), Lista.data_fim_desconto >= agora),
+                or_(
+                    Lista.limite_uso_cupom.is_(None),
+                    func.coalesce(Lista.usos_cupom, 0) < Lista.limite_uso_cupom
+                )
+            ).values(
+                usos_cupom=func.coalesce(Lista.usos_cupom, 0) + 1
+            ).execution_options(synchronize_session=False)
+        )
+
+        if resultado.rowcount != 1:
+            return False
+
+        # O uso em memória só conta depois do commit (ver _aplicar_resgates)
+        db.info.setdefault("cupons_resgatados", []).append((self, codigo))
+        return True
+
+    def registrar_uso(self, codigo: str):
+        with self._lock:
+            cupom = self._cupons.get(codigo)
+            if cupom:
+                cupom.usos += 1
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_resgates(session):
+    for service, codigo in session.info.pop("cupons_resgatados", ()):
+        service.registrar_uso(codigo)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_resgates(session, transacao_anterior):
+    if not transacao_anterior.nested:
+        session.info.pop("cupons_resgatados", None)
+
+cupom_service = CupomService()
@@ -0,0 +1,299 @@
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, insert, select, exists, and_, or_
+from ..database import SessionLocal, settings
+from ..models import (
+    Produto, MovimentoEstoque, SnapshotEstoque, ResumoMovimentoEstoque, MovimentoEstoqueArquivo
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+COLUNAS_ARQUIVO = (
+    "id", "tipo_movimento", "quantidade", "estoque_anterior", "estoque_atual",
+    "motivo", "venda_id", "usuario_id", "criado_em"
+)
+
+def _como_datetime(valor) -> Optional[datetime]:
+    """No SQLite as datas agregadas voltam como texto"""
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor))
+
+class EstoqueService:
+    """
+    Histórico de estoque compacto: snapshots periódicos por produto, resumos por hora dos
+    movimentos e arquivamento comprimido dos movimentos antigos já resumidos.
+    """
+
+    def __init__(self, dias_retencao: int = 30, margem_consolidacao_minutos: int = 5,
+                 lote_arquivamento: int = 50000, session_factory=SessionLocal):
+        self.dias_retencao = dias_retencao
+        self.margem_consolidacao = timedelta(minutes=margem_consolidacao_minutos)
+        self.lote_arquivamento = lote_arquivamento
+        self.session_factory = session_factory
+
+    def run_snapshots(self) -> int:
+        """Snapshot horário (executado pelo scheduler)"""
+        db = self.session_factory()
+        try:
+            total = self.tirar_snapshots(db)
+            db.commit()
+            return total
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao gerar snapshots de estoque: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def run_consolidacao(self) -> Dict[str, int]:
+        """Resumos por hora e arquivamento (executado pelo scheduler)"""
+        db = self.session_factory()
+        try:
+            resumos = self.consolidar(db)
+            db.commit()
+            arquivados = self.arquivar(db)
+            db.commit()
+            return {"resumos": resumos, "arquivados": arquivados}
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro na consolidação de movimentos de estoque: {e}")
+            return {"resumos": 0, "arquivados": 0}
+        finally:
+            db.close()
+
+    def tirar_snapshots(self, db: Session, evento_id: Optional[int] = None) -> int:
+        """
+        Snapshot dos produtos que se movimentaram desde o último (ou que ainda não têm um).
+        Estoque e último id de movimento saem do mesmo SELECT, para serem consistentes entre si.
+        """
+        ultimo_snapshot = select(func.max(SnapshotEstoque.ultimo_movimento_id)).where(
+            SnapshotEstoque.produto_id == Produto.id
+        ).scalar_subquery()
+        movimentou = exists().where(
+            MovimentoEstoque.produto_id == Produto.id,
+            MovimentoEstoque.id > ultimo_snapshot
+        )
+        ultimo_movimento = select(func.coalesce(func.max(MovimentoEstoque.id), 0)).scalar_subquery()
+
+        query = db.query(
+            Produto.id, Produto.evento_id, Produto.estoque_atual, ultimo_movimento
+        ).filter(
+            Produto.controla_estoque == True,
+            or_(ultimo_snapshot.is_(None), movimentou)
+        )
+        if evento_id is not None:
+            query = query.filter(Produto.evento_id == evento_id)
+
+        linhas = [{
+            "produto_id": produto_id,
+            "evento_id": evento,
+            "estoque": estoque or 0,
+            "ultimo_movimento_id": ultimo
+        } for produto_id, evento, estoque, ultimo in query.all()]
+        if linhas:
+            db.execute(insert(SnapshotEstoque), linhas)
+
+        logger.info(f"Snapshots de estoque: {len(linhas)} produtos")
+        return len(linhas)
+
+    def consolidar(self, db: Session, ate: Optional[datetime] = None) -> int:
+        """Resumir por produto e hora os movimentos das horas completas ainda não resumidas"""
+        limite = (ate or datetime.now() - self.margem_consolidacao).replace(minute=0, second=0, microsecond=0)
+        ultima_hora = _como_datetime(db.query(func.max(ResumoMovimentoEstoque.hora)).scalar())
+
+        hora = self._hora(db, MovimentoEstoque.criado_em)
+        query = db.query(
+            MovimentoEstoque.produto_id,
+            Produto.evento_id,
+            hora,
+            func.sum(case((MovimentoEstoque.tipo_movimento == "entrada", MovimentoEstoque.quantidade), else_=0)),
+            func.sum(case((MovimentoEstoque.tipo_movimento == "saida", MovimentoEstoque.quantidade), else_=0)),
+            func.sum(MovimentoEstoque.estoque_atual - MovimentoEstoque.estoque_anterior),
+            func.count(MovimentoEstoque.id)
+        ).join(Produto, Produto.id == MovimentoEstoque.produto_id).filter(
+            MovimentoEstoque.criado_em < limite
+        )
+        if ultima_hora is not None:
+            query = query.filter(MovimentoEstoque.criado_em >= ultima_hora + timedelta(hours=1))
+
+        linhas = [{
+            "produto_id": produto_id,
+            "evento_id": evento_id,
+            "hora": _como_datetime(hora_movimento),
+            "entradas": entradas or 0,
+            "saidas": saidas or 0,
+            "variacao": variacao or 0,
+            "movimentos": movimentos
+        } for produto_id, evento_id, hora_movimento, entradas, saidas, variacao, movimentos in query.group_by(
+            MovimentoEstoque.produto_id, Produto.evento_id, hora
+        ).all()]
+        if linhas:
+            db.execute(insert(ResumoMovimentoEstoque), linhas)
+
+        logger.info(f"Resumos de movimento de estoque gerados: {len(linhas)}")
+        return len(linhas)
+
+    def arquivar(self, db: Session, antes_de: Optional[datetime] = None) -> int:
+        """
+        Mover para movimentos_estoque_arquivo (um bloco comprimido por produto) os movimentos
+        mais antigos que a retenção e já resumidos. Processa até `lote_arquivamento` linhas.
+        """
+        ultima_hora = _como_datetime(db.query(func.max(ResumoMovimentoEstoque.hora)).scalar())
+        if ultima_hora is None:
+            return 0
+
+        corte = min(antes_de or datetime.now() - timedelta(days=self.dias_retencao), ultima_hora + timedelta(hours=1))
+        movimentos = db.query(*[getattr(MovimentoEstoque, coluna) for coluna in ("produto_id",) + COLUNAS_ARQUIVO]).filter(
+            MovimentoEstoque.criado_em < corte
+        ).order_by(MovimentoEstoque.produto_id, MovimentoEstoque.id).limit(self.lote_arquivamento).all()
+        if not movimentos:
+            return 0
+
+        por_produto = defaultdict(list)
+        for movimento in movimentos:
+            por_produto[movimento.produto_id].append(movimento)
+
+        blocos = []
+        for produto_id, linhas in por_produto.items():
+            datas = [_como_datetime(linha.criado_em) for linha in linhas]
+            bruto = json.dumps([
+                [linha.id, linha.tipo_movimento, linha.quantidade, linha.estoque_anterior, linha.estoque_atual,
+                 linha.motivo, linha.venda_id, linha.usuario_id, data.isoformat() if data else None]
+                for linha, data in zip(linhas, datas)
+            ], separators=(",", ":"))
+            blocos.append({
+                "produto_id": produto_id,
+                "inicio": min(data for data in datas if data),
+                "fim": max(data for data in datas if data),
+                "primeiro_movimento_id": linhas[0].id,
+                "ultimo_movimento_id": linhas[-1].id,
+                "movimentos": len(linhas),
+                "dados": zlib.compress(bruto.encode(), 9)
+            })
+
+        db.execute(insert(MovimentoEstoqueArquivo), blocos)
+        ids = [movimento.id for movimento in movimentos]
+        for inicio in range(0, len(ids), 1000):
+            db.query(MovimentoEstoque).filter(
+                MovimentoEstoque.id.in_(ids[inicio:inicio + 1000])
+            ).delete(synchronize_session=False)
+
+        logger.info(f"Movimentos de estoque arquivados: {len(ids)} em {len(blocos)} blocos")
+        return len(ids)
+
+    def estoque_em(self, db: Session, produto_id: int, momento: datetime) -> Optional[int]:
+        """Estoque do produto em `momento`: snapshot mais próximo antes dele mais a variação até o momento"""
+        snapshot = db.query(SnapshotEstoque).filter(
+            SnapshotEstoque.produto_id == produto_id,
+            SnapshotEstoque.tirado_em <= momento
+        ).order_by(SnapshotEstoque.tirado_em.desc(), SnapshotEstoque.id.desc()).first()
+
+        if snapshot:
+            return snapshot.estoque + self._variacao(db, produto_id, apos_id=snapshot.ultimo_movimento_id, ate=momento)
+
+        # Antes do primeiro snapshot: parte do estoque atual e desfaz o que veio depois
+        estoque_atual = db.query(Produto.estoque_atual).filter(Produto.id == produto_id).scalar()
+        if estoque_atual is None:
+            return None
+        return estoque_atual - self._variacao(db, produto_id, depois_de=momento)
+
+    def movimentacao_por_hora(self, db: Session, evento_id: int, inicio: datetime, fim: datetime,
+                              produto_id: Optional[int] = None) -> List[dict]:
+        """Entradas, saídas e variação por produto e hora: resumos prontos mais as horas ainda não resumidas"""
+        query = db.query(ResumoMovimentoEstoque).filter(
+            ResumoMovimentoEstoque.evento_id == evento_id,
+            ResumoMovimentoEstoque.hora >= inicio,
+            ResumoMovimentoEstoque.hora < fim
+        )
+        if produto_id is not None:
+            query = query.filter(ResumoMovimentoEstoque.produto_id == produto_id)
+
+        resultado = [{
+            "produto_id": resumo.produto_id,
+            "hora": _como_datetime(resumo.hora),
+            "entradas": resumo.entradas,
+            "saidas": resumo.saidas,
+            "variacao": resumo.variacao,
+            "movimentos": resumo.movimentos
+        } for resumo in query.all()]
+
+        ultima_hora = _como_datetime(db.query(func.max(ResumoMovimentoEstoque.hora)).scalar())
+        pendente_desde = max(inicio, ultima_hora + timedelta(hours=1)) if ultima_hora else inicio
+        if pendente_desde < fim:
+            hora = self._hora(db, MovimentoEstoque.criado_em)
+            recentes = db.query(
+                MovimentoEstoque.produto_id,
+                hora,
+                func.sum(case((MovimentoEstoque.tipo_movimento == "entrada", MovimentoEstoque.quantidade), else_=0)),
+                func.sum(case((MovimentoEstoque.tipo_movimento == "saida", MovimentoEstoque.quantidade), else_=0)),
+                func.sum(MovimentoEstoque.estoque_atual - MovimentoEstoque.estoque_anterior),
+                func.count(MovimentoEstoque.id)
+            ).join(Produto, Produto.id == MovimentoEstoque.produto_id).filter(
+                Produto.evento_id == evento_id,
+                MovimentoEstoque.criado_em >= pendente_desde,
+                MovimentoEstoque.criado_em < fim
+            )
+            if produto_id is not None:
+                recentes = recentes.filter(MovimentoEstoque.produto_id == produto_id)
+
+            resultado.extend({
+                "produto_id": produto,
+                "hora": _como_datetime(hora_movimento),
+                "entradas": entradas or 0,
+                "saidas": saidas or 0,
+                "variacao": variacao or 0,
+                "movimentos": movimentos
+            } for produto, hora_movimento, entradas, saidas, variacao, movimentos in recentes.group_by(
+                MovimentoEstoque.produto_id, hora
+            ).all())
+
+        return sorted(resultado, key=lambda linha: (linha["hora"], linha["produto_id"]))
+
+    def _variacao(self, db: Session, produto_id: int, apos_id: Optional[int] = None,
+                  ate: Optional[datetime] = None, depois_de: Optional[datetime] = None) -> int:
+        """Soma de estoque_atual - estoque_anterior nos movimentos (ativos e arquivados) do intervalo"""
+        condicoes = [MovimentoEstoque.produto_id == produto_id]
+        if apos_id is not None:
+            condicoes.append(MovimentoEstoque.id > apos_id)
+        if ate is not None:
+            condicoes.append(MovimentoEstoque.criado_em <= ate)
+        if depois_de is not None:
+            condicoes.append(MovimentoEstoque.criado_em > depois_de)
+
+        variacao = db.query(
+            func.coalesce(func.sum(MovimentoEstoque.estoque_atual - MovimentoEstoque.estoque_anterior), 0)
+        ).filter(and_(*condicoes)).scalar() or 0
+
+        blocos = db.query(MovimentoEstoqueArquivo.dados).filter(MovimentoEstoqueArquivo.produto_id == produto_id)
+        if apos_id is not None:
+            blocos = blocos.filter(MovimentoEstoqueArquivo.ultimo_movimento_id > apos_id)
+        if ate is not None:
+            blocos = blocos.filter(MovimentoEstoqueArquivo.inicio <= ate)
+        if depois_de is not None:
+            blocos = blocos.filter(MovimentoEstoqueArquivo.fim > depois_de)
+
+        for (dados,) in blocos.all():
+            for id, _, _, anterior, atual, _, _, _, criado_em in json.loads(zlib.decompress(dados)):
+                data = _como_datetime(criado_em)
+                if apos_id is not None and id <= apos_id:
+                    continue
+                if ate is not None and data > ate:
+                    continue
+                if depois_de is not None and data <= depois_de:
+                    continue
+                variacao += atual - anterior
+
+        return variacao
+
+    def _hora(self, db: Session, coluna):
+        if db.get_bind().dialect.name == "sqlite":
+            return func.strftime("%Y-%m-%d %H:00:00", coluna)
+        return func.date_trunc("hour", coluna)
+
+estoque_service = EstoqueService(dias_retencao=settings.estoque_retencao_dias)
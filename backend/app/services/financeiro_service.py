@@ -0,0 +1,149 @@
+from decimal import Decimal
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import update, select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from ..models import (
+    TotalFinanceiroEvento, CaixaEvento, MovimentacaoFinanceira, Transacao, VendaPDV,
+    TipoMovimentacaoFinanceira, StatusMovimentacaoFinanceira, StatusTransacao, StatusVendaPDV
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOTAIS = ("total_entradas", "total_saidas", "total_vendas_pdv", "total_vendas_listas")
+
+def _membro(enum_cls, valor):
+    """Aceita o membro do enum, o nome ou o valor (as rotas recebem texto livre)"""
+    if valor is None or isinstance(valor, enum_cls):
+        return valor
+    for membro in enum_cls:
+        if valor in (membro.name, membro.value):
+            return membro
+    return None
+
+class FinanceiroService:
+    """
+    Totais financeiros correntes por evento, espelhados no caixa do evento aberto.
+    Cada lançamento soma sua parte com um upsert atômico na própria transação; o commit fica com o chamador.
+    """
+
+    def criar_totais(self, db: Session, evento_id: int, valores: Optional[Dict[str, Decimal]] = None):
+        """Linha de totais do evento, criada junto com ele (zerada) ou na migração (apurada); sem commit"""
+        db.execute(
+            self._insert(db).values(evento_id=evento_id, **{chave: Decimal('0.00') for chave in TOTAIS}, **(valores or {}))
+            .on_conflict_do_nothing(index_elements=["evento_id"])
+        )
+
+    def contribuicao_movimentacao(self, tipo, status, valor) -> Dict[str, Decimal]:
+        """Parte de uma movimentação nos totais (só entradas e saídas aprovadas contam)"""
+        if _membro(StatusMovimentacaoFinanceira, status) != StatusMovimentacaoFinanceira.APROVADA:
+            return {}
+        tipo = _membro(TipoMovimentacaoFinanceira, tipo)
+        if tipo == TipoMovimentacaoFinanceira.ENTRADA:
+            return {"total_entradas": Decimal(str(valor or 0))}
+        if tipo == TipoMovimentacaoFinanceira.SAIDA:
+            return {"total_saidas": Decimal(str(valor or 0))}
+        return {}
+
+    def registrar_movimentacao(self, db: Session, evento_id: int, anterior: Optional[Dict[str, Decimal]],
+                               atual: Optional[Dict[str, Decimal]]):
+        """Aplicar a diferença entre a contribuição anterior e a atual de uma movimentação"""
+        deltas = dict(atual or {})
+        for chave, valor in (anterior or {}).items():
+            deltas[chave] = deltas.get(chave, Decimal('0.00')) - valor
+        self.somar(db, evento_id, **deltas)
+
+    def registrar_transacao(self, db: Session, evento_id: int, valor, status_anterior=None, status_atual=None):
+        """Venda de ingresso: conta enquanto aprovada"""
+        antes = _membro(StatusTransacao, status_anterior) == StatusTransacao.APROVADA
+        depois = _membro(StatusTransacao, status_atual) == StatusTransacao.APROVADA
+        if antes != depois:
+            valor = Decimal(str(valor or 0))
+            self.somar(db, evento_id, total_vendas_listas=valor if depois else -valor)
+
+    def somar(self, db: Session, evento_id: int, **deltas: Decimal):
+        """Somar aos totais do evento e do caixa aberto; sem linha de totais, o upsert a cria com o próprio lançamento"""
+        deltas = {chave: valor for chave, valor in deltas.items() if valor}
+        if not deltas:
+            return
+
+        upsert = self._insert(db).values(
+            evento_id=evento_id, **{chave: deltas.get(chave, Decimal('0.00')) for chave in TOTAIS}
+        )
+        db.execute(upsert.on_conflict_do_update(
+            index_elements=["evento_id"],
+            set_={chave: getattr(TotalFinanceiroEvento, chave) + valor for chave, valor in deltas.items()}
+        ))
+
+        variacao_saldo = sum(
+            (-valor if chave == "total_saidas" else valor for chave, valor in deltas.items()), Decimal('0.00')
+        )
+        db.execute(
+            update(CaixaEvento).where(
+                CaixaEvento.evento_id == evento_id,
+                CaixaEvento.status == "aberto"
+            ).values(
+                saldo_final=func.coalesce(CaixaEvento.saldo_final, 0) + variacao_saldo,
+                **{chave: func.coalesce(getattr(CaixaEvento, chave), 0) + valor for chave, valor in deltas.items()}
+            ).execution_options(synchronize_session=False)
+        )
+
+    def totais(self, db: Session, evento_id: int) -> Dict[str, Decimal]:
+        """Totais correntes do evento; sem linha de totais (evento anterior à migração), os apurados. Não grava nada"""
+        linha = db.query(*[getattr(TotalFinanceiroEvento, chave) for chave in TOTAIS]).filter(
+            TotalFinanceiroEvento.evento_id == evento_id
+        ).first()
+        if linha is None:
+            return self.apurar(db, evento_id)
+        return {chave: Decimal(str(valor or 0)) for chave, valor in zip(TOTAIS, linha)}
+
+    def apurar(self, db: Session, evento_id: int) -> Dict[str, Decimal]:
+        """Totais recalculados a partir dos lançamentos (uma consulta)"""
+        def soma(coluna, *condicoes):
+            return select(func.coalesce(func.sum(coluna), 0)).where(*condicoes).scalar_subquery()
+
+        movimentacoes = (
+            MovimentacaoFinanceira.evento_id == evento_id,
+            MovimentacaoFinanceira.status == StatusMovimentacaoFinanceira.APROVADA
+        )
+        linha = db.execute(select(
+            soma(MovimentacaoFinanceira.valor, *movimentacoes, MovimentacaoFinanceira.tipo == TipoMovimentacaoFinanceira.ENTRADA),
+            soma(MovimentacaoFinanceira.valor, *movimentacoes, MovimentacaoFinanceira.tipo == TipoMovimentacaoFinanceira.SAIDA),
+            soma(VendaPDV.valor_final, VendaPDV.evento_id == evento_id, VendaPDV.status == StatusVendaPDV.APROVADA),
+            soma(Transacao.valor, Transacao.evento_id == evento_id, Transacao.status == StatusTransacao.APROVADA)
+        )).one()
+        return {chave: Decimal(str(valor or 0)) for chave, valor in zip(TOTAIS, linha)}
+
+    def _insert(self, db: Session):
+        dialeto = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        return dialeto.insert(TotalFinanceiroEvento)
+
+    def saldo(self, totais: Dict[str, Decimal], saldo_inicial=0) -> Decimal:
+        return (Decimal(str(saldo_inicial or 0)) + totais["total_entradas"] + totais["total_vendas_listas"]
+                + totais["total_vendas_pdv"] - totais["total_saidas"])
+
+    def reconciliar(self, db: Session, evento_id: int, corrigir: bool = False) -> dict:
+        """Comparar os totais correntes com os apurados; com `corrigir`, regravar os apurados (sem commit)"""
+        registrado = self.totais(db, evento_id)
+        apurado = self.apurar(db, evento_id)
+        consistente = registrado == apurado
+
+        if corrigir and not consistente:
+            self.criar_totais(db, evento_id)
+            db.query(TotalFinanceiroEvento).filter(TotalFinanceiroEvento.evento_id == evento_id).update(
+                apurado, synchronize_session=False
+            )
+            caixa = db.query(CaixaEvento).filter(
+                CaixaEvento.evento_id == evento_id,
+                CaixaEvento.status == "aberto"
+            ).first()
+            if caixa:
+                for chave, valor in apurado.items():
+                    setattr(caixa, chave, valor)
+                caixa.saldo_final = self.saldo(apurado, caixa.saldo_inicial)
+            logger.warning(f"Totais financeiros do evento {evento_id} corrigidos: {registrado} -> {apurado}")
+
+        return {"evento_id": evento_id, "consistente": consistente, "registrado": registrado, "apurado": apurado}
+
+financeiro_service = FinanceiroService()
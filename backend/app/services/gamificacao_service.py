@@ -0,0 +1,686 @@
+import asyncio
+from datetime import date, datetime, time, timedelta
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, and_, case, desc, insert, literal, null, select, update
+from typing import List, Dict, Optional, Iterable
+from decimal import Decimal
+from ..models import (
+    Usuario, Evento, Lista, Transacao, Checkin, Conquista, PromoterConquista,
+    MetricaPromoter, TipoConquista, TipoUsuario, StatusTransacao, NivelBadge
+)
+from ..database import SessionLocal
+from .whatsapp_service import whatsapp_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+def calcular_badge_principal(posicao: int, vendas: int, taxa_presenca: float) -> str:
+    """Calcular badge principal baseado em métricas"""
+    if vendas >= 1000 and taxa_presenca >= 90:
+        return "lenda"
+    elif vendas >= 500 and taxa_presenca >= 90:
+        return "diamante"
+    elif vendas >= 200 and taxa_presenca >= 80:
+        return "platina"
+    elif vendas >= 100:
+        return "ouro"
+    elif vendas >= 50:
+        return "prata"
+    else:
+        return "bronze"
+
+class GamificacaoService:
+    """Avaliação de conquistas em lote, com poucas consultas agrupadas por promoter"""
+
+    def __init__(self, tamanho_lote_notificacao: int = 20):
+        self.tamanho_lote_notificacao = tamanho_lote_notificacao
+        self._versoes: Dict[tuple, tuple] = {}  # período -> (versão dos dados, linhas gravadas)
+
+    def calcular_metricas(self, db: Session, promoter_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[TipoConquista, int]]:
+        """Calcular métricas de conquista de todos os promoters (ou dos informados)"""
+
+        filtro_promoters = []
+        if promoter_ids is not None:
+            promoter_ids = list(promoter_ids)
+            if not promoter_ids:
+                return {}
+            filtro_promoters.append(Lista.promoter_id.in_(promoter_ids))
+
+        vendas = db.query(
+            Lista.promoter_id,
+            func.count(Transacao.id)
+        ).join(
+            Transacao, Transacao.lista_id == Lista.id
+        ).filter(
+            Lista.promoter_id.isnot(None),
+            Transacao.status == StatusTransacao.APROVADA,
+            *filtro_promoters
+        ).group_by(Lista.promoter_id).all()
+
+        presentes = db.query(
+            Lista.promoter_id,
+            func.count(func.distinct(Checkin.id))
+        ).join(
+            Transacao, Transacao.lista_id == Lista.id
+        ).join(
+            Checkin, and_(
+                Checkin.cpf == Transacao.cpf_comprador,
+                Checkin.evento_id == Transacao.evento_id
+            )
+        ).filter(
+            Lista.promoter_id.isnot(None),
+            Transacao.status == StatusTransacao.APROVADA,
+            *filtro_promoters
+        ).group_by(Lista.promoter_id).all()
+
+        compras_por_cliente = db.query(
+            Lista.promoter_id.label('promoter_id'),
+            Transacao.cpf_comprador
+        ).join(
+            Transacao, Transacao.lista_id == Lista.id
+        ).filter(
+            Lista.promoter_id.isnot(None),
+            Transacao.status == StatusTransacao.APROVADA,
+            *filtro_promoters
+        ).group_by(
+            Lista.promoter_id, Transacao.cpf_comprador
+        ).having(func.count(Transacao.id) > 1).subquery()
+
+        clientes_fieis = db.query(
+            compras_por_cliente.c.promoter_id,
+            func.count()
+        ).group_by(compras_por_cliente.c.promoter_id).all()
+
+        agora = datetime.now()
+        inicio_atual = agora - timedelta(days=30)
+        inicio_anterior = agora - timedelta(days=60)
+
+        vendas_periodos = db.query(
+            Lista.promoter_id,
+            func.sum(case((Transacao.criado_em >= inicio_atual, 1), else_=0)),
+            func.sum(case((Transacao.criado_em < inicio_atual, 1), else_=0))
+        ).join(
+            Transacao, Transacao.lista_id == Lista.id
+        ).filter(
+            Lista.promoter_id.isnot(None),
+            Transacao.status == StatusTransacao.APROVADA,
+            Transacao.criado_em >= inicio_anterior,
+            *filtro_promoters
+        ).group_by(Lista.promoter_id).all()
+
+        metricas: Dict[int, Dict[TipoConquista, int]] = {}
+
+        def metrica(promoter_id: int) -> Dict[TipoConquista, int]:
+            if promoter_id not in metricas:
+                metricas[promoter_id] = {tipo: 0 for tipo in TipoConquista}
+            return metricas[promoter_id]
+
+        for promoter_id, total in vendas:
+            metrica(promoter_id)[TipoConquista.VENDAS] = total or 0
+
+        for promoter_id, total in presentes:
+            total_vendas = metrica(promoter_id)[TipoConquista.VENDAS]
+            if total_vendas > 0:
+                metrica(promoter_id)[TipoConquista.PRESENCA] = int(total / total_vendas * 100)
+
+        for promoter_id, total in clientes_fieis:
+            metrica(promoter_id)[TipoConquista.FIDELIDADE] = total or 0
+
+        for promoter_id, atual, anterior in vendas_periodos:
+            atual = atual or 0
+            anterior = anterior or 0
+            if anterior > 0:
+                metrica(promoter_id)[TipoConquista.CRESCIMENTO] = int((atual - anterior) / anterior * 100)
+
+        return metricas
+
+    def consultar_ranking(
+        self,
+        db: Session,
+        periodo_inicio: date,
+        periodo_fim: date,
+        evento_id: Optional[int] = None,
+        empresa_id: Optional[int] = None,
+        limit: int = 20
+    ) -> List:
+        """Ranking de promoters com vendas, presenças e conquistas pré-agregadas em subconsultas"""
+
+        inicio = datetime.combine(periodo_inicio, time.min)
+        fim = datetime.combine(periodo_fim + timedelta(days=1), time.min)
+
+        filtros_transacao = [
+            Lista.promoter_id.isnot(None),
+            Transacao.status == StatusTransacao.APROVADA,
+            Transacao.criado_em >= inicio,
+            Transacao.criado_em < fim
+        ]
+        if evento_id:
+            filtros_transacao.append(Transacao.evento_id == evento_id)
+
+        def transacoes_filtradas(*colunas):
+            query = db.query(*colunas).select_from(Transacao).join(
+                Lista, Transacao.lista_id == Lista.id
+            )
+            if empresa_id is not None:
+                query = query.join(
+                    Evento, Transacao.evento_id == Evento.id
+                ).filter(Evento.empresa_id == empresa_id)
+            return query.filter(*filtros_transacao)
+
+        vendas_sq = transacoes_filtradas(
+            Lista.promoter_id.label('promoter_id'),
+            func.count(Transacao.id).label('total_vendas'),
+            func.sum(Transacao.valor).label('receita_gerada'),
+            func.count(func.distinct(Transacao.evento_id)).label('eventos_ativos')
+        ).group_by(Lista.promoter_id).subquery()
+
+        presentes_sq = transacoes_filtradas(
+            Lista.promoter_id.label('promoter_id'),
+            func.count(func.distinct(Checkin.id)).label('total_presentes')
+        ).join(
+            Checkin, and_(
+                Checkin.cpf == Transacao.cpf_comprador,
+                Checkin.evento_id == Transacao.evento_id
+            )
+        ).group_by(Lista.promoter_id).subquery()
+
+        conquistas_sq = db.query(
+            PromoterConquista.promoter_id.label('promoter_id'),
+            func.count(PromoterConquista.id).label('conquistas_total'),
+            func.sum(case((PromoterConquista.data_conquista >= inicio, 1), else_=0)).label('conquistas_mes')
+        ).group_by(PromoterConquista.promoter_id).subquery()
+
+        return db.query(
+            Usuario.id.label('promoter_id'),
+            Usuario.nome.label('nome_promoter'),
+            vendas_sq.c.total_vendas,
+            vendas_sq.c.receita_gerada,
+            vendas_sq.c.eventos_ativos,
+            func.coalesce(presentes_sq.c.total_presentes, 0).label('total_presentes'),
+            func.coalesce(conquistas_sq.c.conquistas_total, 0).label('conquistas_total'),
+            func.coalesce(conquistas_sq.c.conquistas_mes, 0).label('conquistas_mes'),
+            null().label('taxa_conversao'),
+            literal(0).label('crescimento_vendas'),
+            null().label('posicao_anterior'),
+            literal(0).label('streak_vendas')
+        ).join(
+            vendas_sq, vendas_sq.c.promoter_id == Usuario.id
+        ).outerjoin(
+            presentes_sq, presentes_sq.c.promoter_id == Usuario.id
+        ).outerjoin(
+            conquistas_sq, conquistas_sq.c.promoter_id == Usuario.id
+        ).filter(
+            Usuario.tipo == TipoUsuario.PROMOTER
+        ).order_by(
+            desc(vendas_sq.c.receita_gerada), Usuario.id
+        ).limit(limit).all()
+
+    def gerar_snapshot_metricas(self, db: Session, data_referencia: Optional[date] = None, dias: int = 30,
+                                forcar: bool = False) -> int:
+        """
+        Gravar em metricas_promoters o snapshot da janela móvel terminada em data_referencia: uma linha por
+        evento, uma por empresa do evento e uma geral. Se os dados do período não mudaram desde a última
+        geração, nada é recalculado.
+        """
+
+        data_referencia = data_referencia or date.today()
+        periodo_inicio = data_referencia - timedelta(days=dias - 1)
+        inicio = datetime.combine(periodo_inicio, time.min)
+        fim = datetime.combine(data_referencia + timedelta(days=1), time.min)
+        inicio_anterior = inicio - timedelta(days=dias)
+
+        # Versão lida antes dos dados: o que mudar durante o cálculo força nova geração na próxima vez
+        periodo = (periodo_inicio, data_referencia)
+        versao = self._versao_periodo(db, inicio_anterior, fim)
+        existentes = db.query(func.count(MetricaPromoter.id)).filter(
+            MetricaPromoter.periodo_inicio == periodo_inicio,
+            MetricaPromoter.periodo_fim == data_referencia
+        ).scalar()
+        if not forcar and self._versoes.get(periodo) == (versao, existentes):
+            return existentes
+
+        aprovada_no_periodo = and_(
+            Transacao.status == StatusTransacao.APROVADA,
+            Transacao.criado_em >= inicio
+        )
+
+        vendas = db.query(
+            Lista.promoter_id,
+            Transacao.evento_id,
+            Evento.empresa_id,
+            func.sum(case((aprovada_no_periodo, 1), else_=0)).label('total_vendas'),
+            func.sum(case((aprovada_no_periodo, Transacao.valor), else_=0)).label('receita_gerada'),
+            func.sum(case((Transacao.criado_em >= inicio, 1), else_=0)).label('total_convidados'),
+            func.sum(case((and_(
+                Transacao.status == StatusTransacao.APROVADA,
+                Transacao.criado_em < inicio
+            ), 1), else_=0)).label('vendas_anteriores')
+        ).select_from(Transacao).join(
+            Lista, Transacao.lista_id == Lista.id
+        ).join(
+            Evento, Transacao.evento_id == Evento.id
+        ).filter(
+            Lista.promoter_id.isnot(None),
+            Transacao.criado_em >= inicio_anterior,
+            Transacao.criado_em < fim
+        ).group_by(Lista.promoter_id, Transacao.evento_id, Evento.empresa_id).all()
+
+        presentes = db.query(
+            Lista.promoter_id,
+            Transacao.evento_id,
+            Evento.empresa_id,
+            func.count(func.distinct(Checkin.id))
+        ).select_from(Transacao).join(
+            Lista, Transacao.lista_id == Lista.id
+        ).join(
+            Evento, Transacao.evento_id == Evento.id
+        ).join(
+            Checkin, and_(
+                Checkin.cpf == Transacao.cpf_comprador,
+                Checkin.evento_id == Transacao.evento_id
+            )
+        ).filter(
+            Lista.promoter_id.isnot(None),
+            aprovada_no_periodo,
+            Transacao.criado_em < fim
+        ).group_by(Lista.promoter_id, Transacao.evento_id, Evento.empresa_id).all()
+
+        dias_com_venda = db.query(
+            Lista.promoter_id,
+            Evento.empresa_id,
+            func.date(Transacao.criado_em)
+        ).select_from(Transacao).join(
+            Lista, Transacao.lista_id == Lista.id
+        ).join(
+            Evento, Transacao.evento_id == Evento.id
+        ).filter(
+            Lista.promoter_id.isnot(None),
+            aprovada_no_periodo,
+            Transacao.criado_em < fim
+        ).distinct().all()
+
+        metricas: Dict[tuple, Dict] = {}
+
+        def acumular(promoter_id: int, evento_id: int, empresa_id: int, **valores):
+            # Mesmos escopos do ranking ao vivo: evento, eventos da empresa e todos os eventos
+            for chave in ((promoter_id, evento_id, empresa_id), (promoter_id, None, empresa_id), (promoter_id, None, None)):
+                metrica = metricas.setdefault(chave, {
+                    "total_vendas": 0, "receita_gerada": Decimal('0'), "total_convidados": 0,
+                    "total_presentes": 0, "vendas_anteriores": 0
+                })
+                for campo, valor in valores.items():
+                    metrica[campo] += valor or 0
+
+        for row in vendas:
+            acumular(
+                row.promoter_id, row.evento_id, row.empresa_id,
+                total_vendas=row.total_vendas,
+                receita_gerada=Decimal(str(row.receita_gerada or 0)),
+                total_convidados=row.total_convidados,
+                vendas_anteriores=row.vendas_anteriores
+            )
+
+        for promoter_id, evento_id, empresa_id, total in presentes:
+            acumular(promoter_id, evento_id, empresa_id, total_presentes=total)
+
+        streaks = self._calcular_streaks(
+            [(promoter_id, dia) for promoter_id, _, dia in dias_com_venda], data_referencia
+        )
+        streaks_empresa = self._calcular_streaks(
+            [((promoter_id, empresa_id), dia) for promoter_id, empresa_id, dia in dias_com_venda], data_referencia
+        )
+
+        promoters = {promoter_id for (promoter_id,) in db.query(Usuario.id).filter(
+            Usuario.id.in_({chave[0] for chave in metricas}),
+            Usuario.tipo == TipoUsuario.PROMOTER
+        )} if metricas else set()
+
+        grupos: Dict[tuple, List[Dict]] = {}
+        for (promoter_id, evento_id, empresa_id), metrica in metricas.items():
+            if promoter_id not in promoters:
+                continue
+
+            total_vendas = metrica["total_vendas"]
+            taxa_presenca = (metrica["total_presentes"] / total_vendas * 100) if total_vendas > 0 else 0
+            taxa_conversao = (total_vendas / metrica["total_convidados"] * 100) if metrica["total_convidados"] > 0 else 0
+            anteriores = metrica["vendas_anteriores"]
+            crescimento = ((total_vendas - anteriores) / anteriores * 100) if anteriores > 0 else 0
+            streak = streaks.get(promoter_id, 0) if empresa_id is None else streaks_empresa.get((promoter_id, empresa_id), 0)
+
+            linha = {
+                "promoter_id": promoter_id,
+                "evento_id": evento_id,
+                "empresa_id": empresa_id,
+                "periodo_inicio": periodo_inicio,
+                "periodo_fim": data_referencia,
+                "total_vendas": total_vendas,
+                "receita_gerada": metrica["receita_gerada"],
+                "total_convidados": metrica["total_convidados"],
+                "total_presentes": metrica["total_presentes"],
+                "taxa_presenca": round(Decimal(str(min(taxa_presenca, 999.99))), 2),
+                "taxa_conversao": round(Decimal(str(min(taxa_conversao, 999.99))), 2),
+                "crescimento_vendas": round(Decimal(str(max(-999.99, min(crescimento, 999.99)))), 2),
+                "streak_vendas": streak,
+                "badge_atual": NivelBadge(calcular_badge_principal(0, total_vendas, taxa_presenca))
+            }
+            grupos.setdefault((evento_id, empresa_id if evento_id is None else None), []).append(linha)
+
+        linhas = []
+        for linhas_grupo in grupos.values():
+            self._atribuir_posicoes(linhas_grupo)
+            linhas.extend(linhas_grupo)
+
+        db.query(MetricaPromoter).filter(
+            MetricaPromoter.periodo_inicio == periodo_inicio,
+            MetricaPromoter.periodo_fim == data_referencia
+        ).delete(synchronize_session=False)
+
+        if linhas:
+            db.execute(insert(MetricaPromoter), linhas)
+        db.commit()
+        self._versoes[periodo] = (versao, len(linhas))
+
+        logger.info(f"Snapshot de métricas {periodo_inicio} a {data_referencia}: {len(linhas)} linhas")
+
+        return len(linhas)
+
+    def _versao_periodo(self, db: Session, inicio: datetime, fim: datetime) -> tuple:
+        """
+        Contagem, maior id e última alteração das transações da janela (com o período anterior) e dos
+        check-ins e listas, numa só consulta; qualquer venda, mudança de status ou check-in a altera
+        """
+        na_janela = and_(Transacao.criado_em >= inicio, Transacao.criado_em < fim)
+        return tuple(db.execute(select(
+            select(func.count(Transacao.id)).where(na_janela).scalar_subquery(),
+            select(func.max(Transacao.id)).where(na_janela).scalar_subquery(),
+            select(func.max(Transacao.atualizado_em)).where(na_janela).scalar_subquery(),
+            select(func.count(Checkin.id)).scalar_subquery(),
+            select(func.max(Checkin.id)).scalar_subquery(),
+            select(func.count(Lista.id)).where(Lista.promoter_id.isnot(None)).scalar_subquery(),
+            select(func.max(Lista.id)).where(Lista.promoter_id.isnot(None)).scalar_subquery()
+        )).one())
+
+    def _calcular_streaks(self, dias_com_venda: List, data_referencia: date) -> Dict:
+        """Dias consecutivos com venda até a data de referência (ou até a véspera), por chave"""
+        dias_por_promoter: Dict = {}
+        for promoter_id, dia in dias_com_venda:
+            if isinstance(dia, str):
+                dia = date.fromisoformat(dia)
+            elif isinstance(dia, datetime):
+                dia = dia.date()
+            dias_por_promoter.setdefault(promoter_id, set()).add(dia)
+
+        streaks = {}
+        for promoter_id, dias in dias_por_promoter.items():
+            dia = data_referencia if data_referencia in dias else data_referencia - timedelta(days=1)
+            streak = 0
+            while dia in dias:
+                streak += 1
+                dia -= timedelta(days=1)
+            streaks[promoter_id] = streak
+
+        return streaks
+
+    def _atribuir_posicoes(self, linhas: List[Dict]):
+        ordenacoes = {
+            "posicao_vendas": lambda l: (-l["total_vendas"], l["promoter_id"]),
+            "posicao_presenca": lambda l: (-l["taxa_presenca"], l["promoter_id"]),
+            "posicao_geral": lambda l: (-l["receita_gerada"], l["promoter_id"]),
+        }
+        for campo, chave in ordenacoes.items():
+            for posicao, linha in enumerate(sorted(linhas, key=chave), 1):
+                linha[campo] = posicao
+
+    def consultar_ranking_snapshot(
+        self,
+        db: Session,
+        evento_id: Optional[int] = None,
+        empresa_id: Optional[int] = None,
+        limit: int = 20
+    ) -> Optional[List]:
+        """
+        Ranking lido do último snapshot de metricas_promoters (None se não houver snapshot). Com empresa,
+        lê as linhas dos eventos dessa empresa, como o ranking ao vivo (Evento.empresa_id)
+        """
+
+        def escopo(metrica):
+            condicoes = [metrica.evento_id == evento_id if evento_id else metrica.evento_id.is_(None)]
+            if empresa_id is not None:
+                condicoes.append(metrica.empresa_id == empresa_id)
+            elif not evento_id:
+                condicoes.append(metrica.empresa_id.is_(None))
+            return and_(*condicoes)
+
+        filtro_escopo = escopo(MetricaPromoter)
+
+        ultima_data = db.query(func.max(MetricaPromoter.periodo_fim)).filter(filtro_escopo).scalar()
+        if not ultima_data:
+            return None
+
+        data_anterior = db.query(func.max(MetricaPromoter.periodo_fim)).filter(
+            filtro_escopo,
+            MetricaPromoter.periodo_fim < ultima_data
+        ).scalar()
+
+        anterior = aliased(MetricaPromoter)
+        inicio_periodo = db.query(func.max(MetricaPromoter.periodo_inicio)).filter(
+            filtro_escopo,
+            MetricaPromoter.periodo_fim == ultima_data
+        ).scalar()
+
+        conquistas_sq = db.query(
+            PromoterConquista.promoter_id.label('promoter_id'),
+            func.count(PromoterConquista.id).label('conquistas_total'),
+            func.sum(case((
+                PromoterConquista.data_conquista >= datetime.combine(inicio_periodo, time.min), 1
+            ), else_=0)).label('conquistas_mes')
+        ).group_by(PromoterConquista.promoter_id).subquery()
+
+        filtros_eventos = [
+            MetricaPromoter.evento_id.isnot(None),
+            MetricaPromoter.periodo_fim == ultima_data,
+            MetricaPromoter.total_vendas > 0
+        ]
+        if empresa_id is not None:
+            filtros_eventos.append(MetricaPromoter.empresa_id == empresa_id)
+        eventos_sq = db.query(
+            MetricaPromoter.promoter_id.label('promoter_id'),
+            func.count(MetricaPromoter.id).label('eventos_ativos')
+        ).filter(*filtros_eventos).group_by(MetricaPromoter.promoter_id).subquery()
+
+        return db.query(
+            Usuario.id.label('promoter_id'),
+            Usuario.nome.label('nome_promoter'),
+            MetricaPromoter.total_vendas,
+            MetricaPromoter.receita_gerada,
+            func.coalesce(eventos_sq.c.eventos_ativos, 1 if evento_id else 0).label('eventos_ativos'),
+            MetricaPromoter.total_presentes,
+            func.coalesce(conquistas_sq.c.conquistas_total, 0).label('conquistas_total'),
+            func.coalesce(conquistas_sq.c.conquistas_mes, 0).label('conquistas_mes'),
+            MetricaPromoter.taxa_conversao,
+            MetricaPromoter.crescimento_vendas,
+            anterior.posicao_geral.label('posicao_anterior'),
+            MetricaPromoter.streak_vendas
+        ).join(
+            MetricaPromoter, MetricaPromoter.promoter_id == Usuario.id
+        ).outerjoin(
+            anterior, and_(
+                anterior.promoter_id == MetricaPromoter.promoter_id,
+                escopo(anterior),
+                anterior.periodo_fim == data_anterior
+            )
+        ).outerjoin(
+            conquistas_sq, conquistas_sq.c.promoter_id == Usuario.id
+        ).outerjoin(
+            eventos_sq, eventos_sq.c.promoter_id == Usuario.id
+        ).filter(
+            filtro_escopo,
+            MetricaPromoter.periodo_fim == ultima_data,
+            MetricaPromoter.total_vendas > 0,
+            Usuario.tipo == TipoUsuario.PROMOTER
+        ).order_by(
+            desc(MetricaPromoter.receita_gerada), Usuario.id
+        ).limit(limit).all()
+
+    def run_snapshot_metricas(self):
+        """Gerar o snapshot diário de métricas (executado pelo scheduler)"""
+        db = SessionLocal()
+        try:
+            return self.gerar_snapshot_metricas(db)
+        finally:
+            db.close()
+
+    def avaliar_conquistas(self, db: Session, promoter_ids: Optional[Iterable[int]] = None) -> Dict[int, List[Conquista]]:
+        """Atribuir em lote as conquistas alcançadas e ainda não registradas"""
+
+        conquistas = db.query(Conquista).filter(
+            Conquista.ativa == True,
+            Conquista.tipo != TipoConquista.ESPECIAL
+        ).all()
+
+        if not conquistas:
+            return {}
+
+        query_promoters = db.query(Usuario.id).filter(
+            Usuario.tipo == TipoUsuario.PROMOTER,
+            Usuario.ativo == True
+        )
+        if promoter_ids is not None:
+            query_promoters = query_promoters.filter(Usuario.id.in_(list(promoter_ids)))
+        ids_validos = {row.id for row in query_promoters.all()}
+
+        metricas = self.calcular_metricas(db, ids_validos)
+
+        existentes = set(db.query(
+            PromoterConquista.promoter_id,
+            PromoterConquista.conquista_id
+        ).filter(
+            PromoterConquista.promoter_id.in_(list(metricas.keys()))
+        ).all()) if metricas else set()
+
+        novas_linhas = []
+        novas_conquistas: Dict[int, List[Conquista]] = {}
+
+        for promoter_id, valores in metricas.items():
+            for conquista in conquistas:
+                if (promoter_id, conquista.id) in existentes:
+                    continue
+
+                valor_alcancado = valores[conquista.tipo]
+                if valor_alcancado >= conquista.criterio_valor:
+                    novas_linhas.append({
+                        "promoter_id": promoter_id,
+                        "conquista_id": conquista.id,
+                        "valor_alcancado": valor_alcancado,
+                        "notificado": False
+                    })
+                    novas_conquistas.setdefault(promoter_id, []).append(conquista)
+
+        if novas_linhas:
+            db.execute(insert(PromoterConquista), novas_linhas)
+            db.commit()
+
+        logger.info(
+            f"Conquistas avaliadas para {len(metricas)} promoters: {len(novas_linhas)} novas"
+        )
+
+        return novas_conquistas
+
+    async def notificar_conquistas(self, db: Session, promoter_ids: Optional[Iterable[int]] = None, dias: int = 7) -> int:
+        """Enviar em lotes as conquistas ainda não notificadas, uma mensagem por promoter"""
+
+        # Consultas e commits em thread: só o envio das mensagens fica no loop
+        grupos = await asyncio.to_thread(self._pendentes_notificacao, db, promoter_ids, dias)
+        total_notificados = 0
+
+        for i in range(0, len(grupos), self.tamanho_lote_notificacao):
+            lote = grupos[i:i + self.tamanho_lote_notificacao]
+
+            resultados = await asyncio.gather(*[
+                whatsapp_service._send_whatsapp_message(
+                    g["telefone"], self._formatar_mensagem(g["nome"], g["conquistas"])
+                ) for g in lote
+            ], return_exceptions=True)
+
+            ids_notificados = [
+                id_ for g, resultado in zip(lote, resultados)
+                if not isinstance(resultado, Exception)
+                for id_ in g["ids"]
+            ]
+
+            if ids_notificados:
+                await asyncio.to_thread(self._marcar_notificados, db, ids_notificados)
+                total_notificados += len(ids_notificados)
+
+        return total_notificados
+
+    def _pendentes_notificacao(self, db: Session, promoter_ids: Optional[Iterable[int]], dias: int) -> List[Dict]:
+        query = db.query(
+            PromoterConquista.id,
+            PromoterConquista.promoter_id,
+            Usuario.nome,
+            Usuario.telefone,
+            Conquista.nome.label('conquista_nome'),
+            Conquista.icone
+        ).join(
+            Usuario, PromoterConquista.promoter_id == Usuario.id
+        ).join(
+            Conquista, PromoterConquista.conquista_id == Conquista.id
+        ).filter(
+            PromoterConquista.notificado == False,
+            PromoterConquista.data_conquista >= datetime.now() - timedelta(days=dias),
+            Usuario.telefone.isnot(None)
+        )
+
+        if promoter_ids is not None:
+            query = query.filter(PromoterConquista.promoter_id.in_(list(promoter_ids)))
+
+        pendentes: Dict[int, Dict] = {}
+        for row in query.order_by(PromoterConquista.promoter_id, PromoterConquista.id).all():
+            grupo = pendentes.setdefault(row.promoter_id, {
+                "nome": row.nome, "telefone": row.telefone, "ids": [], "conquistas": []
+            })
+            grupo["ids"].append(row.id)
+            grupo["conquistas"].append(f"{row.icone} {row.conquista_nome}")
+
+        return list(pendentes.values())
+
+    def _marcar_notificados(self, db: Session, ids: List[int]):
+        db.execute(
+            update(PromoterConquista).where(
+                PromoterConquista.id.in_(ids)
+            ).values(notificado=True)
+        )
+        db.commit()
+
+    async def run_verificacao_conquistas(self):
+        """Avaliar conquistas de todos os promoters e notificar (executado pelo scheduler)"""
+        db = SessionLocal()
+        try:
+            novas_conquistas = await asyncio.to_thread(self.avaliar_conquistas, db)
+            await self.notificar_conquistas(db, novas_conquistas.keys())
+            return novas_conquistas
+        finally:
+            db.close()
+
+    async def run_notificacoes_pendentes(self, promoter_ids: Optional[Iterable[int]] = None):
+        """Notificar conquistas pendentes em uma sessão própria (uso em BackgroundTasks)"""
+        db = SessionLocal()
+        try:
+            await self.notificar_conquistas(db, promoter_ids)
+        finally:
+            db.close()
+
+    def _formatar_mensagem(self, nome: str, conquistas: List[str]) -> str:
+        conquistas_texto = "\n".join(conquistas)
+
+        return f"""
+🎉 *PARABÉNS {nome.upper()}!*
+
+Você conquistou novos badges:
+{conquistas_texto}
+
+Continue assim e alcance novos níveis! 🚀
+        """.strip()
+
+gamificacao_service = GamificacaoService()
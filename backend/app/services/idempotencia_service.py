@@ -0,0 +1,178 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, update, bindparam
+from sqlalchemy.exc import IntegrityError
+from ..database import SessionLocal
+from ..models import RequisicaoIdempotente
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ConflitoIdempotencia(Exception):
+    def __init__(self, detail: str, status_code: int = 409):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+class IdempotenciaService:
+    """Registro de chaves de idempotência gravado na mesma transação da operação protegida"""
+
+    def __init__(self, ttl_horas: float = 24):
+        self.ttl_horas = ttl_horas
+
+    def calcular_hash(self, payload: Any) -> str:
+        bruto = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(bruto.encode()).hexdigest()
+
+    def obter(self, db: Session, escopo: str, chave: str) -> Optional[RequisicaoIdempotente]:
+        return db.query(RequisicaoIdempotente).filter(
+            RequisicaoIdempotente.escopo == escopo,
+            RequisicaoIdempotente.chave == chave,
+            RequisicaoIdempotente.expira_em > datetime.now()
+        ).first()
+
+    def reservar(self, db: Session, escopo: str, chave: str, payload: Any, ttl_horas: Optional[float] = None) -> Optional[Any]:
+        """
+        Reservar a chave no início da transação.
+        Retorna a resposta original se a chave já foi usada com o mesmo payload, ou None
+        quando a operação deve prosseguir (e chamar `concluir` antes do commit).
+        """
+        hash_payload = self.calcular_hash(payload)
+        existente = self._resposta_existente(db, escopo, chave, hash_payload)
+        if existente is not None:
+            return existente
+
+        db.query(RequisicaoIdempotente).filter(
+            RequisicaoIdempotente.escopo == escopo,
+            RequisicaoIdempotente.chave == chave,
+            RequisicaoIdempotente.expira_em <= datetime.now()
+        ).delete(synchronize_session=False)
+
+        db.add(RequisicaoIdempotente(
+            escopo=escopo,
+            chave=chave,
+            hash_payload=hash_payload,
+            expira_em=datetime.now() + timedelta(hours=ttl_horas or self.ttl_horas)
+        ))
+        try:
+            # Com uma requisição concorrente em andamento, o índice único faz este INSERT
+            # aguardar o commit (ou rollback) da original em vez de reexecutar a operação
+            db.flush()
+        except IntegrityError:
+            # Outra requisição com a mesma chave concluiu primeiro
+            db.rollback()
+            existente = self._resposta_existente(db, escopo, chave, hash_payload)
+            if existente is not None:
+                return existente
+            raise ConflitoIdempotencia("Requisição com esta chave ainda em processamento")
+
+        return None
+
+    def concluir(self, db: Session, escopo: str, chave: str, resposta: Any):
+        """Gravar a resposta na transação corrente; o commit fica a cargo do chamador"""
+        db.query(RequisicaoIdempotente).filter(
+            RequisicaoIdempotente.escopo == escopo,
+            RequisicaoIdempotente.chave == chave
+        ).update({"resposta": json.dumps(jsonable_encoder(resposta))}, synchronize_session=False)
+
+    def reservar_lote(self, db: Session, escopo: str, payloads: Dict[str, Any],
+                      ttl_horas: Optional[float] = None) -> Tuple[Dict[str, Any], Set[str]]:
+        """
+        Reservar várias chaves do mesmo escopo com uma consulta e um INSERT.
+        Retorna (respostas já registradas por chave, chaves usadas com outro conteúdo);
+        as demais ficam reservadas na transação corrente.
+        """
+        hashes = {chave: self.calcular_hash(payload) for chave, payload in payloads.items()}
+        agora = datetime.now()
+
+        existentes, divergentes = {}, set()
+        registros = db.query(RequisicaoIdempotente).filter(
+            RequisicaoIdempotente.escopo == escopo,
+            RequisicaoIdempotente.chave.in_(hashes),
+            RequisicaoIdempotente.expira_em > agora
+        ).all()
+        for registro in registros:
+            if registro.hash_payload != hashes[registro.chave]:
+                divergentes.add(registro.chave)
+            elif registro.resposta is not None:
+                existentes[registro.chave] = json.loads(registro.resposta)
+
+        novas = [chave for chave in hashes if chave not in existentes and chave not in divergentes]
+        if novas:
+            db.query(RequisicaoIdempotente).filter(
+                RequisicaoIdempotente.escopo == escopo,
+                RequisicaoIdempotente.chave.in_(novas),
+                RequisicaoIdempotente.expira_em <= agora
+            ).delete(synchronize_session=False)
+
+            expira_em = agora + timedelta(hours=ttl_horas or self.ttl_horas)
+            try:
+                db.execute(insert(RequisicaoIdempotente), [{
+                    "escopo": escopo,
+                    "chave": chave,
+                    "hash_payload": hashes[chave],
+                    "expira_em": expira_em
+                } for chave in novas])
+            except IntegrityError:
+                raise ConflitoIdempotencia("Lote com chaves em processamento por outra requisição")
+
+        return existentes, divergentes
+
+    def concluir_lote(self, db: Session, escopo: str, respostas: Dict[str, Any]):
+        """Gravar as respostas de várias chaves com um único UPDATE em lote"""
+        if not respostas:
+            return
+
+        tabela = RequisicaoIdempotente.__table__
+        db.execute(
+            update(tabela).where(
+                tabela.c.escopo == escopo,
+                tabela.c.chave == bindparam("b_chave")
+            ).values(resposta=bindparam("b_resposta")),
+            [{
+                "b_chave": chave,
+                "b_resposta": json.dumps(jsonable_encoder(resposta))
+            } for chave, resposta in respostas.items()]
+        )
+
+    def liberar_lote(self, db: Session, escopo: str, chaves: List[str]):
+        """Desfazer a reserva de chaves cuja operação foi rejeitada, permitindo reenvio corrigido"""
+        db.query(RequisicaoIdempotente).filter(
+            RequisicaoIdempotente.escopo == escopo,
+            RequisicaoIdempotente.chave.in_(chaves)
+        ).delete(synchronize_session=False)
+
+    def limpar_expiradas(self, session_factory=SessionLocal) -> int:
+        """Remover chaves com TTL vencido"""
+        db = session_factory()
+        try:
+            removidas = db.query(RequisicaoIdempotente).filter(
+                RequisicaoIdempotente.expira_em <= datetime.now()
+            ).delete(synchronize_session=False)
+            db.commit()
+            return removidas
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao limpar chaves de idempotência: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def _resposta_existente(self, db: Session, escopo: str, chave: str, hash_payload: str) -> Optional[Any]:
+        registro = self.obter(db, escopo, chave)
+        if not registro:
+            return None
+
+        if registro.hash_payload != hash_payload:
+            raise ConflitoIdempotencia("Chave de idempotência já usada com outro conteúdo", status_code=422)
+
+        if registro.resposta is None:
+            raise ConflitoIdempotencia("Requisição com esta chave ainda em processamento")
+
+        return json.loads(registro.resposta)
+
+idempotencia_service = IdempotenciaService()
@@ -0,0 +1,305 @@
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from ..database import settings
+from ..models import Evento
+from .pdf_service import pdf_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Comandos ESC/POS usados nos comprovantes
+ESC, GS = b"\x1b", b"\x1d"
+INICIAR = ESC + b"@"
+PAGINA_PORTUGUES = ESC + b"t\x03"  # página de código PC860
+CENTRO, ESQUERDA = ESC + b"a\x01", ESC + b"a\x00"
+NEGRITO, NORMAL = ESC + b"E\x01", ESC + b"E\x00"
+DUPLO, SIMPLES = GS + b"!\x11", GS + b"!\x00"
+CORTE = GS + b"V\x42\x03"  # avança 3 linhas e corta
+
+def _texto(texto: str) -> bytes:
+    return texto.encode("cp860", errors="replace")
+
+def _linha(esquerda: str, direita: str, colunas: int) -> bytes:
+    esquerda = esquerda[:max(colunas - len(direita) - 1, 0)]
+    return _texto(esquerda + " " * (colunas - len(esquerda) - len(direita)) + direita + "\n")
+
+def renderizar_comprovante(cabecalho: bytes, dados: dict, colunas: int = 48) -> bytes:
+    """Comprovante em ESC/POS a partir do cabeçalho do evento e dos dados da venda (os mesmos do PDF)"""
+    partes = [
+        cabecalho,
+        ESQUERDA, NEGRITO, _texto(f"Venda: {dados['numero_venda']}\n"), NORMAL,
+        _texto(f"Data: {dados['data']}\n"),
+        _texto("-" * colunas + "\n"),
+    ]
+    for item in dados["itens"]:
+        partes.append(_texto(item["nome"][:colunas] + "\n"))
+        partes.append(_linha(f"  {item['quantidade']} x R$ {item['preco_unitario']:.2f}",
+                             f"R$ {item['preco_total']:.2f}", colunas))
+    partes += [
+        _texto("-" * colunas + "\n"),
+        NEGRITO, _linha("TOTAL:", f"R$ {dados['valor_final']:.2f}", colunas), NORMAL,
+    ]
+    if dados.get("pagamento"):
+        partes.append(_texto(f"Pagamento: {dados['pagamento']}\n"))
+    partes += [CENTRO, _texto("\nObrigado pela preferência!\n"), CORTE]
+    return b"".join(partes)
+
+class DestinoRede:
+    """Impressora de rede em modo RAW (porta 9100)"""
+
+    def __init__(self, host: str, porta: int = 9100, timeout: float = 5):
+        self.host, self.porta, self.timeout = host, porta, timeout
+
+    def enviar(self, dados: bytes):
+        with socket.create_connection((self.host, self.porta), timeout=self.timeout) as conexao:
+            conexao.sendall(dados)
+
+class DestinoArquivo:
+    """Dispositivo local (ex.: /dev/usb/lp0) ou arquivo"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+
+    def enviar(self, dados: bytes):
+        with open(self.caminho, "ab") as destino:
+            destino.write(dados)
+
+class DestinoMemoria:
+    """Impressora falsa: guarda o que recebe; pode simular lentidão e falhas (testes e benchmarks)"""
+
+    def __init__(self, latencia: float = 0, falhas: int = 0):
+        self.latencia = latencia
+        self.falhas = falhas
+        self.envios: List[bytes] = []
+
+    def enviar(self, dados: bytes):
+        if self.latencia:
+            time.sleep(self.latencia)
+        if self.falhas > 0:
+            self.falhas -= 1
+            raise ConnectionError("Falha simulada na impressora")
+        self.envios.append(dados)
+
+def criar_destino(endereco: str):
+    """`tcp://host:porta`, `memoria://` ou caminho de arquivo/dispositivo"""
+    if endereco.startswith("tcp://"):
+        host, _, porta = endereco[len("tcp://"):].partition(":")
+        return DestinoRede(host, int(porta or 9100))
+    if endereco.startswith("memoria://"):
+        return DestinoMemoria()
+    return DestinoArquivo(endereco)
+
+@dataclass
+class TrabalhoImpressao:
+    cabecalho: bytes
+    dados: dict
+    tentativas: int = 0
+
+class FilaImpressora:
+    """
+    Uma thread por impressora: junta os comprovantes que estão na fila num só envio e repete em caso de falha.
+    A repetição reenvia o lote inteiro: se a impressora caiu no meio, os comprovantes já impressos saem de novo.
+    """
+
+    def __init__(self, nome: str, destino, colunas: int, lote_maximo: int, tentativas: int, espera_retentativa: float):
+        self.nome = nome
+        self.destino = destino
+        self.colunas = colunas
+        self.lote_maximo = lote_maximo
+        self.tentativas = tentativas
+        self.espera_retentativa = espera_retentativa
+        self.fila: "queue.Queue[Optional[TrabalhoImpressao]]" = queue.Queue()
+        self.impressos = 0
+        self.lotes = 0
+        self.falhas: deque = deque(maxlen=100)
+        self._thread = threading.Thread(target=self._executar, name=f"impressora-{nome}", daemon=True)
+        self._thread.start()
+
+    def enfileirar(self, trabalho: TrabalhoImpressao):
+        self.fila.put(trabalho)
+
+    def aguardar(self, timeout: float = 10) -> bool:
+        """Esperar a fila esvaziar (testes e benchmarks)"""
+        limite = time.monotonic() + timeout
+        while self.fila.unfinished_tasks:
+            if time.monotonic() > limite:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def encerrar(self):
+        self.fila.put(None)
+        self._thread.join(timeout=5)
+
+    def situacao(self) -> dict:
+        return {
+            "impressora": self.nome,
+            "na_fila": self.fila.qsize(),
+            "impressos": self.impressos,
+            "lotes": self.lotes,
+            "falhas": list(self.falhas)
+        }
+
+    def _executar(self):
+        while True:
+            trabalho = self.fila.get()
+            if trabalho is None:
+                self.fila.task_done()
+                return
+
+            lote = [trabalho]
+            encerrar = False
+            while len(lote) < self.lote_maximo:
+                try:
+                    proximo = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proximo is None:
+                    encerrar = True
+                    self.fila.task_done()
+                    break
+                lote.append(proximo)
+
+            self._imprimir(lote)
+            for _ in lote:
+                self.fila.task_done()
+            if encerrar:
+                return
+
+    def _imprimir(self, lote: List[TrabalhoImpressao]):
+        conteudo = b"".join(renderizar_comprovante(t.cabecalho, t.dados, self.colunas) for t in lote)
+        for tentativa in range(self.tentativas):
+            try:
+                self.destino.enviar(conteudo)
+                self.impressos += len(lote)
+                self.lotes += 1
+                return
+            except Exception as e:
+                logger.warning(f"Impressora {self.nome}: falha no envio ({tentativa + 1}/{self.tentativas}): {e}")
+                if tentativa + 1 < self.tentativas:
+                    time.sleep(self.espera_retentativa * 2 ** tentativa)
+
+        logger.error(f"Impressora {self.nome}: {len(lote)} comprovante(s) não impressos")
+        for trabalho in lote:
+            self.falhas.append({"numero_venda": trabalho.dados["numero_venda"], "em": datetime.now().isoformat()})
+
+class ImpressaoService:
+    """
+    Comprovantes térmicos em ESC/POS, com uma fila por impressora. O cabeçalho de cada evento é montado
+    uma vez e reaproveitado; a impressora é escolhida pelo terminal (X-Terminal-Id), ou a `padrao`.
+    O PDF fica só como arquivo opcional.
+    """
+
+    def __init__(self, impressoras: str = "", colunas: int = 48, lote_maximo: int = 20, tentativas: int = 3,
+                 espera_retentativa: float = 0.5, cache_cabecalho_segundos: float = 300,
+                 arquivo_pdf_dir: Optional[str] = None):
+        self.colunas = colunas
+        self.lote_maximo = lote_maximo
+        self.tentativas = tentativas
+        self.espera_retentativa = espera_retentativa
+        self.cache_cabecalho_segundos = cache_cabecalho_segundos
+        self.arquivo_pdf_dir = arquivo_pdf_dir
+        self.filas: Dict[str, FilaImpressora] = {}
+        self._cabecalhos: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._arquivo_executor: Optional[ThreadPoolExecutor] = None
+        self._configuracao = impressoras
+        self._configurada = not impressoras
+        self._lock_configuracao = threading.Lock()
+
+    def registrar(self, nome: str, destino) -> FilaImpressora:
+        with self._lock:
+            anterior = self.filas.get(nome)
+            self.filas[nome] = FilaImpressora(
+                nome, destino, self.colunas, self.lote_maximo, self.tentativas, self.espera_retentativa
+            )
+        if anterior:
+            anterior.encerrar()
+        return self.filas[nome]
+
+    def impressora_para(self, terminal_id: Optional[str]) -> Optional[FilaImpressora]:
+        self._carregar_configuracao()
+        return self.filas.get(terminal_id) if terminal_id in self.filas else self.filas.get("padrao")
+
+    def cabecalho(self, db: Session, evento_id: int) -> bytes:
+        """Cabeçalho ESC/POS do evento (cache com validade; eventos quase não mudam)"""
+        em_cache = self._cabecalhos.get(evento_id)
+        if em_cache and em_cache[1] > time.monotonic():
+            return em_cache[0]
+
+        evento = db.query(Evento.nome, Evento.local, Evento.data_evento).filter(Evento.id == evento_id).first()
+        partes = [INICIAR, PAGINA_PORTUGUES, CENTRO]
+        if evento:
+            partes += [NEGRITO, DUPLO, _texto(evento.nome[:self.colunas // 2] + "\n"), SIMPLES, NORMAL,
+                       _texto(f"{evento.local}\n"), _texto(evento.data_evento.strftime('%d/%m/%Y') + "\n")]
+        partes.append(NEGRITO + _texto("COMPROVANTE DE VENDA\n") + NORMAL)
+        cabecalho = b"".join(partes)
+
+        self._cabecalhos[evento_id] = (cabecalho, time.monotonic() + self.cache_cabecalho_segundos)
+        return cabecalho
+
+    def enfileirar(self, terminal_id: Optional[str], cabecalho: bytes, dados: dict) -> bool:
+        """Colocar o comprovante na fila da impressora do terminal; False se não há impressora"""
+        impressora = self.impressora_para(terminal_id)
+        if self.arquivo_pdf_dir:
+            self._arquivar_pdf(dados)
+        if impressora is None:
+            return False
+        impressora.enfileirar(TrabalhoImpressao(cabecalho=cabecalho, dados=dados))
+        return True
+
+    def situacao(self) -> List[dict]:
+        self._carregar_configuracao()
+        return [fila.situacao() for fila in self.filas.values()]
+
+    def encerrar(self):
+        with self._lock:
+            filas, self.filas = list(self.filas.values()), {}
+        for fila in filas:
+            fila.encerrar()
+        if self._arquivo_executor:
+            self._arquivo_executor.shutdown(wait=False)
+            self._arquivo_executor = None
+
+    def _carregar_configuracao(self):
+        """Impressoras de IMPRESSORAS (`nome=destino;...`), na primeira utilização"""
+        if self._configurada:
+            return
+        # Quem chega durante o carregamento espera: marcar antes de registrar deixaria a venda sem impressora
+        with self._lock_configuracao:
+            if self._configurada:
+                return
+            for entrada in self._configuracao.split(";"):
+                nome, _, endereco = entrada.strip().partition("=")
+                if nome and endereco:
+                    self.registrar(nome.strip(), criar_destino(endereco.strip()))
+            self._configurada = True
+
+    def _arquivar_pdf(self, dados: dict):
+        if self._arquivo_executor is None:
+            self._arquivo_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arquivo-comprovantes")
+        self._arquivo_executor.submit(self._gravar_pdf, dados)
+
+    def _gravar_pdf(self, dados: dict):
+        try:
+            conteudo = pdf_service.gerar("comprovante_venda", dados)
+            os.makedirs(self.arquivo_pdf_dir, exist_ok=True)
+            with open(os.path.join(self.arquivo_pdf_dir, f"{dados['numero_venda']}.pdf"), "wb") as arquivo:
+                arquivo.write(conteudo)
+        except Exception as e:
+            logger.error(f"Erro ao arquivar PDF do comprovante {dados.get('numero_venda')}: {e}")
+
+impressao_service = ImpressaoService(
+    impressoras=settings.impressoras,
+    colunas=settings.impressao_colunas,
+    arquivo_pdf_dir=settings.impressao_arquivo_pdf_dir or None
+)
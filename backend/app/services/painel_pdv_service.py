@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from ..models import VendaPDV, ItemVendaPDV, Comanda, CaixaPDV, StatusVendaPDV, StatusComanda
+from .catalogo_service import catalogo_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _minuto(momento: datetime) -> int:
+    if momento.tzinfo is not None:
+        momento = momento.astimezone().replace(tzinfo=None)
+    return int(momento.timestamp() // 60)
+
+@dataclass
+class BaldeMinuto:
+    vendas: int = 0
+    valor: Decimal = Decimal('0.00')
+    produtos: Counter = field(default_factory=Counter)
+
+@dataclass
+class EstadoEvento:
+    baldes: Dict[int, BaldeMinuto] = field(default_factory=dict)
+    aplicadas: Dict[int, int] = field(default_factory=dict)  # venda_id -> minuto
+    produtos: Counter = field(default_factory=Counter)  # unidades na janela inteira
+    ultimo_venda_id: int = 0
+    comandas_ativas: int = 0
+    caixas_abertos: int = 0
+    atualizado_em: float = 0.0
+
+class PainelPDVService:
+    """
+    Janela móvel por evento com baldes de um minuto (vendas, faturamento e unidades por produto).
+    Alimentada pelas vendas deste processo logo após o commit e, a cada `intervalo_atualizacao`
+    segundos, pelas vendas novas gravadas por outros processos; reconstruída do banco no primeiro uso.
+    """
+
+    def __init__(self, janela_horas: int = 24, intervalo_atualizacao: float = 5.0, folga_ids: int = 200):
+        self.janela_minutos = janela_horas * 60
+        self.intervalo_atualizacao = intervalo_atualizacao
+        self.folga_ids = folga_ids
+        self._estados: Dict[int, EstadoEvento] = {}
+        self._lock = threading.Lock()
+
+    def registrar_venda(self, evento_id: int, venda_id: int, momento: Optional[datetime], valor: Decimal,
+                        itens: Iterable[Tuple[int, int]]):
+        """Somar uma venda já confirmada; eventos ainda não carregados a obtêm na reconstrução"""
+        with self._lock:
+            estado = self._estados.get(evento_id)
+            if estado is not None:
+                self._aplicar(estado, venda_id, momento or datetime.now(), valor, itens)
+
+    def obter_painel(self, db: Session, evento_id: int, top: int = 10) -> dict:
+        """Campos do DashboardPDV lidos da janela em memória e do catálogo em cache"""
+        estado = self._obter_estado(db, evento_id)
+        snapshot = catalogo_service.obter_snapshot(db, evento_id)
+        agora = datetime.now()
+        inicio_dia = _minuto(agora.replace(hour=0, minute=0, second=0, microsecond=0))
+
+        with self._lock:
+            hoje = [balde for minuto, balde in estado.baldes.items() if minuto >= inicio_dia]
+            vendas_por_hora = self._vendas_por_hora(estado, agora)
+            mais_vendidos = self._mais_vendidos(estado, top)
+            comandas_ativas, caixas_abertos = estado.comandas_ativas, estado.caixas_abertos
+
+        em_falta = [
+            produto for produto in snapshot.produtos.values()
+            if produto.vendavel and produto.controla_estoque and produto.estoque_atual <= produto.estoque_minimo
+        ]
+
+        return {
+            "vendas_hoje": sum(balde.vendas for balde in hoje),
+            "valor_vendas_hoje": sum((balde.valor for balde in hoje), Decimal('0.00')),
+            "produtos_em_falta": len(em_falta),
+            "comandas_ativas": comandas_ativas,
+            "caixas_abertos": caixas_abertos,
+            "vendas_por_hora": vendas_por_hora,
+            "produtos_mais_vendidos": [
+                {
+                    "produto_id": produto_id,
+                    "produto_nome": snapshot.produtos[produto_id].nome if produto_id in snapshot.produtos else None,
+                    "quantidade": quantidade
+                } for produto_id, quantidade in mais_vendidos
+            ],
+            "alertas": [
+                {
+                    "tipo": "sem_estoque" if produto.estoque_atual <= 0 else "estoque_baixo",
+                    "produto_id": produto.id,
+                    "produto_nome": produto.nome,
+                    "estoque_atual": produto.estoque_atual,
+                    "estoque_minimo": produto.estoque_minimo
+                } for produto in sorted(em_falta, key=lambda produto: (produto.estoque_atual, produto.nome))
+            ]
+        }
+
+    def invalidar(self, evento_id: Optional[int] = None):
+        with self._lock:
+            if evento_id is None:
+                self._estados.clear()
+            else:
+                self._estados.pop(evento_id, None)
+
+    def _obter_estado(self, db: Session, evento_id: int) -> EstadoEvento:
+        with self._lock:
+            estado = self._estados.get(evento_id)
+        if estado is None:
+            return self._reconstruir(db, evento_id)
+        if time.monotonic() - estado.atualizado_em > self.intervalo_atualizacao:
+            self._atualizar(db, evento_id, estado)
+        return estado
+
+    def _reconstruir(self, db: Session, evento_id: int) -> EstadoEvento:
+        estado = EstadoEvento()
+        desde = datetime.now() - timedelta(minutes=self.janela_minutos)
+        self._incorporar(estado, self._consultar_vendas(db, evento_id, VendaPDV.criado_em >= desde))
+        self._contar_abertos(db, evento_id, estado)
+
+        with self._lock:
+            self._estados[evento_id] = estado
+        logger.info(f"Painel PDV do evento {evento_id} reconstruído: {len(estado.aplicadas)} vendas na janela")
+        return estado
+
+    def _atualizar(self, db: Session, evento_id: int, estado: EstadoEvento):
+        """Vendas gravadas por outros processos: ids recentes, com folga para commits fora de ordem"""
+        linhas = self._consultar_vendas(db, evento_id, VendaPDV.id > estado.ultimo_venda_id - self.folga_ids)
+        self._incorporar(estado, linhas)
+        self._contar_abertos(db, evento_id, estado)
+
+    def _consultar_vendas(self, db: Session, evento_id: int, condicao) -> list:
+        return db.query(
+            VendaPDV.id, VendaPDV.criado_em, VendaPDV.valor_final, ItemVendaPDV.produto_id, ItemVendaPDV.quantidade
+        ).outerjoin(ItemVendaPDV, ItemVendaPDV.venda_id == VendaPDV.id).filter(
+            VendaPDV.evento_id == evento_id,
+            VendaPDV.status == StatusVendaPDV.APROVADA,
+            condicao
+        ).order_by(VendaPDV.id).all()
+
+    def _incorporar(self, estado: EstadoEvento, linhas: list):
+        vendas: Dict[int, list] = {}
+        for venda_id, criado_em, valor_final, produto_id, quantidade in linhas:
+            venda = vendas.setdefault(venda_id, [criado_em, valor_final, []])
+            if produto_id is not None:
+                venda[2].append((produto_id, quantidade))
+
+        with self._lock:
+            for venda_id, (criado_em, valor_final, itens) in vendas.items():
+                self._aplicar(estado, venda_id, criado_em or datetime.now(), valor_final, itens)
+
+    def _contar_abertos(self, db: Session, evento_id: int, estado: EstadoEvento):
+        estado.comandas_ativas = db.query(func.count(Comanda.id)).filter(
+            Comanda.evento_id == evento_id,
+            Comanda.status == StatusComanda.ATIVA
+        ).scalar() or 0
+        estado.caixas_abertos = db.query(func.count(CaixaPDV.id)).filter(
+            CaixaPDV.evento_id == evento_id,
+            CaixaPDV.status == "aberto"
+        ).scalar() or 0
+        estado.atualizado_em = time.monotonic()
+
+    def _aplicar(self, estado: EstadoEvento, venda_id: int, momento: datetime, valor: Decimal, itens: Iterable[Tuple[int, int]]):
+        """Chamado com o lock; ignora vendas já somadas ou fora da janela"""
+        estado.ultimo_venda_id = max(estado.ultimo_venda_id, venda_id)
+        if venda_id in estado.aplicadas:
+            return
+
+        minuto = _minuto(momento)
+        corte = _minuto(datetime.now()) - self.janela_minutos
+        if minuto <= corte:
+            return
+
+        balde = estado.baldes.get(minuto)
+        if balde is None:
+            # Minuto novo: momento de descartar os que saíram da janela
+            self._descartar_antigos(estado, corte)
+            balde = estado.baldes[minuto] = BaldeMinuto()
+
+        balde.vendas += 1
+        balde.valor += Decimal(str(valor or 0))
+        for produto_id, quantidade in itens:
+            balde.produtos[produto_id] += quantidade
+            estado.produtos[produto_id] += quantidade
+        estado.aplicadas[venda_id] = minuto
+
+    def _descartar_antigos(self, estado: EstadoEvento, corte: int):
+        antigos = [minuto for minuto in estado.baldes if minuto <= corte]
+        if not antigos:
+            return
+        for minuto in antigos:
+            estado.produtos.subtract(estado.baldes.pop(minuto).produtos)
+        estado.produtos = +estado.produtos
+        estado.aplicadas = {venda_id: minuto for venda_id, minuto in estado.aplicadas.items() if minuto > corte}
+
+    def _vendas_por_hora(self, estado: EstadoEvento, agora: datetime) -> List[dict]:
+        hora_atual = agora.replace(minute=0, second=0, microsecond=0)
+        horas = [hora_atual - timedelta(hours=atras) for atras in range(self.janela_minutos // 60 - 1, -1, -1)]
+        por_hora = {_minuto(hora) // 60: {"vendas": 0, "valor": Decimal('0.00')} for hora in horas}
+        for minuto, balde in estado.baldes.items():
+            totais = por_hora.get(minuto // 60)
+            if totais is not None:
+                totais["vendas"] += balde.vendas
+                totais["valor"] += balde.valor
+
+        return [
+            {"hora": hora.strftime("%H:00"), "inicio": hora.isoformat(), **por_hora[_minuto(hora) // 60]}
+            for hora in horas
+        ]
+
+    def _mais_vendidos(self, estado: EstadoEvento, top: int) -> List[Tuple[int, int]]:
+        return estado.produtos.most_common(top)
+
+painel_pdv_service = PainelPDVService()
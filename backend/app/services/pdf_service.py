@@ -0,0 +1,254 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from ..database import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+FONTES_PADRAO = ("Helvetica", "Helvetica-Bold")
+
+class PDFIndisponivel(Exception):
+    def __init__(self, detail: str, status_code: int = 503):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+# --- Executado nos processos do pool: só dados simples (dict/list/str/números), nunca objetos ORM ---
+
+def _iniciar_worker(fontes_dir: Optional[str]):
+    """Carregar as fontes uma vez por processo; os modelos abaixo já ficam importados no worker"""
+    for nome in FONTES_PADRAO:
+        pdfmetrics.getFont(nome)  # tabelas de largura da fonte padrão ficam em cache no processo
+    if fontes_dir and os.path.isdir(fontes_dir):
+        for arquivo in os.listdir(fontes_dir):
+            if arquivo.lower().endswith(".ttf"):
+                try:
+                    pdfmetrics.registerFont(TTFont(os.path.splitext(arquivo)[0], os.path.join(fontes_dir, arquivo)))
+                except Exception as e:
+                    logger.error(f"Erro ao carregar fonte {arquivo}: {e}")
+
+def _desenhar_evento(p, dados: dict):
+    width, height = A4
+
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, height - 50, f"Relatório do Evento: {dados['nome']}")
+
+    p.setFont("Helvetica", 12)
+    y_position = height - 100
+
+    info_evento = [
+        f"Data: {dados['data_evento']}",
+        f"Local: {dados['local']}",
+        f"Endereço: {dados['endereco'] or 'N/A'}",
+        f"Limite de Idade: {dados['limite_idade']}+",
+        f"Capacidade: {dados['capacidade_maxima']}",
+        f"Status: {dados['status']}"
+    ]
+
+    for info in info_evento:
+        p.drawString(50, y_position, info)
+        y_position -= 20
+
+    y_position -= 30
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(50, y_position, "Resumo Financeiro")
+
+    y_position -= 30
+    p.setFont("Helvetica", 12)
+    p.drawString(50, y_position, f"Total de Vendas: {dados['total_vendas']}")
+    y_position -= 20
+    p.drawString(50, y_position, f"Receita Total: R$ {dados['receita_total']:.2f}")
+
+    p.showPage()
+
+def _desenhar_financeiro(p, dados: dict):
+    width, height = A4
+
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, height - 50, f"Relatório Financeiro - {dados['evento_nome']}")
+
+    p.setFont("Helvetica", 12)
+    y_position = height - 100
+
+    total_entradas = dados["total_entradas"]
+    total_saidas = dados["total_saidas"]
+
+    p.drawString(50, y_position, f"Total Entradas: R$ {total_entradas:.2f}")
+    y_position -= 20
+    p.drawString(50, y_position, f"Total Saídas: R$ {total_saidas:.2f}")
+    y_position -= 20
+    p.drawString(50, y_position, f"Saldo: R$ {total_entradas - total_saidas:.2f}")
+    y_position -= 40
+
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y_position, "Movimentações:")
+    y_position -= 20
+
+    p.setFont("Helvetica", 10)
+    for mov in dados["movimentacoes"]:
+        if y_position < 50:
+            p.showPage()
+            y_position = height - 50
+
+        linha = f"{mov['data']} - {mov['tipo'].upper()} - {mov['categoria']} - R$ {mov['valor']:.2f}"
+        p.drawString(50, y_position, linha)
+        y_position -= 15
+
+    p.showPage()
+
+def _desenhar_comprovante_venda(p, dados: dict):
+    width, height = 80 * mm, 200 * mm  # Papel térmico
+
+    y = height - 20 * mm
+    p.setFont("Helvetica-Bold", 12)
+    p.drawCentredString(width/2, y, "COMPROVANTE DE VENDA")
+
+    y -= 10 * mm
+    p.setFont("Helvetica", 8)
+    p.drawCentredString(width/2, y, f"Venda: {dados['numero_venda']}")
+
+    y -= 5 * mm
+    p.drawCentredString(width/2, y, f"Data: {dados['data']}")
+
+    y -= 8 * mm
+    p.line(5 * mm, y, width - 5 * mm, y)
+
+    y -= 8 * mm
+    p.setFont("Helvetica-Bold", 8)
+    p.drawString(5 * mm, y, "ITEM")
+    p.drawRightString(width - 5 * mm, y, "TOTAL")
+
+    y -= 5 * mm
+    p.setFont("Helvetica", 7)
+
+    for item in dados["itens"]:
+        p.drawString(5 * mm, y, item["nome"][:25])
+        y -= 3 * mm
+
+        p.drawString(8 * mm, y, f"{item['quantidade']} x R$ {item['preco_unitario']:.2f}")
+        p.drawRightString(width - 5 * mm, y, f"R$ {item['preco_total']:.2f}")
+        y -= 5 * mm
+
+    y -= 3 * mm
+    p.line(5 * mm, y, width - 5 * mm, y)
+
+    y -= 8 * mm
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(5 * mm, y, "TOTAL:")
+    p.drawRightString(width - 5 * mm, y, f"R$ {dados['valor_final']:.2f}")
+
+    y -= 8 * mm
+    p.setFont("Helvetica", 8)
+    if dados.get("pagamento"):
+        p.drawString(5 * mm, y, f"Pagamento: {dados['pagamento']}")
+
+    y -= 15 * mm
+    p.setFont("Helvetica", 6)
+    p.drawCentredString(width/2, y, "Obrigado pela preferência!")
+
+# Modelo -> (tamanho da página, função de desenho)
+MODELOS = {
+    "evento": (A4, _desenhar_evento),
+    "financeiro": (A4, _desenhar_financeiro),
+    "comprovante_venda": ((80 * mm, 200 * mm), _desenhar_comprovante_venda),
+}
+
+def renderizar(modelo: str, dados: dict) -> bytes:
+    """Desenhar um modelo no processo atual"""
+    tamanho, desenhar = MODELOS[modelo]
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=tamanho)
+    desenhar(p, dados)
+    p.save()
+    return buffer.getvalue()
+
+# --- Lado da aplicação ---
+
+class PDFService:
+    """
+    Geração de PDF num pool de processos: o desenho com reportlab é CPU pura e, numa thread,
+    segura o GIL e trava as demais requisições. Os chamadores montam um dict com os dados
+    (sem objetos ORM) e recebem os bytes do PDF. A fila é limitada: cheia, responde 503.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_fila: Optional[int] = None, timeout: float = 30,
+                 fontes_dir: Optional[str] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_fila = max_fila if max_fila is not None else self.workers * 4
+        self.timeout = timeout
+        self.fontes_dir = fontes_dir
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pendentes = 0
+
+    def gerar(self, modelo: str, dados: dict, timeout: Optional[float] = None) -> bytes:
+        """Renderizar no pool e esperar o resultado"""
+        futuro = self._enviar(modelo, dados)
+        try:
+            return futuro.result(timeout=self.timeout if timeout is None else timeout)
+        except FuturesTimeoutError:
+            futuro.cancel()
+            raise PDFIndisponivel("Tempo esgotado na geração do PDF", status_code=504)
+        except BrokenProcessPool:
+            self._reiniciar()
+            raise PDFIndisponivel("Falha no processo de geração de PDF")
+
+    def situacao(self) -> dict:
+        return {"workers": self.workers, "pendentes": self._pendentes, "max_fila": self.max_fila}
+
+    def encerrar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _enviar(self, modelo: str, dados: dict):
+        if modelo not in MODELOS:
+            raise ValueError(f"Modelo de PDF desconhecido: {modelo}")
+
+        with self._lock:
+            if self._pendentes >= self.max_fila:
+                raise PDFIndisponivel("Fila de geração de PDF cheia, tente novamente em instantes")
+            if self._executor is None:
+                # spawn: o processo da aplicação tem threads (scheduler, pools); fork poderia herdar locks presos
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_iniciar_worker,
+                    initargs=(self.fontes_dir,)
+                )
+            self._pendentes += 1
+            try:
+                futuro = self._executor.submit(renderizar, modelo, dados)
+            except BaseException:
+                self._pendentes -= 1
+                raise
+
+        # Um PDF que estourou o timeout continua ocupando a vaga até o worker terminar
+        futuro.add_done_callback(self._liberar_vaga)
+        return futuro
+
+    def _liberar_vaga(self, _futuro):
+        with self._lock:
+            self._pendentes -= 1
+
+    def _reiniciar(self):
+        logger.error("Pool de geração de PDF quebrado; será recriado no próximo pedido")
+        self.encerrar()
+
+pdf_service = PDFService(
+    workers=settings.pdf_workers or None,
+    max_fila=settings.pdf_max_fila or None,
+    timeout=settings.pdf_timeout_segundos,
+    fontes_dir=settings.pdf_fontes_dir or None
+)
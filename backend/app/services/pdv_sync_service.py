@@ -0,0 +1,294 @@
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, update, bindparam
+from ..models import (
+    Produto, Comanda, VendaPDV, ItemVendaPDV, PagamentoPDV, MovimentoEstoque,
+    StatusVendaPDV, TipoPagamentoPDV
+)
+from ..schemas import SincronizacaoPDVCreate, VendaPDVCreate, VendaPDV as VendaPDVSchema
+from .cupom_service import cupom_service, CupomInvalido
+from .idempotencia_service import idempotencia_service
+from .comanda_service import comanda_service
+from .caixa_service import caixa_service
+from .financeiro_service import financeiro_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PDVSyncService:
+    """Aplicação em lote das vendas registradas offline pelos terminais"""
+
+    def aplicar_lote(self, db: Session, lote: SincronizacaoPDVCreate, escopo: str, usuario, ttl_horas: float = None) -> dict:
+        """
+        Aplicar o lote em uma transação: vendas já sincronizadas são ignoradas, vendas inválidas
+        rejeitadas e estoque/saldo negativos reportados como conflito (a venda já aconteceu no balcão).
+        O commit fica a cargo do chamador.
+        """
+        resultado = {
+            "terminal_id": lote.terminal_id,
+            "aplicadas": [],
+            "duplicadas": [],
+            "rejeitadas": [],
+            "conflitos": []
+        }
+
+        vendas: Dict[str, object] = {}
+        for venda in lote.vendas:
+            if venda.id_local in vendas:
+                resultado["rejeitadas"].append({"id_local": venda.id_local, "erro": "id_local repetido no lote"})
+            else:
+                vendas[venda.id_local] = venda
+
+        # Mesmo fingerprint de processar_venda: uma venda enviada online e depois no lote não duplica
+        payloads = {
+            id_local: VendaPDVCreate(**venda.model_dump(exclude={"id_local", "registrada_em"}))
+            for id_local, venda in vendas.items()
+        }
+        existentes, divergentes = idempotencia_service.reservar_lote(db, escopo, payloads, ttl_horas=ttl_horas)
+
+        for id_local, resposta in existentes.items():
+            resultado["duplicadas"].append({
+                "id_local": id_local,
+                "venda_id": resposta.get("id"),
+                "numero_venda": resposta.get("numero_venda")
+            })
+        for id_local in divergentes:
+            resultado["rejeitadas"].append({"id_local": id_local, "erro": "id_local já usado com outro conteúdo"})
+
+        pendentes = [venda for id_local, venda in vendas.items() if id_local not in existentes and id_local not in divergentes]
+        if not pendentes:
+            return resultado
+
+        produto_ids = sorted({item.produto_id for venda in pendentes for item in venda.itens})
+        produtos = {
+            produto.id: produto for produto in db.query(
+                Produto.id, Produto.nome, Produto.evento_id, Produto.estoque_atual, Produto.estoque_minimo,
+                Produto.controla_estoque
+            ).filter(Produto.id.in_(produto_ids)).order_by(Produto.id).with_for_update()
+        }
+
+        comanda_ids = sorted({venda.comanda_id for venda in pendentes if venda.comanda_id})
+        comandas = dict(
+            db.query(Comanda.id, Comanda.evento_id).filter(Comanda.id.in_(comanda_ids)).all()
+        ) if comanda_ids else {}
+
+        aceitas, rejeitadas_ids, descontos = [], [], {}
+        for venda in pendentes:
+            erro, valor_desconto = self._validar_venda(db, venda, produtos, comandas)
+            if erro:
+                resultado["rejeitadas"].append({"id_local": venda.id_local, "erro": erro})
+                rejeitadas_ids.append(venda.id_local)
+            else:
+                aceitas.append(venda)
+                descontos[venda.id_local] = valor_desconto
+
+        if rejeitadas_ids:
+            idempotencia_service.liberar_lote(db, escopo, rejeitadas_ids)
+
+        if not aceitas:
+            return resultado
+
+        agora = datetime.now()
+        linhas_vendas = []
+        for venda in aceitas:
+            valor_total = sum(item.quantidade * item.preco_unitario for item in venda.itens)
+            valor_desconto = descontos[venda.id_local]
+            linhas_vendas.append({
+                "numero_venda": f"PDV{agora.strftime('%y%m%d%H%M%S')}{uuid.uuid4().hex[:5].upper()}",
+                "cpf_cliente": venda.cpf_cliente,
+                "nome_cliente": venda.nome_cliente,
+                "valor_total": valor_total,
+                "valor_desconto": valor_desconto,
+                "valor_final": valor_total - valor_desconto,
+                "tipo_pagamento": venda.pagamentos[0].tipo_pagamento if venda.pagamentos else TipoPagamentoPDV.DINHEIRO,
+                "status": StatusVendaPDV.APROVADA,
+                "comanda_id": venda.comanda_id,
+                "evento_id": venda.evento_id,
+                "empresa_id": usuario.empresa_id,
+                "usuario_vendedor_id": usuario.id,
+                "cupom_codigo": venda.cupom_codigo,
+                "observacoes": venda.observacoes,
+                "criado_em": venda.registrada_em or agora
+            })
+
+        self._somar_aos_caixas(db, aceitas, linhas_vendas, usuario)
+
+        db_vendas = db.scalars(
+            insert(VendaPDV).returning(VendaPDV, sort_by_parameter_order=True), linhas_vendas
+        ).all()
+
+        linhas_itens, linhas_pagamentos, linhas_movimentos = [], [], []
+        estoque_corrente = {produto_id: produto.estoque_atual or 0 for produto_id, produto in produtos.items()}
+        baixas = defaultdict(int)
+        debitos = []
+
+        for venda, db_venda in zip(aceitas, db_vendas):
+            for item in venda.itens:
+                linhas_itens.append({
+                    "venda_id": db_venda.id,
+                    "produto_id": item.produto_id,
+                    "quantidade": item.quantidade,
+                    "preco_unitario": item.preco_unitario,
+                    "preco_total": item.quantidade * item.preco_unitario,
+                    "observacoes": item.observacoes
+                })
+
+                if produtos[item.produto_id].controla_estoque:
+                    estoque_anterior = estoque_corrente[item.produto_id]
+                    estoque_corrente[item.produto_id] -= item.quantidade
+                    baixas[item.produto_id] += item.quantidade
+                    linhas_movimentos.append({
+                        "produto_id": item.produto_id,
+                        "tipo_movimento": "saida",
+                        "quantidade": item.quantidade,
+                        "estoque_anterior": estoque_anterior,
+                        "estoque_atual": estoque_corrente[item.produto_id],
+                        "motivo": f"Venda PDV offline ({lote.terminal_id})",
+                        "venda_id": db_venda.id,
+                        "usuario_id": usuario.id
+                    })
+
+            for pagamento in venda.pagamentos:
+                comissao = pagamento.comissao_percentual or Decimal('0.00')
+                linhas_pagamentos.append({
+                    "venda_id": db_venda.id,
+                    "tipo_pagamento": pagamento.tipo_pagamento,
+                    "valor": pagamento.valor,
+                    "promoter_id": pagamento.promoter_id,
+                    "comissao_percentual": comissao,
+                    "valor_comissao": pagamento.valor * comissao / 100,
+                    "codigo_transacao": str(uuid.uuid4())
+                })
+
+            if venda.comanda_id:
+                debitos.append((venda.comanda_id, db_venda.valor_final, db_venda.id))
+
+        itens = db.scalars(
+            insert(ItemVendaPDV).returning(ItemVendaPDV, sort_by_parameter_order=True), linhas_itens
+        ).all()
+        pagamentos = db.scalars(
+            insert(PagamentoPDV).returning(PagamentoPDV, sort_by_parameter_order=True), linhas_pagamentos
+        ).all() if linhas_pagamentos else []
+        if linhas_movimentos:
+            db.execute(insert(MovimentoEstoque), linhas_movimentos)
+
+        if baixas:
+            tabela = Produto.__table__
+            db.execute(
+                update(tabela).where(tabela.c.id == bindparam("b_id")).values(estoque_atual=bindparam("b_estoque")),
+                [{"b_id": produto_id, "b_estoque": estoque_corrente[produto_id]} for produto_id in baixas]
+            )
+
+        saldos = comanda_service.debitar_lote(db, debitos, usuario_id=usuario.id)
+
+        for produto_id in baixas:
+            if estoque_corrente[produto_id] < 0:
+                resultado["conflitos"].append({
+                    "tipo": "estoque_negativo",
+                    "produto_id": produto_id,
+                    "produto_nome": produtos[produto_id].nome,
+                    "estoque_atual": estoque_corrente[produto_id]
+                })
+        for comanda_id, saldo in saldos.items():
+            if saldo < 0:
+                resultado["conflitos"].append({
+                    "tipo": "saldo_negativo",
+                    "comanda_id": comanda_id,
+                    "saldo_atual": saldo
+                })
+
+        itens_por_venda, pagamentos_por_venda = defaultdict(list), defaultdict(list)
+        for item in itens:
+            itens_por_venda[item.venda_id].append(item)
+        for pagamento in pagamentos:
+            pagamentos_por_venda[pagamento.venda_id].append(pagamento)
+
+        respostas = {}
+        for venda, db_venda in zip(aceitas, db_vendas):
+            respostas[venda.id_local] = VendaPDVSchema.model_validate({
+                **{coluna.key: getattr(db_venda, coluna.key) for coluna in VendaPDV.__table__.columns},
+                "itens": itens_por_venda[db_venda.id],
+                "pagamentos": pagamentos_por_venda[db_venda.id]
+            })
+            resultado["aplicadas"].append({
+                "id_local": venda.id_local,
+                "venda_id": db_venda.id,
+                "numero_venda": db_venda.numero_venda,
+                "valor_final": db_venda.valor_final
+            })
+        idempotencia_service.concluir_lote(db, escopo, respostas)
+
+        resultado["resumo"] = {
+            "vendas": len(db_vendas),
+            "valor_total": sum((db_venda.valor_final for db_venda in db_vendas), Decimal('0.00')),
+            "estoques": [
+                {
+                    "produto_id": produto_id,
+                    "produto_nome": produtos[produto_id].nome,
+                    "evento_id": produtos[produto_id].evento_id,
+                    "estoque_atual": estoque_corrente[produto_id],
+                    "estoque_minimo": produtos[produto_id].estoque_minimo or 0,
+                    "quantidade": quantidade
+                }
+                for produto_id, quantidade in baixas.items()
+            ]
+        }
+        return resultado
+
+    def _somar_aos_caixas(self, db: Session, aceitas: List, linhas_vendas: List[dict], usuario):
+        """Um incremento por evento no caixa aberto do operador que sincroniza e nos totais financeiros"""
+        por_evento = defaultdict(lambda: {"quantidade": 0, "valor": Decimal('0.00'), "por_tipo": defaultdict(lambda: [0, Decimal('0.00')])})
+        for venda, linha in zip(aceitas, linhas_vendas):
+            totais = por_evento[venda.evento_id]
+            totais["quantidade"] += 1
+            totais["valor"] += linha["valor_final"]
+            for pagamento in venda.pagamentos:
+                totais["por_tipo"][pagamento.tipo_pagamento][0] += 1
+                totais["por_tipo"][pagamento.tipo_pagamento][1] += pagamento.valor
+
+        caixas = {
+            evento_id: caixa_service.registrar_vendas(
+                db, evento_id, usuario.id, totais["quantidade"], totais["valor"], totais["por_tipo"]
+            ) for evento_id, totais in sorted(por_evento.items())
+        }
+        for evento_id, totais in sorted(por_evento.items()):
+            financeiro_service.somar(db, evento_id, total_vendas_pdv=totais["valor"])
+        for venda, linha in zip(aceitas, linhas_vendas):
+            linha["caixa_id"] = caixas[venda.evento_id]
+
+    def _validar_venda(self, db: Session, venda, produtos: dict, comandas: dict) -> Tuple[Optional[str], Decimal]:
+        """Erro que rejeita a venda (ou None) e o desconto do cupom, com as mesmas regras da venda online"""
+        # Produto e comanda têm de ser do evento da venda (o chamador só conferiu o evento)
+        for item in venda.itens:
+            if item.produto_id not in produtos or produtos[item.produto_id].evento_id != venda.evento_id:
+                return f"Produto {item.produto_id} não encontrado", Decimal('0.00')
+
+        if venda.comanda_id and comandas.get(venda.comanda_id) != venda.evento_id:
+            return "Comanda não encontrada", Decimal('0.00')
+
+        valor_total = sum(item.quantidade * item.preco_unitario for item in venda.itens)
+        valor_desconto = Decimal('0.00')
+        if venda.cupom_codigo:
+            # Vigência conferida na hora em que a venda aconteceu no terminal
+            try:
+                cupom = cupom_service.validar(db, venda.cupom_codigo, evento_id=venda.evento_id, agora=venda.registrada_em)
+            except CupomInvalido as e:
+                return f"Cupom {venda.cupom_codigo}: {e.detail}", Decimal('0.00')
+            valor_desconto = cupom_service.calcular_desconto(cupom, valor_total)
+
+        valor_final = valor_total - valor_desconto
+        valor_pagamentos = sum(pagamento.valor for pagamento in venda.pagamentos)
+        if valor_pagamentos != valor_final:
+            return f"Valor dos pagamentos ({valor_pagamentos}) não confere com valor final ({valor_final})", Decimal('0.00')
+
+        # Resgate por último: uma venda rejeitada antes daqui não consome uso do cupom
+        if venda.cupom_codigo and not cupom_service.resgatar(db, venda.cupom_codigo, agora=venda.registrada_em):
+            return f"Cupom {venda.cupom_codigo}: Limite de uso do cupom atingido", Decimal('0.00')
+
+        return None, valor_desconto
+
+pdv_sync_service = PDVSyncService()
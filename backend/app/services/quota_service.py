@@ -0,0 +1,152 @@
+import threading
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import update, or_
+from ..database import SessionLocal, settings
+from ..models import Lista
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Origem da vaga devolvida por reservar
+RESERVA_BLOCO = "bloco"
+RESERVA_BANCO = "banco"
+
+class QuotaService:
+    """Controle de cota de vendas das listas com incremento atômico condicional no banco"""
+
+    def __init__(self, tamanho_bloco: int = 0, tentativas_cas: int = 5):
+        self.tamanho_bloco = tamanho_bloco
+        self.tentativas_cas = tentativas_cas
+        self._blocos: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def reservar(self, db: Session, lista_id: int, quantidade: int = 1) -> Optional[str]:
+        """
+        Reservar exatamente `quantidade` vagas na lista; devolve a origem (RESERVA_BLOCO ou RESERVA_BANCO)
+        ou None se a cota não comporta. Só a vaga do bloco volta ao bloco se a venda falhar; a do banco
+        some com o rollback da transação do chamador.
+        """
+        if quantidade <= 0:
+            return RESERVA_BANCO
+
+        if self.tamanho_bloco and quantidade == 1 and self._consumir_bloco(db, lista_id):
+            return RESERVA_BLOCO
+
+        resultado = db.execute(
+            update(Lista).where(
+                Lista.id == lista_id,
+                Lista.ativa == True,
+                or_(
+                    Lista.limite_vendas.is_(None),
+                    Lista.vendas_realizadas + quantidade <= Lista.limite_vendas
+                )
+            ).values(
+                vendas_realizadas=Lista.vendas_realizadas + quantidade
+            ).execution_options(synchronize_session=False)
+        )
+        return RESERVA_BANCO if resultado.rowcount == 1 else None
+
+    def reservar_ate(self, db: Session, lista_id: int, quantidade: int) -> int:
+        """Reservar até `quantidade` vagas, retornando quantas foram efetivamente reservadas"""
+        if quantidade <= 0:
+            return 0
+
+        for _ in range(self.tentativas_cas):
+            atual = db.query(Lista.vendas_realizadas, Lista.limite_vendas).filter(
+                Lista.id == lista_id,
+                Lista.ativa == True
+            ).first()
+            if not atual:
+                return 0
+
+            vendas = atual.vendas_realizadas or 0
+            disponivel = quantidade if atual.limite_vendas is None else min(quantidade, atual.limite_vendas - vendas)
+            if disponivel <= 0:
+                return 0
+
+            resultado = db.execute(
+                update(Lista).where(
+                    Lista.id == lista_id,
+                    Lista.vendas_realizadas == vendas
+                ).values(
+                    vendas_realizadas=vendas + disponivel
+                ).execution_options(synchronize_session=False)
+            )
+            if resultado.rowcount == 1:
+                return disponivel
+
+        return 0
+
+    def liberar(self, db: Session, lista_id: int, quantidade: int = 1):
+        """Devolver vagas à lista (cancelamentos ou falhas após a reserva)"""
+        if quantidade <= 0:
+            return
+
+        db.execute(
+            update(Lista).where(
+                Lista.id == lista_id,
+                Lista.vendas_realizadas >= quantidade
+            ).values(
+                vendas_realizadas=Lista.vendas_realizadas - quantidade
+            ).execution_options(synchronize_session=False)
+        )
+
+    def devolver_reserva_local(self, lista_id: int, quantidade: int = 1):
+        """Devolver ao bloco local uma vaga consumida cuja venda não foi concluída"""
+        if self.tamanho_bloco:
+            with self._lock:
+                self._blocos[lista_id] = self._blocos.get(lista_id, 0) + quantidade
+
+    def _consumir_bloco(self, db: Session, lista_id: int) -> bool:
+        """Consumir uma vaga do bloco pré-reservado pelo worker, reabastecendo quando vazio"""
+        with self._lock:
+            if self._blocos.get(lista_id, 0) > 0:
+                self._blocos[lista_id] -= 1
+                return True
+
+        # Reabastecimento fora do lock: a ida ao banco não segura as vendas das outras listas.
+        # Dois reabastecimentos simultâneos somam blocos; a sobra volta em liberar_blocos.
+        reservadas = self._reservar_bloco(db, lista_id)
+
+        with self._lock:
+            disponivel = self._blocos.get(lista_id, 0) + reservadas
+            if disponivel <= 0:
+                return False
+            self._blocos[lista_id] = disponivel - 1
+            return True
+
+    def _reservar_bloco(self, db: Session, lista_id: int) -> int:
+        sessao_bloco = Session(bind=db.get_bind())
+        try:
+            reservadas = self.reservar_ate(sessao_bloco, lista_id, self.tamanho_bloco)
+            sessao_bloco.commit()
+            return reservadas
+        except Exception as e:
+            sessao_bloco.rollback()
+            logger.error(f"Erro ao reservar bloco da lista {lista_id}: {e}")
+            return 0
+        finally:
+            sessao_bloco.close()
+
+    def liberar_blocos(self, session_factory=SessionLocal):
+        """Devolver ao banco as vagas pré-reservadas e não vendidas (ao desligar o worker)"""
+        with self._lock:
+            blocos = {lista_id: qtd for lista_id, qtd in self._blocos.items() if qtd > 0}
+            self._blocos.clear()
+
+        if not blocos:
+            return
+
+        db = session_factory()
+        try:
+            for lista_id, quantidade in blocos.items():
+                self.liberar(db, lista_id, quantidade)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao liberar blocos de cota: {e}")
+        finally:
+            db.close()
+
+quota_service = QuotaService(tamanho_bloco=settings.quota_tamanho_bloco)
@@ -1,80 +1,52 @@
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-import io
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from ..database import engine
-from ..models import VendaPDV, ItemVendaPDV, Produto
+from ..models import VendaPDV, ItemVendaPDV, Produto, TipoPagamentoPDV
+from .catalogo_service import catalogo_service
 from .whatsapp_service import whatsapp_service
+from .pdf_service import pdf_service
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 class ReceiptService:
-    def __init__(self):
-        self.width = 80 * mm  # Largura papel térmico
-        self.height = 200 * mm  # Altura variável
+    def dados_comprovante(self, venda: VendaPDV) -> dict:
+        """Dados do comprovante em tipos simples, prontos para o pool de PDF"""
+        return {
+            "numero_venda": venda.numero_venda,
+            "data": venda.criado_em.strftime('%d/%m/%Y %H:%M'),
+            "itens": [{
+                "nome": item.produto.nome if item.produto else "Produto",
+                "quantidade": item.quantidade,
+                "preco_unitario": float(item.preco_unitario),
+                "preco_total": float(item.preco_total)
+            } for item in venda.itens],
+            "valor_final": float(venda.valor_final),
+            "pagamento": venda.pagamentos[0].tipo_pagamento.value.replace('_', ' ').title() if venda.pagamentos else None
+        }
+    
+    def dados_venda_rapida(self, db: Session, evento_id: int, resultado: dict, itens: list) -> dict:
+        """Dados do comprovante de uma venda por aproximação, com preços e nomes do catálogo em cache"""
+        catalogo = catalogo_service.obter(db, evento_id)
+        quantidades = {}
+        for item in itens:
+            quantidades[item.produto_id] = quantidades.get(item.produto_id, 0) + item.quantidade
+        return {
+            "numero_venda": resultado["numero_venda"],
+            "data": datetime.now().strftime('%d/%m/%Y %H:%M'),
+            "itens": [{
+                "nome": catalogo[produto_id].nome,
+                "quantidade": quantidade,
+                "preco_unitario": float(catalogo[produto_id].preco),
+                "preco_total": float(catalogo[produto_id].preco * quantidade)
+            } for produto_id, quantidade in quantidades.items()],
+            "valor_final": float(resultado["valor_final"]),
+            "pagamento": TipoPagamentoPDV.SALDO_COMANDA.value.replace('_', ' ').title()
+        }
     
     def gerar_comprovante_pdf(self, venda: VendaPDV) -> bytes:
-        """Gerar comprovante em PDF para impressão térmica"""
-        
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=(self.width, self.height))
-        
-        y = self.height - 20 * mm
-        p.setFont("Helvetica-Bold", 12)
-        p.drawCentredText(self.width/2, y, "COMPROVANTE DE VENDA")
-        
-        y -= 10 * mm
-        p.setFont("Helvetica", 8)
-        p.drawCentredText(self.width/2, y, f"Venda: {venda.numero_venda}")
-        
-        y -= 5 * mm
-        p.drawCentredText(self.width/2, y, f"Data: {venda.criado_em.strftime('%d/%m/%Y %H:%M')}")
-        
-        y -= 8 * mm
-        p.line(5 * mm, y, self.width - 5 * mm, y)
-        
-        y -= 8 * mm
-        p.setFont("Helvetica-Bold", 8)
-        p.drawString(5 * mm, y, "ITEM")
-        p.drawRightString(self.width - 5 * mm, y, "TOTAL")
-        
-        y -= 5 * mm
-        p.setFont("Helvetica", 7)
-        
-        for item in venda.itens:
-            nome_produto = item.produto.nome[:25] if item.produto else "Produto"
-            p.drawString(5 * mm, y, nome_produto)
-            y -= 3 * mm
-            
-            linha_item = f"{item.quantidade} x R$ {item.preco_unitario:.2f}"
-            p.drawString(8 * mm, y, linha_item)
-            p.drawRightString(self.width - 5 * mm, y, f"R$ {item.preco_total:.2f}")
-            y -= 5 * mm
-        
-        y -= 3 * mm
-        p.line(5 * mm, y, self.width - 5 * mm, y)
-        
-        y -= 8 * mm
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(5 * mm, y, "TOTAL:")
-        p.drawRightString(self.width - 5 * mm, y, f"R$ {venda.valor_final:.2f}")
-        
-        y -= 8 * mm
-        p.setFont("Helvetica", 8)
-        if venda.pagamentos:
-            pagamento_texto = venda.pagamentos[0].tipo_pagamento.value.replace('_', ' ').title()
-            p.drawString(5 * mm, y, f"Pagamento: {pagamento_texto}")
-        
-        y -= 15 * mm
-        p.setFont("Helvetica", 6)
-        p.drawCentredText(self.width/2, y, "Obrigado pela preferência!")
-        
-        p.save()
-        buffer.seek(0)
-        return buffer.getvalue()
+        """Gerar comprovante em PDF para impressão térmica (renderizado no pool de processos)"""
+        return pdf_service.gerar("comprovante_venda", self.dados_comprovante(venda))
     
     async def enviar_comprovante_whatsapp(self, venda: VendaPDV, telefone: str):
         """Enviar comprovante via WhatsApp"""
@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from ..database import SessionLocal, settings
+from ..models import (
+    JobRelatorio, Usuario, Evento, Transacao, Checkin, MovimentacaoFinanceira, MetricaPromoter
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tabela -> (modelo, coluna do evento, coluna de alteração); base da versão dos dados de um relatório
+FONTES = {
+    "eventos": (Evento, Evento.id, func.coalesce(Evento.atualizado_em, Evento.criado_em)),
+    "transacoes": (Transacao, Transacao.evento_id, func.coalesce(Transacao.atualizado_em, Transacao.criado_em)),
+    "checkins": (Checkin, Checkin.evento_id, Checkin.checkin_em),
+    "movimentacoes_financeiras": (
+        MovimentacaoFinanceira, MovimentacaoFinanceira.evento_id,
+        func.coalesce(MovimentacaoFinanceira.atualizado_em, MovimentacaoFinanceira.criado_em)
+    ),
+    "metricas_promoter": (MetricaPromoter, MetricaPromoter.evento_id, MetricaPromoter.atualizado_em),
+}
+
+@dataclass
+class ArquivoRelatorio:
+    conteudo: bytes
+    media_type: str
+    nome_arquivo: str
+
+@dataclass
+class TipoRelatorio:
+    nome: str
+    gerar: Callable[[Session, dict, Usuario], ArquivoRelatorio]
+    fontes: Tuple[str, ...]
+
+class RelatorioInvalido(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+class RelatorioJobService:
+    """
+    Exportações pesadas como jobs: a requisição enfileira e recebe o id, um pool de threads gera o arquivo.
+    O resultado fica em disco sob a chave (relatório, parâmetros, escopo do usuário, versão dos dados);
+    enquanto os dados não mudam, o mesmo pedido é atendido pelo cache sem gerar de novo.
+    """
+
+    def __init__(self, diretorio: str = "cache/relatorios", workers: int = 2, limite_cache_mb: int = 500,
+                 session_factory=SessionLocal):
+        self.diretorio = diretorio
+        self.workers = workers
+        self.limite_cache = limite_cache_mb * 1024 * 1024
+        self.session_factory = session_factory
+        self.tipos: Dict[str, TipoRelatorio] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futuros: Dict[str, Future] = {}
+
+    def registrar(self, nome: str, gerar: Callable, fontes: Tuple[str, ...]):
+        self.tipos[nome] = TipoRelatorio(nome=nome, gerar=gerar, fontes=fontes)
+
+    def versao_dados(self, db: Session, fontes: Tuple[str, ...], evento_id: Optional[int] = None,
+                     empresa_id: Optional[int] = None) -> str:
+        """
+        Impressão digital dos dados do escopo: contagem, maior id e última alteração de cada fonte,
+        numa só consulta (índices por evento); qualquer inclusão, alteração ou exclusão a muda.
+        """
+        colunas = []
+        for nome in fontes:
+            modelo, coluna_evento, alterado_em = FONTES[nome]
+            condicoes = []
+            if evento_id is not None:
+                condicoes.append(coluna_evento == evento_id)
+            elif empresa_id is not None and modelo is not MetricaPromoter:
+                condicoes.append(coluna_evento.in_(select(Evento.id).where(Evento.empresa_id == empresa_id)))
+            for agregado in (func.count(modelo.id), func.max(modelo.id), func.max(alterado_em)):
+                colunas.append(select(agregado).where(*condicoes).scalar_subquery())
+
+        valores = db.execute(select(*colunas)).one()
+        return hashlib.sha1(repr([str(valor) for valor in valores]).encode()).hexdigest()
+
+    def chave(self, db: Session, tipo: TipoRelatorio, parametros: dict, usuario: Usuario) -> str:
+        empresa_id = None if usuario.tipo.value == "admin" else usuario.empresa_id
+        versao = self.versao_dados(db, tipo.fontes, parametros.get("evento_id"), empresa_id)
+        identidade = json.dumps({
+            "relatorio": tipo.nome,
+            "parametros": parametros,
+            "escopo": "admin" if empresa_id is None else empresa_id,
+            "versao": versao
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(identidade.encode()).hexdigest()
+
+    def solicitar(self, db: Session, relatorio: str, parametros: dict, usuario: Usuario) -> JobRelatorio:
+        """Criar o job: já concluído se o cache tem o arquivo; reaproveitado se um igual está em andamento"""
+        tipo = self.tipos.get(relatorio)
+        if tipo is None:
+            raise RelatorioInvalido(f"Relatório desconhecido: {relatorio}", status_code=404)
+
+        parametros = {nome: valor for nome, valor in parametros.items() if valor not in (None, "")}
+        chave = self.chave(db, tipo, parametros, usuario)
+
+        if not self._em_cache(chave):
+            em_andamento = db.query(JobRelatorio).filter(
+                JobRelatorio.chave_cache == chave,
+                JobRelatorio.status.in_(["pendente", "processando"])
+            ).first()
+            if em_andamento and em_andamento.id in self._futuros:
+                return em_andamento
+
+        job = JobRelatorio(
+            id=str(uuid.uuid4()),
+            relatorio=relatorio,
+            parametros=json.dumps(parametros, sort_keys=True, default=str),
+            chave_cache=chave,
+            usuario_id=usuario.id
+        )
+        if self._em_cache(chave):
+            self._tocar(chave)
+            job.status, job.cache_hit, job.concluido_em = "concluido", True, datetime.now()
+        db.add(job)
+        db.commit()
+
+        if job.status == "pendente":
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="relatorios")
+            # O worker usa o mesmo banco da requisição
+            futuro = self._executor.submit(self.executar, job.id, db.get_bind())
+            self._futuros[job.id] = futuro
+            futuro.add_done_callback(lambda _: self._futuros.pop(job.id, None))
+        return job
+
+    def executar(self, job_id: str, bind=None) -> str:
+        """Gerar o arquivo do job e gravá-lo no cache (roda no pool)"""
+        db = Session(bind=bind) if bind is not None else self.session_factory()
+        try:
+            job = db.query(JobRelatorio).filter(JobRelatorio.id == job_id).first()
+            job.status = "processando"
+            db.commit()
+
+            try:
+                usuario = db.query(Usuario).filter(Usuario.id == job.usuario_id).first()
+                arquivo = self.tipos[job.relatorio].gerar(db, json.loads(job.parametros), usuario)
+                self._gravar(job.chave_cache, arquivo)
+                job.status = "concluido"
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Erro ao gerar relatório {job.relatorio} (job {job_id}): {e}")
+                job.status, job.erro = "erro", str(e)[:500]
+
+            job.concluido_em = datetime.now()
+            db.commit()
+            return job.status
+        finally:
+            db.close()
+
+    async def aguardar(self, db: Session, job: JobRelatorio, timeout: float) -> JobRelatorio:
+        """Esperar (sem bloquear o loop) um job deste processo; devolve o estado atual"""
+        futuro = self._futuros.get(job.id)
+        if futuro is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(futuro)), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        db.refresh(job)
+        return job
+
+    def arquivo(self, job: JobRelatorio) -> Optional[Tuple[str, dict]]:
+        """Caminho e metadados do resultado em cache (None se expirou)"""
+        if job.status != "concluido" or not self._em_cache(job.chave_cache):
+            return None
+        caminho, caminho_meta = self._caminhos(job.chave_cache)
+        with open(caminho_meta) as meta:
+            return caminho, json.load(meta)
+
+    async def responder(self, db: Session, job: JobRelatorio, assincrono: bool = False, timeout: Optional[float] = None):
+        """
+        Resposta das rotas de exportação: o arquivo, esperando o job terminar, ou, em modo assíncrono (ou
+        com `timeout` explícito, como no download), a situação do job com 202 enquanto não termina
+        """
+        if not assincrono and job.status in ("pendente", "processando"):
+            job = await self.aguardar(db, job, settings.relatorios_espera_segundos if timeout is None else timeout)
+            if timeout is None and job.status in ("pendente", "processando"):
+                return JSONResponse(status_code=504, content={
+                    "detail": f"Relatório ainda em geração após {settings.relatorios_espera_segundos:.0f}s; "
+                              f"acompanhe em /api/relatorios/jobs/{job.id}",
+                    "job_id": job.id
+                })
+
+        if job.status == "erro":
+            return JSONResponse(status_code=500, content={"detail": f"Erro ao gerar relatório: {job.erro}"})
+
+        resultado = self.arquivo(job) if not assincrono else None
+        if resultado is None:
+            return JSONResponse(status_code=202, content=self.situacao(job))
+
+        caminho, meta = resultado
+        return FileResponse(
+            caminho,
+            media_type=meta["media_type"],
+            filename=meta["nome_arquivo"],
+            headers={"X-Job-Id": job.id, "X-Cache": "HIT" if job.cache_hit else "MISS"}
+        )
+
+    def situacao(self, job: JobRelatorio) -> dict:
+        return {
+            "job_id": job.id,
+            "relatorio": job.relatorio,
+            "status": job.status,
+            "cache_hit": bool(job.cache_hit),
+            "erro": job.erro,
+            "criado_em": job.criado_em.isoformat() if job.criado_em else None,
+            "concluido_em": job.concluido_em.isoformat() if job.concluido_em else None,
+            "download_url": f"/api/relatorios/jobs/{job.id}/download" if job.status == "concluido" else None
+        }
+
+    def limpar_cache(self, session_factory=SessionLocal) -> int:
+        """Descartar os arquivos menos usados acima do limite e os jobs com mais de 7 dias (scheduler)"""
+        removidos = 0
+        try:
+            arquivos = []
+            for raiz, _, nomes in os.walk(self.diretorio):
+                for nome in nomes:
+                    if nome.endswith(".bin"):
+                        caminho = os.path.join(raiz, nome)
+                        estado = os.stat(caminho)
+                        arquivos.append((estado.st_mtime, estado.st_size, caminho))
+
+            total = sum(tamanho for _, tamanho, _ in arquivos)
+            for _, tamanho, caminho in sorted(arquivos):
+                if total <= self.limite_cache:
+                    break
+                for alvo in (caminho, caminho[:-4] + ".json"):
+                    try:
+                        os.remove(alvo)
+                    except FileNotFoundError:
+                        pass
+                total -= tamanho
+                removidos += 1
+        except Exception as e:
+            logger.error(f"Erro ao limpar cache de relatórios: {e}")
+
+        db = session_factory()
+        try:
+            db.query(JobRelatorio).filter(
+                JobRelatorio.criado_em < datetime.now() - timedelta(days=7)
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao limpar jobs de relatório: {e}")
+        finally:
+            db.close()
+
+        if removidos:
+            logger.info(f"Relatórios removidos do cache: {removidos}")
+        return removidos
+
+    def _caminhos(self, chave: str) -> Tuple[str, str]:
+        base = os.path.join(self.diretorio, chave[:2], chave)
+        return base + ".bin", base + ".json"
+
+    def _em_cache(self, chave: str) -> bool:
+        caminho, caminho_meta = self._caminhos(chave)
+        return os.path.exists(caminho_meta) and os.path.exists(caminho)
+
+    def _tocar(self, chave: str):
+        """Atualizar o mtime: a limpeza descarta primeiro os menos usados"""
+        try:
+            os.utime(self._caminhos(chave)[0])
+        except FileNotFoundError:
+            pass
+
+    def _gravar(self, chave: str, arquivo: ArquivoRelatorio):
+        """Gravação atômica: conteúdo e depois metadados, cada um via arquivo temporário + rename"""
+        caminho, caminho_meta = self._caminhos(chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        meta = json.dumps({
+            "media_type": arquivo.media_type,
+            "nome_arquivo": arquivo.nome_arquivo,
+            "tamanho": len(arquivo.conteudo),
+            "gerado_em": datetime.now().isoformat()
+        }).encode()
+        for destino, conteudo in ((caminho, arquivo.conteudo), (caminho_meta, meta)):
+            descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho))
+            with os.fdopen(descritor, "wb") as saida:
+                saida.write(conteudo)
+            os.replace(temporario, destino)
+
+relatorio_job_service = RelatorioJobService(
+    diretorio=settings.relatorios_cache_dir,
+    workers=settings.relatorios_workers,
+    limite_cache_mb=settings.relatorios_cache_max_mb
+)
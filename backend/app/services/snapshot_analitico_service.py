@@ -0,0 +1,244 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import select, Integer, Numeric, Enum, DateTime, Date, Boolean
+from ..database import SessionLocal, settings
+from ..models import (
+    Evento, Lista, Produto, Transacao, Checkin, VendaPDV, ItemVendaPDV, PagamentoPDV, MovimentacaoFinanceira,
+    StatusEvento
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class TabelaSnapshot:
+    modelo: type
+    filtro_evento: Callable  # evento_id -> condição
+    extras: Dict[str, object] = field(default_factory=dict)  # coluna derivada -> expressão (com o join abaixo)
+    juncao: Optional[Tuple] = None  # (modelo, condição) para o outer join das colunas derivadas
+    dicionario: Tuple[str, ...] = ()  # colunas de texto repetitivas, gravadas com dicionário (enums já são)
+
+def _vendas_do_evento(evento_id: int):
+    return select(VendaPDV.id).where(VendaPDV.evento_id == evento_id)
+
+TABELAS: Dict[str, TabelaSnapshot] = {
+    "transacoes": TabelaSnapshot(
+        Transacao, lambda evento_id: Transacao.evento_id == evento_id,
+        extras={"lista_nome": Lista.nome}, juncao=(Lista, Lista.id == Transacao.lista_id),
+        dicionario=("metodo_pagamento", "lista_nome")
+    ),
+    "checkins": TabelaSnapshot(
+        Checkin, lambda evento_id: Checkin.evento_id == evento_id,
+        dicionario=("metodo_checkin",)
+    ),
+    "vendas_pdv": TabelaSnapshot(
+        VendaPDV, lambda evento_id: VendaPDV.evento_id == evento_id,
+        dicionario=("cupom_codigo",)
+    ),
+    "itens_venda_pdv": TabelaSnapshot(
+        ItemVendaPDV, lambda evento_id: ItemVendaPDV.venda_id.in_(_vendas_do_evento(evento_id)),
+        extras={"produto_nome": Produto.nome, "produto_categoria": Produto.categoria},
+        juncao=(Produto, Produto.id == ItemVendaPDV.produto_id),
+        dicionario=("produto_nome", "produto_categoria")
+    ),
+    "pagamentos_pdv": TabelaSnapshot(
+        PagamentoPDV, lambda evento_id: PagamentoPDV.venda_id.in_(_vendas_do_evento(evento_id)),
+        dicionario=("status",)
+    ),
+    "movimentacoes_financeiras": TabelaSnapshot(
+        MovimentacaoFinanceira, lambda evento_id: MovimentacaoFinanceira.evento_id == evento_id,
+        dicionario=("categoria", "metodo_pagamento")
+    ),
+}
+
+class SnapshotAnaliticoService:
+    """
+    Snapshot colunar (Parquet) das tabelas de um evento para as análises de financeiro e marketing,
+    lido em lotes por id (sem carregar a tabela toda) e particionado por evento:
+    `<diretorio>/<tabela>/evento_id=<id>/parte-00001.parquet`. No modo incremental cada execução
+    acrescenta uma parte só com as linhas de id maior que o da anterior; o completo regrava tudo.
+    Linhas alteradas depois de exportadas (status de transação, venda cancelada, lançamento
+    editado) só são corrigidas no completo, que o scheduler roda uma vez por dia.
+    """
+
+    def __init__(self, diretorio: str = "exports/analitico", tamanho_lote: int = 50000,
+                 session_factory=SessionLocal):
+        self.diretorio = diretorio
+        self.tamanho_lote = tamanho_lote
+        self.session_factory = session_factory
+        self._locks: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def exportar(self, db: Session, evento_id: int, completo: bool = False) -> dict:
+        """Exportar as tabelas do evento; devolve o manifesto atualizado"""
+        with self._lock:
+            lock_evento = self._locks.setdefault(evento_id, threading.Lock())
+
+        with lock_evento:
+            manifesto = {} if completo else self.manifesto(evento_id)
+            tabelas = manifesto.setdefault("tabelas", {})
+
+            for nome in TABELAS:
+                estado = tabelas.setdefault(nome, {"ultimo_id": 0, "linhas": 0, "partes": []})
+                if completo:
+                    shutil.rmtree(self._particao(nome, evento_id), ignore_errors=True)
+
+                parte = f"parte-{len(estado['partes']) + 1:05d}.parquet"
+                linhas, ultimo_id = self._exportar_tabela(
+                    db, nome, evento_id, estado["ultimo_id"], os.path.join(self._particao(nome, evento_id), parte)
+                )
+                if linhas:
+                    estado["partes"].append(parte)
+                    estado["linhas"] += linhas
+                    estado["ultimo_id"] = ultimo_id
+                estado["novas_linhas"] = linhas
+
+            manifesto.update(evento_id=evento_id, gerado_em=datetime.now().isoformat(),
+                             modo="completo" if completo else "incremental")
+            self._gravar_manifesto(evento_id, manifesto)
+            return manifesto
+
+    def manifesto(self, evento_id: int) -> dict:
+        try:
+            with open(self._caminho_manifesto(evento_id)) as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return {}
+
+    def run_incremental(self, session_factory=SessionLocal) -> int:
+        """Snapshot incremental dos eventos ativos (executado pelo scheduler)"""
+        return self._executar(session_factory, completo=False)
+
+    def run_completo(self, session_factory=SessionLocal) -> int:
+        """Snapshot completo dos eventos ativos, que traz as linhas alteradas (executado pelo scheduler)"""
+        return self._executar(session_factory, completo=True)
+
+    def _executar(self, session_factory, completo: bool) -> int:
+        db = session_factory()
+        try:
+            evento_ids = [evento_id for (evento_id,) in db.query(Evento.id).filter(
+                Evento.status == StatusEvento.ATIVO
+            ).all()]
+            linhas = 0
+            for evento_id in evento_ids:
+                manifesto = self.exportar(db, evento_id, completo=completo)
+                linhas += sum(estado["novas_linhas"] for estado in manifesto["tabelas"].values())
+            return linhas
+        except Exception as e:
+            logger.error(f"Erro no snapshot analítico: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def _exportar_tabela(self, db: Session, nome: str, evento_id: int, desde_id: int, caminho: str) -> Tuple[int, int]:
+        """Ler em lotes por id (keyset) e gravar cada lote como um row group; arquivo só aparece no fim"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tabela = TABELAS[nome]
+        # evento_id fica só no caminho da partição (convenção hive), como nas tabelas que não o têm
+        colunas = [coluna for coluna in tabela.modelo.__table__.columns if coluna.name != "evento_id"]
+        nomes = [coluna.name for coluna in colunas] + list(tabela.extras)
+        schema = pa.schema(
+            [pa.field(coluna.name, self._tipo_arrow(coluna, tabela)) for coluna in colunas]
+            + [pa.field(extra, pa.dictionary(pa.int32(), pa.string())) for extra in tabela.extras]
+        )
+
+        consulta = select(*colunas, *tabela.extras.values()).select_from(tabela.modelo.__table__)
+        if tabela.juncao:
+            consulta = consulta.outerjoin(*tabela.juncao)
+        id_coluna = tabela.modelo.__table__.c.id
+        posicao_id = nomes.index("id")
+        consulta = consulta.where(tabela.filtro_evento(evento_id)).order_by(id_coluna).limit(self.tamanho_lote)
+
+        writer = None
+        temporario = None
+        linhas, ultimo_id = 0, desde_id
+        try:
+            while True:
+                lote = db.execute(consulta.where(id_coluna > ultimo_id)).all()
+                if not lote:
+                    break
+
+                if writer is None:
+                    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix=".tmp")
+                    os.close(descritor)
+                    writer = pq.ParquetWriter(
+                        temporario, schema, compression="zstd",
+                        use_dictionary=[campo.name for campo in schema if pa.types.is_dictionary(campo.type)]
+                    )
+
+                valores = list(zip(*lote))
+                writer.write_batch(pa.record_batch([
+                    self._array(valores[i], schema.field(nome_coluna).type) for i, nome_coluna in enumerate(nomes)
+                ], schema=schema))
+
+                linhas += len(lote)
+                ultimo_id = lote[-1][posicao_id]
+                if len(lote) < self.tamanho_lote:
+                    break
+
+            if writer is not None:
+                writer.close()
+                writer = None
+                os.replace(temporario, caminho)
+                temporario = None
+            return linhas, ultimo_id
+        finally:
+            if writer is not None:
+                writer.close()
+            if temporario and os.path.exists(temporario):
+                os.remove(temporario)
+
+    def _tipo_arrow(self, coluna, tabela: TabelaSnapshot):
+        import pyarrow as pa
+
+        tipo = coluna.type
+        if isinstance(tipo, Enum) or coluna.name in tabela.dicionario:
+            return pa.dictionary(pa.int32(), pa.string())
+        if isinstance(tipo, Boolean):
+            return pa.bool_()
+        if isinstance(tipo, Integer):
+            return pa.int64()
+        if isinstance(tipo, Numeric):
+            return pa.decimal128(tipo.precision or 18, tipo.scale or 2)
+        if isinstance(tipo, DateTime):
+            return pa.timestamp("us", tz="UTC" if tipo.timezone else None)
+        if isinstance(tipo, Date):
+            return pa.date32()
+        return pa.string()
+
+    def _array(self, valores, tipo):
+        import pyarrow as pa
+
+        if pa.types.is_dictionary(tipo):
+            textos = [valor.value if hasattr(valor, "value") else valor for valor in valores]
+            return pa.array(textos, type=pa.string()).dictionary_encode().cast(tipo)
+        return pa.array(valores, type=tipo)
+
+    def _particao(self, nome: str, evento_id: int) -> str:
+        return os.path.join(self.diretorio, nome, f"evento_id={evento_id}")
+
+    def _caminho_manifesto(self, evento_id: int) -> str:
+        return os.path.join(self.diretorio, "_manifestos", f"evento_{evento_id}.json")
+
+    def _gravar_manifesto(self, evento_id: int, manifesto: dict):
+        caminho = self._caminho_manifesto(evento_id)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho))
+        with os.fdopen(descritor, "w") as arquivo:
+            json.dump(manifesto, arquivo, indent=2)
+        os.replace(temporario, caminho)
+
+snapshot_analitico_service = SnapshotAnaliticoService(
+    diretorio=settings.snapshots_analiticos_dir,
+    tamanho_lote=settings.snapshot_lote_linhas
+)
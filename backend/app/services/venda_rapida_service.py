@@ -0,0 +1,138 @@
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+from sqlalchemy.orm import Session
+from sqlalchemy import update, insert, or_
+from ..models import (
+    Produto, VendaPDV, ItemVendaPDV, PagamentoPDV, MovimentoEstoque,
+    StatusVendaPDV, TipoPagamentoPDV
+)
+from .catalogo_service import catalogo_service
+from .comanda_service import comanda_service, SaldoComandaInvalido
+from .caixa_service import caixa_service
+from .financeiro_service import financeiro_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+class VendaRecusada(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+class VendaRapidaService:
+    """Venda por aproximação: comanda pelo índice de códigos, preços pelo catálogo em cache, uma transação"""
+
+    def registrar(self, db: Session, codigo: str, evento_id: int, itens: List, usuario) -> dict:
+        """Debitar a comanda e baixar o estoque; o commit fica a cargo do chamador"""
+        comanda = comanda_service.resolver_codigo(db, codigo)
+        if not comanda or comanda.evento_id != evento_id:
+            raise VendaRecusada("Comanda não encontrada", status_code=404)
+
+        if usuario.tipo.value != "admin" and usuario.empresa_id != comanda.empresa_id:
+            raise VendaRecusada("Acesso negado", status_code=403)
+
+        catalogo = catalogo_service.obter(db, evento_id)
+        quantidades = defaultdict(int)
+        for item in itens:
+            produto = catalogo.get(item.produto_id)
+            if not produto or not produto.vendavel:
+                raise VendaRecusada(f"Produto {item.produto_id} indisponível", status_code=404)
+            quantidades[item.produto_id] += item.quantidade
+
+        valor_total = sum(catalogo[produto_id].preco * quantidade for produto_id, quantidade in quantidades.items())
+
+        try:
+            lancamento = comanda_service.debitar(db, comanda.id, valor_total, evento_id=evento_id, usuario_id=usuario.id)
+        except SaldoComandaInvalido as e:
+            raise VendaRecusada(e.detail, status_code=e.status_code)
+
+        estoques = {}
+        for produto_id in sorted(quantidades):
+            if not catalogo[produto_id].controla_estoque:
+                continue
+            quantidade = quantidades[produto_id]
+            estoque = db.execute(
+                update(Produto).where(
+                    Produto.id == produto_id,
+                    or_(Produto.controla_estoque == False, Produto.estoque_atual >= quantidade)
+                ).values(
+                    estoque_atual=Produto.estoque_atual - quantidade
+                ).returning(Produto.estoque_atual).execution_options(synchronize_session=False)
+            ).scalar_one_or_none()
+            if estoque is None:
+                raise VendaRecusada(f"Estoque insuficiente para {catalogo[produto_id].nome}")
+            estoques[produto_id] = estoque
+
+        caixa_id = caixa_service.registrar_venda(
+            db, evento_id, usuario.id, valor_total, [(TipoPagamentoPDV.SALDO_COMANDA, valor_total)]
+        )
+
+        venda_id, numero_venda = db.execute(
+            insert(VendaPDV).values(
+                numero_venda=f"PDV{datetime.now().strftime('%y%m%d%H%M%S')}{uuid.uuid4().hex[:5].upper()}",
+                valor_total=valor_total,
+                valor_desconto=Decimal('0.00'),
+                valor_final=valor_total,
+                tipo_pagamento=TipoPagamentoPDV.SALDO_COMANDA,
+                status=StatusVendaPDV.APROVADA,
+                comanda_id=comanda.id,
+                evento_id=evento_id,
+                empresa_id=usuario.empresa_id,
+                usuario_vendedor_id=usuario.id,
+                caixa_id=caixa_id
+            ).returning(VendaPDV.id, VendaPDV.numero_venda)
+        ).one()
+        lancamento.venda_id = venda_id
+
+        db.execute(insert(ItemVendaPDV), [{
+            "venda_id": venda_id,
+            "produto_id": produto_id,
+            "quantidade": quantidade,
+            "preco_unitario": catalogo[produto_id].preco,
+            "preco_total": catalogo[produto_id].preco * quantidade
+        } for produto_id, quantidade in quantidades.items()])
+
+        db.execute(insert(PagamentoPDV), [{
+            "venda_id": venda_id,
+            "tipo_pagamento": TipoPagamentoPDV.SALDO_COMANDA,
+            "valor": valor_total,
+            "codigo_transacao": str(uuid.uuid4())
+        }])
+
+        if estoques:
+            db.execute(insert(MovimentoEstoque), [{
+                "produto_id": produto_id,
+                "tipo_movimento": "saida",
+                "quantidade": quantidades[produto_id],
+                "estoque_anterior": estoque + quantidades[produto_id],
+                "estoque_atual": estoque,
+                "motivo": "Venda PDV",
+                "venda_id": venda_id,
+                "usuario_id": usuario.id
+            } for produto_id, estoque in estoques.items()])
+
+        # Linha de totais compartilhada pelo evento: por último, para segurar o lock o mínimo
+        financeiro_service.somar(db, evento_id, total_vendas_pdv=valor_total)
+
+        return {
+            "venda_id": venda_id,
+            "numero_venda": numero_venda,
+            "comanda_id": comanda.id,
+            "valor_final": valor_total,
+            "saldo_atual": lancamento.saldo_apos,
+            "estoques": [
+                {
+                    "produto_id": produto_id,
+                    "produto_nome": catalogo[produto_id].nome,
+                    "estoque_atual": estoque,
+                    "estoque_minimo": catalogo[produto_id].estoque_minimo
+                }
+                for produto_id, estoque in estoques.items()
+            ]
+        }
+
+venda_rapida_service = VendaRapidaService()
@@ -47,6 +47,14 @@ async def notify_stock_update(produto_id: int, evento_id: int, estoque_atual: in
         "timestamp": datetime.now().isoformat()
     })
 
+async def notify_stock_alert(evento_id: int, alerta: dict):
+    """Produto abaixo do mínimo, sem estoque ou com ruptura prevista"""
+    await manager.broadcast_to_event(evento_id, {
+        "type": "stock_alert",
+        "alerta": alerta,
+        "timestamp": datetime.now().isoformat()
+    })
+
 async def notify_new_sale(evento_id: int, venda_data: dict):
     await manager.broadcast_to_event(evento_id, {
         "type": "new_sale",
@@ -54,6 +62,14 @@ async def notify_new_sale(evento_id: int, venda_data: dict):
         "timestamp": datetime.now().isoformat()
     })
 
+async def notify_sync_batch(evento_id: int, lote_data: dict):
+    """Atualização única por lote sincronizado (vendas e estoques afetados)"""
+    await manager.broadcast_to_event(evento_id, {
+        "type": "sync_batch",
+        "lote": lote_data,
+        "timestamp": datetime.now().isoformat()
+    })
+
 async def notify_cash_register_update(evento_id: int, caixa_data: dict):
     await manager.broadcast_to_event(evento_id, {
         "type": "cash_register_update",
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Empresa, Usuario, Evento, Produto, TipoUsuario, TipoProduto
+from app.services.busca_produto_service import BuscaProdutoService
+
+PALAVRAS = ["cerveja", "chopp", "água", "refrigerante", "suco", "energético", "vodka", "gin", "whisky", "caipirinha",
+            "hambúrguer", "pizza", "pastel", "batata", "porção", "lata", "long", "neck", "artesanal", "limão",
+            "laranja", "uva", "morango", "gelo", "copo", "dose", "combo", "duplo", "premium", "tradicional"]
+
+def preparar_base(engine, total_produtos: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Empresa), [{"id": 1, "nome": "Bench", "cnpj": "00000000000100", "email": "bench@bench.com"}])
+        conn.execute(insert(Usuario), [{
+            "id": 1, "cpf": "00000000001", "nome": "Operador", "email": "op@bench.com",
+            "senha_hash": "x", "tipo": TipoUsuario.ADMIN, "empresa_id": 1
+        }])
+        conn.execute(insert(Evento), [{
+            "id": 1, "nome": "Evento", "data_evento": datetime.now(), "local": "Bench",
+            "empresa_id": 1, "criador_id": 1
+        }])
+        conn.execute(insert(Produto), [{
+            "id": i, "nome": " ".join(random.sample(PALAVRAS, 3)) + f" {i}", "tipo": TipoProduto.BEBIDA,
+            "preco": Decimal('12.00'), "estoque_atual": 1000, "codigo_barras": f"789{i:010d}",
+            "codigo_interno": f"PROD{i:06d}", "evento_id": 1, "empresa_id": 1
+        } for i in range(1, total_produtos + 1)])
+
+def medir(funcao, termos):
+    latencias = []
+    for termo in termos:
+        inicio = time.perf_counter()
+        funcao(termo)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    latencias.sort()
+    return statistics.median(latencias), latencias[int(len(latencias) * 0.99) - 1]
+
+def executar_benchmark():
+    parser = argparse.ArgumentParser(description="Busca de produtos do PDV: índice em memória x ILIKE")
+    parser.add_argument("--produtos", type=int, default=5000)
+    parser.add_argument("--buscas", type=int, default=2000)
+    parser.add_argument("--database-url", default="sqlite:///./bench_busca_produtos.db")
+    args = parser.parse_args()
+
+    connect_args = {"check_same_thread": False} if "sqlite" in args.database_url else {}
+    engine = create_engine(args.database_url, connect_args=connect_args)
+    preparar_base(engine, args.produtos)
+    db = sessionmaker(bind=engine)()
+
+    termos = []
+    for _ in range(args.buscas):
+        sorteio = random.random()
+        if sorteio < 0.4:
+            termos.append(f"789{random.randint(1, args.produtos):010d}")
+        else:
+            palavra = random.choice(PALAVRAS)
+            termos.append(palavra[:random.randint(2, len(palavra))])
+
+    service = BuscaProdutoService()
+    inicio = time.perf_counter()
+    service.obter_indice(db, 1)
+    print(f"🏗️ Índice de {args.produtos} produtos construído em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    p50, p99 = medir(lambda termo: service.buscar(db, 1, termo), termos)
+    print(f"⚡ Índice: p50 {p50:.3f} ms | p99 {p99:.3f} ms")
+
+    def ilike(termo):
+        db.query(Produto).filter(
+            Produto.evento_id == 1,
+            Produto.nome.ilike(f"%{termo}%") |
+            Produto.codigo_barras.ilike(f"%{termo}%") |
+            Produto.codigo_interno.ilike(f"%{termo}%")
+        ).order_by(Produto.nome).all()
+
+    p50_ilike, p99_ilike = medir(ilike, termos[:200])
+    print(f"🐢 ILIKE: p50 {p50_ilike:.3f} ms | p99 {p99_ilike:.3f} ms")
+    print(f"✅ Ganho no p50: {p50_ilike / p50:.1f}x")
+    db.close()
+
+if __name__ == "__main__":
+    executar_benchmark()
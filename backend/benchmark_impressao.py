@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import time
+
+from app.services.impressao_service import ImpressaoService, DestinoMemoria, renderizar_comprovante, INICIAR
+from app.services.pdf_service import renderizar
+
+def montar_comprovantes(total: int):
+    comprovantes = []
+    for i in range(total):
+        itens = [{
+            "nome": f"Produto {j}", "quantidade": random.randint(1, 3),
+            "preco_unitario": 12.0, "preco_total": 12.0 * random.randint(1, 3)
+        } for j in range(random.randint(1, 5))]
+        comprovantes.append({
+            "numero_venda": f"PDV{i:08d}", "data": "01/01/2025 22:00", "itens": itens,
+            "valor_final": sum(item["preco_total"] for item in itens), "pagamento": "Saldo Comanda"
+        })
+    return comprovantes
+
+def executar_benchmark():
+    parser = argparse.ArgumentParser(description="Vazão da impressão de comprovantes numa impressora falsa")
+    parser.add_argument("--comprovantes", type=int, default=2000)
+    parser.add_argument("--latencia-ms", type=float, default=20.0, help="tempo de cada envio à impressora")
+    parser.add_argument("--lote", type=int, default=20)
+    args = parser.parse_args()
+
+    comprovantes = montar_comprovantes(args.comprovantes)
+    cabecalho = INICIAR + b"EVENTO BENCH\n"
+
+    inicio = time.perf_counter()
+    tamanho_escpos = sum(len(renderizar_comprovante(cabecalho, dados)) for dados in comprovantes)
+    escpos = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    tamanho_pdf = sum(len(renderizar("comprovante_venda", dados)) for dados in comprovantes)
+    pdf = time.perf_counter() - inicio
+    print(f"⏱️ Renderização: ESC/POS {escpos * 1e6 / args.comprovantes:.0f} µs e {tamanho_escpos / args.comprovantes:.0f} B "
+          f"por comprovante | PDF {pdf * 1e6 / args.comprovantes:.0f} µs e {tamanho_pdf / args.comprovantes:.0f} B")
+
+    for lote in (1, args.lote):
+        service = ImpressaoService(lote_maximo=lote)
+        destino = DestinoMemoria(latencia=args.latencia_ms / 1000)
+        fila = service.registrar("bench", destino)
+
+        inicio = time.perf_counter()
+        for dados in comprovantes:
+            service.enfileirar("bench", cabecalho, dados)
+        fila.aguardar(timeout=3600)
+        duracao = time.perf_counter() - inicio
+        service.encerrar()
+
+        print(f"⏱️ Lote até {lote}: {args.comprovantes} comprovantes em {duracao:.2f}s "
+              f"({args.comprovantes / duracao:.0f}/s, {fila.lotes} envios)")
+
+if __name__ == "__main__":
+    executar_benchmark()
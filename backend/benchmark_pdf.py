@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.pdf_service import PDFService, renderizar
+
+def montar_payloads(total: int):
+    """Mistura de comprovantes de venda, relatórios de evento e relatórios financeiros"""
+    payloads = []
+    for i in range(total):
+        tipo = random.choice(("comprovante_venda", "evento", "financeiro"))
+        if tipo == "comprovante_venda":
+            itens = [{
+                "nome": f"Produto {j}", "quantidade": random.randint(1, 3),
+                "preco_unitario": 12.0, "preco_total": 12.0 * random.randint(1, 3)
+            } for j in range(random.randint(1, 8))]
+            dados = {
+                "numero_venda": f"PDV{i:08d}", "data": "01/01/2025 22:00", "itens": itens,
+                "valor_final": sum(item["preco_total"] for item in itens), "pagamento": "Pix"
+            }
+        elif tipo == "evento":
+            dados = {
+                "nome": f"Evento {i}", "data_evento": "01/01/2025 22:00", "local": "Bench", "endereco": None,
+                "limite_idade": 18, "capacidade_maxima": 5000, "status": "ativo",
+                "total_vendas": random.randint(0, 5000), "receita_total": random.random() * 100000
+            }
+        else:
+            dados = {
+                "evento_nome": f"Evento {i}", "total_entradas": 50000.0, "total_saidas": 12000.0,
+                "movimentacoes": [{
+                    "data": "01/01/2025", "tipo": random.choice(("entrada", "saida")),
+                    "categoria": "Bar", "valor": random.random() * 1000
+                } for _ in range(20)]
+            }
+        payloads.append((tipo, dados))
+    return payloads
+
+def executar_benchmark():
+    parser = argparse.ArgumentParser(description="Vazão da geração de PDF: em processo vs pool de processos")
+    parser.add_argument("--pdfs", type=int, default=600)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clientes", type=int, default=0, help="threads pedindo PDFs em paralelo (0 = 2 por worker)")
+    args = parser.parse_args()
+
+    payloads = montar_payloads(args.pdfs)
+
+    inicio = time.perf_counter()
+    for modelo, dados in payloads:
+        renderizar(modelo, dados)
+    serial = time.perf_counter() - inicio
+    print(f"⏱️ Em processo: {args.pdfs} PDFs em {serial:.2f}s ({args.pdfs / serial:.0f} PDFs/s)")
+
+    service = PDFService(workers=args.workers, max_fila=args.pdfs, timeout=120)
+    service.gerar(*payloads[0])  # sobe os workers fora da medição
+
+    clientes = args.clientes or args.workers * 2
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as chamadores:
+        tamanhos = list(chamadores.map(lambda payload: len(service.gerar(*payload)), payloads))
+    pool = time.perf_counter() - inicio
+    service.encerrar()
+
+    print(f"⏱️ Pool ({args.workers} workers, {clientes} clientes): {args.pdfs} PDFs em {pool:.2f}s "
+          f"({args.pdfs / pool:.0f} PDFs/s, {sum(tamanhos) / 1024:.0f} KB)")
+    print(f"✅ Aceleração: {serial / pool:.2f}x")
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Empresa, Usuario, Evento, Produto, TipoUsuario, TipoProduto
+from app.schemas import SincronizacaoPDVCreate
+from app.services.pdv_sync_service import PDVSyncService
+
+def preparar_base(engine, total_produtos: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Empresa), [{"id": 1, "nome": "Bench", "cnpj": "00000000000100", "email": "bench@bench.com"}])
+        conn.execute(insert(Usuario), [{
+            "id": 1, "cpf": "00000000001", "nome": "Operador", "email": "op@bench.com",
+            "senha_hash": "x", "tipo": TipoUsuario.ADMIN, "empresa_id": 1
+        }])
+        conn.execute(insert(Evento), [{
+            "id": 1, "nome": "Evento", "data_evento": datetime.now(), "local": "Bench",
+            "empresa_id": 1, "criador_id": 1
+        }])
+        conn.execute(insert(Produto), [{
+            "id": i, "nome": f"Produto {i}", "tipo": TipoProduto.BEBIDA, "preco": Decimal('10.00'),
+            "estoque_atual": 100000, "evento_id": 1, "empresa_id": 1
+        } for i in range(1, total_produtos + 1)])
+
+def gerar_lote(terminal: int, total_vendas: int, total_produtos: int) -> SincronizacaoPDVCreate:
+    inicio = datetime.now() - timedelta(minutes=5)
+    vendas = []
+    for i in range(total_vendas):
+        itens = [{
+            "produto_id": random.randint(1, total_produtos),
+            "quantidade": random.randint(1, 3),
+            "preco_unitario": "10.00"
+        } for _ in range(random.randint(1, 4))]
+        total = sum(item["quantidade"] * 10 for item in itens)
+        vendas.append({
+            "id_local": f"T{terminal}-{i}",
+            "registrada_em": inicio + timedelta(seconds=i),
+            "evento_id": 1,
+            "itens": itens,
+            "pagamentos": [{"tipo_pagamento": "CARTAO_CREDITO", "valor": str(total)}]
+        })
+    return SincronizacaoPDVCreate(terminal_id=f"T{terminal}", vendas=vendas)
+
+def executar_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark da sincronização offline de vendas do PDV")
+    parser.add_argument("--terminais", type=int, default=30)
+    parser.add_argument("--vendas-por-terminal", type=int, default=150, help="Backlog de cada terminal (~5 min de bar cheio)")
+    parser.add_argument("--produtos", type=int, default=40)
+    parser.add_argument("--database-url", default="sqlite:///./bench_pdv_sync.db")
+    args = parser.parse_args()
+
+    connect_args = {"check_same_thread": False, "timeout": 60} if "sqlite" in args.database_url else {}
+    engine = create_engine(args.database_url, connect_args=connect_args, pool_size=args.terminais, max_overflow=0)
+    preparar_base(engine, args.produtos)
+    SessionBench = sessionmaker(bind=engine)
+
+    service = PDVSyncService()
+    usuario = SimpleNamespace(id=1, empresa_id=1)
+    lotes = [gerar_lote(t, args.vendas_por_terminal, args.produtos) for t in range(args.terminais)]
+
+    def sincronizar(lote):
+        db = SessionBench()
+        try:
+            resultado = service.aplicar_lote(db, lote, f"pdv_vendas:1:{lote.terminal_id}", usuario)
+            db.commit()
+            return len(resultado["aplicadas"])
+        finally:
+            db.close()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.terminais) as executor:
+        aplicadas = sum(executor.map(sincronizar, lotes))
+    duracao = time.perf_counter() - inicio
+
+    total = args.terminais * args.vendas_por_terminal
+    print(f"⏱️ {total} vendas de {args.terminais} terminais em {duracao:.2f}s ({total / duracao:.0f} vendas/s)")
+    print(f"🧾 Aplicadas: {aplicadas}")
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.terminais) as executor:
+        reaplicadas = sum(executor.map(sincronizar, lotes))
+    print(f"🔁 Reenvio completo em {time.perf_counter() - inicio:.2f}s, vendas duplicadas aplicadas: {reaplicadas}")
+
+    if aplicadas != total or reaplicadas:
+        print("❌ Resultado inesperado")
+        sys.exit(1)
+    print("✅ Backlog absorvido sem duplicidade")
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Empresa, Usuario, Evento, Lista, TipoUsuario, TipoLista
+from app.services.quota_service import QuotaService
+
+def preparar_base(engine, limite: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Empresa), [{"id": 1, "nome": "Bench", "cnpj": "00000000000100", "email": "bench@bench.com"}])
+        conn.execute(insert(Usuario), [{
+            "id": 1, "cpf": "00000000001", "nome": "Admin", "email": "admin@bench.com",
+            "senha_hash": "x", "tipo": TipoUsuario.ADMIN, "empresa_id": 1
+        }])
+        conn.execute(insert(Evento), [{
+            "id": 1, "nome": "Evento", "data_evento": datetime.now(), "local": "Bench",
+            "empresa_id": 1, "criador_id": 1
+        }])
+        conn.execute(insert(Lista), [{
+            "id": 1, "nome": "Lista Quente", "tipo": TipoLista.PAGANTE, "evento_id": 1,
+            "limite_vendas": limite, "vendas_realizadas": 0, "ativa": True
+        }])
+
+def executar_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark de concorrência da cota de listas")
+    parser.add_argument("--requisicoes", type=int, default=5000)
+    parser.add_argument("--limite", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--bloco", type=int, default=0, help="Tamanho do bloco pré-reservado por worker (0 desativa)")
+    parser.add_argument("--database-url", default="sqlite:///./bench_quota.db")
+    args = parser.parse_args()
+
+    connect_args = {"check_same_thread": False, "timeout": 30} if "sqlite" in args.database_url else {}
+    engine = create_engine(args.database_url, connect_args=connect_args, pool_size=args.threads, max_overflow=0)
+    preparar_base(engine, args.limite)
+    SessionBench = sessionmaker(bind=engine)
+
+    service = QuotaService(tamanho_bloco=args.bloco)
+
+    def comprar(_):
+        for _ in range(10):
+            db = SessionBench()
+            try:
+                ok = service.reservar(db, 1)
+                db.commit()
+                return ok
+            except OperationalError:
+                db.rollback()
+            finally:
+                db.close()
+        return False
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        resultados = list(executor.map(comprar, range(args.requisicoes)))
+    duracao = time.perf_counter() - inicio
+
+    service.liberar_blocos(SessionBench)
+
+    db = SessionBench()
+    vendas = db.query(Lista.vendas_realizadas).filter(Lista.id == 1).scalar()
+    db.close()
+
+    aceitas = sum(resultados)
+    print(f"⏱️ {args.requisicoes} requisições em {duracao:.2f}s ({args.requisicoes / duracao:.0f} req/s)")
+    print(f"🎫 Aceitas: {aceitas} | Contador: {vendas} | Limite: {args.limite}")
+
+    if aceitas > args.limite or vendas > args.limite:
+        print("❌ Oversell detectado")
+        sys.exit(1)
+    print("✅ Nenhum oversell")
+
+if __name__ == "__main__":
+    executar_benchmark()
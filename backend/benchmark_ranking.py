@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models import (
+    Base, Empresa, Usuario, Evento, Lista, Transacao, Checkin, Conquista, PromoterConquista,
+    TipoUsuario, TipoLista, StatusTransacao, TipoConquista, NivelBadge
+)
+from app.services.gamificacao_service import GamificacaoService
+
+def popular_base(db, total_transacoes: int, total_promoters: int, total_eventos: int):
+    """Popular a base de benchmark com inserts em lote"""
+    db.execute(insert(Empresa), [{"id": 1, "nome": "Bench", "cnpj": "00000000000100", "email": "bench@bench.com"}])
+    db.execute(insert(Usuario), [{
+        "id": i, "cpf": f"{i:011d}", "nome": f"Promoter {i}", "email": f"p{i}@bench.com",
+        "senha_hash": "x", "tipo": TipoUsuario.PROMOTER, "ativo": True, "empresa_id": 1
+    } for i in range(1, total_promoters + 1)])
+    db.execute(insert(Evento), [{
+        "id": i, "nome": f"Evento {i}", "data_evento": datetime.now(), "local": "Bench",
+        "empresa_id": 1, "criador_id": 1
+    } for i in range(1, total_eventos + 1)])
+
+    listas = []
+    for evento_id in range(1, total_eventos + 1):
+        for promoter_id in range(1, total_promoters + 1):
+            listas.append({
+                "id": len(listas) + 1, "nome": f"Lista {evento_id}-{promoter_id}",
+                "tipo": TipoLista.PROMOTER, "evento_id": evento_id, "promoter_id": promoter_id
+            })
+    db.execute(insert(Lista), listas)
+
+    conquistas = [{
+        "id": i + 1, "nome": f"Vendas {v}", "descricao": f"{v} vendas", "tipo": TipoConquista.VENDAS,
+        "criterio_valor": v, "badge_nivel": NivelBadge.BRONZE
+    } for i, v in enumerate([10, 100, 1000])]
+    db.execute(insert(Conquista), conquistas)
+    db.execute(insert(PromoterConquista), [{
+        "promoter_id": promoter_id, "conquista_id": 1, "valor_alcancado": 10
+    } for promoter_id in range(1, total_promoters + 1)])
+
+    agora = datetime.now()
+    lote = 50_000
+    for inicio in range(0, total_transacoes, lote):
+        transacoes = []
+        checkins = []
+        for i in range(inicio, min(inicio + lote, total_transacoes)):
+            lista = listas[random.randrange(len(listas))]
+            cpf = f"{random.randrange(10**10):011d}"
+            transacoes.append({
+                "cpf_comprador": cpf, "nome_comprador": "Cliente", "valor": 50,
+                "status": StatusTransacao.APROVADA, "codigo_transacao": f"T{i}", "qr_code_ticket": f"Q{i}",
+                "evento_id": lista["evento_id"], "lista_id": lista["id"],
+                "criado_em": agora - timedelta(minutes=random.randrange(60 * 24 * 30))
+            })
+            if random.random() < 0.7:
+                checkins.append({"cpf": cpf, "nome": "Cliente", "evento_id": lista["evento_id"]})
+        db.execute(insert(Transacao), transacoes)
+        db.execute(insert(Checkin), checkins)
+        db.commit()
+
+def executar_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark do ranking gamificado")
+    parser.add_argument("--transacoes", type=int, default=1_000_000)
+    parser.add_argument("--promoters", type=int, default=500)
+    parser.add_argument("--eventos", type=int, default=20)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--database-url", default="sqlite:///./bench_ranking.db")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    inicio = time.perf_counter()
+    popular_base(db, args.transacoes, args.promoters, args.eventos)
+    print(f"📦 Base populada com {args.transacoes} transações em {time.perf_counter() - inicio:.1f}s")
+
+    consultas = []
+    event.listen(engine, "before_cursor_execute", lambda *a, **k: consultas.append(1))
+
+    service = GamificacaoService()
+    tempos = []
+    for _ in range(args.repeticoes):
+        consultas.clear()
+        inicio = time.perf_counter()
+        ranking = service.consultar_ranking(
+            db, periodo_inicio=date.today() - timedelta(days=30), periodo_fim=date.today(), limit=20
+        )
+        tempos.append(time.perf_counter() - inicio)
+
+    print(f"🏆 Top {len(ranking)} em {len(consultas)} consulta(s)")
+    print(f"⏱️ Melhor: {min(tempos) * 1000:.1f} ms | Média: {sum(tempos) / len(tempos) * 1000:.1f} ms")
+
+    db.close()
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Empresa, Usuario, Evento, Produto, Comanda, TipoUsuario, TipoProduto, TipoComanda
+from app.schemas import ItemVendaRapida
+from app.services.venda_rapida_service import VendaRapidaService
+from app.services.comanda_service import comanda_service
+
+def preparar_base(engine, total_comandas: int, total_produtos: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Empresa), [{"id": 1, "nome": "Bench", "cnpj": "00000000000100", "email": "bench@bench.com"}])
+        conn.execute(insert(Usuario), [{
+            "id": 1, "cpf": "00000000001", "nome": "Operador", "email": "op@bench.com",
+            "senha_hash": "x", "tipo": TipoUsuario.ADMIN, "empresa_id": 1
+        }])
+        conn.execute(insert(Evento), [{
+            "id": 1, "nome": "Evento", "data_evento": datetime.now(), "local": "Bench",
+            "empresa_id": 1, "criador_id": 1
+        }])
+        conn.execute(insert(Produto), [{
+            "id": i, "nome": f"Produto {i}", "tipo": TipoProduto.BEBIDA, "preco": Decimal('12.00'),
+            "estoque_atual": 1000000, "evento_id": 1, "empresa_id": 1
+        } for i in range(1, total_produtos + 1)])
+        conn.execute(insert(Comanda), [{
+            "id": i, "numero_comanda": f"C{i}", "tipo": TipoComanda.RFID, "codigo_rfid": f"RFID{i:08d}",
+            "qr_code": f"QR{i:08d}", "saldo_atual": Decimal('100000.00'), "evento_id": 1, "empresa_id": 1
+        } for i in range(1, total_comandas + 1)])
+
+def executar_benchmark():
+    parser = argparse.ArgumentParser(description="Latência da venda por aproximação (tap-to-pay)")
+    parser.add_argument("--vendas", type=int, default=2000)
+    parser.add_argument("--comandas", type=int, default=5000)
+    parser.add_argument("--produtos", type=int, default=60)
+    parser.add_argument("--meta-p99-ms", type=float, default=30.0)
+    parser.add_argument("--database-url", default="sqlite:///./bench_venda_rapida.db")
+    args = parser.parse_args()
+
+    connect_args = {"check_same_thread": False} if "sqlite" in args.database_url else {}
+    engine = create_engine(args.database_url, connect_args=connect_args)
+    preparar_base(engine, args.comandas, args.produtos)
+    SessionBench = sessionmaker(bind=engine)
+
+    service = VendaRapidaService()
+    usuario = SimpleNamespace(id=1, empresa_id=1, tipo=TipoUsuario.ADMIN)
+
+    db = SessionBench()
+    comanda_service.indexar_evento(db, 1)
+    db.close()
+
+    latencias = []
+    for _ in range(args.vendas):
+        codigo = f"RFID{random.randint(1, args.comandas):08d}"
+        itens = [ItemVendaRapida(produto_id=random.randint(1, args.produtos), quantidade=random.randint(1, 2))
+                 for _ in range(random.randint(1, 3))]
+        inicio = time.perf_counter()
+        db = SessionBench()
+        try:
+            service.registrar(db, codigo, 1, itens, usuario)
+            db.commit()
+        finally:
+            db.close()
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    latencias.sort()
+    p50 = statistics.median(latencias)
+    p99 = latencias[int(len(latencias) * 0.99) - 1]
+    print(f"⏱️ {args.vendas} vendas | p50 {p50:.2f} ms | p99 {p99:.2f} ms | máx {latencias[-1]:.2f} ms")
+
+    if p99 > args.meta_p99_ms:
+        print(f"❌ p99 acima da meta de {args.meta_p99_ms} ms")
+        sys.exit(1)
+    print("✅ p99 dentro da meta")
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+from app.database import SessionLocal
+from app.models import CaixaPDV
+from app.services.caixa_service import caixa_service
+
+def reconciliar_caixas():
+    parser = argparse.ArgumentParser(description="Conferir os totais correntes dos caixas PDV contra as vendas registradas")
+    parser.add_argument("--caixa-id", type=int, action="append", help="Caixa a conferir (pode repetir)")
+    parser.add_argument("--evento-id", type=int, help="Conferir todos os caixas do evento")
+    parser.add_argument("--corrigir", action="store_true", help="Regravar os totais apurados nos caixas divergentes")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        query = db.query(CaixaPDV.id).order_by(CaixaPDV.id)
+        if args.caixa_id:
+            query = query.filter(CaixaPDV.id.in_(args.caixa_id))
+        if args.evento_id:
+            query = query.filter(CaixaPDV.evento_id == args.evento_id)
+
+        divergentes = 0
+        for (caixa_id,) in query.all():
+            resultado = caixa_service.reconciliar(db, caixa_id, corrigir=args.corrigir)
+            if resultado["consistente"]:
+                print(f"✅ Caixa {caixa_id}: {resultado['registrado']['quantidade_vendas']} vendas, R$ {resultado['registrado']['valor_vendas']}")
+                continue
+
+            divergentes += 1
+            print(f"❌ Caixa {caixa_id} divergente")
+            print(f"   registrado: {resultado['registrado']}")
+            print(f"   apurado:    {resultado['apurado']}")
+
+        if args.corrigir:
+            db.commit()
+            if divergentes:
+                print(f"✅ {divergentes} caixa(s) corrigido(s)")
+        elif divergentes:
+            print(f"ℹ️ {divergentes} caixa(s) divergente(s); use --corrigir para regravar os totais")
+            sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    reconciliar_caixas()
@@ -5,6 +5,7 @@ from sqlalchemy.orm import sessionmaker
 
 from app.main import app
 from app.database import get_db, Base
+from app.services.relatorio_job_service import relatorio_job_service
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -19,6 +20,11 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+@pytest.fixture(scope="session", autouse=True)
+def cache_relatorios(tmp_path_factory):
+    """Cache de relatórios fora da árvore do projeto"""
+    relatorio_job_service.diretorio = str(tmp_path_factory.mktemp("relatorios"))
+
 @pytest.fixture(scope="session")
 def test_db():
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from datetime import datetime, timedelta
+import asyncio
+
+from app.database import Base
+from app.models import Usuario, Empresa, Evento, Lista, EstadoAlerta, TipoUsuario, TipoLista, StatusEvento
+from app.services.alert_service import AlertService
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def lista_promoter(db_session):
+    empresa = Empresa(nome="Empresa Teste", cnpj="12345678000199", email="teste@empresa.com")
+    db_session.add(empresa)
+    db_session.commit()
+
+    promoter = Usuario(
+        nome="Promoter Teste", email="promoter@teste.com", cpf="98765432109", telefone="11888888888",
+        tipo=TipoUsuario.PROMOTER, empresa_id=empresa.id, senha_hash="$2b$12$test"
+    )
+    db_session.add(promoter)
+    db_session.commit()
+
+    evento = Evento(
+        nome="Evento Teste", data_evento=datetime.now() + timedelta(days=30), local="Local Teste",
+        status=StatusEvento.ATIVO, empresa_id=empresa.id, criador_id=promoter.id
+    )
+    db_session.add(evento)
+    db_session.commit()
+
+    lista = Lista(
+        nome="Lista Teste", tipo=TipoLista.PROMOTER, evento_id=evento.id, promoter_id=promoter.id,
+        limite_vendas=10, vendas_realizadas=9
+    )
+    db_session.add(lista)
+    db_session.commit()
+    return lista
+
+@pytest.fixture
+def service():
+    service = AlertService(timeout_regra=5)
+    service.session_factory = TestingSessionLocal
+    service.alert_rules = {"limite_lista": service.check_limite_lista}
+    return service
+
+class TestAlertService:
+
+    def test_limite_lista_dispara_uma_vez_por_limiar(self, db_session, lista_promoter, service):
+        resultado = asyncio.run(service.run_alert_checks())
+        assert resultado["limite_lista"]["status"] == "sucesso"
+        assert resultado["limite_lista"]["alertas"] == 1
+
+        assert asyncio.run(service.run_alert_checks())["limite_lista"]["alertas"] == 0
+
+        lista_promoter.vendas_realizadas = 10
+        db_session.commit()
+        assert asyncio.run(service.run_alert_checks())["limite_lista"]["alertas"] == 1
+        assert db_session.query(EstadoAlerta).one().nivel == 100
+
+    def test_estado_reinicia_quando_condicao_deixa_de_valer(self, db_session, lista_promoter, service):
+        asyncio.run(service.run_alert_checks())
+
+        lista_promoter.limite_vendas = 100
+        db_session.commit()
+        asyncio.run(service.run_alert_checks())
+        assert db_session.query(EstadoAlerta).count() == 0
+
+        lista_promoter.limite_vendas = 10
+        db_session.commit()
+        assert asyncio.run(service.run_alert_checks())["limite_lista"]["alertas"] == 1
+
+    def test_regra_com_erro_nao_interrompe_as_demais(self, db_session, lista_promoter, service):
+        def regra_quebrada(db):
+            raise RuntimeError("falhou")
+
+        service.alert_rules["quebrada"] = regra_quebrada
+        resultado = asyncio.run(service.run_alert_checks())
+
+        assert resultado["quebrada"]["status"] == "erro"
+        assert resultado["limite_lista"]["alertas"] == 1
+        assert "duracao_ms" in resultado["limite_lista"]
@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.database import Base
+from app.models import Usuario, Empresa, Evento, Lista, TipoUsuario, TipoLista, StatusEvento
+from app.services.cupom_service import CupomService, CupomInvalido
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def lista(db_session):
+    empresa = Empresa(nome="Empresa Teste", cnpj="12345678000199", email="teste@empresa.com")
+    db_session.add(empresa)
+    db_session.commit()
+
+    admin = Usuario(
+        nome="Admin Teste", email="admin@teste.com", cpf="12345678901",
+        tipo=TipoUsuario.ADMIN, empresa_id=empresa.id, senha_hash="$2b$12$test"
+    )
+    db_session.add(admin)
+    db_session.commit()
+
+    evento = Evento(
+        nome="Evento Teste", data_evento=datetime.now() + timedelta(days=30), local="Local Teste",
+        status=StatusEvento.ATIVO, empresa_id=empresa.id, criador_id=admin.id
+    )
+    db_session.add(evento)
+    db_session.commit()
+
+    lista = Lista(
+        nome="Lista Cupom", tipo=TipoLista.PAGANTE, evento_id=evento.id, preco=Decimal('100.00'),
+        codigo_cupom="PROMO10", desconto_percentual=Decimal('10.00'), limite_uso_cupom=2, usos_cupom=0
+    )
+    db_session.add(lista)
+    db_session.commit()
+    return lista
+
+class TestCupomService:
+
+    def test_validar_sem_consultar_banco_apos_carga(self, db_session, lista):
+        service = CupomService()
+        cupom = service.validar(db_session, "PROMO10")
+        assert cupom.usos_restantes == 2
+
+        db_session.query(Lista).filter(Lista.id == lista.id).update({"limite_uso_cupom": 0})
+        db_session.commit()
+        assert service.validar(db_session, "PROMO10").limite_uso == 2
+
+        service.invalidar()
+        assert service.validar(db_session, "PROMO10").limite_uso == 0
+
+        with pytest.raises(CupomInvalido) as erro:
+            service.validar(db_session, "INEXISTENTE")
+        assert erro.value.status_code == 404
+
+    def test_janela_de_validade(self, db_session, lista):
+        lista.data_fim_desconto = datetime.now() - timedelta(days=1)
+        db_session.commit()
+
+        service = CupomService()
+        with pytest.raises(CupomInvalido, match="expirado"):
+            service.validar(db_session, "PROMO10")
+
+    def test_resgate_respeita_limite(self, db_session, lista):
+        service = CupomService()
+        assert service.resgatar(db_session, "PROMO10")
+        assert service.resgatar(db_session, "PROMO10")
+        assert not service.resgatar(db_session, "PROMO10")
+        db_session.commit()
+
+        assert db_session.query(Lista.usos_cupom).filter(Lista.id == lista.id).scalar() == 2
+        with pytest.raises(CupomInvalido, match="Limite"):
+            service.validar(db_session, "PROMO10")
+
+    def test_uso_em_memoria_so_apos_commit(self, db_session, lista):
+        service = CupomService()
+        assert service.validar(db_session, "PROMO10").usos == 0
+
+        assert service.resgatar(db_session, "PROMO10")
+        db_session.rollback()
+        assert service.validar(db_session, "PROMO10").usos == 0
+
+        assert service.resgatar(db_session, "PROMO10")
+        db_session.commit()
+        assert service.validar(db_session, "PROMO10").usos == 1
+
+    def test_calcular_desconto(self, db_session, lista):
+        service = CupomService()
+        cupom = service.validar(db_session, "PROMO10")
+        assert service.calcular_desconto(cupom, Decimal('50.00')) == Decimal('5.00')
+
+        cupom.desconto_valor = Decimal('80.00')
+        assert service.calcular_desconto(cupom, Decimal('50.00')) == Decimal('50.00')
@@ -0,0 +1,159 @@
+import os
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.models import (
+    Usuario, MovimentacaoFinanceira, TotalFinanceiroEvento, ArquivoComprovante, TipoMovimentacaoFinanceira,
+    StatusMovimentacaoFinanceira
+)
+from app.services.financeiro_service import financeiro_service
+from app.services.comprovante_service import comprovante_service
+from tests.test_pdv import client, db_session, cenario, montar_venda, TestingSessionLocal  # noqa: F401 (fixtures)
+
+class TestTotaisFinanceiros:
+
+    def movimentar(self, db_session, cenario, tipo, valor):
+        movimentacao = MovimentacaoFinanceira(
+            evento_id=cenario["evento_id"], tipo=tipo, categoria="Bar", descricao="Teste", valor=valor,
+            status=StatusMovimentacaoFinanceira.PENDENTE, usuario_responsavel_id=db_session.query(Usuario.id).scalar()
+        )
+        db_session.add(movimentacao)
+        db_session.commit()
+
+        # Aprovação, como em atualizar_movimentacao
+        anterior = financeiro_service.contribuicao_movimentacao(movimentacao.tipo, movimentacao.status, movimentacao.valor)
+        movimentacao.status = StatusMovimentacaoFinanceira.APROVADA
+        financeiro_service.registrar_movimentacao(
+            db_session, cenario["evento_id"], anterior,
+            financeiro_service.contribuicao_movimentacao(movimentacao.tipo, movimentacao.status, movimentacao.valor)
+        )
+        db_session.commit()
+
+    def test_caixa_e_dashboard_acompanham_lancamentos(self, client, db_session, cenario):
+        self.movimentar(db_session, cenario, TipoMovimentacaoFinanceira.ENTRADA, Decimal('100.00'))
+
+        aberto = client.post(
+            "/api/financeiro/caixa/abrir",
+            json={"evento_id": cenario["evento_id"], "saldo_inicial": "50.00"},
+            headers=cenario["headers"]
+        )
+        assert aberto.status_code == 200
+        assert Decimal(aberto.json()["saldo_final"]) == Decimal('150.00')
+
+        assert client.post("/api/pdv/vendas", json=montar_venda(cenario, quantidade=2), headers=cenario["headers"]).status_code == 200
+        self.movimentar(db_session, cenario, TipoMovimentacaoFinanceira.SAIDA, Decimal('30.00'))
+
+        painel = client.get(f"/api/financeiro/dashboard/{cenario['evento_id']}", headers=cenario["headers"]).json()
+        assert Decimal(painel["total_entradas"]) == Decimal('100.00')
+        assert Decimal(painel["total_saidas"]) == Decimal('30.00')
+        assert Decimal(painel["total_vendas"]) == Decimal('20.00')
+        assert Decimal(painel["saldo_atual"]) == Decimal('90.00')
+        assert painel["categorias_despesas"] == [{"categoria": "Bar", "total": 30.0}]
+        assert painel["status_caixa"] == "aberto"
+
+        fechado = client.post(f"/api/financeiro/caixa/{aberto.json()['id']}/fechar", headers=cenario["headers"])
+        assert fechado.json()["saldo_final"] == 140.0
+
+        assert financeiro_service.reconciliar(db_session, cenario["evento_id"])["consistente"]
+
+    def test_reconciliacao_corrige_divergencia(self, client, db_session, cenario):
+        financeiro_service.totais(db_session, cenario["evento_id"])
+        financeiro_service.somar(db_session, cenario["evento_id"], total_entradas=Decimal('5.00'))
+        db_session.commit()
+
+        resposta = client.post(
+            f"/api/financeiro/totais/{cenario['evento_id']}/reconciliar", params={"corrigir": True}, headers=cenario["headers"]
+        ).json()
+        assert resposta["consistente"] is False
+        assert financeiro_service.reconciliar(db_session, cenario["evento_id"])["consistente"]
+
+    def test_leitura_nao_grava_e_lancamento_sem_linha_e_somado(self, client, db_session, cenario):
+        assert financeiro_service.totais(db_session, cenario["evento_id"])["total_vendas_pdv"] == Decimal('0.00')
+        assert db_session.query(TotalFinanceiroEvento).count() == 0
+
+        assert client.post("/api/pdv/vendas", json=montar_venda(cenario), headers=cenario["headers"]).status_code == 200
+        db_session.expire_all()
+        assert db_session.query(TotalFinanceiroEvento.total_vendas_pdv).scalar() == Decimal('20.00')
+        assert financeiro_service.reconciliar(db_session, cenario["evento_id"])["consistente"]
+
+class TestComprovantes:
+
+    @pytest.fixture
+    def movimentacao_id(self, db_session, cenario, tmp_path, monkeypatch):
+        monkeypatch.setattr(comprovante_service, "diretorio", str(tmp_path))
+        monkeypatch.setattr(comprovante_service, "session_factory", TestingSessionLocal)
+        monkeypatch.setattr(comprovante_service, "agendar_miniatura", comprovante_service.gerar_miniatura)
+
+        movimentacao = MovimentacaoFinanceira(
+            evento_id=cenario["evento_id"], tipo=TipoMovimentacaoFinanceira.SAIDA, categoria="Bar", descricao="Gelo",
+            valor=Decimal('80.00'), usuario_responsavel_id=db_session.query(Usuario.id).scalar()
+        )
+        db_session.add(movimentacao)
+        db_session.commit()
+        return movimentacao.id
+
+    def png(self):
+        from PIL import Image
+        import io
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 800), (200, 30, 30)).save(buffer, "PNG")
+        return buffer.getvalue()
+
+    def enviar(self, client, cenario, movimentacao_id, conteudo, nome="foto.png"):
+        return client.post(
+            f"/api/financeiro/movimentacoes/{movimentacao_id}/comprovante",
+            files={"file": (nome, conteudo, "image/png")},
+            headers=cenario["headers"]
+        )
+
+    def test_upload_deduplicado_com_miniatura_e_range(self, client, db_session, cenario, movimentacao_id):
+        conteudo = self.png()
+        primeiro = self.enviar(client, cenario, movimentacao_id, conteudo)
+        assert primeiro.status_code == 200
+        assert primeiro.json()["duplicado"] is False
+        assert self.enviar(client, cenario, movimentacao_id, conteudo, nome="outra.png").json()["duplicado"] is True
+
+        url = primeiro.json()["url"]
+        parcial = client.get(url, headers={**cenario["headers"], "Range": "bytes=0-7"})
+        assert parcial.status_code == 206
+        assert parcial.content == conteudo[:8]
+        assert "immutable" in parcial.headers["cache-control"]
+
+        nao_modificado = client.get(url, headers={**cenario["headers"], "If-None-Match": f'"{primeiro.json()["hash"]}"'})
+        assert nao_modificado.status_code == 304
+
+        miniatura = client.get(url, params={"miniatura": True}, headers=cenario["headers"])
+        assert miniatura.status_code == 200
+        assert miniatura.headers["content-type"] == "image/jpeg"
+
+        uso = client.get(f"/api/financeiro/comprovantes/uso/{cenario['evento_id']}", headers=cenario["headers"]).json()
+        assert uso["comprovantes"] == 1
+        assert uso["bytes_armazenados"] == len(conteudo)
+
+    def test_rejeita_conteudo_que_nao_e_imagem_nem_pdf(self, client, cenario, movimentacao_id):
+        resposta = self.enviar(client, cenario, movimentacao_id, b"MZ\x90\x00executavel", nome="foto.png")
+        assert resposta.status_code == 400
+
+    def test_limpeza_conta_o_prazo_desde_a_liberacao(self, client, db_session, cenario, movimentacao_id):
+        primeiro = self.enviar(client, cenario, movimentacao_id, self.png()).json()
+        db_session.query(ArquivoComprovante).update({"criado_em": datetime.now() - timedelta(days=30)})
+        db_session.commit()
+        assert comprovante_service.limpar_orfaos() == 0
+
+        from PIL import Image
+        import io
+        buffer = io.BytesIO()
+        Image.new("RGB", (10, 10), (0, 0, 255)).save(buffer, "PNG")
+        assert self.enviar(client, cenario, movimentacao_id, buffer.getvalue()).status_code == 200
+
+        # Substituído agora: a idade do upload não conta
+        assert comprovante_service.limpar_orfaos() == 0
+
+        db_session.query(ArquivoComprovante).filter(ArquivoComprovante.hash == primeiro["hash"]).update(
+            {"liberado_em": datetime.now() - timedelta(hours=25)}
+        )
+        db_session.commit()
+        assert comprovante_service.limpar_orfaos() == 1
+        assert not os.path.exists(comprovante_service.caminho(primeiro["hash"], "png"))
+        assert db_session.query(ArquivoComprovante).count() == 1
@@ -0,0 +1,221 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from datetime import date, datetime, timedelta
+import asyncio
+import uuid
+
+from app.database import Base
+from app.models import (
+    Usuario, Empresa, Evento, Lista, Transacao, Checkin, Conquista, PromoterConquista, MetricaPromoter,
+    TipoUsuario, TipoLista, StatusEvento, StatusTransacao, TipoConquista, NivelBadge
+)
+from app.services.gamificacao_service import GamificacaoService
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def cenario(db_session):
+    empresa = Empresa(nome="Empresa Teste", cnpj="12345678000199", email="teste@empresa.com")
+    db_session.add(empresa)
+    db_session.commit()
+
+    admin = Usuario(
+        nome="Admin Teste", email="admin@teste.com", cpf="12345678901",
+        tipo=TipoUsuario.ADMIN, empresa_id=empresa.id, senha_hash="$2b$12$test"
+    )
+    promoters = [
+        Usuario(
+            nome=f"Promoter {i}", email=f"promoter{i}@teste.com", cpf=f"9876543210{i}",
+            telefone=f"1188888888{i}", tipo=TipoUsuario.PROMOTER,
+            empresa_id=empresa.id, senha_hash="$2b$12$test", ativo=True
+        ) for i in range(3)
+    ]
+    db_session.add_all([admin] + promoters)
+    db_session.commit()
+
+    evento = Evento(
+        nome="Evento Teste", data_evento=datetime.now() + timedelta(days=10),
+        local="Local Teste", status=StatusEvento.ATIVO,
+        empresa_id=empresa.id, criador_id=admin.id
+    )
+    db_session.add(evento)
+    db_session.commit()
+
+    listas = [
+        Lista(nome=f"Lista {p.nome}", tipo=TipoLista.PROMOTER, evento_id=evento.id, promoter_id=p.id)
+        for p in promoters
+    ]
+    db_session.add_all(listas)
+    db_session.commit()
+
+    def vender(lista, cpf, presente=False):
+        db_session.add(Transacao(
+            cpf_comprador=cpf, nome_comprador="Cliente", valor=50,
+            status=StatusTransacao.APROVADA, evento_id=evento.id, lista_id=lista.id,
+            codigo_transacao=str(uuid.uuid4()), qr_code_ticket=str(uuid.uuid4())
+        ))
+        if presente:
+            db_session.add(Checkin(cpf=cpf, nome="Cliente", evento_id=evento.id))
+
+    for i in range(10):
+        vender(listas[0], f"1000000000{i}", presente=i < 8)
+    for i in range(3):
+        vender(listas[1], f"2000000000{i}")
+
+    db_session.add_all([
+        Conquista(nome="Primeiras Vendas", descricao="5 vendas", tipo=TipoConquista.VENDAS,
+                  criterio_valor=5, badge_nivel=NivelBadge.BRONZE, icone="🥉"),
+        Conquista(nome="Casa Cheia", descricao="80% de presença", tipo=TipoConquista.PRESENCA,
+                  criterio_valor=80, badge_nivel=NivelBadge.PRATA, icone="🥈"),
+        Conquista(nome="Especial", descricao="Manual", tipo=TipoConquista.ESPECIAL,
+                  criterio_valor=0, badge_nivel=NivelBadge.OURO, icone="🥇"),
+    ])
+    db_session.commit()
+
+    return promoters
+
+class TestGamificacaoService:
+
+    def test_calcular_metricas_agrupadas(self, db_session, cenario):
+        metricas = GamificacaoService().calcular_metricas(db_session)
+
+        assert metricas[cenario[0].id][TipoConquista.VENDAS] == 10
+        assert metricas[cenario[0].id][TipoConquista.PRESENCA] == 80
+        assert metricas[cenario[1].id][TipoConquista.VENDAS] == 3
+        assert metricas[cenario[1].id][TipoConquista.PRESENCA] == 0
+        assert cenario[2].id not in metricas
+
+    def test_avaliar_conquistas_em_lote(self, db_session, cenario):
+        service = GamificacaoService()
+        novas = service.avaliar_conquistas(db_session)
+
+        assert sorted(c.nome for c in novas[cenario[0].id]) == ["Casa Cheia", "Primeiras Vendas"]
+        assert cenario[1].id not in novas
+        assert db_session.query(PromoterConquista).count() == 2
+
+        assert service.avaliar_conquistas(db_session) == {}
+        assert db_session.query(PromoterConquista).count() == 2
+
+    def test_notificar_conquistas_marca_notificado(self, db_session, cenario):
+        service = GamificacaoService(tamanho_lote_notificacao=1)
+        service.avaliar_conquistas(db_session)
+
+        total = asyncio.run(service.notificar_conquistas(db_session))
+
+        assert total == 2
+        assert db_session.query(PromoterConquista).filter(PromoterConquista.notificado == False).count() == 0
+        assert asyncio.run(service.notificar_conquistas(db_session)) == 0
+
+    def test_consultar_ranking_sem_fan_out(self, db_session, cenario):
+        evento_id = db_session.query(Evento.id).scalar()
+        db_session.add(Checkin(cpf="10000000000", nome="Cliente", evento_id=evento_id))
+        db_session.commit()
+
+        ranking = GamificacaoService().consultar_ranking(
+            db_session, periodo_inicio=date.today() - timedelta(days=1), periodo_fim=date.today()
+        )
+
+        assert [r.promoter_id for r in ranking] == [cenario[0].id, cenario[1].id]
+        assert ranking[0].total_vendas == 10
+        assert float(ranking[0].receita_gerada) == 500
+        assert ranking[0].total_presentes == 9
+        assert ranking[0].eventos_ativos == 1
+        assert ranking[1].total_presentes == 0
+
+    def test_snapshot_metricas_alimenta_ranking(self, db_session, cenario):
+        service = GamificacaoService()
+
+        assert service.consultar_ranking_snapshot(db_session) is None
+
+        service.gerar_snapshot_metricas(db_session, date.today() - timedelta(days=1))
+        total = service.gerar_snapshot_metricas(db_session)
+        assert service.gerar_snapshot_metricas(db_session) == total
+
+        metrica = db_session.query(MetricaPromoter).filter(
+            MetricaPromoter.promoter_id == cenario[0].id,
+            MetricaPromoter.evento_id.is_(None),
+            MetricaPromoter.empresa_id.is_(None),
+            MetricaPromoter.periodo_fim == date.today()
+        ).one()
+        assert metrica.total_vendas == 10
+        assert float(metrica.taxa_presenca) == 80
+        assert metrica.posicao_geral == 1
+        assert metrica.streak_vendas == 1
+
+        ranking = service.consultar_ranking_snapshot(db_session)
+
+        assert [r.promoter_id for r in ranking] == [cenario[0].id, cenario[1].id]
+        assert ranking[0].total_presentes == 8
+        assert ranking[0].eventos_ativos == 1
+        assert ranking[0].posicao_anterior is None
+        assert ranking[0].streak_vendas == 1
+
+    def test_snapshot_por_empresa_do_evento(self, db_session, cenario):
+        outra = Empresa(nome="Outra Empresa", cnpj="99999999000199", email="outra@empresa.com")
+        db_session.add(outra)
+        db_session.commit()
+        evento = Evento(
+            nome="Evento Outra", data_evento=datetime.now() + timedelta(days=10), local="Outro Local",
+            status=StatusEvento.ATIVO, empresa_id=outra.id, criador_id=cenario[0].id
+        )
+        db_session.add(evento)
+        db_session.commit()
+        lista = Lista(nome="Lista Outra", tipo=TipoLista.PROMOTER, evento_id=evento.id, promoter_id=cenario[1].id)
+        db_session.add(lista)
+        db_session.commit()
+        for i in range(20):
+            db_session.add(Transacao(
+                cpf_comprador=f"3000000000{i}", nome_comprador="Cliente", valor=50,
+                status=StatusTransacao.APROVADA, evento_id=evento.id, lista_id=lista.id,
+                codigo_transacao=str(uuid.uuid4()), qr_code_ticket=str(uuid.uuid4())
+            ))
+        db_session.commit()
+
+        service = GamificacaoService()
+        service.gerar_snapshot_metricas(db_session)
+        empresa_id = cenario[0].empresa_id
+
+        for filtro in ({}, {"empresa_id": empresa_id}, {"empresa_id": outra.id}):
+            snapshot = service.consultar_ranking_snapshot(db_session, **filtro)
+            ao_vivo = service.consultar_ranking(
+                db_session, periodo_inicio=date.today() - timedelta(days=29), periodo_fim=date.today(), **filtro
+            )
+            assert [(r.promoter_id, r.total_vendas) for r in snapshot] == [(r.promoter_id, r.total_vendas) for r in ao_vivo]
+
+        assert [r.promoter_id for r in service.consultar_ranking_snapshot(db_session, empresa_id=empresa_id)] == [
+            cenario[0].id, cenario[1].id
+        ]
+
+    def test_snapshot_so_recalcula_periodo_alterado(self, db_session, cenario):
+        service = GamificacaoService()
+        recalculos = []
+        atribuir = service._atribuir_posicoes
+        service._atribuir_posicoes = lambda linhas: recalculos.append(len(linhas)) or atribuir(linhas)
+
+        total = service.gerar_snapshot_metricas(db_session)
+        assert service.gerar_snapshot_metricas(db_session) == total
+        assert len(recalculos) == 3  # evento, empresa e geral: uma vez só
+
+        lista = db_session.query(Lista).filter(Lista.promoter_id == cenario[2].id).one()
+        db_session.add(Transacao(
+            cpf_comprador="40000000000", nome_comprador="Cliente", valor=50,
+            status=StatusTransacao.APROVADA, evento_id=lista.evento_id, lista_id=lista.id,
+            codigo_transacao=str(uuid.uuid4()), qr_code_ticket=str(uuid.uuid4())
+        ))
+        db_session.commit()
+
+        assert service.gerar_snapshot_metricas(db_session) == total + 3
+        assert len(recalculos) == 6
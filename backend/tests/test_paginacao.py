@@ -0,0 +1,90 @@
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from datetime import datetime
+
+from app.database import Base
+from app.models import Empresa, Usuario, TipoUsuario
+from app.schemas import Empresa as EmpresaSchema, Usuario as UsuarioSchema
+from app.pagination import paginar, responder, codificar_cursor, decodificar_cursor
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def empresas(db_session):
+    # Metade com criado_em do servidor (mesmo segundo), metade com data explícita
+    for i in range(7):
+        db_session.add(Empresa(nome=f"Empresa {i}", cnpj=f"{i:014d}", email=f"e{i}@teste.com"))
+    for i in range(7, 12):
+        db_session.add(Empresa(
+            nome=f"Empresa {i}", cnpj=f"{i:014d}", email=f"e{i}@teste.com",
+            criado_em=datetime(2020, 1, 1, 12, 0, i, 250000)
+        ))
+    db_session.commit()
+
+class TestPaginacao:
+
+    def test_percorre_todas_as_paginas_sem_repetir(self, db_session, empresas):
+        vistos, cursor, paginas = [], None, 0
+        while True:
+            pagina = paginar(db_session.query(Empresa), Empresa, cursor=cursor, limit=5)
+            if paginas == 0:
+                assert pagina.total_estimado == 12
+            else:
+                assert pagina.total_estimado is None
+            vistos.extend(empresa.id for empresa in pagina.itens)
+            paginas += 1
+            cursor = pagina.proximo_cursor
+            if not cursor:
+                break
+
+        assert paginas == 3
+        assert sorted(vistos) == list(range(1, 13))
+        assert len(vistos) == len(set(vistos))
+        # Datas explícitas são mais antigas e vêm por último
+        assert vistos[-5:] == [12, 11, 10, 9, 8]
+
+    def test_projecao_e_cabecalhos(self, db_session, empresas):
+        pagina = paginar(db_session.query(Empresa), Empresa, limit=3, campos="nome", esquema=EmpresaSchema)
+        assert set(pagina.itens[0]) == {"id", "criado_em", "nome"}
+
+        resposta = responder(pagina, Response())
+        assert resposta.headers["X-Next-Cursor"] == pagina.proximo_cursor
+        assert resposta.headers["X-Total-Count"] == "12"
+
+        with pytest.raises(HTTPException):
+            paginar(db_session.query(Empresa), Empresa, campos="senha_hash", esquema=EmpresaSchema)
+
+    def test_projecao_limitada_ao_schema_de_resposta(self, db_session, empresas):
+        db_session.add(Usuario(
+            cpf="12345678901", nome="Promoter", email="p@teste.com", senha_hash="hash-secreto",
+            tipo=TipoUsuario.PROMOTER, empresa_id=1
+        ))
+        db_session.commit()
+
+        with pytest.raises(HTTPException) as erro:
+            paginar(db_session.query(Usuario), Usuario, campos="nome,senha_hash", esquema=UsuarioSchema)
+        assert erro.value.status_code == 400
+
+        pagina = paginar(db_session.query(Usuario), Usuario, campos="nome,tipo", esquema=UsuarioSchema)
+        assert pagina.itens == [{"id": 1, "criado_em": pagina.itens[0]["criado_em"], "nome": "Promoter", "tipo": "promoter"}]
+
+    def test_cursor_opaco(self):
+        momento = datetime(2024, 5, 1, 10, 30, 15, 123000)
+        assert decodificar_cursor(codificar_cursor(momento, 42)) == (momento, 42)
+
+        with pytest.raises(HTTPException):
+            decodificar_cursor("invalido")
@@ -0,0 +1,725 @@
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from collections import deque
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.main import app
+from app.database import get_db, Base
+from app.models import (
+    Usuario, Empresa, Evento, Lista, Produto, Comanda, VendaPDV, RecargaComanda, LancamentoComanda, CaixaPDV,
+    MovimentoEstoque, SnapshotEstoque, MovimentoEstoqueArquivo, CaixaEvento,
+    TipoUsuario, StatusEvento, StatusVendaPDV, TipoProduto, TipoComanda, TipoLista
+)
+from app.auth import criar_access_token
+from app.services.comanda_service import comanda_service
+from app.services.cupom_service import cupom_service
+from app.services.catalogo_service import catalogo_service
+from app.services.painel_pdv_service import painel_pdv_service
+from app.services.alerta_estoque_service import AlertaEstoqueService, BaixaEstoque, alerta_estoque_service
+from app.services.estoque_service import estoque_service
+from app.services.pdf_service import PDFService, PDFIndisponivel
+from app.services.receipt_service import receipt_service
+from app.services.snapshot_analitico_service import snapshot_analitico_service
+from app.services.impressao_service import ImpressaoService, impressao_service, DestinoMemoria, TrabalhoImpressao, INICIAR, CORTE
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def cenario(db_session):
+    empresa = Empresa(nome="Empresa Teste", cnpj="12345678000199", email="teste@empresa.com")
+    db_session.add(empresa)
+    db_session.commit()
+
+    admin = Usuario(
+        nome="Admin Teste", email="admin@teste.com", cpf="12345678901",
+        tipo=TipoUsuario.ADMIN, empresa_id=empresa.id, senha_hash="$2b$12$test", ativo=True
+    )
+    db_session.add(admin)
+    db_session.commit()
+
+    evento = Evento(
+        nome="Evento Teste", data_evento=datetime.now() + timedelta(days=30), local="Local Teste",
+        status=StatusEvento.ATIVO, empresa_id=empresa.id, criador_id=admin.id
+    )
+    db_session.add(evento)
+    db_session.commit()
+
+    produto = Produto(
+        nome="Cerveja", tipo=TipoProduto.BEBIDA, preco=Decimal('10.00'), estoque_atual=10,
+        evento_id=evento.id, empresa_id=empresa.id
+    )
+    comanda = Comanda(
+        numero_comanda="C001", tipo=TipoComanda.FISICA, saldo_atual=Decimal('100.00'),
+        qr_code="QR-C001", evento_id=evento.id, empresa_id=empresa.id
+    )
+    db_session.add_all([produto, comanda])
+    db_session.commit()
+
+    catalogo_service.invalidar()
+    comanda_service.invalidar_indice()
+    painel_pdv_service.invalidar()
+    alerta_estoque_service.invalidar()
+    alerta_estoque_service.session_factory = TestingSessionLocal
+
+    token = criar_access_token(data={"sub": admin.cpf})
+    return {
+        "evento_id": evento.id,
+        "produto_id": produto.id,
+        "comanda_id": comanda.id,
+        "headers": {"Authorization": f"Bearer {token}", "X-Terminal-Id": "T1"}
+    }
+
+def montar_venda(cenario, quantidade=2):
+    return {
+        "evento_id": cenario["evento_id"],
+        "comanda_id": cenario["comanda_id"],
+        "itens": [{"produto_id": cenario["produto_id"], "quantidade": quantidade, "preco_unitario": "10.00"}],
+        "pagamentos": [{"tipo_pagamento": "CARTAO_CREDITO", "valor": str(10 * quantidade)}]
+    }
+
+class TestIdempotenciaPDV:
+
+    def test_reenvio_de_venda_nao_reexecuta(self, client, db_session, cenario):
+        headers = {**cenario["headers"], "Idempotency-Key": "venda-1"}
+
+        primeira = client.post("/api/pdv/vendas", json=montar_venda(cenario), headers=headers)
+        assert primeira.status_code == 200
+        reenvio = client.post("/api/pdv/vendas", json=montar_venda(cenario), headers=headers)
+        assert reenvio.status_code == 200
+        assert reenvio.json()["id"] == primeira.json()["id"]
+
+        assert db_session.query(VendaPDV).count() == 1
+        assert db_session.query(Produto.estoque_atual).scalar() == 8
+        assert db_session.query(Comanda.saldo_atual).scalar() == Decimal('80.00')
+
+    def test_mesma_chave_em_outro_terminal_e_outra_venda(self, client, db_session, cenario):
+        for terminal in ("T1", "T2"):
+            headers = {**cenario["headers"], "X-Terminal-Id": terminal, "Idempotency-Key": "venda-1"}
+            assert client.post("/api/pdv/vendas", json=montar_venda(cenario, 1), headers=headers).status_code == 200
+
+        assert db_session.query(VendaPDV).count() == 2
+
+        headers = {**cenario["headers"], "Idempotency-Key": "venda-1"}
+        resposta = client.post("/api/pdv/vendas", json=montar_venda(cenario, 3), headers=headers)
+        assert resposta.status_code == 422
+
+    def test_reenvio_de_recarga(self, client, db_session, cenario):
+        headers = {**cenario["headers"], "Idempotency-Key": "recarga-1"}
+        url = f"/api/pdv/comandas/{cenario['comanda_id']}/recarga"
+        corpo = {"comanda_id": cenario["comanda_id"], "valor": "50.00", "tipo_pagamento": "PIX"}
+
+        primeira = client.post(url, json=corpo, headers=headers)
+        reenvio = client.post(url, json=corpo, headers=headers)
+        assert primeira.status_code == reenvio.status_code == 200
+        assert reenvio.json() == primeira.json()
+
+        assert db_session.query(RecargaComanda).count() == 1
+        assert db_session.query(Comanda.saldo_atual).scalar() == Decimal('150.00')
+
+class TestSincronizacaoOffline:
+
+    def montar_lote(self, cenario):
+        vendas = []
+        for i, quantidade in enumerate([4, 8]):
+            venda = montar_venda(cenario, quantidade)
+            venda.pop("comanda_id")
+            vendas.append({**venda, "id_local": f"off-{i}", "registrada_em": "2026-01-10T22:15:00"})
+        invalida = montar_venda(cenario, 1)
+        invalida["itens"][0]["produto_id"] = 999
+        vendas.append({**invalida, "id_local": "off-invalida"})
+        return {"terminal_id": "T1", "vendas": vendas}
+
+    def test_aplica_lote_e_reporta_conflitos(self, client, db_session, cenario):
+        resposta = client.post("/api/pdv/sync", json=self.montar_lote(cenario), headers=cenario["headers"])
+        assert resposta.status_code == 200
+        dados = resposta.json()
+
+        assert [v["id_local"] for v in dados["aplicadas"]] == ["off-0", "off-1"]
+        assert [v["id_local"] for v in dados["rejeitadas"]] == ["off-invalida"]
+        assert dados["conflitos"] == [{
+            "tipo": "estoque_negativo", "produto_id": cenario["produto_id"],
+            "produto_nome": "Cerveja", "estoque_atual": -2
+        }]
+
+        assert db_session.query(VendaPDV).count() == 2
+        assert db_session.query(Produto.estoque_atual).scalar() == -2
+        assert db_session.query(VendaPDV.criado_em).first()[0].date().isoformat() == "2026-01-10"
+
+    def test_reenvio_do_lote_nao_duplica(self, client, db_session, cenario):
+        client.post("/api/pdv/sync", json=self.montar_lote(cenario), headers=cenario["headers"])
+        resposta = client.post("/api/pdv/sync", json=self.montar_lote(cenario), headers=cenario["headers"])
+
+        dados = resposta.json()
+        assert dados["aplicadas"] == []
+        assert {v["id_local"] for v in dados["duplicadas"]} == {"off-0", "off-1"}
+        assert db_session.query(VendaPDV).count() == 2
+        assert db_session.query(Produto.estoque_atual).scalar() == -2
+
+    def test_venda_online_reenviada_no_lote(self, client, db_session, cenario):
+        headers = {**cenario["headers"], "Idempotency-Key": "venda-online"}
+        online = client.post("/api/pdv/vendas", json=montar_venda(cenario), headers=headers).json()
+
+        lote = {"terminal_id": "T1", "vendas": [{**montar_venda(cenario), "id_local": "venda-online"}]}
+        dados = client.post("/api/pdv/sync", json=lote, headers=cenario["headers"]).json()
+
+        assert dados["duplicadas"] == [{"id_local": "venda-online", "venda_id": online["id"], "numero_venda": online["numero_venda"]}]
+        assert db_session.query(Comanda.saldo_atual).scalar() == Decimal('80.00')
+
+    def test_cupom_offline_validado_e_descontado(self, client, db_session, cenario):
+        db_session.add(Lista(
+            nome="Promo", tipo=TipoLista.PAGANTE, evento_id=cenario["evento_id"], codigo_cupom="PROMO10",
+            desconto_percentual=Decimal('10.00'), limite_uso_cupom=1, usos_cupom=0, ativa=True
+        ))
+        db_session.commit()
+        cupom_service.invalidar()
+
+        vendas = []
+        for id_local, cupom, valor in [("com-cupom", "PROMO10", "18.00"), ("inexistente", "NAOEXISTE", "10.00"),
+                                       ("valor-errado", "PROMO10", "15.00"), ("sem-usos", "PROMO10", "18.00")]:
+            venda = montar_venda(cenario)
+            venda["pagamentos"][0]["valor"] = valor
+            vendas.append({**venda, "id_local": id_local, "cupom_codigo": cupom})
+
+        dados = client.post("/api/pdv/sync", json={"terminal_id": "T1", "vendas": vendas}, headers=cenario["headers"]).json()
+
+        assert [v["id_local"] for v in dados["aplicadas"]] == ["com-cupom"]
+        assert [v["id_local"] for v in dados["rejeitadas"]] == ["inexistente", "valor-errado", "sem-usos"]
+        assert dados["conflitos"] == []
+        venda = db_session.query(VendaPDV).one()
+        assert (venda.valor_desconto, venda.valor_final) == (Decimal('2.00'), Decimal('18.00'))
+        assert db_session.query(Lista.usos_cupom).scalar() == 1
+
+    def test_produto_e_comanda_de_outro_evento_sao_rejeitados(self, client, db_session, cenario):
+        outra = Empresa(nome="Outra", cnpj="98765432000199", email="outra@empresa.com")
+        db_session.add(outra)
+        db_session.commit()
+        evento = Evento(
+            nome="Evento Alheio", data_evento=datetime.now() + timedelta(days=30), local="Outro",
+            status=StatusEvento.ATIVO, empresa_id=outra.id, criador_id=db_session.query(Usuario.id).scalar()
+        )
+        db_session.add(evento)
+        db_session.commit()
+        produto = Produto(nome="Vinho", tipo=TipoProduto.BEBIDA, preco=Decimal('10.00'), estoque_atual=10,
+                          evento_id=evento.id, empresa_id=outra.id)
+        comanda = Comanda(numero_comanda="X001", tipo=TipoComanda.FISICA, saldo_atual=Decimal('100.00'),
+                          qr_code="QR-X001", evento_id=evento.id, empresa_id=outra.id)
+        db_session.add_all([produto, comanda])
+        db_session.commit()
+
+        com_produto = montar_venda(cenario, 1)
+        com_produto.pop("comanda_id")
+        com_produto["itens"][0]["produto_id"] = produto.id
+        com_comanda = {**montar_venda(cenario, 1), "comanda_id": comanda.id}
+        lote = {"terminal_id": "T1", "vendas": [{**com_produto, "id_local": "produto-alheio"},
+                                                 {**com_comanda, "id_local": "comanda-alheia"}]}
+
+        dados = client.post("/api/pdv/sync", json=lote, headers=cenario["headers"]).json()
+
+        assert dados["aplicadas"] == []
+        assert [v["id_local"] for v in dados["rejeitadas"]] == ["produto-alheio", "comanda-alheia"]
+        db_session.expire_all()
+        assert db_session.get(Produto, produto.id).estoque_atual == 10
+        assert db_session.get(Comanda, comanda.id).saldo_atual == Decimal('100.00')
+
+class TestSaldoComanda:
+
+    def test_debito_sem_saldo_nao_grava_nada(self, client, db_session, cenario):
+        resposta = client.post("/api/pdv/vendas", json=montar_venda(cenario, 11), headers=cenario["headers"])
+        assert resposta.status_code == 400
+        assert resposta.json()["detail"] == "Saldo insuficiente na comanda"
+
+        assert db_session.query(VendaPDV).count() == 0
+        assert db_session.query(Produto.estoque_atual).scalar() == 10
+        assert db_session.query(LancamentoComanda).count() == 0
+
+    def test_livro_acompanha_saldo(self, client, db_session, cenario):
+        url = f"/api/pdv/comandas/{cenario['comanda_id']}/recarga"
+        client.post(url, json={"comanda_id": cenario["comanda_id"], "valor": "30.00", "tipo_pagamento": "PIX"}, headers=cenario["headers"])
+        venda = client.post("/api/pdv/vendas", json=montar_venda(cenario, 2), headers=cenario["headers"]).json()
+
+        lancamentos = db_session.query(LancamentoComanda).order_by(LancamentoComanda.id).all()
+        assert [(l.tipo, l.valor, l.saldo_apos) for l in lancamentos] == [
+            ("recarga", Decimal('30.00'), Decimal('130.00')),
+            ("debito", Decimal('-20.00'), Decimal('110.00'))
+        ]
+        assert lancamentos[1].venda_id == venda["id"]
+
+        saldo, livro = comanda_service.conferir_saldo(db_session, cenario["comanda_id"])
+        assert saldo - livro == Decimal('100.00')  # saldo inicial criado fora do livro
+
+    def test_consulta_saldo_por_qr_code(self, client, cenario):
+        resposta = client.get("/api/pdv/comandas/saldo/QR-C001", headers=cenario["headers"])
+        assert resposta.status_code == 200
+        assert resposta.json()["saldo_atual"] == 100.0
+
+        assert client.get("/api/pdv/comandas/saldo/NAO-EXISTE", headers=cenario["headers"]).status_code == 404
+
+class TestVendaRapida:
+
+    def test_venda_por_qr_code(self, client, db_session, cenario):
+        corpo = {"codigo": "QR-C001", "evento_id": cenario["evento_id"], "itens": [{"produto_id": cenario["produto_id"], "quantidade": 3}]}
+        resposta = client.post("/api/pdv/vendas/rapida", json=corpo, headers=cenario["headers"])
+        assert resposta.status_code == 200
+        dados = resposta.json()
+        assert Decimal(dados["valor_final"]) == Decimal('30.00')
+        assert Decimal(dados["saldo_atual"]) == Decimal('70.00')
+
+        assert db_session.query(Produto.estoque_atual).scalar() == 7
+        assert db_session.query(Comanda.saldo_atual).scalar() == Decimal('70.00')
+        assert db_session.query(LancamentoComanda.venda_id).scalar() == dados["venda_id"]
+
+    def test_estoque_insuficiente_desfaz_debito(self, client, db_session, cenario):
+        corpo = {"codigo": "QR-C001", "evento_id": cenario["evento_id"], "itens": [{"produto_id": cenario["produto_id"], "quantidade": 11}]}
+        db_session.query(Comanda).update({"saldo_atual": Decimal('500.00')})
+        db_session.commit()
+
+        resposta = client.post("/api/pdv/vendas/rapida", json=corpo, headers=cenario["headers"])
+        assert resposta.status_code == 400
+        assert db_session.query(Comanda.saldo_atual).scalar() == Decimal('500.00')
+        assert db_session.query(VendaPDV).count() == 0
+
+    def test_codigo_desconhecido(self, client, cenario):
+        corpo = {"codigo": "NAO-EXISTE", "evento_id": cenario["evento_id"], "itens": [{"produto_id": cenario["produto_id"]}]}
+        assert client.post("/api/pdv/vendas/rapida", json=corpo, headers=cenario["headers"]).status_code == 404
+
+    def test_abertura_do_caixa_indexa_comandas(self, client, db_session, cenario):
+        resposta = client.post("/api/pdv/caixa/abrir", json={"numero_caixa": "01", "evento_id": cenario["evento_id"]}, headers=cenario["headers"])
+        assert resposta.status_code == 200
+
+        assert comanda_service.resolver_codigo(None, "QR-C001").id == cenario["comanda_id"]
+        assert comanda_service.indexar_evento(db_session, cenario["evento_id"]) == 0
+
+class TestCatalogoVersionado:
+
+    def test_snapshot_e_delta(self, client, db_session, cenario):
+        url = f"/api/pdv/catalogo/{cenario['evento_id']}"
+        completo = client.get(url, headers=cenario["headers"]).json()
+        assert completo["completo"] is True
+        assert [produto["id"] for produto in completo["produtos"]] == [cenario["produto_id"]]
+        versao = completo["versao"]
+
+        vazio = client.get(url, params={"desde_versao": versao}, headers=cenario["headers"]).json()
+        assert vazio["completo"] is False and vazio["produtos"] == []
+
+        corpo = {
+            "nome": "Cerveja Long Neck", "tipo": "BEBIDA", "preco": "12.00",
+            "estoque_atual": 10, "evento_id": cenario["evento_id"]
+        }
+        assert client.put(f"/api/pdv/produtos/{cenario['produto_id']}", json=corpo, headers=cenario["headers"]).status_code == 200
+
+        delta = client.get(url, params={"desde_versao": versao}, headers=cenario["headers"]).json()
+        assert delta["versao"] > versao
+        assert [(produto["nome"], produto["preco"]) for produto in delta["produtos"]] == [("Cerveja Long Neck", "12.00")]
+
+    def test_baixa_de_estoque_gera_nova_versao(self, client, db_session, cenario):
+        url = f"/api/pdv/catalogo/{cenario['evento_id']}"
+        versao = client.get(url, headers=cenario["headers"]).json()["versao"]
+
+        corpo = {"codigo": "QR-C001", "evento_id": cenario["evento_id"], "itens": [{"produto_id": cenario["produto_id"], "quantidade": 2}]}
+        assert client.post("/api/pdv/vendas/rapida", json=corpo, headers=cenario["headers"]).status_code == 200
+
+        # A leitura não publica a baixa; o job do scheduler sim, numa sessão própria
+        catalogo_service.invalidar(cenario["evento_id"])
+        assert client.get(url, params={"desde_versao": versao}, headers=cenario["headers"]).json()["produtos"] == []
+
+        assert catalogo_service.run_publicar_estoque(TestingSessionLocal) == 1
+        delta = client.get(url, params={"desde_versao": versao}, headers=cenario["headers"]).json()
+        assert [produto["estoque_atual"] for produto in delta["produtos"]] == [8]
+
+class TestBuscaProdutos:
+
+    @pytest.fixture
+    def catalogo(self, db_session, cenario):
+        produto = db_session.get(Produto, cenario["produto_id"])
+        produto.codigo_barras = "7891234567890"
+        db_session.add_all([
+            Produto(nome="Cerveja Artesanal IPA", tipo=TipoProduto.BEBIDA, preco=Decimal('25.00'),
+                    evento_id=cenario["evento_id"], empresa_id=produto.empresa_id),
+            Produto(nome="Água Mineral", tipo=TipoProduto.BEBIDA, preco=Decimal('5.00'),
+                    evento_id=cenario["evento_id"], empresa_id=produto.empresa_id),
+        ])
+        db_session.commit()
+        return cenario
+
+    def buscar(self, client, cenario, termo):
+        resposta = client.get("/api/pdv/produtos/busca", params={"evento_id": cenario["evento_id"], "q": termo}, headers=cenario["headers"])
+        assert resposta.status_code == 200
+        return [produto["nome"] for produto in resposta.json()]
+
+    def test_codigo_de_barras_exato(self, client, catalogo):
+        assert self.buscar(client, catalogo, "7891234567890") == ["Cerveja"]
+
+    def test_prefixo_sem_acento(self, client, catalogo):
+        assert self.buscar(client, catalogo, "agu") == ["Água Mineral"]
+        assert set(self.buscar(client, catalogo, "cerv")) == {"Cerveja", "Cerveja Artesanal IPA"}
+
+    def test_erro_de_digitacao_por_trigramas(self, client, catalogo):
+        assert self.buscar(client, catalogo, "artezanal") == ["Cerveja Artesanal IPA"]
+
+    def test_mais_vendidos_primeiro(self, client, catalogo):
+        corpo = {"codigo": "QR-C001", "evento_id": catalogo["evento_id"], "itens": [{"produto_id": catalogo["produto_id"], "quantidade": 1}]}
+        assert client.post("/api/pdv/vendas/rapida", json=corpo, headers=catalogo["headers"]).status_code == 200
+
+        assert self.buscar(client, catalogo, "cerveja")[0] == "Cerveja"
+
+    def test_listagem_busca_trecho_do_codigo_e_indica_corte(self, client, catalogo):
+        url = "/api/pdv/produtos"
+        por_codigo = client.get(url, params={"evento_id": catalogo["evento_id"], "busca": "4567"}, headers=catalogo["headers"])
+        assert [produto["nome"] for produto in por_codigo.json()] == ["Cerveja"]
+        assert por_codigo.headers["x-truncated"] == "false"
+
+        cortada = client.get(url, params={"evento_id": catalogo["evento_id"], "busca": "cerv", "limite": 1}, headers=catalogo["headers"])
+        assert len(cortada.json()) == 1
+        assert cortada.headers["x-truncated"] == "true"
+
+class TestTotaisCaixa:
+
+    @pytest.fixture
+    def caixa_id(self, client, cenario):
+        resposta = client.post("/api/pdv/caixa/abrir", json={"numero_caixa": "01", "evento_id": cenario["evento_id"]}, headers=cenario["headers"])
+        assert resposta.status_code == 200
+        return resposta.json()["id"]
+
+    def test_relatorios_usam_totais_correntes(self, client, db_session, cenario, caixa_id):
+        assert client.post("/api/pdv/vendas", json=montar_venda(cenario, quantidade=2), headers=cenario["headers"]).status_code == 200
+        rapida = {"codigo": "QR-C001", "evento_id": cenario["evento_id"], "itens": [{"produto_id": cenario["produto_id"], "quantidade": 1}]}
+        assert client.post("/api/pdv/vendas/rapida", json=rapida, headers=cenario["headers"]).status_code == 200
+
+        relatorio = client.get(f"/api/pdv/relatorios/x/{caixa_id}", params={"limit": 1}, headers=cenario["headers"]).json()
+        assert relatorio["total_vendas"] == 2
+        assert relatorio["valor_total"] == 30.0
+        assert relatorio["totais_por_pagamento"] == {"CARTAO_CREDITO": 20.0, "SALDO_COMANDA": 10.0}
+        assert len(relatorio["vendas"]) == 1 and relatorio["proximo_cursor"]
+
+        seguinte = client.get(
+            f"/api/pdv/relatorios/x/{caixa_id}", params={"limit": 1, "cursor": relatorio["proximo_cursor"]}, headers=cenario["headers"]
+        ).json()
+        assert len(seguinte["vendas"]) == 1 and seguinte["proximo_cursor"] is None
+
+        fechado = client.post(f"/api/pdv/caixa/{caixa_id}/fechar", params={"valor_fechamento": "30.00"}, headers=cenario["headers"])
+        assert Decimal(fechado.json()["valor_vendas"]) == Decimal('30.00')
+
+        z = client.get(f"/api/pdv/relatorios/z/{caixa_id}", headers=cenario["headers"]).json()
+        assert z["tipo"] == "relatorio_z" and z["diferenca"] == 0.0
+
+    def test_reconciliacao_detecta_e_corrige(self, client, db_session, cenario, caixa_id):
+        assert client.post("/api/pdv/vendas", json=montar_venda(cenario), headers=cenario["headers"]).status_code == 200
+        url = f"/api/pdv/caixa/{caixa_id}/reconciliar"
+        assert client.post(url, headers=cenario["headers"]).json()["consistente"] is True
+
+        db_session.query(CaixaPDV).update({"valor_vendas": Decimal('999.00')})
+        db_session.commit()
+        assert client.post(url, headers=cenario["headers"]).json()["consistente"] is False
+
+        assert client.post(url, params={"corrigir": True}, headers=cenario["headers"]).status_code == 200
+        assert client.post(url, headers=cenario["headers"]).json()["consistente"] is True
+
+class TestPainelPDV:
+
+    def test_dashboard_reconstruido_e_alimentado_pelas_vendas(self, client, db_session, cenario):
+        assert client.post("/api/pdv/vendas", json=montar_venda(cenario, quantidade=2), headers=cenario["headers"]).status_code == 200
+
+        url = f"/api/pdv/dashboard/{cenario['evento_id']}"
+        painel = client.get(url, headers=cenario["headers"]).json()
+        assert painel["vendas_hoje"] == 1
+        assert Decimal(painel["valor_vendas_hoje"]) == Decimal('20.00')
+        assert len(painel["vendas_por_hora"]) == 24
+        assert painel["vendas_por_hora"][-1]["vendas"] == 1
+        assert painel["produtos_mais_vendidos"] == [{"produto_id": cenario["produto_id"], "produto_nome": "Cerveja", "quantidade": 2}]
+
+        rapida = {"codigo": "QR-C001", "evento_id": cenario["evento_id"], "itens": [{"produto_id": cenario["produto_id"], "quantidade": 3}]}
+        assert client.post("/api/pdv/vendas/rapida", json=rapida, headers=cenario["headers"]).status_code == 200
+
+        painel = client.get(url, headers=cenario["headers"]).json()
+        assert painel["vendas_hoje"] == 2
+        assert painel["produtos_mais_vendidos"][0]["quantidade"] == 5
+
+    def test_alerta_de_estoque_baixo(self, client, db_session, cenario):
+        db_session.query(Produto).update({"estoque_minimo": 10})
+        db_session.commit()
+
+        painel = client.get(f"/api/pdv/dashboard/{cenario['evento_id']}", headers=cenario["headers"]).json()
+        assert painel["produtos_em_falta"] == 1
+        assert painel["alertas"][0]["tipo"] == "estoque_baixo"
+        assert painel["alertas"][0]["produto_id"] == cenario["produto_id"]
+
+class TestAlertaEstoque:
+
+    def baixa(self, estoque_atual, quantidade=1, estoque_minimo=5):
+        return BaixaEstoque(produto_id=1, produto_nome="Cerveja", estoque_atual=estoque_atual,
+                            estoque_minimo=estoque_minimo, quantidade=quantidade)
+
+    def test_alerta_uma_vez_por_nivel(self):
+        service = AlertaEstoqueService(minutos_ruptura=30)
+        inicio = datetime(2026, 1, 1, 22, 0)
+
+        assert service.registrar_baixas([self.baixa(1000)], momento=inicio) == []
+        assert [a["tipo"] for a in service.registrar_baixas([self.baixa(5)], momento=inicio)] == ["estoque_minimo"]
+        assert service.registrar_baixas([self.baixa(4)], momento=inicio) == []
+        assert [a["tipo"] for a in service.registrar_baixas([self.baixa(0)], momento=inicio)] == ["sem_estoque"]
+
+    def test_previsao_de_ruptura_pelo_ritmo_de_vendas(self):
+        service = AlertaEstoqueService(minutos_ruptura=30, constante_tempo_minutos=15)
+        inicio = datetime(2026, 1, 1, 22, 0)
+
+        alertas = []
+        for minuto in range(10):
+            alertas += service.registrar_baixas([self.baixa(200 - minuto * 10, quantidade=10)], momento=inicio + timedelta(minutes=minuto))
+
+        assert [alerta["tipo"] for alerta in alertas] == ["ruptura_prevista"]
+        assert alertas[0]["minutos_para_ruptura"] <= 30
+
+    def test_reposicao_permite_novo_alerta(self):
+        service = AlertaEstoqueService()
+        inicio = datetime(2026, 1, 1, 22, 0)
+
+        assert service.registrar_baixas([self.baixa(3)], momento=inicio)
+        assert service.registrar_baixas([self.baixa(500)], momento=inicio + timedelta(hours=2)) == []
+        assert service.registrar_baixas([self.baixa(4)], momento=inicio + timedelta(hours=3))
+
+    def test_venda_dispara_stock_alert(self, client, db_session, cenario, monkeypatch):
+        from app.routers import pdv
+        enviados = []
+
+        async def capturar(evento_id, alerta):
+            enviados.append((evento_id, alerta))
+
+        monkeypatch.setattr(pdv, "notify_stock_alert", capturar)
+        db_session.query(Produto).update({"estoque_minimo": 5})
+        db_session.commit()
+
+        rapida = {"codigo": "QR-C001", "evento_id": cenario["evento_id"], "itens": [{"produto_id": cenario["produto_id"], "quantidade": 5}]}
+        assert client.post("/api/pdv/vendas/rapida", json=rapida, headers=cenario["headers"]).status_code == 200
+
+        assert [(evento_id, alerta["tipo"], alerta["estoque_atual"]) for evento_id, alerta in enviados] == [
+            (cenario["evento_id"], "estoque_minimo", 5)
+        ]
+
+class TestHistoricoEstoque:
+
+    @pytest.fixture
+    def historico(self, db_session, cenario):
+        """Saídas de 2 e 3 nas duas primeiras horas, snapshot entre elas e reposição de 5 na terceira"""
+        usuario_id = db_session.query(Usuario.id).scalar()
+        produto_id = cenario["produto_id"]
+        base = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=5)
+
+        def movimentar(minutos, tipo, quantidade, anterior, atual):
+            db_session.add(MovimentoEstoque(
+                produto_id=produto_id, tipo_movimento=tipo, quantidade=quantidade, estoque_anterior=anterior,
+                estoque_atual=atual, usuario_id=usuario_id, criado_em=base + timedelta(minutes=minutos)
+            ))
+            db_session.query(Produto).filter(Produto.id == produto_id).update({"estoque_atual": atual})
+            db_session.commit()
+
+        movimentar(10, "saida", 2, 10, 8)
+        movimentar(70, "saida", 3, 8, 5)
+        assert estoque_service.tirar_snapshots(db_session) == 1
+        db_session.query(SnapshotEstoque).update({"tirado_em": base + timedelta(minutes=90)})
+        db_session.commit()
+        movimentar(130, "entrada", 5, 5, 10)
+        return base
+
+    def posicoes(self, db_session, cenario, base):
+        return [
+            estoque_service.estoque_em(db_session, cenario["produto_id"], base + timedelta(minutes=minutos))
+            for minutos in (0, 30, 100, 140)
+        ]
+
+    def test_posicao_por_snapshot_mais_variacao(self, db_session, cenario, historico):
+        assert self.posicoes(db_session, cenario, historico) == [10, 8, 5, 10]
+        # Sem movimento novo não há snapshot novo
+        assert estoque_service.tirar_snapshots(db_session) == 1
+        assert estoque_service.tirar_snapshots(db_session) == 0
+
+    def test_resumos_e_arquivo_preservam_historico(self, client, db_session, cenario, historico):
+        assert estoque_service.consolidar(db_session) == 3
+        assert estoque_service.consolidar(db_session) == 0
+        assert estoque_service.arquivar(db_session, antes_de=datetime.now()) == 3
+        db_session.commit()
+
+        assert db_session.query(MovimentoEstoque).count() == 0
+        assert db_session.query(MovimentoEstoqueArquivo).count() == 1
+        assert self.posicoes(db_session, cenario, historico) == [10, 8, 5, 10]
+
+        resposta = client.get(
+            "/api/pdv/estoque/movimentacao",
+            params={"evento_id": cenario["evento_id"], "inicio": historico.isoformat()},
+            headers=cenario["headers"]
+        )
+        assert resposta.status_code == 200
+        assert [(linha["saidas"], linha["entradas"], linha["variacao"]) for linha in resposta.json()] == [
+            (2, 0, -2), (3, 0, -3), (0, 5, 5)
+        ]
+
+        posicao = client.get(
+            f"/api/pdv/estoque/{cenario['produto_id']}/posicao",
+            params={"momento": (historico + timedelta(minutes=30)).isoformat()},
+            headers=cenario["headers"]
+        ).json()
+        assert posicao["estoque"] == 8
+
+class TestGeracaoPDF:
+
+    def test_comprovante_de_venda_renderizado_no_pool(self, client, db_session, cenario):
+        venda_id = client.post("/api/pdv/vendas", json=montar_venda(cenario), headers=cenario["headers"]).json()["id"]
+        venda = db_session.get(VendaPDV, venda_id)
+
+        dados = receipt_service.dados_comprovante(venda)
+        assert dados["itens"] == [{"nome": "Cerveja", "quantidade": 2, "preco_unitario": 10.0, "preco_total": 20.0}]
+        assert receipt_service.gerar_comprovante_pdf(venda).startswith(b"%PDF")
+
+    def test_fila_cheia_recusa_sem_esperar(self):
+        service = PDFService(workers=1, max_fila=0)
+        with pytest.raises(PDFIndisponivel) as erro:
+            service.gerar("evento", {})
+        assert erro.value.status_code == 503
+
+class TestImpressaoComprovantes:
+
+    @pytest.fixture
+    def impressora(self, monkeypatch):
+        monkeypatch.setattr(impressao_service, "espera_retentativa", 0)
+        impressao_service._cabecalhos.clear()
+        destino = DestinoMemoria()
+        impressao_service.registrar("BAR1", destino)
+        yield destino
+        impressao_service.encerrar()
+
+    def vender(self, client, cenario, terminal="BAR1", quantidade=1):
+        corpo = {"codigo": "QR-C001", "evento_id": cenario["evento_id"], "itens": [{"produto_id": cenario["produto_id"], "quantidade": quantidade}]}
+        return client.post("/api/pdv/vendas/rapida", json=corpo, headers={**cenario["headers"], "X-Terminal-Id": terminal})
+
+    def test_venda_imprime_escpos_na_impressora_do_terminal(self, client, cenario, impressora):
+        numero = self.vender(client, cenario, quantidade=2).json()["numero_venda"]
+        assert self.vender(client, cenario, terminal="OUTRO").status_code == 200  # sem impressora: só não imprime
+
+        assert impressao_service.filas["BAR1"].aguardar()
+        comprovante = b"".join(impressora.envios)
+        assert comprovante.startswith(INICIAR)
+        assert comprovante.endswith(CORTE)
+        assert numero.encode() in comprovante
+        assert b"Evento Teste" in comprovante
+        assert b"Cerveja" in comprovante and b"R$ 20.00" in comprovante
+
+    def test_falha_no_envio_e_repetida(self, client, cenario, impressora):
+        impressora.falhas = 1
+        self.vender(client, cenario)
+
+        fila = impressao_service.filas["BAR1"]
+        assert fila.aguardar()
+        assert fila.impressos == 1
+        assert len(impressora.envios) == 1
+        assert fila.falhas == deque()
+
+    def test_comprovantes_na_fila_saem_no_mesmo_envio(self, cenario):
+        destino = DestinoMemoria(latencia=0.05)
+        fila = impressao_service.registrar("LENTA", destino)
+        dados = {"numero_venda": "PDV1", "data": "01/01/2025 22:00", "itens": [], "valor_final": 0.0}
+        for _ in range(6):
+            fila.enfileirar(TrabalhoImpressao(cabecalho=INICIAR, dados=dados))
+
+        assert fila.aguardar()
+        assert fila.impressos == 6
+        assert fila.lotes < 6
+        impressao_service.encerrar()
+
+    def test_impressora_configurada_durante_o_carregamento_nao_some(self, monkeypatch):
+        service = ImpressaoService(impressoras="padrao=memoria://")
+        registrar = service.registrar
+
+        def registrar_lento(nome, destino):
+            time.sleep(0.2)
+            return registrar(nome, destino)
+
+        monkeypatch.setattr(service, "registrar", registrar_lento)
+        primeira = threading.Thread(target=service.impressora_para, args=("BAR1",))
+        primeira.start()
+        time.sleep(0.05)
+
+        assert service.impressora_para("BAR1") is not None
+        primeira.join()
+        service.encerrar()
+
+class TestSnapshotAnalitico:
+
+    @pytest.fixture(autouse=True)
+    def diretorio(self, tmp_path, monkeypatch):
+        pytest.importorskip("pyarrow")
+        monkeypatch.setattr(snapshot_analitico_service, "diretorio", str(tmp_path))
+        monkeypatch.setattr(snapshot_analitico_service, "tamanho_lote", 2)
+        return tmp_path
+
+    def test_snapshot_completo_e_incremental(self, client, cenario, diretorio):
+        import pyarrow.dataset as ds
+
+        for _ in range(3):
+            assert client.post("/api/pdv/vendas", json=montar_venda(cenario, 1), headers=cenario["headers"]).status_code == 200
+
+        url = f"/api/relatorios/snapshots/{cenario['evento_id']}"
+        manifesto = client.post(url, params={"completo": True}, headers=cenario["headers"]).json()
+        assert manifesto["tabelas"]["vendas_pdv"]["linhas"] == 3
+        assert manifesto["tabelas"]["checkins"]["partes"] == []
+
+        itens = ds.dataset(diretorio / "itens_venda_pdv", format="parquet", partitioning="hive").to_table()
+        assert itens.num_rows == 3
+        assert itens.column("produto_nome").type.value_type == "string"  # dicionário
+        assert set(itens.column("evento_id").to_pylist()) == {cenario["evento_id"]}
+
+        client.post("/api/pdv/vendas", json=montar_venda(cenario, 1), headers=cenario["headers"])
+        manifesto = client.post(url, headers=cenario["headers"]).json()
+        vendas = manifesto["tabelas"]["vendas_pdv"]
+        assert (vendas["novas_linhas"], vendas["linhas"], len(vendas["partes"])) == (1, 4, 2)
+
+        tabela = ds.dataset(diretorio / "vendas_pdv", format="parquet", partitioning="hive").to_table()
+        assert sorted(tabela.column("status").to_pylist()) == ["APROVADA"] * 4
+        assert client.get(url, headers=cenario["headers"]).json()["modo"] == "incremental"
+
+    def test_completo_agendado_traz_linhas_alteradas(self, client, db_session, cenario, diretorio):
+        import pyarrow.dataset as ds
+
+        assert client.post("/api/pdv/vendas", json=montar_venda(cenario, 1), headers=cenario["headers"]).status_code == 200
+        assert snapshot_analitico_service.run_incremental(TestingSessionLocal) > 0
+
+        db_session.query(VendaPDV).update({"status": StatusVendaPDV.CANCELADA})
+        db_session.commit()
+
+        def status_exportados():
+            tabela = ds.dataset(diretorio / "vendas_pdv", format="parquet", partitioning="hive").to_table()
+            return tabela.column("status").to_pylist()
+
+        snapshot_analitico_service.run_incremental(TestingSessionLocal)
+        assert status_exportados() == ["APROVADA"]  # o incremental só vê ids novos
+
+        snapshot_analitico_service.run_completo(TestingSessionLocal)
+        assert status_exportados() == ["CANCELADA"]
+
@@ -0,0 +1,129 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import OperationalError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app.database import Base
+from app.models import Usuario, Empresa, Evento, Lista, TipoUsuario, TipoLista, StatusEvento
+from app.services.quota_service import QuotaService, RESERVA_BLOCO, RESERVA_BANCO
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False, "timeout": 30})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def lista(db_session):
+    empresa = Empresa(nome="Empresa Teste", cnpj="12345678000199", email="teste@empresa.com")
+    db_session.add(empresa)
+    db_session.commit()
+
+    admin = Usuario(
+        nome="Admin Teste", email="admin@teste.com", cpf="12345678901",
+        tipo=TipoUsuario.ADMIN, empresa_id=empresa.id, senha_hash="$2b$12$test"
+    )
+    db_session.add(admin)
+    db_session.commit()
+
+    evento = Evento(
+        nome="Evento Teste", data_evento=datetime.now() + timedelta(days=30), local="Local Teste",
+        status=StatusEvento.ATIVO, empresa_id=empresa.id, criador_id=admin.id
+    )
+    db_session.add(evento)
+    db_session.commit()
+
+    lista = Lista(nome="Lista Teste", tipo=TipoLista.PAGANTE, evento_id=evento.id, limite_vendas=20, vendas_realizadas=0)
+    db_session.add(lista)
+    db_session.commit()
+    return lista
+
+def vendas_realizadas(lista_id):
+    db = TestingSessionLocal()
+    try:
+        return db.query(Lista.vendas_realizadas).filter(Lista.id == lista_id).scalar()
+    finally:
+        db.close()
+
+class TestQuotaService:
+
+    @pytest.mark.parametrize("tamanho_bloco", [0, 3])
+    def test_reservas_concorrentes_sem_oversell(self, lista, tamanho_bloco):
+        service = QuotaService(tamanho_bloco=tamanho_bloco)
+        lista_id = lista.id
+
+        def comprar(_):
+            for _ in range(20):
+                db = TestingSessionLocal()
+                try:
+                    ok = service.reservar(db, lista_id)
+                    db.commit()
+                    return ok
+                except OperationalError:
+                    db.rollback()
+                finally:
+                    db.close()
+            return None
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            resultados = list(executor.map(comprar, range(60)))
+
+        service.liberar_blocos(TestingSessionLocal)
+
+        assert sum(1 for origem in resultados if origem) == 20
+        assert vendas_realizadas(lista_id) == 20
+
+    def test_reservar_ate_parcial(self, db_session, lista):
+        service = QuotaService()
+        lista.vendas_realizadas = 15
+        db_session.commit()
+
+        assert service.reservar_ate(db_session, lista.id, 10) == 5
+        db_session.commit()
+        assert service.reservar_ate(db_session, lista.id, 1) == 0
+        assert vendas_realizadas(lista.id) == 20
+
+    def test_lista_sem_limite_e_lista_inativa(self, db_session, lista):
+        service = QuotaService()
+        lista.limite_vendas = None
+        db_session.commit()
+        assert service.reservar(db_session, lista.id, 100) == RESERVA_BANCO
+        db_session.commit()
+
+        lista.ativa = False
+        db_session.commit()
+        assert service.reservar(db_session, lista.id) is None
+        assert vendas_realizadas(lista.id) == 100
+
+    def test_liberar_devolve_vagas(self, db_session, lista):
+        service = QuotaService()
+        assert service.reservar(db_session, lista.id, 20) == RESERVA_BANCO
+        assert service.reservar(db_session, lista.id) is None
+
+        service.liberar(db_session, lista.id, 2)
+        db_session.commit()
+        assert service.reservar(db_session, lista.id, 2) == RESERVA_BANCO
+
+    def test_origem_da_vaga(self, db_session, lista):
+        service = QuotaService(tamanho_bloco=3)
+        lista.vendas_realizadas = 18
+        db_session.commit()
+
+        assert service.reservar(db_session, lista.id) == RESERVA_BLOCO
+        assert service.reservar(db_session, lista.id) == RESERVA_BLOCO
+        assert service.reservar(db_session, lista.id) is None
+        assert service.reservar(db_session, lista.id, 2) is None
+        assert vendas_realizadas(lista.id) == 20
+
+        service.devolver_reserva_local(lista.id)
+        assert service.reservar(db_session, lista.id) == RESERVA_BLOCO
@@ -0,0 +1,78 @@
+import dataclasses
+import threading
+import pytest
+from decimal import Decimal
+
+from app.database import settings
+from app.models import Usuario, MovimentacaoFinanceira, TipoMovimentacaoFinanceira
+from app.services.relatorio_job_service import relatorio_job_service
+from tests.test_pdv import client, db_session, cenario  # noqa: F401 (fixtures)
+
+class TestJobsRelatorio:
+
+    @pytest.fixture(autouse=True)
+    def cache(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(relatorio_job_service, "diretorio", str(tmp_path))
+
+    def exportar(self, client, cenario, **params):
+        return client.get(
+            f"/api/financeiro/relatorio/{cenario['evento_id']}/export/csv", params=params, headers=cenario["headers"]
+        )
+
+    def test_exportacao_repetida_vem_do_cache_ate_os_dados_mudarem(self, client, db_session, cenario):
+        primeiro = self.exportar(client, cenario)
+        assert primeiro.status_code == 200
+        assert primeiro.headers["x-cache"] == "MISS"
+        assert primeiro.headers["content-type"].startswith("text/csv")
+
+        repetido = self.exportar(client, cenario)
+        assert repetido.headers["x-cache"] == "HIT"
+        assert repetido.content == primeiro.content
+
+        db_session.add(MovimentacaoFinanceira(
+            evento_id=cenario["evento_id"], tipo=TipoMovimentacaoFinanceira.ENTRADA, categoria="Patrocínio",
+            descricao="Cota", valor=Decimal('500.00'), usuario_responsavel_id=db_session.query(Usuario.id).scalar()
+        ))
+        db_session.commit()
+
+        atualizado = self.exportar(client, cenario)
+        assert atualizado.headers["x-cache"] == "MISS"
+        assert "Patrocínio" in atualizado.text
+
+    def test_modo_assincrono_devolve_job_para_consulta(self, client, cenario):
+        resposta = self.exportar(client, cenario, assincrono=True)
+        assert resposta.status_code == 202
+        job_id = resposta.json()["job_id"]
+
+        futuro = relatorio_job_service._futuros.get(job_id)
+        if futuro:
+            futuro.result(timeout=30)
+        situacao = client.get(f"/api/relatorios/jobs/{job_id}", headers=cenario["headers"]).json()
+        assert situacao["status"] == "concluido"
+
+        download = client.get(situacao["download_url"], headers=cenario["headers"])
+        assert download.status_code == 200
+        assert download.headers["x-job-id"] == job_id
+
+    def test_exportacao_sincrona_espera_o_job_ou_falha_claramente(self, client, cenario, monkeypatch):
+        tipo = relatorio_job_service.tipos["financeiro"]
+        liberar = threading.Event()
+
+        def gerar_lento(db, parametros, usuario):
+            liberar.wait(5)
+            return tipo.gerar(db, parametros, usuario)
+
+        monkeypatch.setitem(relatorio_job_service.tipos, "financeiro", dataclasses.replace(tipo, gerar=gerar_lento))
+        monkeypatch.setattr(settings, "relatorios_espera_segundos", 0.05)
+
+        esgotado = self.exportar(client, cenario)
+        assert esgotado.status_code == 504
+        assert esgotado.json()["job_id"] in esgotado.json()["detail"]
+
+        monkeypatch.setattr(settings, "relatorios_espera_segundos", 5)
+        threading.Timer(0.2, liberar.set).start()
+        assert self.exportar(client, cenario).status_code == 200
+
+    def test_relatorio_desconhecido(self, client, cenario):
+        resposta = client.post("/api/relatorios/jobs", json={"relatorio": "inexistente"}, headers=cenario["headers"])
+        assert resposta.status_code == 404
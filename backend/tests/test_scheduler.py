@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import asyncio
+import threading
+
+from app.database import Base
+from app.models import ExecucaoJob
+from app.scheduler import Scheduler
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+class TestScheduler:
+
+    def test_apenas_um_lider(self, db_session):
+        worker_a = Scheduler(session_factory=TestingSessionLocal)
+        worker_b = Scheduler(session_factory=TestingSessionLocal)
+
+        assert worker_a.renovar_lease() is True
+        assert worker_b.renovar_lease() is False
+        assert worker_a.renovar_lease() is True
+
+        worker_a.liberar_lease()
+
+        assert worker_b.renovar_lease() is True
+        assert worker_a.renovar_lease() is False
+
+    def test_lease_expirado_pode_ser_assumido(self, db_session):
+        worker_a = Scheduler(session_factory=TestingSessionLocal, lease_ttl=-1)
+        worker_b = Scheduler(session_factory=TestingSessionLocal)
+
+        assert worker_a.renovar_lease() is True
+        assert worker_b.renovar_lease() is True
+
+    def test_execucao_registra_resultado(self, db_session):
+        scheduler = Scheduler(session_factory=TestingSessionLocal)
+
+        async def job_ok():
+            pass
+
+        def job_com_erro():
+            raise ValueError("falhou")
+
+        async def job_lento():
+            await asyncio.sleep(1)
+
+        jobs = [
+            scheduler.every(60, "ok", job_ok),
+            scheduler.every(60, "erro", job_com_erro),
+            scheduler.every(60, "lento", job_lento, timeout=0.01),
+        ]
+
+        async def executar():
+            for job in jobs:
+                await scheduler.executar_job(job)
+
+        asyncio.run(executar())
+
+        execucoes = {e.job: e for e in db_session.query(ExecucaoJob).all()}
+        assert execucoes["ok"].status == "sucesso"
+        assert execucoes["erro"].status == "erro"
+        assert execucoes["erro"].erro == "falhou"
+        assert execucoes["lento"].status == "timeout"
+        assert all(not job.em_execucao for job in jobs)
+        assert scheduler.status()["jobs"]["erro"]["ultima_execucao"]["status"] == "erro"
+
+    def test_job_em_thread_segue_em_execucao_apos_timeout(self, db_session):
+        scheduler = Scheduler(session_factory=TestingSessionLocal)
+        liberar = threading.Event()
+        job = scheduler.every(60, "thread_lenta", lambda: liberar.wait(5), timeout=0.01)
+
+        async def executar():
+            await scheduler.executar_job(job)
+            assert job.ultima_execucao["status"] == "timeout"
+            assert job.em_execucao
+
+            liberar.set()
+            for _ in range(100):
+                if not job.em_execucao:
+                    break
+                await asyncio.sleep(0.01)
+
+        asyncio.run(executar())
+
+        assert not job.em_execucao
+        assert db_session.query(ExecucaoJob).filter(ExecucaoJob.job == "thread_lenta").one().status == "timeout"
@@ -0,0 +1,131 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from datetime import datetime, timedelta
+
+from app.main import app
+from app.database import get_db, Base
+from app.models import Usuario, Empresa, Evento, Lista, Transacao, TipoUsuario, TipoLista, StatusEvento
+from app.auth import criar_access_token
+from app.services.quota_service import quota_service
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def cenario(db_session):
+    empresa = Empresa(nome="Empresa Teste", cnpj="12345678000199", email="teste@empresa.com")
+    db_session.add(empresa)
+    db_session.commit()
+
+    admin = Usuario(
+        nome="Admin Teste", email="admin@teste.com", cpf="12345678901",
+        tipo=TipoUsuario.ADMIN, empresa_id=empresa.id, senha_hash="$2b$12$test", ativo=True
+    )
+    db_session.add(admin)
+    db_session.commit()
+
+    evento = Evento(
+        nome="Evento Teste", data_evento=datetime.now() + timedelta(days=30), local="Local Teste",
+        status=StatusEvento.ATIVO, empresa_id=empresa.id, criador_id=admin.id
+    )
+    db_session.add(evento)
+    db_session.commit()
+
+    lista = Lista(
+        nome="Pista", tipo=TipoLista.PAGANTE, evento_id=evento.id, preco=50,
+        limite_vendas=3, vendas_realizadas=0, ativa=True
+    )
+    db_session.add(lista)
+    db_session.commit()
+
+    token = criar_access_token(data={"sub": admin.cpf})
+    return {"evento_id": evento.id, "lista_id": lista.id, "headers": {"Authorization": f"Bearer {token}"}}
+
+def montar_lote(cenario, quantidade):
+    return {"transacoes": [{
+        "cpf_comprador": "529.982.247-25",
+        "nome_comprador": f"Comprador {i}",
+        "valor": 0,
+        "evento_id": cenario["evento_id"],
+        "lista_id": cenario["lista_id"]
+    } for i in range(quantidade)]}
+
+class TestTransacoesLote:
+
+    def test_emite_lote_uma_unica_vez(self, client, db_session, cenario):
+        headers = {**cenario["headers"], "Idempotency-Key": "lote-1"}
+
+        resposta = client.post("/api/transacoes/lote", json=montar_lote(cenario, 2), headers=headers)
+        assert resposta.status_code == 200
+        dados = resposta.json()
+        assert dados["quantidade"] == 2
+        assert all(t["valor"] == "50.00" for t in dados["transacoes"])
+
+        repetida = client.post("/api/transacoes/lote", json=montar_lote(cenario, 2), headers=headers)
+        assert repetida.status_code == 200
+        assert repetida.json() == dados
+
+        assert db_session.query(Transacao).count() == 2
+        assert db_session.query(Lista.vendas_realizadas).scalar() == 2
+
+    def test_chave_reutilizada_com_outro_conteudo(self, client, db_session, cenario):
+        headers = {**cenario["headers"], "Idempotency-Key": "lote-2"}
+        client.post("/api/transacoes/lote", json=montar_lote(cenario, 1), headers=headers)
+
+        resposta = client.post("/api/transacoes/lote", json=montar_lote(cenario, 2), headers=headers)
+        assert resposta.status_code == 422
+
+    def test_lote_acima_da_cota_nao_emite_nada(self, client, db_session, cenario):
+        headers = {**cenario["headers"], "Idempotency-Key": "lote-3"}
+
+        resposta = client.post("/api/transacoes/lote", json=montar_lote(cenario, 4), headers=headers)
+        assert resposta.status_code == 400
+        assert db_session.query(Transacao).count() == 0
+        assert db_session.query(Lista.vendas_realizadas).scalar() == 0
+
+        # A chave não fica presa após a falha
+        resposta = client.post("/api/transacoes/lote", json=montar_lote(cenario, 3), headers=headers)
+        assert resposta.status_code == 200
+        assert db_session.query(Lista.vendas_realizadas).scalar() == 3
+
+    def test_falha_do_lote_devolve_vaga_do_bloco_local(self, client, db_session, cenario, monkeypatch):
+        vip = Lista(nome="VIP", tipo=TipoLista.PAGANTE, evento_id=cenario["evento_id"], preco=100,
+                    limite_vendas=1, vendas_realizadas=0, ativa=True)
+        db_session.add(vip)
+        db_session.commit()
+        # Uma vaga da Pista já pré-reservada no bloco do worker (e contada no banco)
+        monkeypatch.setattr(quota_service, "tamanho_bloco", 5)
+        monkeypatch.setattr(quota_service, "_blocos", {cenario["lista_id"]: 1})
+
+        lote = montar_lote(cenario, 1)
+        lote["transacoes"] += montar_lote({**cenario, "lista_id": vip.id}, 2)["transacoes"]
+        resposta = client.post("/api/transacoes/lote", json=lote, headers={**cenario["headers"], "Idempotency-Key": "lote-4"})
+
+        assert resposta.status_code == 400
+        assert db_session.query(Transacao).count() == 0
+        assert quota_service._blocos[cenario["lista_id"]] == 1